@@ -2,9 +2,10 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 from sqlalchemy import text, inspect
-from database import init_db, engine, TimetableProject
+from database import init_db, engine, TimetableProject, unit_of_work
 
 from utils.logger import get_logger  # ロガー有効化(except: pass を撲滅する基盤)
+from utils import query_stats
 
 # --- 各画面の読み込み ---
 from views.workspace import render_workspace_page   # 統合ワークスペース
@@ -26,10 +27,22 @@ logger = get_logger("app")
 @st.cache_resource
 def _ensure_db_initialized():
     init_db()
+    # 新設の grid_order_entries(アーティスト名の索引)を既存プロジェクトの JSON から埋める
+    from services import project_service
+    project_service.backfill_grid_order_entries()
     return True
 
 _ensure_db_initialized()
 
+# FONT_DIR は一時領域でコンテナ再起動のたびに空になるため、起動時にフォントカタログ全体を
+# バックグラウンドで並列取得しておく(プロセス 1 回。描画側はファイル単位のロックで待ち合わせる)。
+@st.cache_resource
+def _start_font_provisioning():
+    from services import font_service
+    return font_service.start_background_provisioning()
+
+_start_font_provisioning()
+
 logger.info("App started")
 
 # ==========================================
@@ -80,20 +93,23 @@ current_page = menu_selection
 # ==========================================
 # ルーティング
 # ==========================================
-if current_page == "ワークスペース":
-    render_workspace_page()
+# rerun 中の service 呼び出しは 1 つの DB セッション(接続 1 本)を共有する。
+# 発行した SQL の文数・時間も rerun 単位で集計する(N+1 の疑い・遅い文はログに出る)
+with unit_of_work(), query_stats.track(f"rerun:{current_page}"):
+    if current_page == "ワークスペース":
+        render_workspace_page()
 
-elif current_page == "プロジェクト管理":
-    render_projects_page()
+    elif current_page == "プロジェクト管理":
+        render_projects_page()
 
-elif current_page == "テンプレート管理":
-    render_template_management_page()
+    elif current_page == "テンプレート管理":
+        render_template_management_page()
 
-elif current_page == "アーティスト管理":
-    render_artists_page()
+    elif current_page == "アーティスト管理":
+        render_artists_page()
 
-elif current_page == "アセット管理":
-    render_assets_page()
+    elif current_page == "アセット管理":
+        render_assets_page()
 
-elif current_page == "使い方マニュアル":
-    render_manual_page()
+    elif current_page == "使い方マニュアル":
+        render_manual_page()
@@ -12,16 +12,23 @@ Webhook(/callback)の LINE 署名検証とは別系統で、EVENT_API_KEY によ
 - ORM は返さず、既存の読み取り DTO(ProjectView / TimetableRowDraft / ArtistView)を
   dict 化して JSON で返す。
 - テストは下記データアクセス薄ラッパ(_load_*)を monkeypatch し、実 DB に触れず検証する。
+- 軽い read(一覧 / 詳細 / rows / grid / artists / 告知テキスト)は async def で、非同期エンジン
+  (database.async_session)経由の service *_async を await する(DB 待ちでスレッドプールを
+  塞がない)。描画・PDF など CPU を使うものは従来どおり同期 def(スレッドプールで実行)。
 """
 from __future__ import annotations
 
+import datetime
 import hmac
 import json
 import os
+import tempfile
 from dataclasses import asdict
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 
 
 # ---------------------------------------------------------------------------
@@ -57,10 +64,16 @@ router = APIRouter(prefix="/api", dependencies=[Depends(require_api_key)])
 # ---------------------------------------------------------------------------
 # データアクセス薄ラッパ(services を遅延 import。テストはここを monkeypatch する)
 # ---------------------------------------------------------------------------
-def _load_project_summaries():
+async def _load_project_summaries_async():
     from services import project_service
 
-    return project_service.list_project_summaries()
+    return await project_service.list_project_summaries_async()
+
+
+async def _load_project_page_async(limit, cursor, date_from, date_to):
+    from services import project_service
+
+    return await project_service.list_project_summary_page_async(limit, cursor, date_from, date_to)
 
 
 def _load_project_view(project_id: int):
@@ -69,22 +82,34 @@ def _load_project_view(project_id: int):
     return project_service.get_project_flyer_view(project_id)
 
 
-def _load_rows(project_id: int):
-    from services import timetable_service
+async def _load_project_view_async(project_id: int):
+    from services import project_service
+
+    return await project_service.get_project_flyer_view_async(project_id)
+
 
-    return timetable_service.get_rows_for_project(project_id)
+async def _load_project_with_rows_async(project_id: int):
+    from services import project_service
+
+    return await project_service.get_project_with_rows_async(project_id)
+
+
+def _find_conflicts(project_id: int):
+    from services import stage_service
 
+    return stage_service.find_conflicts_for_project(project_id)
 
-def _load_artists():
+
+async def _load_artists_async():
     from services import artist_service
 
-    return artist_service.list_artists()
+    return await artist_service.list_artists_async()
 
 
-def _build_summary_text(project_id: int):
+async def _build_summary_text_async(project_id: int):
     from services import generation_service
 
-    return generation_service.build_summary_text_for_project(project_id)
+    return await generation_service.build_summary_text_for_project_async(project_id)
 
 
 def _render_grid_png(project_id: int):
@@ -93,6 +118,52 @@ def _render_grid_png(project_id: int):
     return generation_service.render_grid_png_for_project(project_id)
 
 
+def _build_flyer_layout(project_id: int, variant: str):
+    from services import generation_service
+
+    return generation_service.build_flyer_layout_for_project(project_id, variant)
+
+
+def _render_flyer_png(project_id: int, variant: str):
+    from services import generation_service
+
+    return generation_service.render_flyer_png_for_project(project_id, variant)
+
+
+def _export_timetables_pdf(date_from: Optional[str], date_to: Optional[str], out):
+    from services import generation_service
+
+    return generation_service.export_timetables_pdf(date_from, date_to, out)
+
+
+def _build_event_pack_pdf(project_id: int, out):
+    from services import generation_service
+
+    return generation_service.build_event_pack_pdf(project_id, out)
+
+
+def _pdf_file_response(write, filename: str, empty_detail: str) -> Response:
+    """write(out) で一時ファイルへ PDF を直接書き、ストリームで返して送信後に消す。
+
+    write が偽を返したら(書く対象なし)404。PDF 全体をメモリに持たない。
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        with open(path, "wb") as out:
+            written = write(out)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if not written:
+        os.unlink(path)
+        raise HTTPException(status_code=404, detail=empty_detail)
+    return FileResponse(
+        path, media_type="application/pdf", filename=filename,
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
 def _parse_grid(raw: Optional[str]):
     """grid_order_json(生文字列)を JSON パースして返す。None / 空 / 壊れは None。"""
     if not raw:
@@ -107,53 +178,90 @@ def _parse_grid(raw: Optional[str]):
 # read エンドポイント(全て GET・非書き込み・DTO を JSON で返す)
 # ---------------------------------------------------------------------------
 @router.get("/projects")
-def list_projects() -> list:
-    """プロジェクト一覧(軽量: id / title / event_date)。"""
+async def list_projects(
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> list:
+    """プロジェクト一覧(軽量: id / title / event_date)。日付降順。
+
+    limit / cursor で keyset ページング(次ページのカーソルは X-Next-Cursor ヘッダ。
+    最後のページでは付かない)、date_from / date_to で event_date を絞り込む。
+    いずれも無指定なら従来どおり全件。壊れた cursor は 400。
+    """
+    if limit is None and cursor is None and date_from is None and date_to is None:
+        views = await _load_project_summaries_async()
+    else:
+        try:
+            views, next_cursor = await _load_project_page_async(
+                limit, cursor,
+                date_from.isoformat() if date_from else None,
+                date_to.isoformat() if date_to else None,
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
     return [
         {"id": v.id, "title": v.title, "event_date": v.event_date}
-        for v in _load_project_summaries()
+        for v in views
     ]
 
 
 @router.get("/projects/{project_id}")
-def get_project(project_id: int) -> dict:
+async def get_project(project_id: int) -> dict:
     """プロジェクト詳細(ProjectView 相当・生値ミラー)。未検出は 404。"""
-    view = _load_project_view(project_id)
+    view = await _load_project_view_async(project_id)
     if view is None:
         raise HTTPException(status_code=404, detail="project not found")
     return asdict(view)
 
 
 @router.get("/projects/{project_id}/rows")
-def get_project_rows(project_id: int) -> list:
+async def get_project_rows(project_id: int) -> list:
     """その project の TT rows(TimetableRowDraft 相当)。未検出プロジェクトは 404。"""
-    if _load_project_view(project_id) is None:
+    view, rows = await _load_project_with_rows_async(project_id)
+    if view is None:
         raise HTTPException(status_code=404, detail="project not found")
-    return [asdict(r) for r in _load_rows(project_id)]
+    return [asdict(r) for r in rows]
 
 
 @router.get("/projects/{project_id}/grid")
-def get_project_grid(project_id: int) -> dict:
+async def get_project_grid(project_id: int) -> dict:
     """その project の grid_order(ProjectView.grid_order_json をパースして返す)。未検出は 404。"""
-    view = _load_project_view(project_id)
+    view = await _load_project_view_async(project_id)
     if view is None:
         raise HTTPException(status_code=404, detail="project not found")
     return {"grid_order": _parse_grid(view.grid_order_json)}
 
 
+@router.get("/projects/{project_id}/conflicts")
+def get_project_conflicts(project_id: int) -> dict:
+    """同じイベントの全ステージを通した重複(出演の二重ブッキング・物販ブースの重なり)。未検出は 404。"""
+    if _load_project_view(project_id) is None:
+        raise HTTPException(status_code=404, detail="project not found")
+    stages, conflicts = _find_conflicts(project_id)
+    return {
+        "stages": [{"project_id": s.project_id, "name": s.name} for s in stages],
+        "conflicts": [c.to_dict() for c in conflicts],
+    }
+
+
 @router.get("/artists")
-def list_artists() -> list:
+async def list_artists() -> list:
     """アーティスト一覧(ArtistView 相当・既定 is_deleted==False)。"""
-    return [asdict(a) for a in _load_artists()]
+    return [asdict(a) for a in await _load_artists_async()]
 
 
 # ---------------------------------------------------------------------------
 # 生成トリガー(read + generate・書き込みなし。§11.7 段階A1)
 # ---------------------------------------------------------------------------
 @router.get("/projects/{project_id}/summary-text")
-def get_project_summary_text(project_id: int) -> dict:
+async def get_project_summary_text(project_id: int) -> dict:
     """その project の告知テキストを DB から生成して返す。未検出は 404。"""
-    text = _build_summary_text(project_id)
+    text = await _build_summary_text_async(project_id)
     if text is None:
         raise HTTPException(status_code=404, detail="project not found")
     return {"text": text}
@@ -171,3 +279,70 @@ def get_project_grid_image(project_id: int) -> Response:
     if png is None:
         raise HTTPException(status_code=404, detail="grid has no artists")
     return Response(content=png, media_type="image/png")
+
+
+@router.get("/projects/{project_id}/flyer-layout")
+def get_project_flyer_layout(project_id: int, variant: Literal["grid", "tt"] = "grid") -> dict:
+    """その project のフライヤー各要素の配置(base_x/base_y/bbox)を返す。描画はしない。
+
+    flyer_json の設定から計測だけでレイアウトを確定する(utils.flyer_generator.layout_flyer)。
+    未検出は 404。variant は grid / tt(それ以外は 422)。
+    """
+    layout = _build_flyer_layout(project_id, variant)
+    if layout is None:
+        raise HTTPException(status_code=404, detail="project not found")
+    return layout
+
+
+@router.get("/projects/{project_id}/flyer-image")
+def get_project_flyer_image(
+    project_id: int,
+    variant: Literal["grid", "tt"] = "grid",
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    """その project の完成フライヤー(PNG)を DB 設定から描画して返す。
+
+    入力(設定・素材・フォント・出演者画像の版)のハッシュを ETag に載せ、
+    同じ入力ならサーバ側キャッシュから返す。If-None-Match が一致すれば 304(本文なし)。
+    未検出プロジェクトは 404。メイン画像(grid / TT)が作れない場合も 404。
+    """
+    if _load_project_view(project_id) is None:
+        raise HTTPException(status_code=404, detail="project not found")
+    result = _render_flyer_png(project_id, variant)
+    if result is None:
+        raise HTTPException(status_code=404, detail="flyer source unavailable")
+    png, digest = result
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+@router.get("/exports/timetables.pdf")
+def export_timetables_pdf(
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Response:
+    """event_date が期間内の全プロジェクトのタイムテーブルを 1 つの PDF で返す。該当 0 件は 404。"""
+    return _pdf_file_response(
+        lambda out: _export_timetables_pdf(
+            date_from.isoformat() if date_from else None,
+            date_to.isoformat() if date_to else None,
+            out,
+        ),
+        "timetables.pdf",
+        "no timetables in range",
+    )
+
+
+@router.get("/projects/{project_id}/event-pack.pdf")
+def get_project_event_pack(project_id: int) -> Response:
+    """イベント資料 PDF(概要 + 業務用タイムテーブル + grid / TT 画像)。未検出は 404。"""
+    if _load_project_view(project_id) is None:
+        raise HTTPException(status_code=404, detail="project not found")
+    return _pdf_file_response(
+        lambda out: _build_event_pack_pdf(project_id, out),
+        f"event_pack_{project_id}.pdf",
+        "project not found",
+    )
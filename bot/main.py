@@ -27,6 +27,7 @@ import logging
 import os
 import threading
 import time
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
@@ -345,9 +346,47 @@ def handle_event(event: dict, config: BotConfig) -> None:
 # ---------------------------------------------------------------------------
 # FastAPI アプリ
 # ---------------------------------------------------------------------------
-app = FastAPI(title="BOTTZ AI LINE Bot")
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # /api のフライヤー描画用に、フォントカタログをバックグラウンドで並列取得しておく。
+    # services は遅延 import(env 未設定などで失敗しても起動自体は止めない)。
+    try:
+        from services import font_service
+
+        font_service.start_background_provisioning()
+    except Exception as e:
+        logger.warning("font provisioning not started: %s", e)
+    yield
+
+
+app = FastAPI(title="BOTTZ AI LINE Bot", lifespan=_lifespan)
 app.include_router(api.router)  # /api/* read エンドポイント(API キー認証・§11.7 段階A0)
 
+# ローカルバックエンド(EVENT_APP_BACKEND=local)では画像を /storage で配信する
+# (LOCAL_STORAGE_URL=http://<host>:<port>/storage にすると get_image_url がこの URL を返す)
+if os.environ.get("EVENT_APP_BACKEND", "").strip().lower() == "local":
+    from fastapi.staticfiles import StaticFiles
+
+    from constants import LOCAL_STORAGE_DIR
+
+    app.mount("/storage", StaticFiles(directory=LOCAL_STORAGE_DIR, check_dir=False), name="storage")
+
+
+@app.middleware("http")
+async def _db_unit_of_work(request: Request, call_next):
+    # /api の 1 リクエスト内の service 呼び出しは DB セッション(接続 1 本)を共有し、
+    # 発行した SQL の文数・時間をリクエスト単位で集計する(utils.query_stats)。
+    # database は遅延 import(env 未設定でも起動できるように。失敗時は従来どおり個別セッション)
+    if not request.url.path.startswith("/api"):
+        return await call_next(request)
+    try:
+        from database import unit_of_work
+        from utils import query_stats
+    except Exception:
+        return await call_next(request)
+    with unit_of_work(), query_stats.track(f"{request.method} {request.url.path}"):
+        return await call_next(request)
+
 
 @app.get("/")
 def health() -> dict:
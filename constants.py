@@ -18,6 +18,22 @@ FONT_DIR = os.path.join(tempfile.gettempdir(), "app_fonts")
 os.makedirs(FONT_DIR, exist_ok=True)
 
 
+# ==========================================
+# ローカルバックエンド (Supabase 無しで動かす: ベンチ・負荷試験・オフライン開発用)
+# ==========================================
+# EVENT_APP_BACKEND=local のとき database は Supabase を使わず、
+#   DB   : LOCAL_DB_URL(既定 data/local.db の SQLite。ローカル Postgres の URL も可)
+#   画像 : LOCAL_STORAGE_DIR(既定 data/storage)に保存する。get_image_url は LOCAL_STORAGE_URL
+#          (例 http://127.0.0.1:8000/storage。Bot が /storage で配信)があればその URL、
+#          無ければファイルパスを返す。
+# 未設定(既定 supabase)なら従来どおり。
+BACKEND = os.environ.get("EVENT_APP_BACKEND", "supabase").strip().lower()
+LOCAL_BACKEND = BACKEND == "local"
+LOCAL_DB_URL = os.environ.get("LOCAL_DB_URL") or "sqlite:///" + os.path.join(BASE_DIR, "data", "local.db")
+LOCAL_STORAGE_DIR = os.environ.get("LOCAL_STORAGE_DIR") or os.path.join(BASE_DIR, "data", "storage")
+LOCAL_STORAGE_URL = os.environ.get("LOCAL_STORAGE_URL", "").rstrip("/")
+
+
 # ==========================================
 # 選択肢リスト (ユーザー様の設定を維持)
 # ==========================================
@@ -1,10 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, Float, ForeignKey, LargeBinary
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
-from supabase import create_client, Client
+from sqlalchemy import create_engine, make_url, Column, Integer, String, Text, Boolean, Float, ForeignKey, LargeBinary
+from sqlalchemy.orm import Session, sessionmaker, declarative_base, relationship
+from contextlib import contextmanager
+from contextvars import ContextVar
 import logging
 import os
+import threading
 import urllib.parse  # URLエンコード用
 
+from constants import LOCAL_BACKEND, LOCAL_DB_URL, LOCAL_STORAGE_DIR, LOCAL_STORAGE_URL
+
 # streamlit は Streamlit Cloud / ローカル venv にのみ存在する。Bot 実環境(Railway・
 # fastapi のみ)には入れない(starlette バージョン衝突の回避=§Bot 依存分離)。無い環境でも
 # database を import できるよう任意化する。★streamlit がある環境では st は本物のモジュールに
@@ -40,24 +44,159 @@ def _load_supabase_config():
     )
 
 
-raw_db_url, SUPABASE_URL, SUPABASE_KEY = _load_supabase_config()
+# ローカルバックエンド(constants.LOCAL_BACKEND)は Supabase の設定を読まない
+if LOCAL_BACKEND:
+    raw_db_url, SUPABASE_URL, SUPABASE_KEY = LOCAL_DB_URL, None, None
+else:
+    raw_db_url, SUPABASE_URL, SUPABASE_KEY = _load_supabase_config()
 # URLの形式補正（postgres:// を postgresql:// に変換）
 if raw_db_url.startswith("postgres://"):
     raw_db_url = raw_db_url.replace("postgres://", "postgresql://", 1)
 DB_URL = raw_db_url
 
-# --- データベース接続 (PostgreSQL) ---
-# SSL接続を強制する設定。create_engine は遅延接続(ここでは接続しない)なので
+
+def _engine_connect_args(url):
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False}  # Streamlit / FastAPI はスレッドをまたいで使う
+    if LOCAL_BACKEND:
+        return {}  # ローカル Postgres は SSL なし
+    return {"sslmode": "require"}  # Supabase接続に必須
+
+
+# --- データベース接続 (PostgreSQL / ローカルバックエンドでは SQLite も可) ---
+# create_engine は遅延接続(ここでは接続しない)なので
 # 例外は基本出ないが、出た場合は Streamlit 非依存のため素の例外として送出する。
-engine = create_engine(
-    DB_URL,
-    connect_args={"sslmode": "require"}  # Supabase接続に必須
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(DB_URL, connect_args=_engine_connect_args(DB_URL))
+
+
+# --- リクエスト / rerun 単位のセッション共有(unit of work) ---
+# service は従来どおり `db = SessionLocal() … db.close()` と書く。unit_of_work() の中では
+# SessionLocal() が同じセッションを返し、スコープの終わりで閉じる。スコープ外では従来どおり
+# 毎回新しいセッションを作る。commit / rollback は各 service が握ったまま。
+# service 側の close() はセッションを閉じないが、使用中の service がいなくなったら(入れ子の
+# 内側の close では終わらせない)トランザクションを rollback で終え、接続をプールに返す。
+# 未 commit の分を捨てるのは従来の close と同じ。これで描画・PDF 生成などの CPU 処理や
+# ロック待ちの間に、スコープがプール接続(と Supabase pooler 側の接続)を握り続けない。
+class _SharedSession(Session):
+    users = 0   # SessionLocal() で渡した数 - close() の数
+
+    def close(self):
+        self.users = max(self.users - 1, 0)
+        if self.users == 0:
+            self.rollback()   # セッションは残す(スコープの持ち主 unit_of_work が閉じる)
+
+    def _close_scope(self):
+        super().close()
+
+
+class _UnitOfWork:
+    def __init__(self):
+        self.session = None  # 最初に SessionLocal() が呼ばれたときに作る(DB を使わない要求は接続しない)
+
+
+_current_uow: ContextVar = ContextVar("db_unit_of_work", default=None)
+
+
+class _SessionFactory(sessionmaker):
+    def __call__(self, **local_kw):
+        uow = _current_uow.get()
+        if uow is None or local_kw:
+            return super().__call__(**local_kw)
+        if uow.session is None:
+            uow.session = _SharedSession(**self.kw)
+        uow.session.users += 1
+        return uow.session
+
+
+SessionLocal = _SessionFactory(autocommit=False, autoflush=False, bind=engine)
+
+
+@contextmanager
+def unit_of_work():
+    """この中の SessionLocal() を 1 つのセッションに束ねる(入れ子は外側に合流)。
+
+    Streamlit は rerun 1 回、Bot の /api は 1 リクエストをこのスコープで包む。
+    スレッドをまたいでは共有しない(ContextVar。ThreadPoolExecutor の中は従来どおり個別)。
+    """
+    if _current_uow.get() is not None:
+        yield
+        return
+    uow = _UnitOfWork()
+    token = _current_uow.set(uow)
+    try:
+        yield
+    finally:
+        _current_uow.reset(token)
+        if uow.session is not None:
+            uow.session._close_scope()  # 未 commit の分は close が rollback する
 Base = declarative_base()
 
+
+# --- 非同期エンジン(Bot の async /api 用・初回利用時に作る) ---
+# Streamlit 側は使わないので import 時には作らない(asyncpg が無い環境でも database を import できる)。
+# URL は ASYNC_DB_URL(ローカル / テスト用の差し替え。例 sqlite+aiosqlite://)があればそれ、
+# 無ければ DB_URL を postgresql+asyncpg(SQLite なら sqlite+aiosqlite)に読み替える。
+# asyncpg は sslmode を受け付けないのでクエリから外して connect_args の ssl で渡す。
+# Supabase の pooler(トランザクションモード)はトランザクションごとに裏の接続が替わるため、
+# prepared statement を接続に残すと "already exists / does not exist" になる。SQLAlchemy の
+# asyncpg 方言の説明どおり、asyncpg 側(statement_cache_size=0)と SQLAlchemy 側
+# (prepared_statement_cache_size=0)の両方のキャッシュを切り、文の名前を毎回 uuid にし、
+# 接続はプールせず(NullPool。プールは pooler 側に任せる)使い捨てる。
+# ローカルバックエンドの Postgres には付けない。
+_async_session_factory = None
+_async_guard = threading.Lock()
+
+
+def _async_db_url():
+    override = os.environ.get("ASYNC_DB_URL")
+    if override:
+        return make_url(override)
+    url = make_url(DB_URL)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    url = url.set(drivername="postgresql+asyncpg")
+    return url.difference_update_query(["sslmode"])
+
+
+def get_async_session_factory():
+    """async_sessionmaker(プロセスで 1 つ。初回呼び出しでエンジンを作る)。"""
+    global _async_session_factory
+    with _async_guard:
+        if _async_session_factory is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            url = _async_db_url()
+            engine_kwargs = {"pool_pre_ping": True}
+            if url.drivername == "postgresql+asyncpg" and not LOCAL_BACKEND:
+                from uuid import uuid4
+                from sqlalchemy.pool import NullPool
+
+                url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+                engine_kwargs = {
+                    "poolclass": NullPool,
+                    "connect_args": {
+                        "ssl": "require",
+                        "statement_cache_size": 0,
+                        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+                    },
+                }
+            async_engine = create_async_engine(url, **engine_kwargs)
+            _async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+        return _async_session_factory
+
+
+def async_session():
+    """`async with async_session() as db:` で使う AsyncSession(read 用。commit は呼び出し側)。"""
+    return get_async_session_factory()()
+
 # --- Supabase Storageクライアント ---
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# ローカルバックエンドでは作らない(画像は LOCAL_STORAGE_DIR のファイル)
+if LOCAL_BACKEND:
+    supabase = None
+    os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+else:
+    from supabase import create_client
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # ★重要: 以前の開発環境とバケット名が同じか確認してください。
 BUCKET_NAME = "images" 
@@ -105,6 +244,10 @@ class TimetableProject(Base):
 
     # 行データへのリレーション
     rows = relationship("TimetableRow", back_populates="project", cascade="all, delete-orphan")
+    # grid_order_json の order を正規化した索引(同期は project_repo が行う)
+    grid_entries = relationship(
+        "GridOrderEntry", cascade="all, delete-orphan", order_by="GridOrderEntry.position",
+    )
 
 # タイムテーブル行データ保存用テーブル
 class TimetableRow(Base):
@@ -134,6 +277,31 @@ class TimetableRow(Base):
     project = relationship("TimetableProject", back_populates="rows")
 
 
+# 複数ステージ: 同じイベントのステージ(= プロジェクト)を束ねる
+# group_id はグループ先頭プロジェクトの id。新規テーブルなので init_db の create_all で作られる
+class ProjectStage(Base):
+    __tablename__ = "project_stages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects_v4.id"), nullable=False, unique=True)
+    stage_name = Column(String)
+    sort_order = Column(Integer, default=0)
+
+
+# グリッド並び順(grid_order_json の order)の正規化テーブル。
+# 正本は grid_order_json のまま(表示側はそちらを読む)。アーティスト名での検索
+# (統合時の名寄せ・「どのプロジェクトに載っているか」)を索引で引くためのもの。
+# 新規テーブルなので init_db の create_all で作られる(既存分は backfill で埋める)
+class GridOrderEntry(Base):
+    __tablename__ = "grid_order_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects_v4.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    artist_name = Column(String, nullable=False, index=True)
+
+
 class Asset(Base):
     __tablename__ = "assets"
     id = Column(Integer, primary_key=True, index=True)
@@ -197,6 +365,10 @@ def upload_image_to_supabase(file_obj, filename):
         elif lower_name.endswith(".webp"):
             content_type = "image/webp"
         
+        if LOCAL_BACKEND:
+            _write_local_image(filename, file_bytes)
+            return filename
+
         # ファイル名をURLエンコード等はせず、そのままアップロード
         # (Supabase側で保存される名前とDBの名前を一致させるため)
         res = supabase.storage.from_(BUCKET_NAME).upload(
@@ -212,10 +384,42 @@ def upload_image_to_supabase(file_obj, filename):
             logger.error("画像アップロードエラー: %s", e)
         return None
 
+def _local_image_path(filename):
+    """ローカルバックエンドの画像パス(LOCAL_STORAGE_DIR の外を指す名前は ValueError)。"""
+    root = os.path.abspath(LOCAL_STORAGE_DIR)
+    path = os.path.abspath(os.path.join(root, filename))
+    if not path.startswith(root + os.sep):
+        raise ValueError(f"不正なファイル名: {filename!r}")
+    return path
+
+
+def _write_local_image(filename, file_bytes):
+    # 一時ファイル → rename(読み手に書きかけのファイルを見せない。Supabase の upsert と同じく上書き)
+    path = _local_image_path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(file_bytes)
+    os.replace(tmp, path)
+
+
+def read_local_file(path):
+    """ローカルバックエンドの保存ファイル(get_image_url が返したパス)の中身を返す。
+
+    ローカルバックエンド以外、または LOCAL_STORAGE_DIR の外を指すパスは ValueError
+    (DB に入っている文字列を任意のファイルパスとして開かない)。
+    """
+    if not LOCAL_BACKEND:
+        raise ValueError(f"ローカルバックエンド以外ではファイルを読まない: {path!r}")
+    with open(_local_image_path(path), "rb") as f:
+        return f.read()
+
+
 def get_image_url(filename):
     """
     ファイル名からSupabaseの公開URLを取得する
     日本語ファイル名に対応するためURLエンコードを行う
+    (ローカルバックエンドでは LOCAL_STORAGE_URL 配下の URL、未設定ならファイルパス)
     """
     if not filename: return None
     
@@ -232,7 +436,13 @@ def get_image_url(filename):
         # 日本語ファイル名などをURLで使用できる形式に変換
         # パス区切り文字 '/' はエンコードしないように safe='/' を指定
         safe_filename = urllib.parse.quote(filename, safe='/')
-        
+
+        if LOCAL_BACKEND:
+            if LOCAL_STORAGE_URL:
+                return f"{LOCAL_STORAGE_URL}/{safe_filename}"
+            path = _local_image_path(filename)
+            return path if os.path.exists(path) else None
+
         # Supabase Storageから公開URLを取得
         return supabase.storage.from_(BUCKET_NAME).get_public_url(safe_filename)
     except Exception as e:
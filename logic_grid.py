@@ -8,7 +8,9 @@ import numpy as np
 import requests
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont, ImageOps
-from database import get_image_url
+from constants import LOCAL_BACKEND
+from database import get_image_url, read_local_file
+from utils.font_metrics import estimate_fit_size, fit_font_size, get_table
 
 # ★追加: パス解決のために constants からディレクトリ情報をインポート
 try:
@@ -141,11 +143,21 @@ def create_no_image_placeholder(width, height):
     draw.text(((width - (bbox[2]-bbox[0])) / 2, (height - (bbox[3]-bbox[1])) / 2), text, fill="white")
     return img
 
-def load_image_from_url(url):
-    try:
+def _fetch_bytes(url):
+    """http(s) は GET。ローカルバックエンドに限り、LOCAL_STORAGE_DIR 配下のファイルパスも読む
+    (get_image_url は LOCAL_STORAGE_URL 未設定時にパスを返す)。それ以外は ValueError。"""
+    if url.startswith("http://") or url.startswith("https://"):
         response = requests.get(url, timeout=10)
         response.raise_for_status()
-        return Image.open(BytesIO(response.content)).convert("RGBA")
+        return response.content
+    if not LOCAL_BACKEND:
+        raise ValueError(f"画像 URL ではない: {url!r}")
+    return read_local_file(url)
+
+
+def load_image_from_url(url):
+    try:
+        return Image.open(BytesIO(_fetch_bytes(url))).convert("RGBA")
     except Exception:
         return None
 
@@ -186,9 +198,7 @@ def _load_and_downscale(url):
     ※ アプリ共有の load_image_from_url は変更しない(この grid 専用経路のみ draft する)。
     """
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        im = Image.open(BytesIO(response.content))
+        im = Image.open(BytesIO(_fetch_bytes(url)))
         try:
             im.draft("RGB", (GRID_MAX_LOAD_EDGE, GRID_MAX_LOAD_EDGE))
         except Exception:
@@ -369,6 +379,7 @@ def generate_grid_image(artists, image_dir_unused, font_path="keifont.ttf", row_
     if not valid_font_path:
         valid_font_path = resolve_font_path("keifont.ttf")
     font_exists = (valid_font_path is not None)
+    metrics = get_table(valid_font_path) if font_exists else None
 
     for config in row_configs:
         chunk = config["artists"]
@@ -418,27 +429,23 @@ def generate_grid_image(artists, image_dir_unused, font_path="keifont.ttf", row_
             draw.rectangle([(x, text_bg_y), (x + w, text_bg_y + th)], fill="white")
 
             # --- テキスト描画 ---
-            current_font_size = font_max
+            # 字幅テーブル(utils.font_metrics)の見積もりで入るサイズへ飛び、実測は前後 1〜2 回。
+            # 結果は従来の「2px ずつ下げて実測」ループと同じ(下限まで入らなければ
+            # MIN_FONT_SIZE を超える最後のサイズ / font_max が下限以下なら既定フォント)。
             target_font = default_font
+            if font_exists and font_max > MIN_FONT_SIZE:
+                def _fits(size):
+                    bbox = draw.textbbox((0, 0), artist_name, font=ImageFont.truetype(valid_font_path, int(size)))
+                    return (bbox[2] - bbox[0]) < (w - 10)
 
-            while current_font_size > MIN_FONT_SIZE:
                 try:
-                    if font_exists:
-                        target_font = ImageFont.truetype(valid_font_path, int(current_font_size))
-                    else:
-                        target_font = default_font
-                        break
+                    size = fit_font_size(
+                        _fits, font_max, MIN_FONT_SIZE + 2, 2,
+                        estimate=estimate_fit_size(metrics, artist_name, w - 10),
+                    )
+                    target_font = ImageFont.truetype(valid_font_path, int(size))
                 except Exception:
                     target_font = default_font
-                    break
-
-                bbox = draw.textbbox((0, 0), artist_name, font=target_font)
-                text_w = bbox[2] - bbox[0]
-                
-                if text_w < (w - 10):
-                    break 
-                
-                current_font_size -= 2 
 
             try:
                 bbox = draw.textbbox((0, 0), artist_name, font=target_font)
@@ -5,6 +5,7 @@ from datetime import date
 from database import TimetableProject, TimetableRow
 from utils import safe_int, safe_str
 from constants import get_default_row_settings
+from repositories.timetable_repo import upsert_row_values
 
 # --- ヘルパー関数: 安全なJSON読み込み ---
 def parse_json_safe(data, default_val):
@@ -41,42 +42,31 @@ def save_timetable_rows(db, project_id, rows_data):
     ★修正: 追加物販時間(ADD_GOODS_DURATION)のデフォルトを60ではなくNoneに変更
     """
     try:
-        # 1. 既存行の削除
-        db.query(TimetableRow).filter(TimetableRow.project_id == project_id).delete()
-        
-        # 2. 新規行の作成
-        new_rows = []
-        for idx, item in enumerate(rows_data):
+        # 差分だけ書く(全削除→全挿入はしない。timetable_repo.upsert_row_values)
+        values = []
+        for item in rows_data:
             # 数値型カラムに入れる値は必ず safe_int を通す
-            duration_val = safe_int(item.get("DURATION"), 0)
-            adjustment_val = safe_int(item.get("ADJUSTMENT"), 0)
-            goods_duration_val = safe_int(item.get("GOODS_DURATION"), 60)
-            # ★修正: デフォルトを60からNoneに変更
-            add_goods_duration_val = safe_int(item.get("ADD_GOODS_DURATION"), None) 
-
-            row = TimetableRow(
-                project_id=project_id,
-                sort_order=idx,
+            values.append(dict(
                 artist_name=safe_str(item.get("ARTIST")),
-                
-                duration=duration_val,
+
+                duration=safe_int(item.get("DURATION"), 0),
                 is_post_goods=bool(item.get("IS_POST_GOODS", False)),
-                adjustment=adjustment_val,
-                
+                adjustment=safe_int(item.get("ADJUSTMENT"), 0),
+
                 goods_start_time=safe_str(item.get("GOODS_START_MANUAL")),
-                goods_duration=goods_duration_val,
+                goods_duration=safe_int(item.get("GOODS_DURATION"), 60),
                 place=safe_str(item.get("PLACE")),
-                
+
                 add_goods_start_time=safe_str(item.get("ADD_GOODS_START")),
-                add_goods_duration=add_goods_duration_val,
+                # ★修正: デフォルトを60からNoneに変更
+                add_goods_duration=safe_int(item.get("ADD_GOODS_DURATION"), None),
                 add_goods_place=safe_str(item.get("ADD_GOODS_PLACE")),
 
                 # ★追加: 非表示フラグを保存
-                is_hidden=bool(item.get("IS_HIDDEN", False))
-            )
-            new_rows.append(row)
-        
-        db.add_all(new_rows)
+                is_hidden=bool(item.get("IS_HIDDEN", False)),
+            ))
+
+        upsert_row_values(db, project_id, values)
         db.commit()
         return True
     except Exception as e:
@@ -4,7 +4,10 @@ import os
 import requests
 from io import BytesIO
 from concurrent.futures import ThreadPoolExecutor
-import streamlit as st
+from utils.font_metrics import estimate_fit_size, fit_font_size, get_table
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 # ================= 設定エリア =================
 # 1mm = 10px の高解像度で設定し、印刷時(300dpi等)に綺麗に出るようにします
@@ -53,29 +56,36 @@ def _prefetch_tt_images(timetable_data, db):
     ThreadPoolExecutor で並列 HTTP 取得。出力画像 (タイムテーブル合成結果) は不変。
     HTTP 取得の wall-clock 時間を短縮するための取得フェーズのみ並列化。
 
-    - Artist 解決: 既存 draw_one_row 内と同じロジック (name 完全一致 → ilike fallback)
+    - Artist 解決: 既存 draw_one_row 内と同じロジック (name 完全一致 → ilike fallback)。
+      完全一致は全行分を IN 1 回で引き (同名が複数あれば id 最小)、見つからない名前だけ ilike で引く
     - 物販系 ("OPEN / START" / "開演前物販" / "終演後物販") はスキップ
     - URL 生成 (get_image_url) は直列 (DB を引かない・軽い文字列処理)
     - HTTP 取得は max_workers=8 で並列
     - 失敗時は None を返す (既存 load_image の挙動と同じ)
     - 同名行は同じ画像を共有 (1 回取得で済む)
-    - DB 二重引き (prefetch でも draw_one_row 内でも Artist を引く) は今回許容。
-      DB N+1 解消は別タスク。
+    - draw_one_row は image_cache を渡されたら DB を引かない (行ごとの Artist 引きはしない)
     """
     from database import Artist, get_image_url
     SKIP_NAMES = {"OPEN / START", "開演前物販", "終演後物販"}
 
     # 1. name_str → url を集める (DBクエリ + URL生成は直列)
-    name_to_url = {}
+    names = []
     for row in timetable_data:
         if not row or len(row) < 2:
             continue
         name_str = str(row[1]).strip()
-        if not name_str or name_str in SKIP_NAMES:
-            continue
-        if name_str in name_to_url:
-            continue
-        artist = db.query(Artist).filter(Artist.name == name_str, Artist.is_deleted == False).first()
+        if name_str and name_str not in SKIP_NAMES and name_str not in names:
+            names.append(name_str)
+
+    by_name = {}
+    if names:
+        exact = db.query(Artist).filter(Artist.name.in_(names), Artist.is_deleted == False).order_by(Artist.id)
+        for artist in exact:
+            by_name.setdefault(artist.name, artist)
+
+    name_to_url = {}
+    for name_str in names:
+        artist = by_name.get(name_str)
         if not artist:
             clean = name_str.replace(" ", "").replace("　", "")
             if clean:
@@ -103,13 +113,17 @@ def _prefetch_tt_images(timetable_data, db):
 def draw_centered_text(draw, text, box_x, box_y, box_w, box_h, font_path, max_font_size, align="center"):
     text = str(text).strip()
     if not text: return
-    current_font_size = max_font_size
-    font = get_font(font_path, current_font_size)
     min_font_size = 15
-    while current_font_size > min_font_size:
-        bbox = draw.multiline_textbbox((0, 0), text, font=font, spacing=4)
-        if (bbox[2]-bbox[0]) <= (box_w - 10) and (bbox[3]-bbox[1]) <= (box_h - 4): break
-        current_font_size -= 2
+    font = get_font(font_path, max_font_size)
+
+    def fits(size):
+        bbox = draw.multiline_textbbox((0, 0), text, font=get_font(font_path, size), spacing=4)
+        return (bbox[2]-bbox[0]) <= (box_w - 10) and (bbox[3]-bbox[1]) <= (box_h - 4)
+
+    # 字幅テーブルの見積もりで入るサイズへ飛び、実測で確定(従来の 2px 刻みループと同じ結果)
+    estimate = estimate_fit_size(get_table(font), text, box_w - 10, box_h - 4, spacing=4)
+    current_font_size = fit_font_size(fits, max_font_size, min_font_size, 2, estimate=estimate)
+    if current_font_size != max_font_size:
         font = get_font(font_path, current_font_size)
 
     bbox = draw.multiline_textbbox((0, 0), text, font=font, spacing=4)
@@ -159,24 +173,25 @@ def draw_one_row(draw, canvas, base_x, base_y, row_data, font_path, db, row_widt
 
     if name_str and name_str not in ["OPEN / START", "開演前物販", "終演後物販"]:
         try:
-            from database import Artist, get_image_url
-            artist = db.query(Artist).filter(Artist.name == name_str, Artist.is_deleted == False).first()
-            if not artist:
-                clean = name_str.replace(" ", "").replace("　", "")
-                if clean: artist = db.query(Artist).filter(Artist.name.ilike(f"%{clean}%"), Artist.is_deleted == False).first()
-
-            if artist and artist.image_filename:
-                url = get_image_url(artist.image_filename)
-                if url:
-                    # Phase 3 P2: 並列取得済みの image_cache から取り出し (image_cache=None のとき従来動作にフォールバック)
-                    if image_cache is not None:
-                        img = image_cache.get(name_str)
-                    else:
+            img = None
+            if image_cache is not None:
+                # Phase 3 P2: 解決・取得は _prefetch_tt_images 済み (ここでは DB も HTTP も引かない)
+                img = image_cache.get(name_str)
+            else:
+                from database import Artist, get_image_url
+                artist = db.query(Artist).filter(Artist.name == name_str, Artist.is_deleted == False).first()
+                if not artist:
+                    clean = name_str.replace(" ", "").replace("　", "")
+                    if clean: artist = db.query(Artist).filter(Artist.name.ilike(f"%{clean}%"), Artist.is_deleted == False).first()
+
+                if artist and artist.image_filename:
+                    url = get_image_url(artist.image_filename)
+                    if url:
                         img = load_image(url)
-                    if img:
-                        img_fitted = ImageOps.fit(img, (int(row_width), int(row_height)), method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
-                        row_img.paste(img_fitted, (0, 0))
-                        has_image = True
+            if img:
+                img_fitted = ImageOps.fit(img, (int(row_width), int(row_height)), method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+                row_img.paste(img_fitted, (0, 0))
+                has_image = True
         except Exception: pass
 
     if has_image:
@@ -213,8 +228,7 @@ def draw_one_row(draw, canvas, base_x, base_y, row_data, font_path, db, row_widt
 def generate_timetable_image(timetable_data, font_path=None, columns=2):
     if not timetable_data: return Image.new('RGBA', (COL1_CANVAS_WIDTH, CANVAS_HEIGHT), (0,0,0,255))
     
-    st.toast("画像生成完了！", icon="✅")
-    
+    # 注: 完了 toast は views/timetable.py 側で出す(API からも呼べるよう streamlit 非依存に保つ)
     from database import SessionLocal
     db = SessionLocal()
 
@@ -278,7 +292,7 @@ def generate_timetable_image(timetable_data, font_path=None, columns=2):
         return canvas
 
     except Exception as e:
-        st.error(f"エラー: {e}")
+        logger.exception(f"タイムテーブル画像の生成エラー: {e}")
         return Image.new('RGBA', (COL1_CANVAS_WIDTH, CANVAS_HEIGHT), (255,0,0,255))
     finally:
         db.close()
@@ -10,7 +10,7 @@ frozen dataclass に写し替えて返す。
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -23,3 +23,42 @@ class ArtistView:
     crop_scale: float
     crop_x: int
     crop_y: int
+
+
+@dataclass(frozen=True)
+class ArtistImportReport:
+    """CSV 取り込みでのアーティスト照合結果(名前は CSV の出現順)。
+
+    - matched: 登録済みのアーティストが 1 件だけ一致した名前
+    - created: 未登録だったので画像なしで新規登録した名前
+    - ambiguous: 同名の登録が複数ある名前(どれを指すか決められないので、新規登録もしない)
+    """
+    matched: Tuple[str, ...] = ()
+    created: Tuple[str, ...] = ()
+    ambiguous: Tuple[str, ...] = ()
+
+
+def resolve_merge_pairs(pairs) -> Dict[int, int]:
+    """(winner_id, loser_id) の組を {loser_id: 最終的に残る winner_id} にまとめる(純ロジック)。
+
+    連鎖は辿る: (A, B) と (B, C) なら B も C も A に寄せる。同じ組の重複は 1 つにまとめる。
+    自己統合・同じ loser に別々の winner・循環(A←B←A)は ValueError。
+    """
+    parent: Dict[int, int] = {}
+    for winner, loser in pairs:
+        if winner == loser:
+            raise ValueError(f"自分自身には統合できません: id={loser}")
+        if parent.get(loser, winner) != winner:
+            raise ValueError(f"統合先が 2 つあります: id={loser} → {parent[loser]} / {winner}")
+        parent[loser] = winner
+
+    resolved: Dict[int, int] = {}
+    for loser, winner in parent.items():
+        seen = {loser}
+        while winner in parent:
+            if winner in seen:
+                raise ValueError(f"統合が循環しています: id={loser}")
+            seen.add(winner)
+            winner = parent[winner]
+        resolved[loser] = winner
+    return resolved
@@ -0,0 +1,164 @@
+"""
+物販ブース(place)の占有状況の集計と、ブース数を最小にする割り当て提案。
+
+物販枠はメイン(goods_start_time / goods_duration / place)と追加
+(add_goods_start_time / add_goods_duration / add_goods_place)の 2 種類。
+開始時刻が読めて時間が正の枠だけを区間 [start, end)(0:00 からの分)として扱う
+(「終演後物販」扱いの出演枠は物販時刻を持たないので除外)。
+
+- booth_usage: 開始/終了イベントを時刻順に 1 回なめる sweep-line で、
+  place ごとの最大同時使用数とその時刻を出す(終了 == 開始は同時とみなさない)
+- suggest_places: 区間分割の貪欲法(開始順 + 使用中ブースの終了時刻ヒープ)で、
+  全体の最大同時数 = 必要最小ブース数で割り当てる。空いていれば今の place を優先し、
+  変更を最小限にする
+- apply_places: 提案をドラフト行へ一括反映(新しい行リストを返す)
+
+どれも O(n log n)。DB / Streamlit 非依存。
+"""
+from __future__ import annotations
+
+import dataclasses
+import heapq
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from models.timetable import TimetableRowDraft
+from models.timetable_flow import parse_hhmm
+
+MAIN = "main"
+ADD = "add"
+
+
+@dataclass(frozen=True)
+class GoodsSlot:
+    """物販枠 1 つ。row_index はドラフト行の位置、which はメイン/追加。"""
+    row_index: int
+    which: str           # MAIN / ADD
+    artist: str
+    start: int
+    end: int
+    place: str           # 入力値(前後空白除去のみ。未入力は "")
+
+
+@dataclass(frozen=True)
+class BoothUsage:
+    place: str
+    slots: int           # その place の物販枠数
+    peak: int            # 最大同時使用数(1 を超えると重なっている)
+    peak_start: int      # 最大同時使用が始まる時刻(分)
+
+
+def goods_slots(rows: Sequence[TimetableRowDraft]) -> List[GoodsSlot]:
+    """ドラフト行から物販枠を取り出す(行順・メイン→追加の順)。"""
+    out: List[GoodsSlot] = []
+
+    def add(i, row, which, start_str, duration, place):
+        start = parse_hhmm(start_str) if start_str else None
+        if start is None or duration <= 0:
+            return
+        out.append(GoodsSlot(i, which, row.artist_name, start, start + duration, str(place or "").strip()))
+
+    for i, row in enumerate(rows):
+        if row.is_post_goods and not row.is_special_row:
+            continue  # 「終演後物販」扱いの出演枠は物販時刻を持たない
+        add(i, row, MAIN, row.goods_start_time, int(row.goods_duration or 0), row.place)
+        if not row.is_special_row:
+            add_dur = 60 if row.add_goods_duration is None else int(row.add_goods_duration)
+            add(i, row, ADD, row.add_goods_start_time, add_dur, row.add_goods_place)
+    return out
+
+
+def _peak(slots: Sequence[GoodsSlot]) -> Tuple[int, int]:
+    # 同時刻は終了(-1)を開始(+1)より先に処理する(半開区間)
+    events = sorted([(s.start, 1) for s in slots] + [(s.end, -1) for s in slots])
+    current = peak = 0
+    peak_start = events[0][0] if events else 0
+    for t, delta in events:
+        current += delta
+        if current > peak:
+            peak, peak_start = current, t
+    return peak, peak_start
+
+
+def booth_usage(slots: Sequence[GoodsSlot]) -> List[BoothUsage]:
+    """place ごとの使用状況(place 名順。未入力の枠は含めない)。"""
+    by_place: Dict[str, List[GoodsSlot]] = {}
+    for s in slots:
+        if s.place:
+            by_place.setdefault(s.place, []).append(s)
+    return [BoothUsage(p, len(v), *_peak(v)) for p, v in sorted(by_place.items())]
+
+
+def required_booths(slots: Sequence[GoodsSlot]) -> int:
+    """全物販枠を重ねずに並べるのに必要な最小ブース数(= 全体の最大同時数)。"""
+    return _peak(slots)[0]
+
+
+def suggest_places(
+    slots: Sequence[GoodsSlot], places: Sequence[str],
+) -> Dict[Tuple[int, str], str]:
+    """ブース数が最小になる割り当て {(row_index, which): place}。
+
+    開始順に見て、空いているブースがあればそれを使い(今の place が空いていればそれ、
+    なければ places の並びで先頭)、無いときだけブースを 1 つ増やす(今の place が
+    未使用ならそれ、なければ places の未使用の先頭)。places を使い切ったら ValueError。
+    """
+    rank = {p: i for i, p in enumerate(places)}
+    busy: List[Tuple[int, int, str]] = []   # (終了, 順位, place)
+    free: List[Tuple[int, str]] = []        # (順位, place)
+    free_set = set()
+    opened = set()
+    unused = [(i, p) for i, p in enumerate(places)]
+    heapq.heapify(unused)
+    assignment: Dict[Tuple[int, str], str] = {}
+
+    for s in sorted(slots, key=lambda s: (s.start, s.end, s.row_index, s.which)):
+        while busy and busy[0][0] <= s.start:
+            _, r, p = heapq.heappop(busy)
+            heapq.heappush(free, (r, p))
+            free_set.add(p)
+
+        if s.place in free_set:
+            place = s.place
+            free_set.discard(place)
+            free.remove((rank[place], place))
+            heapq.heapify(free)
+        elif free_set:
+            _, place = heapq.heappop(free)
+            free_set.discard(place)
+        else:
+            place = _open_booth(s.place, rank, opened, unused)
+        assignment[(s.row_index, s.which)] = place
+        heapq.heappush(busy, (s.end, rank[place], place))
+    return assignment
+
+
+def _open_booth(current: str, rank: Dict[str, int], opened: set, unused: List[Tuple[int, str]]) -> str:
+    if current in rank and current not in opened:
+        place = current
+    else:
+        while unused and unused[0][1] in opened:
+            heapq.heappop(unused)
+        if not unused:
+            raise ValueError("物販ブースが足りません(場所の候補を使い切りました)")
+        place = heapq.heappop(unused)[1]
+    opened.add(place)
+    return place
+
+
+def apply_places(
+    rows: Sequence[TimetableRowDraft], assignment: Dict[Tuple[int, str], str],
+) -> List[TimetableRowDraft]:
+    """割り当てを反映した新しい行リスト(対象外の行はそのまま同じオブジェクト)。"""
+    out = list(rows)
+    for (i, which), place in assignment.items():
+        field = "place" if which == MAIN else "add_goods_place"
+        if getattr(out[i], field) != place:
+            out[i] = dataclasses.replace(out[i], **{field: place})
+    return out
+
+
+def changed_slots(slots: Sequence[GoodsSlot], assignment: Dict[Tuple[int, str], str]) -> List[Tuple[GoodsSlot, str]]:
+    """提案で place が変わる枠 [(枠, 新しい place), ...](表示用)。"""
+    return [(s, assignment[(s.row_index, s.which)]) for s in slots
+            if assignment.get((s.row_index, s.which), s.place) != s.place]
@@ -0,0 +1,199 @@
+"""
+複数ステージのスケジュールと重複(コンフリクト)検出。
+
+1 ステージ = 1 プロジェクト(TimetableRow の並び)のまま、同じイベントの各ステージを
+StageTimetable のリストとして束ね、出演枠と物販枠を「0:00 からの分」の区間(Slot)に直す。
+
+検出するもの:
+- artist_double_booking: 同じアーティスト名の出演枠が時間的に重なる(別ステージ同士、
+  または同一ステージ内の重複登録)
+- goods_booth_overlap: 同じ物販ブース(place。"a" / "Ａ" / " A " は同じ A 扱い)の物販枠が重なる
+
+区間は半開区間 [start, end)。ちょうど入れ替わり(前の終了 == 次の開始)は重なりではない。
+キー(アーティスト名 / ブース)ごとに IntervalTree(開始順に並べた静的な区間木。
+各ノードに部分木の最大終了時刻を持つ)を作り、各区間の重なりを O(log n + k) で引くので、
+全体で O(n log n + 重なり数)。
+
+時刻は開始時刻からの累積(models.timetable_flow と同じ規則)で、日付をまたいでも
+24:00 以降の分として持つ(出演枠)。物販の開始時刻は "HH:MM" をそのまま分にする。
+DB / Streamlit 非依存。
+"""
+from __future__ import annotations
+
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.goods_allocation import goods_slots
+from models.timetable import TimetableRowDraft, draft_rows_to_df
+from models.timetable_flow import FlowInputs, format_hhmm, parse_hhmm
+
+ARTIST_DOUBLE_BOOKING = "artist_double_booking"
+GOODS_BOOTH_OVERLAP = "goods_booth_overlap"
+
+
+@dataclass(frozen=True)
+class Slot:
+    """1 ステージ上の 1 区間(出演枠 or 物販枠)。start / end は 0:00 からの分。"""
+    stage: str
+    kind: str            # "act" / "goods"
+    key: str             # 重なりを調べる単位(正規化したアーティスト名 / ブース)
+    label: str           # 表示用(アーティスト名 / place の入力値)
+    start: int
+    end: int
+    row_index: int       # ステージ内の行位置(0 始まり)
+    project_id: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage, "project_id": self.project_id, "kind": self.kind,
+            "label": self.label, "row_index": self.row_index,
+            "start": format_hhmm(self.start), "end": format_hhmm(self.end),
+        }
+
+
+@dataclass(frozen=True)
+class Conflict:
+    kind: str
+    key: str
+    a: Slot
+    b: Slot
+
+    @property
+    def overlap(self) -> Tuple[int, int]:
+        return max(self.a.start, self.b.start), min(self.a.end, self.b.end)
+
+    def describe(self) -> str:
+        s, e = self.overlap
+        span = f"{format_hhmm(s)}-{format_hhmm(e)}"
+        if self.kind == ARTIST_DOUBLE_BOOKING:
+            return f"{self.a.label}: {self.a.stage} と {self.b.stage} で出演時間が重複 ({span})"
+        return f"物販ブース {self.key}: {self.a.stage} と {self.b.stage} の物販が重複 ({span})"
+
+    def to_dict(self) -> dict:
+        s, e = self.overlap
+        return {
+            "kind": self.kind, "key": self.key,
+            "overlap_start": format_hhmm(s), "overlap_end": format_hhmm(e),
+            "slots": [self.a.to_dict(), self.b.to_dict()],
+            "message": self.describe(),
+        }
+
+
+@dataclass
+class StageTimetable:
+    """1 ステージ分の入力(プロジェクトの開始時刻と行)。"""
+    name: str
+    start_time: str
+    rows: List[TimetableRowDraft] = field(default_factory=list)
+    project_id: Optional[int] = None
+
+
+class IntervalTree:
+    """静的な区間木(開始順の配列を暗黙の平衡二分木として使い、部分木の最大終了を持つ)。
+
+    構築 O(n log n)、overlapping は O(log n + k)。区間は半開 [start, end)。
+    """
+
+    def __init__(self, slots: Iterable[Slot]):
+        self.slots: List[Slot] = sorted(slots, key=lambda s: (s.start, s.end))
+        self._starts = [s.start for s in self.slots]
+        self._max_end = [0] * len(self.slots)
+        self._build(0, len(self.slots))
+
+    def _build(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -(1 << 62)
+        mid = (lo + hi) // 2
+        m = max(self.slots[mid].end, self._build(lo, mid), self._build(mid + 1, hi))
+        self._max_end[mid] = m
+        return m
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def overlapping_indices(self, start: int, end: int) -> List[int]:
+        """[start, end) と重なる区間の添字(self.slots の位置)。"""
+        out = []
+        stack = [(0, len(self.slots))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= start:
+                continue  # この部分木はどれも start までに終わっている
+            stack.append((lo, mid))
+            if self._starts[mid] < end:
+                if start < self.slots[mid].end:
+                    out.append(mid)
+                stack.append((mid + 1, hi))  # 右側は開始がさらに遅い: mid が end 以降なら不要
+        return out
+
+    def overlapping(self, start: int, end: int) -> List[Slot]:
+        return [self.slots[i] for i in sorted(self.overlapping_indices(start, end))]
+
+    def overlapping_pairs(self) -> List[Tuple[Slot, Slot]]:
+        """互いに重なる区間の組(各組 1 回、開始順)。"""
+        pairs = []
+        for i, slot in enumerate(self.slots):
+            for j in sorted(self.overlapping_indices(slot.start, slot.end)):
+                if j > i:
+                    pairs.append((slot, self.slots[j]))
+        return pairs
+
+
+def normalize_key(value) -> str:
+    """アーティスト名 / ブースの比較キー(NFKC・前後空白除去・大文字化)。"""
+    return unicodedata.normalize("NFKC", str(value or "")).strip().upper()
+
+
+def stage_slots(stage: StageTimetable) -> Tuple[List[Slot], List[Slot]]:
+    """ステージの (出演枠, 物販枠)。時間ゼロ・開始時刻が読めない枠は含めない。"""
+    rows = stage.rows or []
+    acts: List[Slot] = []
+    goods: List[Slot] = []
+    if not rows:
+        return acts, goods
+
+    inp = FlowInputs(draft_rows_to_df(rows))
+    base = parse_hhmm(stage.start_time)
+    if base is not None:
+        offsets = np.cumsum(inp.step) - inp.step
+        for i in np.flatnonzero(inp.is_act):
+            start = base + int(offsets[i])
+            end = start + int(inp.duration[i])
+            key = normalize_key(inp.artists[i])
+            if end > start and key:
+                acts.append(Slot(stage.name, "act", key, str(inp.artists[i]).strip(), start, end, int(i), stage.project_id))
+
+    for g in goods_slots(rows):
+        key = normalize_key(g.place)
+        if key:
+            goods.append(Slot(stage.name, "goods", key, g.place, g.start, g.end, g.row_index, stage.project_id))
+    return acts, goods
+
+
+def _pairs_by_key(slots: Sequence[Slot]) -> Iterable[Tuple[Slot, Slot]]:
+    groups: Dict[str, List[Slot]] = {}
+    for s in slots:
+        groups.setdefault(s.key, []).append(s)
+    for key in sorted(groups):
+        if len(groups[key]) > 1:
+            yield from IntervalTree(groups[key]).overlapping_pairs()
+
+
+def find_conflicts(stages: Sequence[StageTimetable]) -> List[Conflict]:
+    """ステージ群のコンフリクト(出演の二重ブッキング・物販ブースの重なり)。"""
+    acts: List[Slot] = []
+    goods: List[Slot] = []
+    for stage in stages:
+        a, g = stage_slots(stage)
+        acts.extend(a)
+        goods.extend(g)
+
+    conflicts = [Conflict(ARTIST_DOUBLE_BOOKING, a.key, a, b) for a, b in _pairs_by_key(acts)]
+    conflicts += [Conflict(GOODS_BOOTH_OVERLAP, a.key, a, b) for a, b in _pairs_by_key(goods)]
+    return conflicts
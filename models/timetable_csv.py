@@ -0,0 +1,140 @@
+"""
+タイムテーブル CSV → draft_rows の純粋変換(DB / Streamlit 非依存)。
+
+旧 views/timetable.import_csv_callback が df.iterrows() で 1 行ずつ組み立てていた変換を
+列単位(pandas)に置き換えたもの。列の読み方は旧実装と同じ:
+
+- アーティスト名: 「グループ名」列、無ければ "artist"(大文字小文字無視)列、それも無ければ先頭列
+- 持ち時間: 「持ち時間」列、無ければ "Duration"(既定 20)
+- 転換: START / END 列が両方あれば「自分の END → 次の行の START」の分数(負は 0)。
+  最終行(次の行が無い)と、START / END が無いときは "Adjustment" 列(既定 0)
+- 物販: 物販開始|GoodsStart / 物販時間|GoodsDuration(既定 60) / 物販場所|Place(既定 "A")、
+  AddGoodsStart / AddGoodsDuration / AddGoodsPlace。「A|B」は旧 `row.get(A) or row.get(B)` と同じ
+  (A の値が偽のときだけ B を見る。空セルは NaN=真なので B に落ちない)
+- 開演時間: 先頭行の START が "H:MM" なら "HH:MM" に整形して返す
+- 名前が空 / "nan" の行と、「開演前物販」「終演後物販」名の行は飛ばす
+  (特殊行は既存 draft_rows 側で管理する。旧実装と同じ)
+
+旧実装との意図的な差分:
+- アーティスト名は前後の空白を落とす(旧実装は自動登録側だけ strip しており、行の名前と
+  登録名がずれていた)
+- IS_POST_GOODS の空セル(NaN)は False(旧実装は bool(NaN) で True になっていた)
+- 物販の特殊行名は自動登録の対象にしない
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from models.timetable import POST_GOODS_ARTIST_NAME, PRE_GOODS_ARTIST_NAME, TimetableRowDraft
+
+
+@dataclass
+class CsvTimetable:
+    """CSV 1 ファイル分の変換結果。"""
+    rows: List[TimetableRowDraft] = field(default_factory=list)
+    start_time: Optional[str] = None        # 先頭行 START("HH:MM")。無い / 読めなければ None
+    artist_names: List[str] = field(default_factory=list)   # 照合・自動登録する名前(出現順・重複なし)
+
+
+def _column(df: pd.DataFrame, name: Optional[str]) -> pd.Series:
+    if name is not None and name in df.columns:
+        return df[name].astype(object)
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def _first_truthy(df: pd.DataFrame, names: Sequence[str], default=None) -> pd.Series:
+    """列ごとの `row.get(a) or row.get(b) or default`。"""
+    out = pd.Series([default] * len(df), index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            values = df[name].astype(object)
+            out = values.where(values.map(bool), out)
+    return out
+
+
+def _to_int(values: pd.Series, default) -> list:
+    """utils.safe_int の列版(空・nan・数値でない → default、小数は切り捨て)。"""
+    nums = pd.to_numeric(values.astype(str).str.strip(), errors="coerce")
+    ok = values.notna() & np.isfinite(nums)
+    return [int(v) if k else default for v, k in zip(np.trunc(nums.fillna(0).where(ok, 0)), ok)]
+
+
+def _to_str(values: pd.Series) -> list:
+    """utils.safe_str の列版(None / NaN / "nan" → "")。"""
+    text = values.astype(str)
+    return text.where(values.notna() & (text.str.lower() != "nan"), "").tolist()
+
+
+def _adjustments(df: pd.DataFrame, col_start: Optional[str], col_end: Optional[str]) -> list:
+    from_column = _to_int(_column(df, "Adjustment"), 0)
+    if col_start is None or col_end is None:
+        return from_column
+    ends = pd.to_datetime(df[col_end].astype(str).str.strip(), format="%H:%M", errors="coerce")
+    next_starts = pd.to_datetime(df[col_start].astype(str).str.strip(), format="%H:%M", errors="coerce").shift(-1)
+    minutes = ((next_starts - ends).dt.total_seconds() // 60).fillna(0).clip(lower=0).astype(int).tolist()
+    if minutes:
+        minutes[-1] = from_column[-1]   # 最終行は旧実装どおり Adjustment 列に落ちる
+    return minutes
+
+
+def _start_time(df: pd.DataFrame, col_start: Optional[str]) -> Optional[str]:
+    if col_start is None or df.empty:
+        return None
+    first = str(df[col_start].iloc[0]).strip()
+    if ":" not in first:
+        return None
+    try:
+        h, m = map(int, first.split(":"))
+    except ValueError:
+        return None
+    return f"{h:02d}:{m:02d}"
+
+
+def parse_timetable_csv(df: pd.DataFrame) -> CsvTimetable:
+    """pd.read_csv の結果を draft_rows と開演時間に変換する(DB は引かない)。"""
+    df = df.rename(columns=lambda c: str(c).strip()).reset_index(drop=True)
+    if len(df.columns) == 0:
+        return CsvTimetable()
+
+    col_group = "グループ名" if "グループ名" in df.columns else next(
+        (c for c in df.columns if c.lower() == "artist"), df.columns[0]
+    )
+    col_start = "START" if "START" in df.columns else None
+    col_end = "END" if "END" in df.columns else None
+    col_duration = "持ち時間" if "持ち時間" in df.columns else "Duration"
+
+    names = df[col_group].astype(str).str.strip()
+    keep = ((names != "") & (names != "nan") & ~names.isin([PRE_GOODS_ARTIST_NAME, POST_GOODS_ARTIST_NAME])).tolist()
+
+    is_post = _column(df, "IS_POST_GOODS")
+    columns = zip(
+        names.tolist(),
+        _to_int(_column(df, col_duration), 20),
+        _adjustments(df, col_start, col_end),
+        is_post.where(is_post.notna(), False).map(bool).tolist(),
+        _to_str(_first_truthy(df, ["物販開始", "GoodsStart"])),
+        _to_int(_first_truthy(df, ["物販時間", "GoodsDuration"]), 60),
+        _to_str(_first_truthy(df, ["物販場所", "Place"], default="A")),
+        _to_str(_column(df, "AddGoodsStart")),
+        _to_int(_column(df, "AddGoodsDuration"), None),
+        _to_str(_column(df, "AddGoodsPlace")),
+    )
+    rows = [
+        TimetableRowDraft(
+            artist_name=name, duration=duration, adjustment=adjustment, is_post_goods=post,
+            is_hidden=False, goods_start_time=g_start, goods_duration=g_dur, place=g_place,
+            add_goods_start_time=add_start, add_goods_duration=add_dur, add_goods_place=add_place,
+        )
+        for k, (name, duration, adjustment, post, g_start, g_dur, g_place, add_start, add_dur, add_place)
+        in zip(keep, columns)
+        if k
+    ]
+    return CsvTimetable(
+        rows=rows,
+        start_time=_start_time(df, col_start),
+        artist_names=list(dict.fromkeys(r.artist_name for r in rows)),
+    )
@@ -0,0 +1,367 @@
+"""
+タイムテーブルの時刻計算(utils.calculate_timetable_flow の本体)。
+
+旧実装は df.iterrows() で 1 行ずつ回し、時刻を進めるたびに add_minutes
+(datetime.strptime → timedelta → strftime)、セルごとに safe_int / safe_str
+(pd.isna)を呼んでいた。フェス規模(数千枠)だと行数 × 数回の文字列往復になる。
+
+ここでは:
+- 時刻は「0:00 からの分(int)」で持つ。開始時刻は
+  start + cumsum(DURATION + ADJUSTMENT) の NumPy 累積和で一括計算
+  (物販専用行は時刻を進めないので 0 として足す)。
+- 数値列は dtype が数値ならベクトル化して int 化(NaN / inf → 既定値、小数は切り捨て)。
+  object 列(data_editor 由来の文字列混在など)だけ旧 safe_int と同じ判定を 1 セルずつ。
+- "HH:MM" への整形は出力時だけ(1440 通りの表引き)。
+- TimetableFlow は前回の入力・累積和・行 dict を持ち越し、編集された行から先だけ
+  計算し直す(views/timetable.py の rerun 用。物販だけの編集は時刻に触れない)。
+
+結果は旧実装と完全一致させる(列・キー順・文字列・型):
+- 24 時を越えたら日付を捨てて折り返す(strftime("%H:%M") と同じ)。
+- 開始時刻が "H:MM" 形式で読めない場合は旧 add_minutes と同様、以降の時刻は
+  その文字列のまま(先頭行の RAW_START だけは渡された値そのもの)。
+- 物販の開始時刻も同じ規則(読めなければ "X - X")。
+DB / Streamlit 非依存。pandas / numpy のみ。
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from models.timetable import POST_GOODS_ARTIST_NAME, PRE_GOODS_ARTIST_NAME
+
+MINUTES_PER_DAY = 24 * 60
+
+# datetime.strptime(s, "%H:%M") が受け付ける形(1〜2 桁の時・分、前後の空白なし)
+_HHMM_RE = re.compile(r"(2[0-3]|[0-1]\d|\d):([0-5]\d|\d)", re.IGNORECASE)
+_HHMM = [f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY)]
+
+# float → int64 の変換で桁あふれしない範囲(外れたら 1 セルずつの判定に回す)
+_INT_SAFE_LIMIT = float(2 ** 62)
+
+
+def parse_hhmm(value) -> Optional[int]:
+    """"HH:MM" → 0:00 からの分。読めなければ None。"""
+    m = _HHMM_RE.fullmatch(str(value))
+    if m is None:
+        return None
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+def format_hhmm(minutes: int) -> str:
+    return _HHMM[int(minutes) % MINUTES_PER_DAY]
+
+
+def shift_hhmm(value, minutes: int) -> str:
+    """utils.add_minutes と同じ結果(読めなければ str(value) をそのまま返す)。"""
+    base = parse_hhmm(value)
+    if base is None:
+        return str(value)
+    return _HHMM[(base + int(minutes)) % MINUTES_PER_DAY]
+
+
+def _scalar_int(val, default):
+    # utils.safe_int と同じ判定(object 列用)
+    try:
+        if pd.isna(val) or str(val).strip() == "" or str(val).lower() in ["nan", "none"]:
+            return default
+        return int(float(val))
+    except Exception:
+        return default
+
+
+def _scalar_str(val):
+    # utils.safe_str と同じ判定。文字列セルは pd.isna を通さない
+    if isinstance(val, str):
+        return "" if val.lower() == "nan" else val
+    if pd.isna(val) or val is None or str(val).lower() == "nan":
+        return ""
+    return str(val)
+
+
+def int_column(df: pd.DataFrame, column: str, default: int) -> np.ndarray:
+    """列を safe_int(v, default) した int64 配列。列が無ければ全行 default。"""
+    n = len(df)
+    if column not in df.columns:
+        return np.full(n, default, dtype=np.int64)
+    series = df[column]
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        finite = np.isfinite(values)
+        if not np.any(np.abs(values[finite]) >= _INT_SAFE_LIMIT):
+            return np.where(finite, np.trunc(np.where(finite, values, 0.0)), default).astype(np.int64)
+    return np.fromiter((_scalar_int(v, default) for v in series), dtype=np.int64, count=n)
+
+
+def str_column(df: pd.DataFrame, column: str) -> list:
+    """列を safe_str した文字列リスト。列が無ければ全行 ""。"""
+    if column not in df.columns:
+        return [""] * len(df)
+    return [_scalar_str(v) for v in df[column].tolist()]
+
+
+def _goods_range(start: str, duration: int, require_duration: bool = True) -> str:
+    if not start:
+        return ""
+    end = "" if require_duration and duration <= 0 else shift_hhmm(start, duration)
+    return f"{start} - {end}"
+
+
+def _opening_row(open_time, start_time) -> dict:
+    return {
+        "TIME_DISPLAY": f"{open_time} - {start_time}",
+        "ARTIST": "OPEN / START",
+        "DURATION": 0, "ADJUSTMENT": 0,
+        "GOODS_DISPLAY": "", "GOODS_START_MANUAL": "", "GOODS_DURATION": 0, "PLACE": "",
+        "ADD_GOODS_START": "", "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "",
+        "RAW_START": open_time, "RAW_END": start_time,
+    }
+
+
+class FlowInputs:
+    """DataFrame から取り出した計算用の列(1 回の O(n) 走査。整形はしない)。
+
+    schedule_* は時刻に効く列、row_key(i) は物販など「その行の表示だけ」に効く値。
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        n = self.n = len(df)
+        self.artists = df["ARTIST"].tolist() if n else []
+        self.is_pre = np.fromiter((a == PRE_GOODS_ARTIST_NAME for a in self.artists), dtype=bool, count=n)
+        self.is_post = np.fromiter((a == POST_GOODS_ARTIST_NAME for a in self.artists), dtype=bool, count=n)
+        self.is_act = ~(self.is_pre | self.is_post)
+
+        self.duration = int_column(df, "DURATION", 0)
+        self.adjustment = int_column(df, "ADJUSTMENT", 0)
+        self.goods_dur_60 = int_column(df, "GOODS_DURATION", 60)
+        self.goods_dur = np.where(self.is_pre, int_column(df, "GOODS_DURATION", 0), self.goods_dur_60)
+        self.add_goods_dur = int_column(df, "ADD_GOODS_DURATION", 60)
+        # 物販専用行は時刻を進めない
+        self.step = np.where(self.is_act, self.duration + self.adjustment, 0)
+
+        self.goods_start = str_column(df, "GOODS_START_MANUAL")
+        self.place_raw = str_column(df, "PLACE")
+        self.add_goods_start = str_column(df, "ADD_GOODS_START")
+        self.add_goods_place = str_column(df, "ADD_GOODS_PLACE")
+        flags = df["IS_POST_GOODS"].tolist() if "IS_POST_GOODS" in df.columns else [False] * n
+        self.post_goods = [bool(f) for f in flags]
+
+    def row_key(self, i: int) -> tuple:
+        return (
+            self.artists[i], bool(self.is_act[i]), self.post_goods[i],
+            int(self.duration[i]), int(self.adjustment[i]), int(self.goods_dur[i]), int(self.goods_dur_60[i]),
+            self.goods_start[i], self.place_raw[i], self.add_goods_start[i],
+            int(self.add_goods_dur[i]), self.add_goods_place[i],
+        )
+
+    def first_schedule_change(self, other: "FlowInputs") -> int:
+        """self と other で時刻に効く値が最初に食い違う行(同じなら min(n))。"""
+        m = min(self.n, other.n)
+        diff = (
+            (self.is_act[:m] != other.is_act[:m])
+            | (self.duration[:m] != other.duration[:m])
+            | (self.step[:m] != other.step[:m])
+        )
+        hits = np.flatnonzero(diff)
+        return int(hits[0]) if len(hits) else m
+
+
+def _goods_only_row(inp: FlowInputs, i: int) -> dict:
+    g_dur = int(inp.goods_dur[i])
+    return {
+        "TIME_DISPLAY": "", "ARTIST": inp.artists[i], "DURATION": 0, "ADJUSTMENT": 0,
+        "GOODS_DISPLAY": _goods_range(inp.goods_start[i], g_dur), "PLACE": "",
+        "GOODS_START_MANUAL": inp.goods_start[i],
+        "GOODS_DURATION": g_dur, "PLACE_RAW": "", "ADD_GOODS_START": "",
+        "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "", "RAW_START": "", "RAW_END": ""
+    }
+
+
+def _act_row(inp: FlowInputs, i: int, current_time, end_time) -> dict:
+    final_goods_display = ""
+    final_place_display = ""
+
+    if inp.post_goods[i]:
+        place = inp.place_raw[i]
+        final_goods_display = f"終演後物販 {place}" if place else "終演後物販"
+    else:
+        main_goods_str = _goods_range(inp.goods_start[i], int(inp.goods_dur_60[i]))
+        main_place = inp.place_raw[i]
+        add_goods_str = _goods_range(inp.add_goods_start[i], int(inp.add_goods_dur[i]), require_duration=False)
+        add_goods_place = inp.add_goods_place[i]
+
+        if main_goods_str and add_goods_str:
+            final_goods_display = f"{main_goods_str} / {add_goods_str}"
+            p1 = main_place if main_place else "-"
+            p2 = add_goods_place if add_goods_place else "-"
+            final_place_display = f"{p1} / {p2}"
+        elif main_goods_str:
+            final_goods_display = main_goods_str
+            final_place_display = main_place
+        elif add_goods_str:
+            final_goods_display = add_goods_str
+            final_place_display = add_goods_place
+
+    return {
+        "TIME_DISPLAY": f"{current_time} - {end_time}",
+        "ARTIST": inp.artists[i], "DURATION": int(inp.duration[i]), "ADJUSTMENT": int(inp.adjustment[i]),
+        "GOODS_DISPLAY": final_goods_display, "PLACE": final_place_display,
+        "GOODS_START_MANUAL": inp.goods_start[i],
+        "GOODS_DURATION": int(inp.goods_dur_60[i]),
+        "PLACE_RAW": inp.place_raw[i],
+        "ADD_GOODS_START": inp.add_goods_start[i],
+        "ADD_GOODS_DURATION": int(inp.add_goods_dur[i]),
+        "ADD_GOODS_PLACE": inp.add_goods_place[i],
+        "RAW_START": current_time, "RAW_END": end_time
+    }
+
+
+class TimetableFlow:
+    """calculate_flow の結果を保持し、編集差分だけ計算し直す。
+
+    views/timetable.py は rerun ごとに data_editor の DataFrame を渡す。前回と比べて
+    - 時刻に効く値(出演/物販の別・DURATION・ADJUSTMENT)が最初に変わった行 k より前は、
+      累積和(offsets)も行 dict もそのまま使う。k 以降は offsets[k-1] から足し直し、
+      時刻が変わった行は時刻の 3 列だけ差し替える(物販表示などは組み直さない)。
+    - 物販・場所だけの編集は時刻を一切計算し直さず、その行の dict だけ作り直す。
+    - 行数と列構成が同じなら、前回の DataFrame をコピーして変わったセルだけ書き換える。
+    何も変わっていなければ前回の DataFrame をそのまま返す(呼び出し側で書き換えないこと)。
+
+    結果は毎回 calculate_flow(一括計算)と完全一致する。行 dict(rows)は
+    画像生成用の gen_list にもそのまま使う(DataFrame を iterrows し直さない)。
+    """
+
+    def __init__(self):
+        self.inputs: Optional[FlowInputs] = None
+        self.open_time = None
+        self.start_time = None
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.rows: list = []  # OPEN / START 行を含む、DataFrame と同じ並び
+        self.frame: Optional[pd.DataFrame] = None
+        # 直近の update で作り直した行(入力 df の位置)。None は全件
+        self.last_rebuilt: Optional[list] = None
+
+    def _times(self, inp: FlowInputs, base: Optional[int], offsets: np.ndarray, i: int, first_act: int):
+        if i == first_act:
+            # 旧実装は先頭枠の開始に渡された値そのものを使う(整形しない)
+            current = self.start_time
+        elif base is None:
+            current = str(self.start_time)
+        else:
+            current = _HHMM[(base + int(offsets[i])) % MINUTES_PER_DAY]
+        if base is None:
+            end = str(self.start_time)
+        else:
+            end = _HHMM[(base + int(offsets[i]) + int(inp.duration[i])) % MINUTES_PER_DAY]
+        return current, end
+
+    def update(self, df: pd.DataFrame, open_time, start_time) -> pd.DataFrame:
+        inp = FlowInputs(df)
+        prev = self.inputs
+        same_frame = (
+            prev is not None and self.frame is not None
+            and open_time == self.open_time and start_time == self.start_time
+            and type(open_time) is type(self.open_time) and type(start_time) is type(self.start_time)
+        )
+        self.open_time, self.start_time = open_time, start_time
+        base = parse_hhmm(start_time)
+        acts = np.flatnonzero(inp.is_act)
+        first_act = int(acts[0]) if len(acts) else -1
+
+        # --- 累積和: 変化点 k より前は前回のまま ---
+        k = inp.first_schedule_change(prev) if same_frame else 0
+        offsets = np.empty(inp.n, dtype=np.int64)
+        offsets[:k] = self.offsets[:k]
+        if k < inp.n:
+            start_k = int(self.offsets[k - 1] + prev.step[k - 1]) if k > 0 else 0
+            tail = inp.step[k:]
+            offsets[k:] = start_k + np.cumsum(tail) - tail
+
+        head = [_opening_row(open_time, start_time)] if (open_time and start_time) else []
+        prev_first_act = None
+        if same_frame:
+            prev_acts = np.flatnonzero(prev.is_act)
+            prev_first_act = int(prev_acts[0]) if len(prev_acts) else -1
+        can_reuse = same_frame and prev_first_act == first_act
+        prev_body = self.rows[len(head):] if can_reuse else []
+
+        body = []
+        rebuilt = []
+        for i in range(inp.n):
+            if not inp.is_act[i]:
+                if i < len(prev_body) and prev.row_key(i) == inp.row_key(i):
+                    body.append(prev_body[i])
+                else:
+                    body.append(_goods_only_row(inp, i))
+                    rebuilt.append(i)
+                continue
+            if i < k and i < len(prev_body) and prev.row_key(i) == inp.row_key(i):
+                body.append(prev_body[i])  # 時刻も物販も前回のまま
+                continue
+            current, end = self._times(inp, base, offsets, i, first_act)
+            if i < len(prev_body) and prev.row_key(i) == inp.row_key(i):
+                old = prev_body[i]
+                if old["RAW_START"] == current and old["RAW_END"] == end:
+                    body.append(old)
+                    continue
+                row = dict(old)  # 時刻だけずれた行: 物販表示は組み直さない
+                row.update(TIME_DISPLAY=f"{current} - {end}", RAW_START=current, RAW_END=end)
+            else:
+                row = _act_row(inp, i, current, end)
+            body.append(row)
+            rebuilt.append(i)
+
+        rows = head + body
+        frame = self._patched_frame(rows, rebuilt, len(head)) if can_reuse and inp.n == prev.n else None
+        if frame is None:
+            frame = pd.DataFrame(rows)
+            rebuilt = None
+
+        self.inputs, self.offsets, self.rows, self.frame = inp, offsets, rows, frame
+        self.last_rebuilt = rebuilt
+        return frame
+
+    def _patched_frame(self, rows: list, rebuilt: list, head: int) -> Optional[pd.DataFrame]:
+        """前回の DataFrame に変わった行だけ書き込む。列構成が変わる場合は None(作り直し)。"""
+        if not rebuilt:
+            return self.frame
+        if len(rebuilt) * 2 > len(rows):
+            return None
+        old = self.frame
+        positions = [head + i for i in rebuilt]
+        columns = list(old.columns)
+        if any(set(rows[p]) - set(columns) for p in positions):
+            return None
+        frame = old.copy()
+        for j, col in enumerate(columns):
+            values = [rows[p].get(col, np.nan) for p in positions]
+            dtype = frame.dtypes.iloc[j]
+            if pd.api.types.is_integer_dtype(dtype):
+                if not all(type(v) is int for v in values):
+                    return None
+            elif dtype != object:
+                return None  # float 列などは dtype 推論ごと作り直しに任せる
+            frame.iloc[positions, j] = values
+        return frame
+
+    def gen_list(self, hidden_flags=None) -> list:
+        """画像生成用の [TIME_DISPLAY, ARTIST, GOODS_DISPLAY, PLACE](OPEN / START と非表示行を除く)。"""
+        hidden_flags = list(hidden_flags or [])
+        out = []
+        edited_row_idx = 0
+        for row in self.rows:
+            if row["ARTIST"] == "OPEN / START":
+                continue
+            is_hidden = hidden_flags[edited_row_idx] if edited_row_idx < len(hidden_flags) else False
+            edited_row_idx += 1
+            if is_hidden:
+                continue
+            out.append([row["TIME_DISPLAY"], row["ARTIST"], row["GOODS_DISPLAY"], row["PLACE"]])
+        return out
+
+
+def calculate_flow(df: pd.DataFrame, open_time, start_time) -> pd.DataFrame:
+    """utils.calculate_timetable_flow の本体(同じ DataFrame を返す)。"""
+    return TimetableFlow().update(df, open_time, start_time)
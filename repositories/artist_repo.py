@@ -12,8 +12,10 @@ Artist の CRUD を担うリポジトリ。
 """
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+from sqlalchemy import Integer, String, column, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from database import Artist, TimetableRow
@@ -51,11 +53,19 @@ def list_artists(db: Session, include_deleted: bool = False) -> List[ArtistView]
     include_deleted=True のときのみ削除済みも含めて全件返す。その場合でも
     各要素は ArtistView.is_deleted で生死を判別できる(create-or-restore 判定用)。
     """
-    query = db.query(Artist)
+    return [_to_view(a) for a in db.scalars(_list_stmt(include_deleted))]
+
+
+async def list_artists_async(db: AsyncSession, include_deleted: bool = False) -> List[ArtistView]:
+    """list_artists の非同期版(Bot の async /api 用)。"""
+    return [_to_view(a) for a in await db.scalars(_list_stmt(include_deleted))]
+
+
+def _list_stmt(include_deleted: bool):
+    stmt = select(Artist)
     if not include_deleted:
-        query = query.filter(Artist.is_deleted == False)  # noqa: E712 (SQLAlchemy 比較)
-    artists = query.order_by(Artist.name).all()
-    return [_to_view(a) for a in artists]
+        stmt = stmt.where(Artist.is_deleted == False)  # noqa: E712 (SQLAlchemy 比較)
+    return stmt.order_by(Artist.name)
 
 
 def get_artist(db: Session, artist_id: int) -> Optional[ArtistView]:
@@ -111,9 +121,57 @@ def get_artists_by_names(db: Session, names) -> List[ArtistView]:
     return [by_name[n] for n in names if n in by_name]
 
 
+def find_artists_by_names(db: Session, names) -> Dict[str, List[ArtistView]]:
+    """名前 → 完全一致する ArtistView のリスト(id 昇順・削除済み含む)を 1 クエリ(IN)で返す。
+
+    CSV 取り込みの照合用。見つからない名前はキーに含めない。同名が複数あれば
+    リストの要素が 2 つ以上になる(呼び出し側で「曖昧」と判定する)。
+    """
+    unique_names = list(dict.fromkeys(names))
+    if not unique_names:
+        return {}
+    out: Dict[str, List[ArtistView]] = {}
+    for a in db.scalars(select(Artist).where(Artist.name.in_(unique_names)).order_by(Artist.id)):
+        out.setdefault(a.name, []).append(_to_view(a))
+    return out
+
+
+def get_artists_by_ids(db: Session, artist_ids) -> Dict[int, ArtistView]:
+    """id → ArtistView(削除済み含む)を 1 クエリ(IN)で返す。見つからない id はキーに含めない。"""
+    ids = list(dict.fromkeys(artist_ids))
+    if not ids:
+        return {}
+    return {a.id: _to_view(a) for a in db.scalars(select(Artist).where(Artist.id.in_(ids)))}
+
+
 # ---------------------------------------------------------
 # 書き込み系(commit は呼び出し側 service が行う)
 # ---------------------------------------------------------
+def insert_artists(db: Session, names) -> List[ArtistView]:
+    """画像なしのアーティストを 1 文(複数行 INSERT ... ON CONFLICT DO NOTHING)でまとめて追加する。
+
+    実際に追加された行を ArtistView で返す(RETURNING。衝突で飛ばした行は含まない)。
+    artists.name に一意制約は無いので、同名の二重登録は呼び出し側が
+    find_artists_by_names で事前に除いておく(ON CONFLICT は制約ができたときの保険)。
+    PostgreSQL / SQLite 以外の方言では素の INSERT。commit はしない。
+    """
+    rows = [{"name": n, "image_filename": None} for n in dict.fromkeys(names)]
+    if not rows:
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(Artist).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(Artist).on_conflict_do_nothing()
+    else:
+        stmt = insert(Artist)
+    created = [_to_view(a) for a in db.scalars(stmt.returning(Artist), rows)]
+    logger.info(f"insert_artists: added {len(created)}/{len(rows)}")
+    return created
+
+
 def create_artist(db: Session, name: str, image_filename: Optional[str]) -> ArtistView:
     """新規アーティストを追加する(commit はしない)。
 
@@ -216,3 +274,57 @@ def reassign_timetable_rows(db: Session, old_name: str, new_name: str) -> int:
         r.artist_name = new_name
     logger.info(f"reassign_timetable_rows: {old_name!r} -> {new_name!r} rows={count}")
     return count
+
+
+# ---------------------------------------------------------
+# 一括 merge 用(集合演算。対応表を VALUES の CTE にして 1 文で当てる)
+# ---------------------------------------------------------
+# WITH m(a, b) AS (VALUES ...) UPDATE t SET ... FROM m WHERE ... の形。PostgreSQL と
+# SQLite(3.33+ の UPDATE FROM)の両方で通る(SQLite は FROM 句の (VALUES ...) AS m(a, b) を
+# 受け付けないので CTE にしている)。更新行数は RETURNING で数える(CTE 付き UPDATE は
+# sqlite3 ドライバの rowcount が -1 になるため)。
+def reassign_timetable_rows_bulk(db: Session, renames: Dict[str, str]) -> int:
+    """reassign_timetable_rows の複数組版。renames = {旧名: 新名} を 1 文の UPDATE で当てる。
+
+    意味論は 1 組版と同じ(完全一致・全プロジェクト横断・artist_name 列のみ)。
+    全組を同時に適用する(新名が別の組の旧名でも連鎖しない)。付け替えた行数を返す。commit はしない。
+    """
+    renames = {old: new for old, new in renames.items() if old != new}
+    if not renames:
+        return 0
+    m = values(column("old_name", String), column("new_name", String), name="m").data(
+        list(renames.items())
+    ).cte("m")
+    stmt = (
+        update(TimetableRow)
+        .where(TimetableRow.artist_name == m.c.old_name)
+        .values(artist_name=m.c.new_name)
+        .returning(TimetableRow.id)
+        .execution_options(synchronize_session=False)
+    )
+    count = len(db.execute(stmt).all())
+    logger.info(f"reassign_timetable_rows_bulk: renames={len(renames)} rows={count}")
+    return count
+
+
+def retire_artists(db: Session, new_names: Dict[int, str]) -> int:
+    """merge の loser をまとめて改名 + 論理削除する(1 文の UPDATE)。new_names = {id: 新しい名前}。
+
+    1 組版の update_artist(改名)+ soft_delete_artist を全 loser について同時に行う。
+    更新した行数を返す。commit はしない。
+    """
+    if not new_names:
+        return 0
+    m = values(column("artist_id", Integer), column("new_name", String), name="m").data(
+        list(new_names.items())
+    ).cte("m")
+    stmt = (
+        update(Artist)
+        .where(Artist.id == m.c.artist_id)
+        .values(name=m.c.new_name, is_deleted=True)
+        .returning(Artist.id)
+        .execution_options(synchronize_session=False)
+    )
+    count = len(db.execute(stmt).all())
+    logger.info(f"retire_artists: ids={sorted(new_names)} rows={count}")
+    return count
@@ -6,20 +6,23 @@ Font(Asset / AssetFile)の read を担うリポジトリ。
 - repository はセッションを作らない/閉じない(呼び出し側 service が所有)。
 - repository は db.commit()/add() を【しない】(純 read)。
 - ここで返す ORM は service スコープ内(session open 中)でのみ属性参照される
-  想定(view へ escape させない)。font_service.ensure_font_available が
-  own_db open 中に image_filename / file_data を読むためだけに使う。
+  想定(view へ escape させない)。
+  ※ フォント確保(ensure_font_available / provision_fonts)は共用 helper
+    utils.flyer_helpers.provision_font_file が own_db で Asset / AssetFile を引く。
+    get_font_asset / get_font_asset_file は温存(asset_repo から参照あり)。
 
 読む対象:
 - get_font_asset(db, filename)      -> Asset(assets.image_filename 一致)
 - get_font_asset_file(db, filename) -> AssetFile(asset_files.filename 一致)
+- list_font_filenames(db)            -> list[str](フォント Asset の image_filename・一括確保用)
 ※ フォント一覧(get_sorted_font_list)/見本画像(create_font_specimen_img)は
   utils の共用 helper が内部で Asset/SystemFontConfig/FavoriteFont を読むため、
   font_service がそれらへ own_db を渡す。この repo は ensure_font_available が
-  要求する 2 read のみを提供する(S0-2 確定)。
+  要求する 2 read(S0-2 確定)と、provision_fonts のカタログ read を提供する。
 """
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional
 
 from sqlalchemy.orm import Session
 
@@ -47,3 +50,13 @@ def get_font_asset_file(db: Session, filename: str) -> Optional[AssetFile]:
 def get_system_font_config(db: Session) -> Optional[SystemFontConfig]:
     """system_font_config の 1 件(標準フォント設定)。無ければ None。純 read。"""
     return db.query(SystemFontConfig).first()
+
+
+def list_font_filenames(db: Session) -> List[str]:
+    """削除されていないフォント Asset の image_filename 一覧(カタログ全体の一括確保用)。"""
+    rows = (
+        db.query(Asset.image_filename)
+        .filter(Asset.asset_type == "font", Asset.is_deleted == False)  # noqa: E712
+        .all()
+    )
+    return [r[0] for r in rows if r[0]]
@@ -7,11 +7,13 @@ from __future__ import annotations
 
 import datetime
 import json
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
 
-from database import TimetableProject
+from database import GridOrderEntry, TimetableProject
 from models import (
     FreeTextDraft,
     ProjectDraft,
@@ -56,7 +58,8 @@ def _parse_date(v) -> Optional[datetime.date]:
         return None
 
 
-def _format_time_str(t_val, default: str = "10:00") -> str:
+def format_time_str(t_val, default: str = "10:00") -> str:
+    """DB の時刻(文字列 / time)→ "HH:MM"。空なら default(draft・ステージ判定用。空文字は返さない)。"""
     if t_val is None or t_val == "":
         return default
     if isinstance(t_val, str):
@@ -69,11 +72,99 @@ def _format_time_str(t_val, default: str = "10:00") -> str:
 # ---------------------------------------------------------
 # クエリ系
 # ---------------------------------------------------------
+# 一覧の並び: event_date 降順(未設定は最後)→ 同日は id 昇順。
+# 旧実装(Python の安定ソート・"0000-00-00" 代替)と同じ順序を SQL の ORDER BY で出す。
+_EVENT_DATE_KEY = func.coalesce(TimetableProject.event_date, "0000-00-00")
+_LIST_ORDER = (_EVENT_DATE_KEY.desc(), TimetableProject.id.asc())
+
+# 一覧・セレクタ用に読む列(JSON の大きな列は読まない)
+SUMMARY_COLUMNS = (
+    TimetableProject.id,
+    TimetableProject.title,
+    TimetableProject.subtitle,
+    TimetableProject.event_date,
+    TimetableProject.venue_name,
+    TimetableProject.venue_url,
+    TimetableProject.open_time,
+    TimetableProject.start_time,
+)
+
+
+def list_keyset(proj: TimetableProject) -> Tuple[str, int]:
+    """一覧の並びにおける proj の位置(keyset ページングのカーソル値)。"""
+    return (proj.event_date or "0000-00-00", proj.id)
+
+
+def project_list_stmt(
+    *,
+    summary_only: bool = False,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    after: Optional[Tuple[str, int]] = None,
+    limit: Optional[int] = None,
+    featuring: Optional[str] = None,
+) -> Select:
+    """一覧の並び(event_date 降順・id 昇順)でプロジェクトを選ぶ SELECT(同期 / 非同期共用)。
+
+    - summary_only: SUMMARY_COLUMNS だけを読む(JSON 列は load_only で読まない。
+      返した ORM の JSON 列に触れると 1 件ずつ追加 SELECT になるので to_summary_view で写す)
+    - date_from / date_to: event_date("YYYY-MM-DD")の範囲。指定時は未設定の行を含めない
+    - after: list_keyset の値。その位置より後ろから(keyset ページング。OFFSET は使わない)
+    - limit: 件数上限
+    - featuring: グリッド並び順にこの名前(完全一致)を含むプロジェクトだけ(grid_order_entries の索引)
+    """
+    stmt = select(TimetableProject)
+    if summary_only:
+        stmt = stmt.options(load_only(*SUMMARY_COLUMNS))
+    if date_from:
+        stmt = stmt.where(TimetableProject.event_date >= date_from)
+    if date_to:
+        stmt = stmt.where(TimetableProject.event_date <= date_to)
+    if featuring is not None:
+        stmt = stmt.where(TimetableProject.id.in_(_grid_name_project_ids(featuring)))
+    if after is not None:
+        key, last_id = after
+        stmt = stmt.where(or_(
+            _EVENT_DATE_KEY < key,
+            and_(_EVENT_DATE_KEY == key, TimetableProject.id > last_id),
+        ))
+    stmt = stmt.order_by(*_LIST_ORDER)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def query_project_list(db: Session, **kwargs) -> List[TimetableProject]:
+    """project_list_stmt(引数も同じ)の結果。"""
+    return list(db.scalars(project_list_stmt(**kwargs)))
+
+
+async def query_project_list_async(db: AsyncSession, **kwargs) -> List[TimetableProject]:
+    """query_project_list の非同期版(Bot の async /api 用)。"""
+    return list(await db.scalars(project_list_stmt(**kwargs)))
+
+
 def list_projects(db: Session) -> List[TimetableProject]:
-    """全プロジェクトを日付降順で返す。"""
-    projects = db.query(TimetableProject).all()
-    projects.sort(key=lambda x: x.event_date or "0000-00-00", reverse=True)
-    return projects
+    """全プロジェクトを日付降順で返す(並べ替えは SQL)。"""
+    return query_project_list(db)
+
+
+def list_projects_between(
+    db: Session, date_from: Optional[str] = None, date_to: Optional[str] = None,
+) -> List[TimetableProject]:
+    """event_date("YYYY-MM-DD" 文字列)が [date_from, date_to] のプロジェクトを日付昇順で返す。
+
+    None の端は無制限。event_date 未設定のプロジェクトは含めない。
+    一括 PDF 用なので SUMMARY_COLUMNS だけを読む(JSON 列は触ったときに遅延で読む)。
+    """
+    q = db.query(TimetableProject).options(load_only(*SUMMARY_COLUMNS)).filter(
+        TimetableProject.event_date.isnot(None)
+    )
+    if date_from:
+        q = q.filter(TimetableProject.event_date >= date_from)
+    if date_to:
+        q = q.filter(TimetableProject.event_date <= date_to)
+    return q.order_by(TimetableProject.event_date, TimetableProject.id).all()
 
 
 def get_project(db: Session, project_id: int) -> Optional[TimetableProject]:
@@ -111,6 +202,11 @@ def to_flyer_view(proj: TimetableProject) -> ProjectView:
     )
 
 
+def to_summary_view(proj: TimetableProject) -> ProjectView:
+    """summary_only で読んだ ORM → ProjectView(JSON 列は None のまま。追加 SELECT を起こさない)。"""
+    return ProjectView(**{c.key: getattr(proj, c.key) for c in SUMMARY_COLUMNS})
+
+
 def get_project_view(db: Session, project_id: int) -> Optional[ProjectView]:
     """
     ID 指定で ProjectView(読み取り専用)を返す。未検出なら None。
@@ -123,6 +219,14 @@ def get_project_view(db: Session, project_id: int) -> Optional[ProjectView]:
     return to_flyer_view(proj)
 
 
+async def get_project_view_async(db: AsyncSession, project_id: int) -> Optional[ProjectView]:
+    """get_project_view の非同期版。"""
+    if project_id is None:
+        return None
+    proj = await db.get(TimetableProject, project_id)
+    return to_flyer_view(proj) if proj is not None else None
+
+
 # ---------------------------------------------------------
 # ORM <-> Draft 変換
 # ---------------------------------------------------------
@@ -171,8 +275,8 @@ def to_draft(proj: TimetableProject) -> ProjectDraft:
         event_date=_parse_date(proj.event_date),
         venue_name=proj.venue_name or "",
         venue_url=proj.venue_url or "",
-        open_time=_format_time_str(proj.open_time, "10:00"),
-        start_time=_format_time_str(proj.start_time, "10:30"),
+        open_time=format_time_str(proj.open_time, "10:00"),
+        start_time=format_time_str(proj.start_time, "10:30"),
         goods_start_offset=int(proj.goods_start_offset) if proj.goods_start_offset is not None else 5,
         tickets=[TicketDraft.from_dict(t) for t in tickets_raw],
         ticket_notes=notes_clean,
@@ -214,6 +318,7 @@ def apply_draft(
     proj.free_text_json = json.dumps([f.to_dict() for f in draft.free_texts], ensure_ascii=False)
     proj.settings_json = json.dumps(draft.settings, ensure_ascii=False)
     proj.grid_order_json = json.dumps(draft.grid_settings, ensure_ascii=False)
+    sync_grid_order_entries(proj, grid_order_names(draft.grid_settings))
 
     # --- flyer_json: 既存値と draft.flyer_settings をマージ ---
     # 全消し上書きすると init_s 由来の動的キー(flyer_grid_scale_w 等 30+ 個)が
@@ -307,6 +412,7 @@ def duplicate_project(db: Session, project_id: int) -> Optional[TimetableProject
         flyer_json=src.flyer_json,
         settings_json=src.settings_json,
     )
+    sync_grid_order_entries(new_proj, [e.artist_name for e in src.grid_entries])
     db.add(new_proj)
     db.commit()
     db.refresh(new_proj)
@@ -315,10 +421,13 @@ def duplicate_project(db: Session, project_id: int) -> Optional[TimetableProject
 
 
 def delete_project(db: Session, project_id: int) -> bool:
-    """プロジェクト削除(cascade で行も消える)。"""
+    """プロジェクト削除(cascade で行も消える。ステージグループからも外す)。"""
+    from repositories import stage_repo
+
     proj = get_project(db, project_id)
     if not proj:
         return False
+    stage_repo.detach_project(db, project_id)
     db.delete(proj)
     db.commit()
     logger.info(f"Deleted project id={project_id}")
@@ -342,6 +451,54 @@ def _reassign_grid_json(raw, old_name: str, new_name: str):
 
     壊れた JSON は json.loads が json.JSONDecodeError を送出する(呼び出し側で握る)。
     """
+    loaded = _load_grid_order(raw)
+    if loaded is None:
+        return None
+    data, order, is_bare_list = loaded
+    if old_name not in order:
+        return None
+
+    if new_name in order:
+        new_order = [n for n in order if n != old_name]  # loser を除去して重複回避
+    else:
+        new_order = [new_name if n == old_name else n for n in order]  # 位置維持で置換
+    return _dump_grid_order(data, order, new_order, is_bare_list)
+
+
+def _reassign_grid_json_many(raw, renames: Dict[str, str]):
+    """_reassign_grid_json の複数組版(一括 merge 用)。renames = {loser 名: winner 名}。
+
+    全組を同時に適用する(順番に 1 組ずつ当てたときのように、ある組の結果が別の組の
+    old_name に一致して再度書き換わることはない)。1 組ごとの意味論は _reassign_grid_json と同じ:
+    winner が(書き換え対象でない要素として)order に既在なら loser を除去、無ければ位置維持で置換。
+    複数の loser が同じ winner に寄るときは最初の位置に 1 つだけ残す。
+    """
+    loaded = _load_grid_order(raw)
+    if loaded is None:
+        return None
+    data, order, is_bare_list = loaded
+    if not any(n in renames for n in order):
+        return None
+
+    present = {n for n in order if n not in renames}
+    new_order, placed = [], set()
+    for n in order:
+        if n not in renames:
+            new_order.append(n)
+            continue
+        target = renames[n]
+        if target in present or target in placed:
+            continue  # winner が既に並びにいる → loser を除去(重複回避)
+        placed.add(target)
+        new_order.append(target)
+    return _dump_grid_order(data, order, new_order, is_bare_list)
+
+
+def _load_grid_order(raw):
+    """grid_order_json を (data, order, is_bare_list) に分解する。order が無ければ None。
+
+    JSONDecodeError はそのまま送出(呼び出し側で握る)。
+    """
     if raw is None:
         return None
     if isinstance(raw, str):
@@ -359,18 +516,14 @@ def _reassign_grid_json(raw, old_name: str, new_name: str):
         is_bare_list = True
     else:
         return None
-
-    if not isinstance(order, list) or old_name not in order:
+    if not isinstance(order, list):
         return None
+    return data, order, is_bare_list
 
-    if new_name in order:
-        new_order = [n for n in order if n != old_name]  # loser を除去して重複回避
-    else:
-        new_order = [new_name if n == old_name else n for n in order]  # 位置維持で置換
 
+def _dump_grid_order(data, order, new_order, is_bare_list):
     if new_order == order:
         return None  # 実質変化なし
-
     if is_bare_list:
         return json.dumps(new_order, ensure_ascii=False)
     data["order"] = new_order  # 他キーは温存
@@ -378,17 +531,22 @@ def _reassign_grid_json(raw, old_name: str, new_name: str):
 
 
 def reassign_grid_orders(db: Session, old_name: str, new_name: str) -> int:
-    """アーティスト統合(merge)時に、全プロジェクトの grid_order_json 内 order リストの
+    """アーティスト統合(merge)時に、grid_order_json 内 order リストの
     old_name(loser 現名)を new_name(winner 現名)へ名寄せする。変更したプロジェクト数を返す。
 
     commit はしない(境界は service)。※ このモジュールは apply_draft に次ぐ
     grid_order_json への「2 人目の書き手」。dict 形式の order 以外のキーは温存する。
 
-    null / 空文字 / 壊れた JSON のプロジェクトはスキップして logger.warning(project_id を記録)。
+    対象は grid_order_entries の artist_name 索引で引いたプロジェクトだけ(全件は読まない)。
+    書き換えた order で entries も同期する。
+    壊れた JSON のプロジェクトはスキップして logger.warning(project_id を記録)。
     実際の付け替えロジックは純関数 _reassign_grid_json に委譲(scratch で単体検証可能)。
     """
     changed = 0
-    for proj in db.query(TimetableProject).all():
+    targets = db.query(TimetableProject).filter(
+        TimetableProject.id.in_(_grid_name_project_ids(old_name))
+    ).order_by(TimetableProject.id)
+    for proj in targets:
         try:
             updated = _reassign_grid_json(proj.grid_order_json, old_name, new_name)
         except json.JSONDecodeError as e:
@@ -400,8 +558,98 @@ def reassign_grid_orders(db: Session, old_name: str, new_name: str) -> int:
         if updated is None:
             continue
         proj.grid_order_json = updated
+        sync_grid_order_entries(proj, grid_order_names(updated))
         changed += 1
         logger.info(
             f"reassign_grid_orders: project_id={proj.id} {old_name!r} -> {new_name!r}"
         )
     return changed
+
+
+def reassign_grid_orders_bulk(db: Session, renames: Dict[str, str]) -> int:
+    """reassign_grid_orders の複数組版(一括 merge 用)。renames = {loser 名: winner 名}。
+
+    対象プロジェクトは grid_order_entries の索引から 1 回の SELECT で引き、各プロジェクトの
+    order を _reassign_grid_json_many で 1 回だけ書き換える(組ごとに全プロジェクトを走査しない)。
+    変更したプロジェクト数を返す。壊れた JSON はスキップして warning。commit はしない。
+    """
+    renames = {old: new for old, new in renames.items() if old != new}
+    if not renames:
+        return 0
+    project_ids = select(GridOrderEntry.project_id).where(
+        GridOrderEntry.artist_name.in_(list(renames))
+    ).distinct()
+    targets = db.query(TimetableProject).filter(
+        TimetableProject.id.in_(project_ids)
+    ).order_by(TimetableProject.id)
+    changed = 0
+    for proj in targets:
+        try:
+            updated = _reassign_grid_json_many(proj.grid_order_json, renames)
+        except json.JSONDecodeError as e:
+            logger.warning(
+                f"reassign_grid_orders_bulk: skip project_id={proj.id} "
+                f"(grid_order_json parse failed: {e})"
+            )
+            continue
+        if updated is None:
+            continue
+        proj.grid_order_json = updated
+        sync_grid_order_entries(proj, grid_order_names(updated))
+        changed += 1
+    logger.info(f"reassign_grid_orders_bulk: renames={len(renames)} projects={changed}")
+    return changed
+
+
+# ---------------------------------------------------------
+# grid_order_entries(grid_order_json の order の索引)
+# ---------------------------------------------------------
+def grid_order_names(raw) -> List[str]:
+    """grid_order_json(生文字列 / dict / 裸 list)の order を名前のリストで返す。
+
+    order が無い・壊れた JSON は [](壊れた JSON は warning)。文字列でない要素と空文字は除く。
+    """
+    data = _parse_json(raw, None) if isinstance(raw, str) and raw.strip() else raw
+    order = data.get("order") if isinstance(data, dict) else data
+    if not isinstance(order, list):
+        return []
+    return [n for n in order if isinstance(n, str) and n]
+
+
+def sync_grid_order_entries(proj: TimetableProject, names: List[str]) -> bool:
+    """proj.grid_entries を names(並び順どおり)に揃える。変わらなければ何もしない。
+
+    commit はしない。変更したら True。
+    """
+    if [e.artist_name for e in proj.grid_entries] == list(names):
+        return False
+    proj.grid_entries = [
+        GridOrderEntry(position=i, artist_name=name) for i, name in enumerate(names)
+    ]
+    return True
+
+
+def _grid_name_project_ids(artist_name: str) -> Select:
+    return select(GridOrderEntry.project_id).where(GridOrderEntry.artist_name == artist_name).distinct()
+
+
+def backfill_grid_order_entries(db: Session) -> int:
+    """entries をまだ持たないプロジェクトを grid_order_json から埋める。埋めた件数を返す。
+
+    冪等(2 回目以降は order が空のプロジェクトだけを読む)。commit はしない。
+    """
+    has_entries = db.query(GridOrderEntry.id).filter(
+        GridOrderEntry.project_id == TimetableProject.id
+    ).exists()
+    missing = db.query(TimetableProject).options(
+        load_only(TimetableProject.id, TimetableProject.grid_order_json)
+    ).filter(TimetableProject.grid_order_json.isnot(None), ~has_entries)
+
+    filled = 0
+    for proj in missing:
+        names = grid_order_names(proj.grid_order_json)
+        if names and sync_grid_order_entries(proj, names):
+            filled += 1
+    if filled:
+        logger.info(f"backfill_grid_order_entries: {filled} projects")
+    return filled
@@ -0,0 +1,81 @@
+"""
+ProjectStage(複数ステージのグループ)を担うリポジトリ。
+
+流儀は timetable_repo / font_repo に合わせる:
+- モジュールレベル関数。db: Session を第 1 引数で受ける。
+- repository はセッションを作らない/閉じない/commit しない(service が所有)。
+
+グループは「同じイベントのステージ」として束ねたプロジェクトの集合。
+group_id は先頭(sort_order 最小)プロジェクトの id。どのグループにも属さない
+プロジェクトは単独ステージとして扱う(行が無い = 自分だけのグループ)。
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import ProjectStage
+
+
+def get_stage_group(db: Session, project_id: int) -> List[ProjectStage]:
+    """project_id が属するグループのステージ(sort_order 順)。属さなければ空リスト。"""
+    own = db.query(ProjectStage).filter(ProjectStage.project_id == project_id).first()
+    if own is None:
+        return []
+    return (
+        db.query(ProjectStage)
+        .filter(ProjectStage.group_id == own.group_id)
+        .order_by(ProjectStage.sort_order, ProjectStage.id)
+        .all()
+    )
+
+
+def set_stage_group(db: Session, members: Sequence[Tuple[int, Optional[str]]]) -> None:
+    """members = [(project_id, stage_name), ...] を 1 グループとして保存する(並び順 = sort_order)。
+
+    members に含まれるプロジェクトの旧グループ所属は外す。旧グループに残ったプロジェクトは
+    そのまま(group_id は残り先頭に付け替える)。1 件以下ならグループを作らない。
+    """
+    ids = [pid for pid, _ in members]
+    old_groups = {
+        g for (g,) in db.query(ProjectStage.group_id).filter(ProjectStage.project_id.in_(ids)).all()
+    } if ids else set()
+    if ids:
+        db.query(ProjectStage).filter(ProjectStage.project_id.in_(ids)).delete(synchronize_session=False)
+    for g in old_groups:
+        _regroup(db, g)
+
+    if len(members) < 2:
+        return
+    group_id = ids[0]
+    for order, (pid, name) in enumerate(members):
+        db.add(ProjectStage(group_id=group_id, project_id=pid, stage_name=name or None, sort_order=order))
+
+
+def detach_project(db: Session, project_id: int) -> None:
+    """プロジェクトをグループから外す(削除前に呼ぶ)。"""
+    own = db.query(ProjectStage).filter(ProjectStage.project_id == project_id).first()
+    if own is None:
+        return
+    group_id = own.group_id
+    db.delete(own)
+    db.flush()
+    _regroup(db, group_id)
+
+
+def _regroup(db: Session, group_id: int) -> None:
+    # 残り 1 件以下ならグループを解散、先頭が抜けたら group_id を残りの先頭に付け替える
+    rest = (
+        db.query(ProjectStage)
+        .filter(ProjectStage.group_id == group_id)
+        .order_by(ProjectStage.sort_order, ProjectStage.id)
+        .all()
+    )
+    if len(rest) < 2:
+        for r in rest:
+            db.delete(r)
+        return
+    head = rest[0].project_id
+    for r in rest:
+        r.group_id = head
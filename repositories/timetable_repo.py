@@ -8,8 +8,10 @@ timetable_rows テーブル + ProjectDraft (DB 由来) と定める。
 from __future__ import annotations
 
 import json
-from typing import List
+from typing import Any, Dict, List, Sequence, Tuple
 
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from database import TimetableRow, TimetableProject
@@ -33,21 +35,41 @@ def load_rows(db: Session, project_id: int) -> List[TimetableRowDraft]:
         return []
 
     try:
-        rows = (
-            db.query(TimetableRow)
-            .filter(TimetableRow.project_id == project_id)
-            .order_by(TimetableRow.sort_order)
-            .all()
-        )
+        rows = db.scalars(_rows_stmt(project_id)).all()
     except Exception as e:
         logger.error(f"load_rows: timetable_rows query failed: {e}", exc_info=True)
         rows = []
 
     if rows:
         return [_row_to_draft(r) for r in rows]
+    return _legacy_drafts(db.get(TimetableProject, project_id), project_id)
+
+
+async def load_rows_async(db: AsyncSession, project_id: int) -> List[TimetableRowDraft]:
+    """load_rows の非同期版(Bot の async /api 用。優先順位・フォールバックも同じ)。"""
+    if project_id is None:
+        return []
+    try:
+        rows = (await db.scalars(_rows_stmt(project_id))).all()
+    except Exception as e:
+        logger.error(f"load_rows_async: timetable_rows query failed: {e}", exc_info=True)
+        await db.rollback()   # 失敗したトランザクションのままではフォールバックの get も通らない
+        rows = []
+    if rows:
+        return [_row_to_draft(r) for r in rows]
+    return _legacy_drafts(await db.get(TimetableProject, project_id), project_id)
+
 
+def _rows_stmt(project_id: int):
+    return (
+        select(TimetableRow)
+        .where(TimetableRow.project_id == project_id)
+        .order_by(TimetableRow.sort_order)
+    )
+
+
+def _legacy_drafts(proj, project_id: int) -> List[TimetableRowDraft]:
     # フォールバック: 旧 data_json から読み込む(読み込みのみ・保存しない)
-    proj = db.query(TimetableProject).filter(TimetableProject.id == project_id).first()
     if proj and proj.data_json:
         try:
             data = json.loads(proj.data_json)
@@ -59,24 +81,25 @@ def load_rows(db: Session, project_id: int) -> List[TimetableRowDraft]:
                 return [TimetableRowDraft.from_dict(d) for d in data if isinstance(d, dict)]
         except Exception as e:
             logger.warning(f"load_rows: legacy data_json parse failed: {e}", exc_info=True)
-
     return []
 
 
 def save_rows(db: Session, project_id: int, drafts: List[TimetableRowDraft]) -> bool:
     """
-    指定プロジェクトの行データを置き換える(全削除→挿入)。
+    指定プロジェクトの行データを drafts に揃える(差分のみ書く。upsert_row_values を参照)。
     """
     if project_id is None:
         logger.error("save_rows: project_id is None")
         return False
 
     try:
-        db.query(TimetableRow).filter(TimetableRow.project_id == project_id).delete()
-        new_rows = [_draft_to_row(project_id, idx, d) for idx, d in enumerate(drafts)]
-        db.add_all(new_rows)
+        values = [_draft_values(d) for d in drafts]
+        n_upd, n_ins, n_del = upsert_row_values(db, project_id, values)
         db.commit()
-        logger.info(f"save_rows: project={project_id}, count={len(new_rows)}")
+        logger.info(
+            f"save_rows: project={project_id}, count={len(values)} "
+            f"(update={n_upd}, insert={n_ins}, delete={n_del})"
+        )
         return True
     except Exception as e:
         logger.error(f"save_rows failed: {e}", exc_info=True)
@@ -84,6 +107,76 @@ def save_rows(db: Session, project_id: int, drafts: List[TimetableRowDraft]) ->
         return False
 
 
+# 行の内容を表す列(project_id / sort_order 以外)
+ROW_FIELDS = (
+    "artist_name",
+    "duration",
+    "is_post_goods",
+    "adjustment",
+    "goods_start_time",
+    "goods_duration",
+    "place",
+    "add_goods_start_time",
+    "add_goods_duration",
+    "add_goods_place",
+    "is_hidden",
+)
+
+
+def diff_rows(
+    stored: Sequence[Tuple[int, int, Dict[str, Any]]],
+    values: Sequence[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[int]]:
+    """保存済み行と新しい行を位置(並び順)で突き合わせる(純ロジック・DB 非依存)。
+
+    stored: sort_order 順の (id, sort_order, {ROW_FIELDS の値})。values: 新しい行の ROW_FIELDS の値。
+    戻り値 (updates, inserts, delete_ids):
+      - updates: 内容か sort_order が変わった行の {"id", "sort_order", ROW_FIELDS...}
+      - inserts: 末尾に増えた行の {"sort_order", ROW_FIELDS...}(project_id は呼び出し側で付ける)
+      - delete_ids: 末尾で減った行の id
+    """
+    updates: List[Dict[str, Any]] = []
+    for pos, ((row_id, sort_order, old), new) in enumerate(zip(stored, values)):
+        if sort_order != pos or any(old.get(f) != new.get(f) for f in ROW_FIELDS):
+            updates.append({"id": row_id, "sort_order": pos, **{f: new.get(f) for f in ROW_FIELDS}})
+    inserts = [
+        {"sort_order": pos, **{f: new.get(f) for f in ROW_FIELDS}}
+        for pos, new in enumerate(values[len(stored):], start=len(stored))
+    ]
+    delete_ids = [row_id for row_id, _, _ in stored[len(values):]]
+    return updates, inserts, delete_ids
+
+
+def upsert_row_values(
+    db: Session, project_id: int, values: Sequence[Dict[str, Any]],
+) -> Tuple[int, int, int]:
+    """プロジェクトの行を values(ROW_FIELDS の値の並び)に揃える。commit はしない。
+
+    全削除→全挿入ではなく diff_rows の差分だけを、UPDATE(主キー指定の executemany)/
+    INSERT(複数行 1 文)/ DELETE(id IN 1 文)でまとめて書く。変更のない行は触らない。
+    戻り値は (更新数, 挿入数, 削除数)。
+    """
+    columns = [getattr(TimetableRow, f) for f in ROW_FIELDS]
+    stored = [
+        (r[0], r[1], dict(zip(ROW_FIELDS, r[2:])))
+        for r in db.query(TimetableRow.id, TimetableRow.sort_order, *columns)
+        .filter(TimetableRow.project_id == project_id)
+        .order_by(TimetableRow.sort_order, TimetableRow.id)
+    ]
+    updates, inserts, delete_ids = diff_rows(stored, values)
+    if updates:
+        db.execute(update(TimetableRow), updates)
+    if inserts:
+        # render_nulls: None を含む行で文が分かれないようにする(NULL をそのまま 1 文で入れる)
+        db.execute(
+            insert(TimetableRow).execution_options(render_nulls=True),
+            [{"project_id": project_id, **v} for v in inserts],
+        )
+    if delete_ids:
+        db.query(TimetableRow).filter(TimetableRow.id.in_(delete_ids)).delete(synchronize_session=False)
+    return len(updates), len(inserts), len(delete_ids)
+
+
 def copy_rows(db: Session, src_project_id: int, dest_project_id: int) -> bool:
     """src の行データを dest にコピーする(複製機能で使う)。"""
     drafts = load_rows(db, src_project_id)
@@ -109,10 +202,8 @@ def _row_to_draft(r: TimetableRow) -> TimetableRowDraft:
     )
 
 
-def _draft_to_row(project_id: int, sort_order: int, d: TimetableRowDraft) -> TimetableRow:
-    return TimetableRow(
-        project_id=project_id,
-        sort_order=sort_order,
+def _draft_values(d: TimetableRowDraft) -> Dict[str, Any]:
+    return dict(
         artist_name=d.artist_name,
         duration=int(d.duration or 0),
         is_post_goods=bool(d.is_post_goods),
@@ -125,3 +216,4 @@ def _draft_to_row(project_id: int, sort_order: int, d: TimetableRowDraft) -> Tim
         add_goods_place=d.add_goods_place,
         is_hidden=bool(d.is_hidden),
     )
+
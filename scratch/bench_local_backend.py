@@ -0,0 +1,124 @@
+"""ローカルバックエンド(EVENT_APP_BACKEND=local)で描画と /api を 1 台で端から端まで計測する。
+
+一時ディレクトリに SQLite と画像置き場を作り、data/images のアー写でアーティストと
+プロジェクト(タイムテーブル行・グリッド並び順)を用意してから、各ケースの
+実時間と発行 SQL 数(utils.query_stats)を並べる。Supabase・ネットワークには触れない。
+
+--profile を付けると各ケースを cProfile にかけ、累積時間の上位を出す。
+
+実行: python3 scratch/bench_local_backend.py [--artists 40] [--repeat 3] [--profile]
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+def _setup_env(workdir):
+    os.environ["EVENT_APP_BACKEND"] = "local"
+    os.environ["LOCAL_DB_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["LOCAL_STORAGE_DIR"] = os.path.join(workdir, "storage")
+    os.environ["ASYNC_DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["EVENT_API_KEY"] = "bench"
+
+
+def _seed(n_artists):
+    import json
+
+    from database import TimetableProject, init_db, SessionLocal
+    from models import TimetableRowDraft
+    from repositories import project_repo, timetable_repo
+    from services import artist_service
+
+    init_db()
+    image_dir = os.path.join(ROOT, "data", "images")
+    photos = sorted(os.listdir(image_dir))
+    names = []
+    for i in range(n_artists):
+        with open(os.path.join(image_dir, photos[i % len(photos)]), "rb") as f:
+            photo = io.BytesIO(f.read())
+        photo.name = photos[i % len(photos)]
+        view, _ = artist_service.create_artist(f"Artist{i:02d}", photo)
+        names.append(view.name)
+
+    db = SessionLocal()
+    try:
+        proj = TimetableProject(
+            title="Bench", event_date="2026-10-19", venue_name="Local", open_time="10:00", start_time="10:30",
+            grid_order_json=json.dumps({"order": names, "row_counts_str": "5,5,5,5,5,5,5,5"}),
+        )
+        db.add(proj)
+        db.flush()
+        project_repo.sync_grid_order_entries(proj, names)
+        timetable_repo.save_rows(db, proj.id, [TimetableRowDraft(artist_name=n, duration=20, adjustment=5) for n in names])
+        db.commit()
+        return proj.id, names
+    finally:
+        db.close()
+
+
+def _cases(project_id, names):
+    from fastapi.testclient import TestClient
+
+    import logic_timetable
+    from bot import main
+    from services import generation_service
+
+    client = TestClient(main.app)
+    headers = {"X-API-Key": "bench"}
+    tt_rows = [[f"{10 + i // 3}:{(i % 3) * 20:02d}", n, "", ""] for i, n in enumerate(names)]
+
+    def api(path):
+        return lambda: client.get(path, headers=headers).raise_for_status()
+
+    return [
+        ("timetable image", lambda: logic_timetable.generate_timetable_image(tt_rows)),
+        ("grid png", lambda: generation_service.render_grid_png_for_project(project_id)),
+        ("summary text", lambda: generation_service.build_summary_text_for_project(project_id)),
+        ("GET /api/projects", api("/api/projects")),
+        ("GET /api/projects/{id}/rows", api(f"/api/projects/{project_id}/rows")),
+        ("GET /api/artists", api("/api/artists")),
+        ("GET /api/projects/{id}/grid-image", api(f"/api/projects/{project_id}/grid-image")),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--artists", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _setup_env(workdir)
+        project_id, names = _seed(args.artists)
+
+        from utils import query_stats
+
+        print(f"{'case':<36} {'best ms':>9} {'mean ms':>9} {'queries':>8}")
+        for label, fn in _cases(project_id, names):
+            fn()  # 1 回目はフォント取得・キャッシュ作成を含むので捨てる
+            times = []
+            for _ in range(args.repeat):
+                with query_stats.track(label, report=False) as stats:
+                    start = time.perf_counter()
+                    fn()
+                    times.append((time.perf_counter() - start) * 1000)
+            print(f"{label:<36} {min(times):9.1f} {sum(times) / len(times):9.1f} {stats.count:8d}")
+            if args.profile:
+                prof = cProfile.Profile()
+                prof.runcall(fn)
+                pstats.Stats(prof).sort_stats("cumulative").print_stats(12)
+
+
+if __name__ == "__main__":
+    main()
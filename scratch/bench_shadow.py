@@ -0,0 +1,92 @@
+"""影パイプライン比較ベンチ: 従来(PIL MaxFilter + GaussianBlur)vs utils/shadow.render_shadow
+
+フライヤーで実際に出るサイズ(テキスト1行 ≒ 1000x200、ロゴ ≒ 430x200)と
+UI のスライダー範囲(太さ 0-20 / ぼかし 0-20)で、速度とアルファ差分を並べる。
+従来側は utils/flyer_generator.py の旧実装をそのまま写したもの。
+
+utils パッケージの import が database(import 時に secrets/env 必須)を引くため、
+probe_reassign_grid_orders.py と同様に database を MagicMock 化してから読み込む。
+DB・ネットワークには一切触れない。
+
+実行: python3 scratch/bench_shadow.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+sys.modules["database"] = MagicMock()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.shadow import render_shadow  # noqa: E402
+
+CASES = [
+    # (名前, (w, h), spread, blur)
+    ("text 0/0", (1000, 200), 0, 0),
+    ("text 0/5", (1000, 200), 0, 5),
+    ("text 3/5", (1000, 200), 3, 5),
+    ("text 10/10", (1000, 200), 10, 10),
+    ("text 10/20", (1000, 200), 10, 20),
+    ("logo 20/20", (430, 200), 20, 20),
+]
+REPEAT = 5
+
+
+def _make_mask(size):
+    """テキスト影相当のマスク(L, 形=255)を作る。"""
+    mask = Image.new("L", size, 0)
+    d = ImageDraw.Draw(mask)
+    try:
+        font = ImageFont.load_default(size=int(size[1] * 0.45))
+    except TypeError:
+        font = ImageFont.load_default()
+    d.text((size[1] // 3, size[1] // 4), "2026.10.19 (MON) OPEN 18:00", font=font, fill=255)
+    return mask
+
+
+def legacy_shadow(mask, rgb, opacity, spread, blur):
+    """旧 draw_text_with_shadow の影処理(RGBA 全体に MaxFilter → GaussianBlur)。"""
+    layer = Image.new("RGBA", mask.size, (0, 0, 0, 0))
+    ink = Image.new("RGBA", mask.size, tuple(rgb) + (opacity,))
+    layer.paste(ink, (0, 0), mask)
+    if spread > 0:
+        a = layer.getchannel("A").filter(ImageFilter.MaxFilter(1 + spread * 2))
+        expanded = Image.new("RGBA", layer.size, tuple(rgb) + (opacity,))
+        expanded.putalpha(a)
+        layer = expanded
+    if blur > 0:
+        layer = layer.filter(ImageFilter.GaussianBlur(blur))
+    return layer
+
+
+def _bench(fn):
+    best = float("inf")
+    out = None
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, out
+
+
+def run():
+    rgb, opacity = (0, 0, 0), 200
+    print(f"{'case':<12} {'legacy ms':>10} {'new ms':>8} {'speedup':>8} {'max|dA|':>8} {'mean|dA|':>9}")
+    for name, size, spread, blur in CASES:
+        mask = _make_mask(size)
+        t_old, old = _bench(lambda: legacy_shadow(mask, rgb, opacity, spread, blur))
+        t_new, new = _bench(lambda: render_shadow(mask, rgb, opacity, spread, blur))
+        a_old = np.asarray(old.getchannel("A"), dtype=np.int16)
+        a_new = np.asarray(new.getchannel("A"), dtype=np.int16)
+        diff = np.abs(a_old - a_new)
+        speedup = t_old / t_new if t_new > 0 else float("inf")
+        print(f"{name:<12} {t_old:>10.2f} {t_new:>8.2f} {speedup:>7.1f}x {diff.max():>8d} {diff.mean():>9.3f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -6,20 +6,21 @@ session の生成/クローズと commit/rollback は service が所有する
 (project_service と同じ流儀)。repository は「書くだけ・commit しない」ので、
 トランザクション境界(commit/rollback)はすべてここで握る。
 
-キャッシュ(@st.cache_data 等)は入れない(罠17: 導入するなら
-create/update/delete/merge 全経路の invalidation とセット設計が必要。
-その判断は Phase 6)。
+一覧の読み取りは services.catalog_cache(プロセス内キャッシュ)経由。
+書き込み経路(作成・復元・更新・位置調整・削除・統合)は commit 後に必ず
+catalog_cache.invalidate(ARTISTS) を呼ぶ(罠17)。
 """
 from __future__ import annotations
 
 import os
 import time
 import uuid
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from database import SessionLocal, upload_image_to_supabase
-from models.artist import ArtistView
+from database import SessionLocal, async_session, upload_image_to_supabase
+from models.artist import ArtistImportReport, ArtistView, resolve_merge_pairs
 from repositories import artist_repo, project_repo
+from services import catalog_cache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -40,22 +41,56 @@ def _upload_image(image_file) -> Optional[str]:
 # ---------------------------------------------------------
 # 読み取り
 # ---------------------------------------------------------
-def list_artists(include_deleted: bool = False) -> List[ArtistView]:
-    """アーティスト一覧(既定 is_deleted==False)を ArtistView で返す。"""
+def _load(loader):
     db = SessionLocal()
     try:
-        return artist_repo.list_artists(db, include_deleted=include_deleted)
+        return loader(db)
     finally:
         db.close()
 
 
+def list_artists(include_deleted: bool = False) -> List[ArtistView]:
+    """アーティスト一覧(既定 is_deleted==False)を ArtistView で返す(キャッシュ経由)。"""
+    return list(catalog_cache.get_or_load(
+        catalog_cache.ARTISTS, ("list", include_deleted),
+        lambda: _load(lambda db: artist_repo.list_artists(db, include_deleted=include_deleted)),
+    ))
+
+
+async def list_artists_async(include_deleted: bool = False) -> List[ArtistView]:
+    """list_artists の非同期版(Bot の async /api 用。キャッシュは同期版と共有)。"""
+    async def load():
+        async with async_session() as db:
+            return await artist_repo.list_artists_async(db, include_deleted=include_deleted)
+
+    return list(await catalog_cache.get_or_load_async(
+        catalog_cache.ARTISTS, ("list", include_deleted), load,
+    ))
+
+
+def _artists_by_name() -> Dict[str, ArtistView]:
+    # 名前 → ArtistView(削除済み含む。同名は id 最小を採用=artist_repo.get_artists_by_names と同じ)
+    def load(db):
+        by_name: Dict[str, ArtistView] = {}
+        for a in sorted(artist_repo.list_artists(db, include_deleted=True), key=lambda a: a.id):
+            by_name.setdefault(a.name, a)
+        return by_name
+
+    return catalog_cache.get_or_load(catalog_cache.ARTISTS, "by_name", lambda: _load(load))
+
+
 def get_artists_by_names(names) -> List[ArtistView]:
-    """名前リストに対応する ArtistView を入力順・重複保持で返す。"""
-    db = SessionLocal()
-    try:
-        return artist_repo.get_artists_by_names(db, names)
-    finally:
-        db.close()
+    """名前リストに対応する ArtistView を入力順・重複保持で返す(見つからない名前は飛ばす)。"""
+    names = list(names)
+    if not names:
+        return []
+    by_name = _artists_by_name()
+    return [by_name[n] for n in names if n in by_name]
+
+
+def invalidate_cache() -> None:
+    """アーティスト一覧のキャッシュを捨てる(service を通さず Artist を書いた view が commit 後に呼ぶ)。"""
+    catalog_cache.invalidate(catalog_cache.ARTISTS)
 
 
 # ---------------------------------------------------------
@@ -83,10 +118,12 @@ def create_artist(name: str, image_file=None) -> Tuple[Optional[ArtistView], str
         if existing is None:
             view = artist_repo.create_artist(db, name, image_filename)
             db.commit()
+            catalog_cache.invalidate(catalog_cache.ARTISTS)
             return (view, "created")
         if existing.is_deleted:
             view = artist_repo.restore_artist(db, existing.id, image_filename)
             db.commit()
+            catalog_cache.invalidate(catalog_cache.ARTISTS)
             return (view, "restored")
         # 既存 & 生存中: 登録済み。書き込みは行わない。
         db.rollback()
@@ -99,6 +136,36 @@ def create_artist(name: str, image_file=None) -> Tuple[Optional[ArtistView], str
         db.close()
 
 
+def register_missing_artists(names) -> ArtistImportReport:
+    """CSV 取り込み用: 名前をまとめて照合し、未登録のものを画像なしで一括登録する。
+
+    照合は完全一致の IN 1 回(削除済みも一致扱い=旧 import_csv_callback と同じく再登録しない)、
+    登録は複数行 INSERT 1 文。同名の登録が複数ある名前は ambiguous として報告だけ行う。
+    失敗時は rollback して例外を送出する(呼び出し側で取り込み自体は続けられるように)。
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return ArtistImportReport()
+    db = SessionLocal()
+    try:
+        found = artist_repo.find_artists_by_names(db, names)
+        missing = [n for n in names if n not in found]
+        created = {a.name for a in artist_repo.insert_artists(db, missing)}
+        db.commit()
+        if created:
+            catalog_cache.invalidate(catalog_cache.ARTISTS)
+        return ArtistImportReport(
+            matched=tuple(n for n in names if len(found.get(n, ())) == 1),
+            created=tuple(n for n in missing if n in created),
+            ambiguous=tuple(n for n in names if len(found.get(n, ())) > 1),
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def update_artist(artist_id: int, name: str, image_file=None) -> Optional[ArtistView]:
     """基本情報(名前/画像)を更新する。既存 views/artists.py L150-158 相当。
 
@@ -113,6 +180,7 @@ def update_artist(artist_id: int, name: str, image_file=None) -> Optional[Artist
             db.rollback()
             return None
         db.commit()
+        catalog_cache.invalidate(catalog_cache.ARTISTS)
         return view
     except Exception as e:
         db.rollback()
@@ -133,6 +201,7 @@ def update_artist_crop(artist_id: int, scale: float, x: int, y: int) -> Optional
             db.rollback()
             return None
         db.commit()
+        catalog_cache.invalidate(catalog_cache.ARTISTS)
         return view
     except Exception as e:
         db.rollback()
@@ -159,6 +228,7 @@ def soft_delete_artist(artist_id: int) -> bool:
         artist_repo.update_artist(db, artist_id, del_name)  # 改名(image は None なので不変)
         artist_repo.soft_delete_artist(db, artist_id)        # is_deleted=True
         db.commit()
+        catalog_cache.invalidate(catalog_cache.ARTISTS)
         return True
     except Exception as e:
         db.rollback()
@@ -174,7 +244,8 @@ def merge_artists(winner_id: int, loser_id: int) -> Tuple[int, int, str]:
       1. winner / loser を取得。どちらか無ければ (0, 0, "not_found")
       2. rows_count = TimetableRow.artist_name を loser 現名 → winner 現名 に付け替え
          ※ rename 前の loser 名で付け替える(順序厳守)
-      3. grid_count = 全プロジェクトの grid_order_json 内 order の loser 名を winner 名へ名寄せ
+      3. grid_count = grid_order_json 内 order の loser 名を winner 名へ名寄せ
+         (対象は grid_order_entries の索引で引いたプロジェクトのみ)
          (⑤-b で追加。TimetableRow と同じく rename 前の loser 名で。順序: TT → grid → rename)
       4. loser を `{loser名}_merged_{int(time.time())}` にリネーム
          (image_filename は None 渡しで不変)
@@ -208,6 +279,7 @@ def merge_artists(winner_id: int, loser_id: int) -> Tuple[int, int, str]:
         # 4. loser を論理削除
         artist_repo.soft_delete_artist(db, loser_id)
         db.commit()
+        catalog_cache.invalidate(catalog_cache.ARTISTS)
         return (rows_count, grid_count, "merged")
     except Exception as e:
         db.rollback()
@@ -215,3 +287,54 @@ def merge_artists(winner_id: int, loser_id: int) -> Tuple[int, int, str]:
         return (0, 0, "error")
     finally:
         db.close()
+
+
+def merge_artists_bulk(pairs) -> Tuple[Dict[int, int], int, int, str]:
+    """複数組のアーティスト統合を 1 トランザクションでまとめて行う(CSV 取り込み後の名寄せ用)。
+
+    pairs は (winner_id, loser_id) のリスト。連鎖(A←B, B←C)は models.artist.resolve_merge_pairs で
+    {loser: 最終 winner} に解決してから、merge_artists と同じ手順を組ごとではなく集合で行う:
+
+      1. 関係するアーティストを IN 1 回で取得。どれか無ければ ({}, 0, 0, "not_found")
+      2. timetable_rows.artist_name を loser 現名 → winner 現名 に 1 文の UPDATE(VALUES の CTE)で付け替え
+      3. grid_order_json の order を索引で引いたプロジェクトについて 1 回ずつ書き換え
+      4. loser 全員を `{loser名}_merged_{int(time.time())}` に改名 + 論理削除(1 文の UPDATE)
+      5. commit → (解決後の {loser: winner}, rows_count, grid_count, "merged")
+
+    同名の loser が別々の winner に寄る場合、名前で持っている行・並び順は先に出てきた組の
+    winner に寄せる(1 組ずつ順に merge_artists した場合と同じ)。
+    組が不正(自己統合・統合先が 2 つ・循環)なら ({}, 0, 0, "invalid")、
+    例外時は rollback して ({}, 0, 0, "error")(詳細は log)。
+    """
+    try:
+        mapping = resolve_merge_pairs(pairs)
+    except ValueError as e:
+        logger.warning(f"merge_artists_bulk: invalid pairs: {e}")
+        return ({}, 0, 0, "invalid")
+    if not mapping:
+        return ({}, 0, 0, "merged")
+
+    db = SessionLocal()
+    try:
+        artists = artist_repo.get_artists_by_ids(db, list(mapping) + list(mapping.values()))
+        if any(i not in artists for i in list(mapping) + list(mapping.values())):
+            db.rollback()
+            return ({}, 0, 0, "not_found")
+        renames: Dict[str, str] = {}
+        for loser_id, winner_id in mapping.items():
+            renames.setdefault(artists[loser_id].name, artists[winner_id].name)
+        rows_count = artist_repo.reassign_timetable_rows_bulk(db, renames)
+        grid_count = project_repo.reassign_grid_orders_bulk(db, renames)
+        stamp = int(time.time())
+        artist_repo.retire_artists(db, {
+            loser_id: f"{artists[loser_id].name}_merged_{stamp}" for loser_id in mapping
+        })
+        db.commit()
+        catalog_cache.invalidate(catalog_cache.ARTISTS)
+        return (mapping, rows_count, grid_count, "merged")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"merge_artists_bulk failed: {e}", exc_info=True)
+        return ({}, 0, 0, "error")
+    finally:
+        db.close()
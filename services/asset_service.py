@@ -12,6 +12,11 @@ view に渡さない。
 提供(汎用窓口・今回は flyer だけが使う):
 - list_assets_by_type(asset_type) -> List[AssetView]
 - get_asset_view(asset_id)        -> Optional[AssetView]
+- invalidate_cache()              : 素材・フォント設定を書いた view が commit 後に呼ぶ
+
+読み取りは services.catalog_cache(プロセス内キャッシュ)経由。素材の書き込みはまだ
+views/assets.py が ORM で直接行っているので、そこから invalidate_cache() を呼ぶ(罠17)。
+フォント一覧(font_service)は素材テーブルから作るので FONTS も同時に無効化する。
 """
 from __future__ import annotations
 
@@ -20,6 +25,7 @@ from typing import List, Optional
 from database import SessionLocal
 from models.asset import AssetView
 from repositories import asset_repo
+from services import catalog_cache
 
 
 def _to_view(asset) -> AssetView:
@@ -31,20 +37,31 @@ def _to_view(asset) -> AssetView:
     )
 
 
-def list_assets_by_type(asset_type: str) -> List[AssetView]:
-    """asset_type 一致 かつ is_deleted==False の一覧を AssetView リストで返す。"""
+def _load(loader):
     db = SessionLocal()
     try:
-        return [_to_view(a) for a in asset_repo.list_assets_by_type(db, asset_type)]
+        return loader(db)
     finally:
         db.close()
 
 
+def list_assets_by_type(asset_type: str) -> List[AssetView]:
+    """asset_type 一致 かつ is_deleted==False の一覧を AssetView リストで返す(キャッシュ経由)。"""
+    return list(catalog_cache.get_or_load(
+        catalog_cache.ASSETS, ("type", asset_type),
+        lambda: _load(lambda db: [_to_view(a) for a in asset_repo.list_assets_by_type(db, asset_type)]),
+    ))
+
+
 def get_asset_view(asset_id) -> Optional[AssetView]:
     """id 一致の 1 件を AssetView で返す。無ければ None(旧 .get(id) の Optional 挙動)。"""
-    db = SessionLocal()
-    try:
+    def load(db):
         asset = asset_repo.get_asset(db, asset_id)
         return _to_view(asset) if asset else None
-    finally:
-        db.close()
+
+    return catalog_cache.get_or_load(catalog_cache.ASSETS, ("id", asset_id), lambda: _load(load))
+
+
+def invalidate_cache() -> None:
+    """素材(とそれを元にしたフォント一覧・フォント設定)のキャッシュを捨てる。"""
+    catalog_cache.invalidate(catalog_cache.ASSETS, catalog_cache.FONTS)
@@ -0,0 +1,112 @@
+"""
+カタログ(アーティスト・素材・フォント・テンプレート)のプロセス内 read-through キャッシュ。
+
+Streamlit は rerun のたびに一覧を読み直すので、件数が少なく更新もまれなカタログは
+プロセス全体で共有するキャッシュから返す(罠17 の「invalidation とセット設計」)。
+
+- get_or_load(catalog, key, loader): キャッシュにあれば返し、無ければ loader() の結果を入れて返す
+  (get_or_load_async は loader がコルーチン関数の版)
+- invalidate(*catalogs): カタログごとの版数を上げる。古い版のエントリは次の読み込みで捨てる。
+  service の書き込み経路(作成・更新・復元・削除・統合・位置調整・改名)と、まだ service を
+  通さず ORM を直接書いている view(素材管理・CSV のアーティスト自動登録)は commit 後に必ず呼ぶ
+- TTL(既定 300 秒)は保険。別プロセス(Bot)での書き込みや呼び忘れがあっても TTL で読み直す
+- stats(): カタログごとのヒット/ミス数と現在の版数
+
+loader の実行はロックの外で行う(遅い DB 読みで他スレッドを止めない)。読み込み中に
+invalidate されたら、その結果は古い版のまま保存されるので次の読みでミスになる。
+キャッシュする値は frozen dataclass の list 等、呼び出し側が書き換えない前提のもの。
+streamlit 非依存(Bot / API からも同じ窓口で使える)。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+ARTISTS = "artists"
+ASSETS = "assets"
+FONTS = "fonts"
+TEMPLATES = "templates"
+
+DEFAULT_TTL = 300.0
+
+_clock = time.monotonic
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_entries: Dict[Tuple[str, Hashable], Tuple[int, float, Any]] = {}   # (版数, 期限, 値)
+_hits: Dict[str, int] = {}
+_misses: Dict[str, int] = {}
+
+
+def get_or_load(catalog: str, key: Hashable, loader: Callable[[], T], ttl: float = DEFAULT_TTL) -> T:
+    """(catalog, key) の値を返す。無い・版数が古い・期限切れなら loader() で読み直して入れる。"""
+    hit, version, value = _lookup(catalog, key)
+    if hit:
+        return value
+    value = loader()
+    _store(catalog, key, version, ttl, value)
+    return value
+
+
+async def get_or_load_async(
+    catalog: str, key: Hashable, loader: Callable[[], Awaitable[T]], ttl: float = DEFAULT_TTL,
+) -> T:
+    """get_or_load の非同期版(loader はコルーチン関数。Bot の async /api 用)。"""
+    hit, version, value = _lookup(catalog, key)
+    if hit:
+        return value
+    value = await loader()
+    _store(catalog, key, version, ttl, value)
+    return value
+
+
+def _lookup(catalog: str, key: Hashable) -> Tuple[bool, int, Any]:
+    now = _clock()
+    with _lock:
+        version = _versions.get(catalog, 0)
+        entry = _entries.get((catalog, key))
+        if entry is not None and entry[0] == version and entry[1] > now:
+            _hits[catalog] = _hits.get(catalog, 0) + 1
+            return True, version, entry[2]
+        _misses[catalog] = _misses.get(catalog, 0) + 1
+        return False, version, None
+
+
+def _store(catalog: str, key: Hashable, version: int, ttl: float, value: Any) -> None:
+    with _lock:
+        _entries[(catalog, key)] = (version, _clock() + ttl, value)
+
+
+def invalidate(*catalogs: str) -> None:
+    """カタログの版数を上げ、そのエントリを捨てる(書き込みの commit 後に呼ぶ)。"""
+    with _lock:
+        for catalog in catalogs:
+            _versions[catalog] = _versions.get(catalog, 0) + 1
+        for k in [k for k in _entries if k[0] in catalogs]:
+            del _entries[k]
+    logger.debug(f"catalog_cache invalidated: {', '.join(catalogs)}")
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """{catalog: {"hits", "misses", "version"}}(観測用)。"""
+    with _lock:
+        names = set(_versions) | set(_hits) | set(_misses)
+        return {
+            c: {"hits": _hits.get(c, 0), "misses": _misses.get(c, 0), "version": _versions.get(c, 0)}
+            for c in sorted(names)
+        }
+
+
+def clear() -> None:
+    """全エントリと統計を捨てる(テスト用)。"""
+    with _lock:
+        _versions.clear()
+        _entries.clear()
+        _hits.clear()
+        _misses.clear()
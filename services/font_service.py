@@ -10,37 +10,60 @@ read のみで commit はしないが、トランザクション境界(open/clos
 
 提供:
 - list_sorted_fonts()          -> list[dict]  : 共用 helper get_sorted_font_list に own_db を渡す
+  ※ list_sorted_fonts / get_default_font_name は services.catalog_cache(FONTS)経由。
+    素材・フォント設定の書き込み側は asset_service.invalidate_cache() で無効化する
 - build_specimen(font_dicts)   -> PIL.Image   : 共用 helper create_font_specimen_img に own_db を渡す
 - ensure_font_available(name)  -> str         : フォントを FS に確保。状態を 4 値で返す
     "cached" / "downloaded_url" / "downloaded_db" / "not_found"
+- provision_fonts(names=None)  -> dict        : 複数フォント(省略時はカタログ全体)を並列に確保
+- provision_project_fonts(id)  -> dict        : そのプロジェクトの設定が参照するフォントを並列に確保
+- start_background_provisioning()             : 起動時にカタログ全体の確保をバックグラウンドで開始
+  ※ 確保の実体は utils.flyer_helpers.provision_font_file(一時ファイル → rename の
+    アトミック書き込み・サイズ/SHA-256 照合・ファイル名ごとのロック。utils.font_store)。
   ※ 共用 helper(get_sorted_font_list / create_font_specimen_img)は無改造。
     ここは own_db を渡すだけの薄いラッパ。
 """
 from __future__ import annotations
 
-import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-
-from constants import FONT_DIR
-from database import SessionLocal, get_image_url
-from repositories import font_repo
+from database import SessionLocal
+from repositories import font_repo, project_repo
+from services import catalog_cache
 from utils import get_sorted_font_list, create_font_specimen_img
-from utils.flyer_helpers import ensure_font_file_exists
+from utils.flyer_helpers import ensure_font_file_exists, provision_font_file
+from utils.font_metrics import ensure_table
+from utils.logger import get_logger
 
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
 
 if TYPE_CHECKING:
     from PIL import Image
 
+logger = get_logger(__name__)
+
+# 並列ダウンロード数(Storage への同時接続数)
+_PROVISION_WORKERS = 8
+
+_background_started = False
+_background_guard = threading.Lock()
+
 
 def list_sorted_fonts() -> List[dict]:
-    """フォント一覧(dict list)を返す。own_db を共用 helper に渡すだけ(helper 無改造)。"""
-    db = SessionLocal()
-    try:
-        return get_sorted_font_list(db)
-    finally:
-        db.close()
+    """フォント一覧(dict list)を返す。own_db を共用 helper に渡すだけ(helper 無改造)。
+
+    キャッシュ経由。dict は呼び出し側で書き換えられてもよいよう毎回コピーして返す。
+    """
+    def load():
+        db = SessionLocal()
+        try:
+            return get_sorted_font_list(db)
+        finally:
+            db.close()
+
+    return [dict(f) for f in catalog_cache.get_or_load(catalog_cache.FONTS, "sorted", load)]
 
 
 def build_specimen(font_dicts: List[dict]) -> "Image.Image":
@@ -68,12 +91,15 @@ def ensure_font_path(filename: str) -> Optional[str]:
 
 def get_default_font_name() -> str:
     """標準フォントのファイル名を返す。未設定なら "keifont.ttf"(旧 flyer L132-133 と同一)。"""
-    db = SessionLocal()
-    try:
-        sys_conf = font_repo.get_system_font_config(db)
-        return sys_conf.filename if sys_conf else "keifont.ttf"
-    finally:
-        db.close()
+    def load():
+        db = SessionLocal()
+        try:
+            sys_conf = font_repo.get_system_font_config(db)
+            return sys_conf.filename if sys_conf else "keifont.ttf"
+        finally:
+            db.close()
+
+    return catalog_cache.get_or_load(catalog_cache.FONTS, "default", load)
 
 
 def ensure_font_available(filename) -> str:
@@ -84,49 +110,115 @@ def ensure_font_available(filename) -> str:
     分岐:
       ① 空入力 → "not_found"(旧は無印 return=無 toast。view 戻しでは状態が要るため
          "not_found" に寄せる。空入力=異常入力も not_found 扱い)
-      ② makedirs + file_path 算出
-      ③ 既にローカルに存在(size>0) → "cached"(旧: 早期 return・無 toast)
-      ④ URL 経路: Asset → get_image_url → requests.get 200 → 保存 → "downloaded_url"
-      ⑤ binary 経路: AssetFile.file_data → 保存 → "downloaded_db"
-      ⑥ どれも当たらず → "not_found"
+      ② 既にローカルに存在(size>0・manifest のサイズと一致) → "cached"
+      ③ URL 経路: Asset → get_image_url → requests.get 200 → 保存 → "downloaded_url"
+      ④ binary 経路: AssetFile.file_data → 保存 → "downloaded_db"
+      ⑤ どれも当たらず → "not_found"
+    保存は一時ファイル → rename(途中で落ちても壊れたフォントが残らない)。
     例外は旧同様 print で握りつぶし(粒度踏襲)。own_db は try/finally で確実に close。
     """
     if not filename:
         return "not_found"
 
-    abs_font_dir = os.path.abspath(FONT_DIR)
-    os.makedirs(abs_font_dir, exist_ok=True)
-    file_path = os.path.join(abs_font_dir, filename)
+    db = SessionLocal()
+    try:
+        status, _ = provision_font_file(db, filename)
+        return status
+    finally:
+        db.close()
 
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-        return "cached"
 
+def _provision_one(filename: str, verify: bool) -> str:
+    # Session はスレッド間で共有できないので 1 件ごとに own_db を開く
     db = SessionLocal()
     try:
-        # URL 経路(Asset)
+        status, path = provision_font_file(db, filename, verify=verify)
+        if path:
+            ensure_table(path)
+        return status
+    except Exception as e:
+        logger.warning(f"font provisioning failed: {filename}: {e}", exc_info=True)
+        return "not_found"
+    finally:
+        db.close()
+
+
+def provision_fonts(filenames: Optional[Iterable[str]] = None, verify: bool = True) -> Dict[str, str]:
+    """フォントをまとめて並列に FONT_DIR へ確保し、{filename: 状態} を返す。
+
+    filenames 省略時はカタログ全体(削除されていないフォント Asset + 標準フォント)。
+    verify=True ならローカルの既存ファイルも SHA-256 まで照合し、壊れていれば取り直す。
+    同じフォントを描画側が同時に要求しても、ファイル名ごとのロックで取得は 1 回になる。
+    """
+    if filenames is None:
+        db = SessionLocal()
         try:
-            asset = font_repo.get_font_asset(db, filename)
-            if asset:
-                url = get_image_url(asset.image_filename)
-                if url:
-                    response = requests.get(url, timeout=10)
-                    if response.status_code == 200:
-                        with open(file_path, "wb") as f:
-                            f.write(response.content)
-                        return "downloaded_url"
-        except Exception as e:
-            print(f"URL Download Error: {e}")
+            names = font_repo.list_font_filenames(db)
+            sys_conf = font_repo.get_system_font_config(db)
+            if sys_conf and sys_conf.filename:
+                names.append(sys_conf.filename)
+        finally:
+            db.close()
+    else:
+        names = list(filenames)
+    names = list(dict.fromkeys(n for n in names if n))
+    if not names:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(_PROVISION_WORKERS, len(names))) as executor:
+        statuses = list(executor.map(lambda n: _provision_one(n, verify), names))
+    return dict(zip(names, statuses))
+
+
+def project_font_filenames(project_id: int) -> List[str]:
+    """プロジェクトの設定(flyer_json の *_font / fallback_font、settings_json の
+    grid_font / tt_font)が参照するフォント名と標準フォントを返す。未検出は []。"""
+    db = SessionLocal()
+    try:
+        proj = project_repo.get_project(db, project_id)
+        if proj is None:
+            return []
+        raws = (proj.flyer_json, proj.settings_json)
+        sys_conf = font_repo.get_system_font_config(db)
+    finally:
+        db.close()
 
-        # binary 経路(AssetFile)
+    names = [sys_conf.filename if sys_conf else "keifont.ttf"]
+    for raw in raws:
         try:
-            asset_file = font_repo.get_font_asset_file(db, filename)
-            if asset_file and asset_file.file_data:
-                with open(file_path, "wb") as f:
-                    f.write(asset_file.file_data)
-                return "downloaded_db"
+            data = json.loads(raw) if raw else {}
+        except (TypeError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            continue
+        names.extend(v for k, v in data.items() if k.endswith("_font") and isinstance(v, str) and v)
+    return list(dict.fromkeys(names))
+
+
+def provision_project_fonts(project_id: int) -> Dict[str, str]:
+    """そのプロジェクトの描画に要るフォントを並列に確保する(描画前の一括プリフェッチ用)。"""
+    return provision_fonts(project_font_filenames(project_id), verify=False)
+
+
+def start_background_provisioning() -> bool:
+    """カタログ全体の確保をデーモンスレッドで開始する(プロセスで 1 回だけ。開始したら True)。
+
+    FONT_DIR はコンテナ再起動で空になるため、起動直後に全フォントを並列で取り直しておく。
+    起動は待たせない。確保中のフォントを描画が要求した場合はファイル名ごとのロックで待ち合わせる。
+    """
+    global _background_started
+    with _background_guard:
+        if _background_started:
+            return False
+        _background_started = True
+
+    def _run():
+        try:
+            statuses = provision_fonts()
+            missing = [n for n, s in statuses.items() if s == "not_found"]
+            logger.info(f"font provisioning done: {len(statuses)} fonts, {len(missing)} missing")
         except Exception as e:
-            print(f"Binary Write Error: {e}")
+            logger.warning(f"font provisioning failed: {e}", exc_info=True)
 
-        return "not_found"
-    finally:
-        db.close()
+    threading.Thread(target=_run, name="font-provisioning", daemon=True).start()
+    return True
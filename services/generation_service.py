@@ -1,13 +1,14 @@
 """生成トリガー用サービス(§11.7 段階A1・§36 バケツ①)。
 
-Web API(bot/api.py)から「告知テキスト」「grid 画像」を生成するための、
-DB から引数を組む streamlit フリーの gather 層。
+Web API(bot/api.py)から「告知テキスト」「grid 画像」「フライヤーのレイアウト / 画像」を
+生成するための、DB から引数を組む streamlit フリーの gather 層。
 
 不変条件(絶対):
 - このモジュールは streamlit を一切 import しない(直下も、辿る先も)。
   views/ や session_manager / project_service(いずれも streamlit を引く)は import しない。
 - 既存ロジック関数(utils.text_generator.build_event_summary_text /
-  logic_grid.generate_grid_image)は「呼ぶだけ」で中身は変更しない。
+  logic_grid.generate_grid_image / logic_timetable.generate_timetable_image)は
+  「呼ぶだけ」で中身は変更しない。
 - read + generate のみ。DB / Storage への書き込みは行わない。
 
 gather は既存 view(views/flyer.py:490-516 / views/grid.py の設定マッピング)の
@@ -15,18 +16,28 @@ gather は既存 view(views/flyer.py:490-516 / views/grid.py の設定マッピ
 """
 from __future__ import annotations
 
+import hashlib
 import io
 import json
 import os
 import threading
-from typing import List, Optional
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 from constants import FONT_DIR
-from database import SessionLocal
+from database import SessionLocal, async_session, get_image_url, unit_of_work
 from logic_grid import generate_grid_image
-from repositories import project_repo
-from services import artist_service, timetable_service
-from utils.flyer_helpers import format_time_str
+from logic_timetable import generate_timetable_image
+from models.flyer_keys import FLYER_KEY_REGISTRY
+from models.timetable import draft_rows_to_df
+from models.timetable_flow import TimetableFlow, calculate_flow
+from repositories import project_repo, timetable_repo
+from services import artist_service, asset_service, font_service, timetable_service
+from utils.flyer_generator import (
+    CANVAS_H, CANVAS_W, EXPORT_SCALE, MOVABLE_ELEMENTS, layout_flyer, load_image, render_flyer,
+)
+from utils.flyer_helpers import format_event_date, format_time_str
+from utils.pdf_export import write_event_pack_pdf, write_timetables_pdf
 from utils.text_generator import build_event_summary_text
 
 # 物販専用行(出演者一覧から除外する。views/flyer.py:506 と同一)
@@ -36,11 +47,20 @@ _SPECIAL_ROW_NAMES = ("開演前物販", "終演後物販")
 _ALIGN_MAP = {"左揃え": "left", "中央揃え": "center", "右揃え": "right"}
 _BRICK_LABEL = "レンガ (サイズ統一)"
 
+# フライヤーの版(grid 版 / タイムテーブル版)。flyer_json の {variant}_scale_w 等を使い分ける
+FLYER_VARIANTS = ("grid", "tt")
+
 # OOM 対策: grid 画像生成を API 経路で直列化する(同時に1件だけ生成)。
 # 複数 /grid-image 同時アクセスで full-res 生成のピークが積み上がるのを防ぐ。
 # ※ logic_grid 自体はロックしない(アプリ側の単独利用は直列化しない)。
 _render_lock = threading.Lock()
 
+# フライヤー画像(/flyer-image)のプロセス内キャッシュ: 入力ハッシュ → PNG bytes(LRU)。
+# ハッシュはそのまま ETag にも使う。1 枚 1-3MB 程度なので件数で上限を切る。
+_FLYER_CACHE_MAX = 16
+_flyer_png_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_flyer_cache_lock = threading.Lock()
+
 
 def _loads_list(raw) -> list:
     """JSON 文字列を list として読む。None / 壊れ / 非 list は []。"""
@@ -64,6 +84,7 @@ def _loads_dict(raw) -> dict:
     return v if isinstance(v, dict) else {}
 
 
+@unit_of_work()
 def build_summary_text_for_project(project_id: int) -> Optional[str]:
     """project_id の告知テキストを DB から組んで返す。未検出は None。
 
@@ -83,12 +104,24 @@ def build_summary_text_for_project(project_id: int) -> Optional[str]:
         db.close()
     if view is None:
         return None
+    return _summary_text(view, timetable_service.get_rows_for_project(project_id))
 
+
+async def build_summary_text_for_project_async(project_id: int) -> Optional[str]:
+    """build_summary_text_for_project の非同期版(Bot の async /api 用。1 セッションで読む)。"""
+    async with async_session() as db:
+        view = await project_repo.get_project_view_async(db, project_id)
+        if view is None:
+            return None
+        rows = await timetable_repo.load_rows_async(db, project_id)
+    return _summary_text(view, rows)
+
+
+def _summary_text(view, rows) -> str:
     tickets = _loads_list(view.tickets_json)
     ticket_notes = _loads_list(view.ticket_notes_json)
     free_texts = _loads_list(view.free_text_json)
 
-    rows = timetable_service.get_rows_for_project(project_id)
     hidden_map = {r.artist_name: r.is_hidden for r in rows if r.artist_name}
 
     raw_order: List[str] = []
@@ -123,12 +156,66 @@ def build_summary_text_for_project(project_id: int) -> Optional[str]:
     )
 
 
+def _load_grid_params(project_id: int) -> Optional[dict]:
+    """grid 画像の生成引数を DB から組む。未検出 project は None。
+
+    戻り値: {"artists", "font_path", "row_counts", "is_brick", "alignment"}
+    (artists は ArtistView のリスト。出演者ゼロなら空)。
+    """
+    db = SessionLocal()
+    try:
+        proj = project_repo.get_project(db, project_id)  # ORM(settings_json も要るため)
+        if proj is None:
+            return None
+        grid_order_raw = proj.grid_order_json
+        settings_raw = proj.settings_json
+    finally:
+        db.close()
+
+    grid = _loads_dict(grid_order_raw)
+    settings = _loads_dict(settings_raw)
+
+    order = grid.get("order") or []
+    row_counts_str = grid.get("row_counts_str") or ""
+    layout_mode = grid.get("layout_mode")
+    alignment_label = grid.get("alignment")
+
+    alignment = _ALIGN_MAP.get(alignment_label, "center")
+    is_brick = layout_mode == _BRICK_LABEL
+    try:
+        row_counts = [int(x.strip()) for x in row_counts_str.split(",") if x.strip()]
+    except Exception:
+        row_counts = []
+    row_counts = row_counts or None  # 空は None → generate_grid_image が既定 [5]*10 を使う
+
+    grid_font = settings.get("grid_font") or "keifont.ttf"
+    return {
+        "artists": artist_service.get_artists_by_names(order),
+        "font_path": os.path.join(FONT_DIR, grid_font),
+        "row_counts": row_counts,
+        "is_brick": is_brick,
+        "alignment": alignment,
+    }
+
+
+def _generate_grid(params: dict):
+    return generate_grid_image(
+        params["artists"],
+        "",  # image_dir_unused(logic_grid 側で未使用)
+        font_path=params["font_path"],
+        row_counts=params["row_counts"],
+        is_brick_mode=params["is_brick"],
+        alignment=params["alignment"],
+    )
+
+
+@unit_of_work()
 def render_grid_png_for_project(project_id: int) -> Optional[bytes]:
     """project_id の grid 画像を DB 設定から生成し PNG bytes で返す。
 
     未検出 project / 出演者ゼロ(generate_grid_image が None)は None。
 
-    gather(views/grid.py の設定マッピングを streamlit フリーに移植):
+    gather(views/grid.py の設定マッピングを streamlit フリーに移植・_load_grid_params):
       - grid_order_json: order(出演者名)/ row_counts_str / layout_mode / alignment
       - settings_json: grid_font(無ければ keifont.ttf)
       - alignment ラベル → left/center/right、layout_mode == "レンガ (サイズ統一)" → is_brick
@@ -139,50 +226,290 @@ def render_grid_png_for_project(project_id: int) -> Optional[bytes]:
     OOM 対策: モジュールレベルの _render_lock で全体を囲み、同時に1件だけ生成する。
     """
     with _render_lock:
-        db = SessionLocal()
-        try:
-            proj = project_repo.get_project(db, project_id)  # ORM(settings_json も要るため)
-            if proj is None:
-                return None
-            grid_order_raw = proj.grid_order_json
-            settings_raw = proj.settings_json
-        finally:
-            db.close()
-
-        grid = _loads_dict(grid_order_raw)
-        settings = _loads_dict(settings_raw)
-
-        order = grid.get("order") or []
-        row_counts_str = grid.get("row_counts_str") or ""
-        layout_mode = grid.get("layout_mode")
-        alignment_label = grid.get("alignment")
-
-        alignment = _ALIGN_MAP.get(alignment_label, "center")
-        is_brick = layout_mode == _BRICK_LABEL
-        try:
-            row_counts = [int(x.strip()) for x in row_counts_str.split(",") if x.strip()]
-        except Exception:
-            row_counts = []
-        row_counts = row_counts or None  # 空は None → generate_grid_image が既定 [5]*10 を使う
-
-        grid_font = settings.get("grid_font") or "keifont.ttf"
-        font_path = os.path.join(FONT_DIR, grid_font)
-
-        artists = artist_service.get_artists_by_names(order)
-        if not artists:
+        params = _load_grid_params(project_id)
+        if params is None or not params["artists"]:
             return None
 
-        img = generate_grid_image(
-            artists,
-            "",  # image_dir_unused(logic_grid 側で未使用)
-            font_path=font_path,
-            row_counts=row_counts,
-            is_brick_mode=is_brick,
-            alignment=alignment,
-        )
+        img = _generate_grid(params)
         if img is None:
             return None
 
         buf = io.BytesIO()
         img.save(buf, format="PNG")
         return buf.getvalue()
+
+
+def _load_tt_params(view) -> dict:
+    """タイムテーブル画像の生成引数を DB から組む(views/timetable.py の gen_list 導出を移植)。
+
+    戻り値: {"gen_list", "font_path", "columns"}。gen_list は
+    [TIME_DISPLAY, ARTIST, GOODS_DISPLAY, PLACE] の list で、OPEN / START 行と
+    is_hidden 行を除く(出演者ゼロなら空)。
+    """
+    db = SessionLocal()
+    try:
+        proj = project_repo.get_project(db, view.id)
+        settings = _loads_dict(proj.settings_json) if proj is not None else {}
+    finally:
+        db.close()
+
+    rows = timetable_service.get_rows_for_project(view.id)
+    flow = TimetableFlow()
+    flow.update(draft_rows_to_df(rows), format_time_str(view.open_time), format_time_str(view.start_time))
+    gen_list = flow.gen_list([bool(r.is_hidden) for r in rows])
+
+    tt_font = settings.get("tt_font", "keifont.ttf")
+    return {
+        "gen_list": gen_list,
+        "font_path": font_service.ensure_font_path(tt_font) or os.path.join(os.path.abspath(FONT_DIR), tt_font),
+        "columns": settings.get("tt_columns", 2),
+    }
+
+
+def _flyer_styles_from_settings(settings: dict, variant: str) -> dict:
+    """flyer_json(dict)から create/layout_flyer に渡す styles を組む。
+
+    views/flyer.py の init_s(レジストリ default で穴埋め・None は未設定扱い)と
+    _generate_preview(フォント名 → FS パス、content_scale_* を版ごとに差し替え)の
+    導出を streamlit フリーに移植したもの。
+    """
+    styles = {e.short_key: e.default for e in FLYER_KEY_REGISTRY}
+    styles.update({k: v for k, v in settings.items() if v is not None})
+
+    # 未取得のフォントを先に並列で確保しておく(以降の ensure_font_path はローカル確認だけで済む)
+    font_service.provision_fonts(
+        [styles.get(f"{t}_font") for t in MOVABLE_ELEMENTS] + [settings.get("fallback_font")], verify=False
+    )
+    for t in MOVABLE_ELEMENTS:
+        f_name = styles.get(f"{t}_font")
+        if f_name:
+            valid_path = font_service.ensure_font_path(f_name)
+            if valid_path:
+                styles[f"{t}_font"] = valid_path
+
+    styles["content_scale_w"] = styles.get(f"{variant}_scale_w")
+    styles["content_scale_h"] = styles.get(f"{variant}_scale_h")
+    styles["content_pos_y"] = styles.get(f"{variant}_pos_y")
+    return styles
+
+
+def _asset_url(asset_id) -> Optional[str]:
+    if not asset_id:
+        return None
+    asset = asset_service.get_asset_view(asset_id)
+    return get_image_url(asset.image_filename) if asset else None
+
+
+def gather_flyer_inputs(view, variant: str) -> dict:
+    """ProjectView から create_flyer_image_shadow / layout_flyer 用の引数一式を組む。
+
+    戻り値は styles / テキスト類 / チケット類 / fallback フォントに加え、
+    bg_source / logo_source(URL)を含む dict。main_source(grid/TT 画像)は含まない。
+    """
+    settings = _loads_dict(view.flyer_json)
+    styles = _flyer_styles_from_settings(settings, variant)
+
+    fallback = settings.get("fallback_font") or font_service.get_default_font_name()
+    fallback = font_service.ensure_font_path(fallback) or fallback
+
+    return {
+        "bg_source": _asset_url(styles.get("bg_id")),
+        "logo_source": _asset_url(styles.get("logo_id")),
+        "styles": styles,
+        "date_text": format_event_date(view.event_date, styles.get("date_format")),
+        "venue_text": view.venue_name or "",
+        "subtitle_text": view.subtitle or "",
+        "open_time": format_time_str(view.open_time),
+        "start_time": format_time_str(view.start_time),
+        "ticket_info_list": [t for t in _loads_list(view.tickets_json) if isinstance(t, dict)],
+        "common_notes_list": _loads_list(view.ticket_notes_json),
+        "system_fallback_filename": fallback,
+    }
+
+
+@unit_of_work()
+def build_flyer_layout_for_project(project_id: int, variant: str = "grid") -> Optional[dict]:
+    """project_id のフライヤー各要素の配置を、描画せずに計測だけで返す。未検出は None。
+
+    layout_flyer(1段目・計測のみ)を呼ぶだけで、テキストのラスタライズや合成はしない。
+    ロゴは寸法を知るために画像だけ取得する。メイン画像(grid/TT)は生成しないと寸法が
+    決まらないため、elements に "main" は含まれない。
+
+    戻り値: {"variant", "canvas": {"width", "height"}, "elements": layout_meta}
+      elements[key] = {"base_x", "base_y", "bbox": [x0, y0, x1, y1] or None, ...}
+    """
+    db = SessionLocal()
+    try:
+        view = project_repo.get_project_view(db, project_id)
+    finally:
+        db.close()
+    if view is None:
+        return None
+
+    inputs = gather_flyer_inputs(view, variant)
+    logo_img = load_image(inputs["logo_source"])
+
+    layout = layout_flyer(
+        inputs["styles"], inputs["date_text"], inputs["venue_text"], inputs["subtitle_text"],
+        inputs["open_time"], inputs["start_time"],
+        inputs["ticket_info_list"], inputs["common_notes_list"],
+        inputs["system_fallback_filename"],
+        logo_size=logo_img.size if logo_img else None,
+    )
+    return {
+        "variant": variant,
+        "canvas": {"width": CANVAS_W, "height": CANVAS_H},
+        "elements": layout.layout_meta,
+    }
+
+
+def _file_fingerprint(path) -> Optional[list]:
+    """フォントファイル等の版(サイズ・更新時刻)。存在しなければ None。"""
+    try:
+        stat = os.stat(path)
+    except (TypeError, OSError):
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _artist_versions(artists) -> list:
+    # 画像差し替えは image_filename が変わる。トリミング調整は crop_* に出る
+    return [[a.name, a.image_filename, a.crop_scale, a.crop_x, a.crop_y] for a in artists]
+
+
+def _flyer_cache_key(variant: str, inputs: dict, main_params: dict, main_material: dict) -> str:
+    """フライヤー画像の全入力(設定・素材・フォント・出演者画像の版)から SHA-256 を作る。"""
+    font_paths = {inputs["system_fallback_filename"], main_params["font_path"]}
+    font_paths.update(inputs["styles"].get(f"{t}_font") for t in MOVABLE_ELEMENTS)
+    material = {
+        "variant": variant,
+        "scale": EXPORT_SCALE,
+        "inputs": inputs,
+        "fonts": {str(p): _file_fingerprint(p) for p in font_paths if p},
+        "main": main_material,
+    }
+    raw = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@unit_of_work()
+def render_flyer_png_for_project(project_id: int, variant: str = "grid") -> Optional[Tuple[bytes, str]]:
+    """project_id の完成フライヤー(grid 版 / TT 版)を描画し、(PNG bytes, 入力ハッシュ) を返す。
+
+    views/flyer.py の _generate_preview と同じ入力(flyer_json / tickets_json /
+    ticket_notes_json と、grid 画像または TT 画像をメイン画像として)を DB から組み、
+    session 無しで utils.flyer_generator.render_flyer を呼ぶ(書き出し解像度 = EXPORT_SCALE)。
+    未検出 project / メイン画像が作れない(出演者ゼロ)場合は None。
+
+    入力ハッシュ(設定・素材 URL・フォントファイルの版・出演者画像の版・TT 行)が
+    同じならプロセス内 LRU(_flyer_png_cache)から返し、描画しない。ハッシュは ETag 用。
+    """
+    db = SessionLocal()
+    try:
+        view = project_repo.get_project_view(db, project_id)
+    finally:
+        db.close()
+    if view is None:
+        return None
+
+    inputs = gather_flyer_inputs(view, variant)
+    if variant == "tt":
+        params = _load_tt_params(view)
+        if not params["gen_list"]:
+            return None
+        names = [row[1] for row in params["gen_list"]]
+        main_material = {
+            "gen_list": params["gen_list"], "columns": params["columns"],
+            "artists": _artist_versions(artist_service.get_artists_by_names(names)),
+        }
+    else:
+        params = _load_grid_params(project_id)
+        if params is None or not params["artists"]:
+            return None
+        main_material = {
+            "artists": _artist_versions(params["artists"]),
+            "row_counts": params["row_counts"], "is_brick": params["is_brick"], "alignment": params["alignment"],
+        }
+
+    key = _flyer_cache_key(variant, inputs, params, main_material)
+    with _flyer_cache_lock:
+        png = _flyer_png_cache.get(key)
+        if png is not None:
+            _flyer_png_cache.move_to_end(key)
+            return png, key
+
+    # OOM 対策: grid 画像と同じロックで直列化(メイン画像 + フライヤーの生成ピークを重ねない)
+    with _render_lock:
+        if variant == "tt":
+            main_img = generate_timetable_image(
+                params["gen_list"], font_path=params["font_path"], columns=params["columns"])
+        else:
+            main_img = _generate_grid(params)
+        if main_img is None:
+            return None
+        render = render_flyer(main_source=main_img, scale=EXPORT_SCALE, **inputs)
+        buf = io.BytesIO()
+        render.canvas.save(buf, format="PNG")
+        png = buf.getvalue()
+
+    with _flyer_cache_lock:
+        _flyer_png_cache[key] = png
+        _flyer_png_cache.move_to_end(key)
+        while len(_flyer_png_cache) > _FLYER_CACHE_MAX:
+            _flyer_png_cache.popitem(last=False)
+    return png, key
+
+
+def export_timetables_pdf(date_from: Optional[str], date_to: Optional[str], out) -> int:
+    """event_date が [date_from, date_to] のプロジェクトのタイムテーブルを 1 つの PDF にして
+    out(パス or file-like)へ書く。出力した件数を返す(行データの無いプロジェクトは飛ばす)。
+
+    プロジェクト一覧は PDF に要る列だけを読み、行データは PDF が前の 1 件を組み終えてから
+    1 件ずつ読んで計算する(全件の行・表を同時に持たない)。出力 PDF 自体は reportlab が
+    書き終えるまでメモリに持つので、件数に比例したメモリは使う。
+    """
+    db = SessionLocal()
+    try:
+        def sections():
+            for proj in project_repo.list_projects_between(db, date_from, date_to):
+                rows = timetable_repo.load_rows(db, proj.id)
+                if not rows:
+                    continue
+                df = calculate_flow(draft_rows_to_df(rows), format_time_str(proj.open_time),
+                                    format_time_str(proj.start_time))
+                yield df, proj.title, proj.event_date, proj.venue_name
+
+        return write_timetables_pdf(sections(), out)
+    finally:
+        db.close()
+
+
+@unit_of_work()
+def build_event_pack_pdf(project_id: int, out) -> bool:
+    """イベント資料 PDF(概要 + 業務用タイムテーブル + grid 画像 + TT 画像)を out へ書く。
+
+    画像は DB 設定から描画し、PDF には表示サイズまで縮小した JPEG で 1 回ずつ埋め込む。
+    未検出 project は False(何も書かない)。出演者ゼロの画像は載せない。
+    """
+    db = SessionLocal()
+    try:
+        view = project_repo.get_project_view(db, project_id)
+    finally:
+        db.close()
+    if view is None:
+        return False
+
+    rows = timetable_service.get_rows_for_project(project_id)
+    df = calculate_flow(draft_rows_to_df(rows), format_time_str(view.open_time),
+                        format_time_str(view.start_time)) if rows else None
+
+    grid_params = _load_grid_params(project_id)
+    tt_params = _load_tt_params(view)
+    with _render_lock:
+        grid_img = _generate_grid(grid_params) if grid_params and grid_params["artists"] else None
+        tt_img = generate_timetable_image(
+            tt_params["gen_list"], font_path=tt_params["font_path"], columns=tt_params["columns"],
+        ) if tt_params["gen_list"] else None
+
+    write_event_pack_pdf(out, view, df, [("■ 出演者一覧", grid_img), ("■ タイムテーブル", tt_img)])
+    return True
@@ -5,7 +5,9 @@ view 層からはこの service を呼び、直接 repository / DB は触らな
 """
 from __future__ import annotations
 
+import base64
 import datetime
+import json
 from typing import List, Optional, Tuple
 
 # streamlit は Streamlit アプリ / ローカル venv にのみ存在する。Bot 実環境(Railway・
@@ -16,8 +18,8 @@ try:
 except Exception:
     st = None
 
-from database import SessionLocal, TimetableProject
-from models import ProjectDraft, ProjectView
+from database import SessionLocal, TimetableProject, async_session
+from models import ProjectDraft, ProjectView, TimetableRowDraft
 from repositories import project_repo, timetable_repo
 from utils.logger import get_logger
 
@@ -220,7 +222,7 @@ def list_projects_for_selector() -> List[Tuple[int, str]]:
     """
     db = SessionLocal()
     try:
-        projects = project_repo.list_projects(db)
+        projects = project_repo.query_project_list(db, summary_only=True)
         result = [(p.id, f"{p.event_date or '----'} {p.title}") for p in projects]
         return result
     finally:
@@ -231,13 +233,91 @@ def list_project_summaries() -> List[ProjectView]:
     """プロジェクト一覧を ProjectView(読み取り専用 DTO)のリストで返す。
 
     @st.cache_data 付きの list_projects_for_selector とは別に、Bot / Web API から
-    キャッシュ非依存で呼ぶための素の読み窓口(§11.7 段階A0)。ORM を返さず既存の
-    to_flyer_view で ProjectView に写して返す(read-only・commit しない)。
-    並び順は project_repo.list_projects(日付降順)をそのまま踏襲する。
+    キャッシュ非依存で呼ぶための素の読み窓口(§11.7 段階A0)。ORM を返さない(read-only・commit しない)。
+    並び順は project_repo.list_projects(日付降順)と同じ。一覧用に要約列だけを読むので
+    JSON 列(tickets_json 等)は None(詳細は get_project_flyer_view)。
     """
+    return list_project_summary_page()[0]
+
+
+def encode_list_cursor(keyset: Tuple[str, int]) -> str:
+    """keyset(event_date, id)→ URL に載せられる不透明なカーソル文字列。"""
+    raw = json.dumps(list(keyset), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_list_cursor(cursor: str) -> Tuple[str, int]:
+    """encode_list_cursor の逆。壊れたカーソルは ValueError。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, last_id = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+    if not isinstance(key, str) or not isinstance(last_id, int):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return key, last_id
+
+
+def list_project_summary_page(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Tuple[List[ProjectView], Optional[str]]:
+    """一覧の 1 ページ分(要約列のみの ProjectView)と次ページのカーソル(最後なら None)。
+
+    並べ替え・絞り込み・ページングは SQL(keyset)で行う。limit=None は全件。
+    cursor が壊れていれば ValueError。
+    """
+    query = _summary_page_query(limit, cursor, date_from, date_to)
+    db = SessionLocal()
+    try:
+        return _summary_page(project_repo.query_project_list(db, **query), limit)
+    finally:
+        db.close()
+
+
+async def list_project_summary_page_async(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Tuple[List[ProjectView], Optional[str]]:
+    """list_project_summary_page の非同期版(Bot の async /api 用。非同期エンジンで読む)。"""
+    query = _summary_page_query(limit, cursor, date_from, date_to)
+    async with async_session() as db:
+        projects = await project_repo.query_project_list_async(db, **query)
+    return _summary_page(projects, limit)
+
+
+async def list_project_summaries_async() -> List[ProjectView]:
+    """list_project_summaries の非同期版。"""
+    return (await list_project_summary_page_async())[0]
+
+
+def _summary_page_query(limit, cursor, date_from, date_to) -> dict:
+    # 1 件多く読んで次ページの有無を判定する
+    return dict(
+        summary_only=True, date_from=date_from, date_to=date_to,
+        after=decode_list_cursor(cursor) if cursor else None,
+        limit=None if limit is None else limit + 1,
+    )
+
+
+def _summary_page(projects, limit) -> Tuple[List[ProjectView], Optional[str]]:
+    has_more = limit is not None and len(projects) > limit
+    projects = projects[:limit] if has_more else projects
+    views = [project_repo.to_summary_view(p) for p in projects]
+    next_cursor = encode_list_cursor(project_repo.list_keyset(projects[-1])) if has_more else None
+    return views, next_cursor
+
+
+def list_projects_featuring(artist_name: str) -> List[ProjectView]:
+    """グリッド並び順に artist_name(完全一致)を含むプロジェクト(要約列のみ・一覧の並び)。"""
     db = SessionLocal()
     try:
-        return [project_repo.to_flyer_view(p) for p in project_repo.list_projects(db)]
+        projects = project_repo.query_project_list(db, summary_only=True, featuring=artist_name)
+        return [project_repo.to_summary_view(p) for p in projects]
     finally:
         db.close()
 
@@ -255,3 +335,35 @@ def get_project_flyer_view(project_id: int) -> Optional[ProjectView]:
         return project_repo.get_project_view(db, project_id)
     finally:
         db.close()
+
+
+async def get_project_flyer_view_async(project_id: int) -> Optional[ProjectView]:
+    """get_project_flyer_view の非同期版(Bot の async /api 用)。"""
+    async with async_session() as db:
+        return await project_repo.get_project_view_async(db, project_id)
+
+
+async def get_project_with_rows_async(
+    project_id: int,
+) -> Tuple[Optional[ProjectView], List[TimetableRowDraft]]:
+    """プロジェクトとその行を 1 セッションで読む(Bot の /rows 用)。未検出は (None, [])。"""
+    async with async_session() as db:
+        view = await project_repo.get_project_view_async(db, project_id)
+        if view is None:
+            return None, []
+        return view, await timetable_repo.load_rows_async(db, project_id)
+
+
+def backfill_grid_order_entries() -> int:
+    """grid_order_entries を既存の grid_order_json から埋める(起動時に 1 回)。埋めた件数を返す。"""
+    db = SessionLocal()
+    try:
+        filled = project_repo.backfill_grid_order_entries(db)
+        db.commit()
+        return filled
+    except Exception as e:
+        db.rollback()
+        logger.error(f"backfill_grid_order_entries failed: {e}", exc_info=True)
+        return 0
+    finally:
+        db.close()
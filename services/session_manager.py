@@ -57,6 +57,8 @@ SESSION_PROJECT_KEYS = [
     "flyer_result_grid",
     "flyer_result_tt",
     "flyer_layout_meta",
+    "flyer_render_grid",
+    "flyer_render_tt",
     "tt_editor_key",
     "tt_title",
     "tt_event_date",
@@ -72,6 +74,8 @@ SESSION_PROJECT_KEYS = [
     "tt_columns",
     "tt_font",
     "tt_gen_list",
+    "tt_flow",
+    "tt_stages",
     "tt_last_generated_params",
     "tt_last_check_times_",
     "grid_order",
@@ -150,6 +154,9 @@ _FLYER_TRANSIENT_KEYS = {
     "flyer_result_grid",
     "flyer_result_tt",
     "flyer_layout_meta",
+    # クリック移動の差分再合成用キャッシュ (utils.flyer_generator.FlyerRender)
+    "flyer_render_grid",
+    "flyer_render_tt",
     # UI のクリック追跡用、永続化しない
     "flyer_click_target",
 }
@@ -159,6 +166,7 @@ _FLYER_TRANSIENT_KEYS = {
 # 二重管理を解消し SSOT を registry に統一するため、ここではレジストリから動的に
 # 取得する (Phase 2B-2a で手書きだった 3 行を削除)。
 # 変更前後で _FLYER_EXCLUDED_KEYS の集合は同一 (7 キー: transient 4 + UI 3)。
+# (その後 FlyerRender キャッシュ 2 キーを transient に追加し 9 キー)
 _FLYER_EXCLUDED_KEYS = _FLYER_TRANSIENT_KEYS | non_persisted_session_keys()
 
 # session_state のキーから draft.grid_settings のキーへの写像
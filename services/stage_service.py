@@ -0,0 +1,105 @@
+"""
+複数ステージ(同じイベントのプロジェクト群)のビジネスロジック。
+
+view / Bot API からはこの service を呼び、直接 repository / DB は触らない。
+session の生成/クローズ・commit は service が所有する(timetable_service と同じ流儀)。
+重複検出そのものは models.stage_schedule(純ロジック)に任せる。
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+from database import SessionLocal
+from models.stage_schedule import Conflict, StageTimetable, find_conflicts
+from models.timetable import TimetableRowDraft
+from repositories import project_repo, stage_repo, timetable_repo
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _stage_label(proj, name: Optional[str]) -> str:
+    return name or proj.title or f"#{proj.id}"
+
+
+def get_stage_members(project_id: int) -> List[Tuple[int, str]]:
+    """project_id のグループの [(project_id, stage_name), ...]。単独なら自分だけ。"""
+    db = SessionLocal()
+    try:
+        group = stage_repo.get_stage_group(db, project_id)
+        if not group:
+            proj = project_repo.get_project(db, project_id)
+            return [(project_id, _stage_label(proj, None))] if proj else []
+        result = []
+        for m in group:
+            proj = project_repo.get_project(db, m.project_id)
+            if proj:
+                result.append((m.project_id, _stage_label(proj, m.stage_name)))
+        return result
+    finally:
+        db.close()
+
+
+def save_stage_group(members: Sequence[Tuple[int, Optional[str]]]) -> bool:
+    """[(project_id, stage_name), ...] を 1 イベントのステージとして保存する(1 件なら解散)。"""
+    db = SessionLocal()
+    try:
+        stage_repo.set_stage_group(db, list(members))
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"save_stage_group failed: {e}", exc_info=True)
+        return False
+    finally:
+        db.close()
+
+
+def load_stage_timetables(project_id: int) -> List[StageTimetable]:
+    """グループ全ステージの (開始時刻, 行) を DB から読む。プロジェクトが無ければ空リスト。"""
+    db = SessionLocal()
+    try:
+        group = stage_repo.get_stage_group(db, project_id)
+        members = [(m.project_id, m.stage_name) for m in group] or [(project_id, None)]
+        stages = []
+        for pid, name in members:
+            proj = project_repo.get_project(db, pid)
+            if proj is None:
+                continue
+            stages.append(StageTimetable(
+                name=_stage_label(proj, name),
+                start_time=project_repo.format_time_str(proj.start_time, "10:30"),   # to_draft と同じ既定
+                rows=timetable_repo.load_rows(db, pid),
+                project_id=pid,
+            ))
+        return stages
+    finally:
+        db.close()
+
+
+def find_conflicts_for_project(
+    project_id: int,
+    rows: Optional[List[TimetableRowDraft]] = None,
+    start_time: Optional[str] = None,
+    stages: Optional[List[StageTimetable]] = None,
+) -> Tuple[List[StageTimetable], List[Conflict]]:
+    """project_id のグループのコンフリクト。
+
+    rows / start_time を渡すと、そのプロジェクト分は DB ではなく編集中の値で判定する
+    (エディタのライブ表示用)。stages を渡すと他ステージの DB 読み込みを省く。
+    """
+    if stages is None:
+        stages = load_stage_timetables(project_id)
+    if rows is not None or start_time is not None:
+        stages = [
+            StageTimetable(
+                name=s.name,
+                start_time=s.start_time if start_time is None else start_time,
+                rows=s.rows if rows is None else rows,
+                project_id=s.project_id,
+            ) if s.project_id == project_id else s
+            for s in stages
+        ]
+        if rows is not None and all(s.project_id != project_id for s in stages):
+            stages.append(StageTimetable(f"#{project_id}", start_time or "", rows, project_id))
+    return stages, find_conflicts(stages)
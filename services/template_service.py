@@ -9,8 +9,8 @@ session の生成/クローズと commit/rollback は service が所有する
 ★ 画面非依存: streamlit を import しない(将来 API / LINE Bot 化の前提 §11.3)。
   data_json は解釈せず raw 文字列を素通しする(キーの意味は view 側の責務=罠22 別テーブル)。
 
-キャッシュは入れない(罠17: 導入するなら create/update/rename/delete 全経路の
-invalidation とセット設計が必要。その判断は Phase 6)。
+一覧は services.catalog_cache(プロセス内キャッシュ)経由。create/update/rename/delete は
+commit 後に catalog_cache.invalidate(TEMPLATES) を呼ぶ(罠17)。
 
 提供:
 - list_templates()                       -> List[TemplateView]  (created_at 降順)
@@ -27,6 +27,7 @@ from typing import List
 from database import SessionLocal
 from models.template import TemplateView
 from repositories import template_repo
+from services import catalog_cache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -38,12 +39,15 @@ def _now() -> str:
 
 
 def list_templates() -> List[TemplateView]:
-    """全テンプレートを created_at 降順の TemplateView リストで返す。"""
-    db = SessionLocal()
-    try:
-        return template_repo.list_templates(db)
-    finally:
-        db.close()
+    """全テンプレートを created_at 降順の TemplateView リストで返す(キャッシュ経由)。"""
+    def load():
+        db = SessionLocal()
+        try:
+            return template_repo.list_templates(db)
+        finally:
+            db.close()
+
+    return list(catalog_cache.get_or_load(catalog_cache.TEMPLATES, "list", load))
 
 
 def create_template(name: str, data_json: str) -> bool:
@@ -54,6 +58,7 @@ def create_template(name: str, data_json: str) -> bool:
             return False
         template_repo.create(db, name, data_json, _now())
         db.commit()
+        catalog_cache.invalidate(catalog_cache.TEMPLATES)
         return True
     except Exception as e:
         db.rollback()
@@ -75,6 +80,7 @@ def update_template_data(name: str, data_json: str) -> bool:
             db.rollback()
             return False
         db.commit()
+        catalog_cache.invalidate(catalog_cache.TEMPLATES)
         return True
     except Exception as e:
         db.rollback()
@@ -93,6 +99,7 @@ def rename_template(template_id: int, new_name: str) -> bool:
             db.rollback()
             return False
         db.commit()
+        catalog_cache.invalidate(catalog_cache.TEMPLATES)
         return True
     except Exception as e:
         db.rollback()
@@ -111,6 +118,7 @@ def delete_template(template_id: int) -> bool:
             db.rollback()
             return False
         db.commit()
+        catalog_cache.invalidate(catalog_cache.TEMPLATES)
         return True
     except Exception as e:
         db.rollback()
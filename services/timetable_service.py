@@ -4,14 +4,23 @@
 view 層からはこの service を呼び、直接 repository / DB は触らない。
 session の生成/クローズは service が所有する(artist_service と同じ流儀)。
 load_rows は read only(repo は commit しない)。
+CSV 取り込み(import_csv)のアーティスト登録は artist_service に委ねる。
 """
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional, Tuple
 
-from database import SessionLocal
+import pandas as pd
+
+from database import SessionLocal, async_session
+from models.artist import ArtistImportReport
 from models.timetable import TimetableRowDraft
+from models.timetable_csv import CsvTimetable, parse_timetable_csv
 from repositories import timetable_repo
+from services import artist_service
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_rows_for_project(project_id: int) -> List[TimetableRowDraft]:
@@ -25,3 +34,33 @@ def get_rows_for_project(project_id: int) -> List[TimetableRowDraft]:
         return timetable_repo.load_rows(db, project_id)
     finally:
         db.close()
+
+
+async def get_rows_for_project_async(project_id: int) -> List[TimetableRowDraft]:
+    """get_rows_for_project の非同期版(Bot の async /api 用)。"""
+    async with async_session() as db:
+        return await timetable_repo.load_rows_async(db, project_id)
+
+
+def import_csv(uploaded) -> Tuple[CsvTimetable, Optional[ArtistImportReport]]:
+    """タイムテーブル CSV(UTF-8、読めなければ cp932)を draft_rows に変換し、
+    出てくるアーティストを照合・未登録分を一括登録する。
+
+    変換は models.timetable_csv(列単位)、登録は artist_service.register_missing_artists
+    (IN 1 回 + INSERT 1 文)。CSV が読めなければ例外を送出する。アーティスト登録の失敗は
+    取り込みを止めない(旧実装どおり)。その場合の report は None。
+    """
+    uploaded.seek(0)
+    try:
+        df = pd.read_csv(uploaded)
+    except UnicodeDecodeError:
+        uploaded.seek(0)
+        df = pd.read_csv(uploaded, encoding="cp932")
+
+    parsed = parse_timetable_csv(df)
+    try:
+        report = artist_service.register_missing_artists(parsed.artist_names)
+    except Exception as e:
+        logger.warning(f"import_csv: アーティスト自動登録に失敗: {e}", exc_info=True)
+        report = None
+    return parsed, report
@@ -153,6 +153,46 @@ def two_projects_different_row_counts(readonly_creds):
     return distinct[0], distinct[1]
 
 
+@pytest.fixture
+def query_budget():
+    """`with query_budget(n):` の中で発行された SQL が n 文を超えたらテストを失敗させる。
+
+    N+1 の再発検知用(utils.query_stats.query_budget をそのまま返す)。
+    """
+    from utils.query_stats import query_budget as budget
+
+    return budget
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch):
+    """SQLite(インメモリ)に同じ ORM でテーブルを作り、session factory を返す関数。
+
+    `factory = sqlite_db(project_service, ...)` で渡したモジュールの SessionLocal をその factory に
+    差し替える。factory は本番の SessionLocal と同じ作り(unit_of_work に合流する)で、
+    発行された SQL 文を factory.statements に順に記録する。実 DB には触れない。
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.pool import StaticPool
+
+    import database
+
+    def make(*modules):
+        engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False},
+        )
+        database.Base.metadata.create_all(engine)
+        factory = database._SessionFactory(autocommit=False, autoflush=False, bind=engine)
+        factory.statements = []
+        event.listen(engine, "before_cursor_execute",
+                     lambda conn, cur, stmt, *a: factory.statements.append(stmt))
+        for module in modules:
+            monkeypatch.setattr(module, "SessionLocal", factory)
+        return factory
+
+    return make
+
+
 @pytest.fixture
 def app_test(_inject_readonly_secrets):
     """未実行の AppTest を返す(secrets 注入後に生成)。"""
@@ -0,0 +1,114 @@
+"""アーティスト一括統合(artist_service.merge_artists_bulk)のテスト。
+
+- resolve_merge_pairs は連鎖を最終 winner に解決し、自己統合・統合先 2 つ・循環を弾く
+- _reassign_grid_json_many は(連鎖しない組なら)1 組ずつ _reassign_grid_json を当てた結果と同じ
+- 一括統合の結果は、解決後の組を 1 組ずつ merge_artists した結果と同じ(_merged_ の時刻以外)
+- timetable_rows の付け替えと loser の改名+論理削除はそれぞれ 1 文、組数によらない(query_budget で確認)
+"""
+from __future__ import annotations
+
+import json
+import random
+import re
+
+import pytest
+
+from database import Artist, TimetableProject, TimetableRow
+from models.artist import resolve_merge_pairs
+from repositories import project_repo
+from services import artist_service, catalog_cache
+
+
+def test_resolve_merge_pairs():
+    assert resolve_merge_pairs([(1, 2), (2, 3), (1, 2), (4, 5)]) == {2: 1, 3: 1, 5: 4}
+    assert resolve_merge_pairs([]) == {}
+    for bad in ([(1, 1)], [(1, 3), (2, 3)], [(1, 2), (2, 1)], [(1, 2), (2, 3), (3, 1)]):
+        with pytest.raises(ValueError):
+            resolve_merge_pairs(bad)
+
+
+def test_grid_json_many_matches_sequential():
+    rnd = random.Random(7)
+    names = list("ABCDEFGH")
+    for _ in range(200):
+        order = rnd.sample(names, rnd.randint(0, 6))
+        losers = rnd.sample(names, 3)
+        winners = rnd.sample([n for n in names if n not in losers], 3)
+        renames = dict(zip(losers, winners))
+        raw = json.dumps({"order": order, "alignment": "中央揃え"}) if rnd.random() < 0.5 else json.dumps(order)
+        expected = raw
+        for old, new in renames.items():
+            expected = project_repo._reassign_grid_json(expected, old, new) or expected
+        assert (project_repo._reassign_grid_json_many(raw, renames) or raw) == expected
+    assert project_repo._reassign_grid_json_many("[\"X\"]", {"A": "B"}) is None
+
+
+_ARTISTS = ["Alpha", "alpha", "ALPHA ", "Beta", "Betta", "Gamma", "Other"]
+_ROWS = [["Alpha", "alpha", "Beta"], ["ALPHA ", "Betta", "Other", "alpha"], ["Gamma"]]
+_GRIDS = [["Betta", "alpha", "Other"], ["Alpha", "ALPHA "], ["Gamma", "Beta", "Betta"]]
+
+
+def _seed(factory):
+    db = factory()
+    db.add_all([Artist(id=i, name=n) for i, n in enumerate(_ARTISTS, start=1)])
+    for pid, (rows, grid) in enumerate(zip(_ROWS, _GRIDS), start=1):
+        db.add(TimetableProject(id=pid, title=f"P{pid}", grid_order_json=json.dumps({"order": grid})))
+        db.add_all([TimetableRow(project_id=pid, sort_order=i, artist_name=n) for i, n in enumerate(rows)])
+    db.flush()
+    project_repo.backfill_grid_order_entries(db)
+    db.commit()
+    db.close()
+    return factory
+
+
+def _state(factory):
+    db = factory()
+    try:
+        artists = {a.id: (re.sub(r"_merged_\d+$", "_merged", a.name), bool(a.is_deleted)) for a in db.query(Artist)}
+        rows = [(r.project_id, r.sort_order, r.artist_name) for r in db.query(TimetableRow).order_by(TimetableRow.id)]
+        grids = {p.id: json.loads(p.grid_order_json)["order"] for p in db.query(TimetableProject)}
+        return artists, rows, grids
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    catalog_cache.clear()
+    yield
+    catalog_cache.clear()
+
+
+def test_bulk_merge_matches_sequential(sqlite_db, query_budget):
+    pairs = [(1, 2), (2, 3), (4, 5), (1, 2)]   # alpha→Alpha, ALPHA →alpha(→Alpha), Betta→Beta
+
+    factory = _seed(sqlite_db(artist_service))
+    for loser, winner in sorted(resolve_merge_pairs(pairs).items()):
+        assert artist_service.merge_artists(winner, loser)[2] == "merged"
+    expected = _state(factory)
+
+    factory = _seed(sqlite_db(artist_service))
+    # artists の IN・行の付け替え・対象プロジェクトの SELECT・loser の改名+論理削除が各 1 文。
+    # 残りは並び順が変わる 3 プロジェクト分の entries の読み書き(組数ではなくプロジェクト数で増える)
+    with query_budget(15) as stats:
+        mapping, rows_count, grid_count, status = artist_service.merge_artists_bulk(pairs)
+    assert status == "merged"
+    assert mapping == {2: 1, 3: 1, 5: 4}
+    assert (rows_count, grid_count) == (4, 3)
+    assert _state(factory) == expected
+    artists, rows, grids = expected
+    assert artists[3] == ("ALPHA _merged", True) and artists[1] == ("Alpha", False)
+    assert grids == {1: ["Beta", "Alpha", "Other"], 2: ["Alpha"], 3: ["Gamma", "Beta"]}
+
+    updates = [r.sql for r in stats.records if "UPDATE" in r.sql]
+    assert len([s for s in updates if "UPDATE timetable_rows" in s]) == 1
+    assert len([s for s in updates if "UPDATE artists" in s]) == 1
+
+
+def test_bulk_merge_rejects_bad_pairs(sqlite_db):
+    factory = _seed(sqlite_db(artist_service))
+    before = _state(factory)
+    assert artist_service.merge_artists_bulk([(1, 2), (2, 1)]) == ({}, 0, 0, "invalid")
+    assert artist_service.merge_artists_bulk([(1, 99)]) == ({}, 0, 0, "not_found")
+    assert artist_service.merge_artists_bulk([]) == ({}, 0, 0, "merged")
+    assert _state(factory) == before
@@ -0,0 +1,123 @@
+"""Bot の async /api が使う非同期 read 経路(*_async)のテスト。
+
+- 非同期版(一覧ページング / 詳細 / rows / artists / 告知テキスト)は同期版と同じ結果を返す
+- rows は timetable_rows が空なら旧 data_json にフォールバックする(同期版と同じ)。
+  timetable_rows の読み込みが失敗しても 500 にせず同じフォールバックに落ちる
+- /rows 用の get_project_with_rows_async はプロジェクトと行を 1 セッションで読む
+- /api の async エンドポイントが非同期エンジン経由で実際に読める
+
+同じ SQLite ファイルを同期エンジン(sqlite://)と非同期エンジン(sqlite+aiosqlite://)の両方から
+開いて突き合わせる。database の import に SUPABASE_* が要るため conftest(read-only secrets 注入)前提。
+aiosqlite が無い環境ではスキップ。実 DB には触れない。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import database  # noqa: E402
+from bot import main as bot_main  # noqa: E402
+from database import Artist, Base, TimetableProject, TimetableRow  # noqa: E402
+from services import (  # noqa: E402
+    artist_service,
+    catalog_cache,
+    generation_service,
+    project_service,
+    timetable_service,
+)
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = tmp_path / "app.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    for i in range(1, 8):
+        db.add(TimetableProject(
+            id=i, title=f"P{i}", event_date=f"2025-0{i % 3 + 1}-01", venue_name="V",
+            grid_order_json=json.dumps({"order": ["B", "A"]}), tickets_json="[]",
+        ))
+    db.add_all([
+        TimetableRow(project_id=1, sort_order=1, artist_name="B", duration=20),
+        TimetableRow(project_id=1, sort_order=0, artist_name="A", duration=30, is_hidden=True),
+    ])
+    db.get(TimetableProject, 2).data_json = json.dumps([{"ARTIST": "L", "DURATION": 15}])
+    db.add_all([Artist(name="Z"), Artist(name="Y"), Artist(name="X", is_deleted=True)])
+    db.commit()
+    db.close()
+
+    for module in (project_service, timetable_service, artist_service, generation_service):
+        monkeypatch.setattr(module, "SessionLocal", factory)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(database, "_async_session_factory", async_sessionmaker(async_engine, expire_on_commit=False))
+    catalog_cache.clear()
+    yield path
+    catalog_cache.clear()
+    asyncio.run(async_engine.dispose())
+
+
+def test_async_reads_match_sync(db_file):
+    async def pages():
+        out, cursor = [], None
+        while True:
+            views, cursor = await project_service.list_project_summary_page_async(3, cursor)
+            out += views
+            if cursor is None:
+                return out
+
+    assert asyncio.run(pages()) == project_service.list_project_summaries()
+    for pid in (1, 2, 99):
+        assert asyncio.run(project_service.get_project_flyer_view_async(pid)) == \
+            project_service.get_project_flyer_view(pid)
+        assert asyncio.run(timetable_service.get_rows_for_project_async(pid)) == \
+            timetable_service.get_rows_for_project(pid)
+        assert asyncio.run(generation_service.build_summary_text_for_project_async(pid)) == \
+            generation_service.build_summary_text_for_project(pid)
+
+    assert [r.artist_name for r in asyncio.run(timetable_service.get_rows_for_project_async(2))] == ["L"]
+    catalog_cache.clear()
+    assert [a.name for a in asyncio.run(artist_service.list_artists_async())] == ["Y", "Z"]
+    assert asyncio.run(artist_service.list_artists_async()) == artist_service.list_artists()
+
+
+def test_project_with_rows_uses_one_session(db_file, monkeypatch):
+    factory = database._async_session_factory
+    opened = []
+    monkeypatch.setattr(database, "_async_session_factory", lambda: opened.append(1) or factory())
+    for pid in (1, 2, 99):
+        view, rows = asyncio.run(project_service.get_project_with_rows_async(pid))
+        assert view == project_service.get_project_flyer_view(pid)
+        assert rows == timetable_service.get_rows_for_project(pid)
+    assert len(opened) == 3
+
+
+def test_async_rows_fall_back_when_query_fails(db_file, monkeypatch):
+    from repositories import timetable_repo
+
+    monkeypatch.setattr(timetable_repo, "_rows_stmt", lambda pid: text("SELECT * FROM no_such_table"))
+    assert [r.artist_name for r in asyncio.run(timetable_service.get_rows_for_project_async(2))] == ["L"]
+    assert asyncio.run(timetable_service.get_rows_for_project_async(1)) == []
+
+
+def test_async_endpoints_read_through_async_engine(db_file, monkeypatch):
+    monkeypatch.setenv("EVENT_API_KEY", "k")
+    client = TestClient(bot_main.app)
+    headers = {"X-API-Key": "k"}
+    r = client.get("/api/projects/1/rows", headers=headers)
+    assert r.status_code == 200
+    assert [x["artist_name"] for x in r.json()] == ["A", "B"]
+    r = client.get("/api/projects?limit=2", headers=headers)
+    assert len(r.json()) == 2 and "x-next-cursor" in r.headers
+    assert client.get("/api/projects/1/grid", headers=headers).json() == {"grid_order": {"order": ["B", "A"]}}
+    assert client.get("/api/projects/99", headers=headers).status_code == 404
@@ -9,6 +9,8 @@ fastapi / starlette / httpx を要するため、bot 依存を入れた venv(例
 """
 from __future__ import annotations
 
+import os
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -16,6 +18,7 @@ from bot import api as bot_api
 from bot import main as bot_main
 from models.artist import ArtistView
 from models.project import ProjectView
+from models.stage_schedule import StageTimetable, find_conflicts
 from models.timetable import TimetableRowDraft
 
 API_KEY = "test-secret-key"
@@ -33,6 +36,14 @@ def _auth(key: str = API_KEY) -> dict:
     return {"Authorization": f"Bearer {key}"}
 
 
+def _async(fn):
+    """async 薄ラッパ(_load_*_async 等)の差し替え用に、同期関数をコルーチン関数で包む。"""
+    async def wrapper(*args):
+        return fn(*args)
+
+    return wrapper
+
+
 # ---------------------------------------------------------------------------
 # 認証(Webhook とは別系統・未認証 401)
 # ---------------------------------------------------------------------------
@@ -57,13 +68,13 @@ def test_401_does_not_touch_data_layer(monkeypatch):
         called["n"] += 1
         raise AssertionError("data layer must not be reached on auth failure")
 
-    monkeypatch.setattr(bot_api, "_load_project_summaries", _boom)
+    monkeypatch.setattr(bot_api, "_load_project_summaries_async", _async(_boom))
     assert client.get("/api/projects", headers=_auth("wrong")).status_code == 401
     assert called["n"] == 0
 
 
 def test_x_api_key_header_accepted(monkeypatch):
-    monkeypatch.setattr(bot_api, "_load_project_summaries", lambda: [])
+    monkeypatch.setattr(bot_api, "_load_project_summaries_async", _async(lambda: []))
     r = client.get("/api/projects", headers={"X-API-Key": API_KEY})
     assert r.status_code == 200
     assert r.json() == []
@@ -77,7 +88,7 @@ def test_list_projects_ok(monkeypatch):
         ProjectView(id=1, title="A", event_date="2026-07-01"),
         ProjectView(id=2, title="B", event_date=None),
     ]
-    monkeypatch.setattr(bot_api, "_load_project_summaries", lambda: fake)
+    monkeypatch.setattr(bot_api, "_load_project_summaries_async", _async(lambda: fake))
     r = client.get("/api/projects", headers=_auth())
     assert r.status_code == 200
     assert r.json() == [
@@ -86,6 +97,39 @@ def test_list_projects_ok(monkeypatch):
     ]
 
 
+def test_list_projects_paginated(monkeypatch):
+    calls = []
+
+    def fake_page(limit, cursor, date_from, date_to):
+        calls.append((limit, cursor, date_from, date_to))
+        return [ProjectView(id=3, title="C", event_date="2026-05-01")], "next-token"
+
+    monkeypatch.setattr(bot_api, "_load_project_summaries_async", _async(lambda: pytest.fail("full list")))
+    monkeypatch.setattr(bot_api, "_load_project_page_async", _async(fake_page))
+    r = client.get("/api/projects?limit=1&cursor=abc&date_from=2026-01-01", headers=_auth())
+    assert r.status_code == 200
+    assert r.json() == [{"id": 3, "title": "C", "event_date": "2026-05-01"}]
+    assert r.headers["x-next-cursor"] == "next-token"
+    assert calls == [(1, "abc", "2026-01-01", None)]
+
+
+def test_list_projects_last_page_has_no_cursor_header(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_page_async", _async(lambda *a: ([], None)))
+    r = client.get("/api/projects?limit=10", headers=_auth())
+    assert r.status_code == 200
+    assert r.json() == []
+    assert "x-next-cursor" not in r.headers
+
+
+def test_list_projects_bad_params(monkeypatch):
+    def bad_cursor(*a):
+        raise ValueError("invalid cursor")
+
+    monkeypatch.setattr(bot_api, "_load_project_page_async", _async(bad_cursor))
+    assert client.get("/api/projects?cursor=zzz", headers=_auth()).status_code == 400
+    assert client.get("/api/projects?limit=0", headers=_auth()).status_code == 422
+
+
 # ---------------------------------------------------------------------------
 # GET /api/projects/{id}
 # ---------------------------------------------------------------------------
@@ -93,7 +137,7 @@ def test_get_project_ok(monkeypatch):
     view = ProjectView(
         id=7, title="X", event_date="2026-08-01", grid_order_json='{"order":["a"]}'
     )
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: view if pid == 7 else None)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: view if pid == 7 else None))
     r = client.get("/api/projects/7", headers=_auth())
     assert r.status_code == 200
     body = r.json()
@@ -104,7 +148,7 @@ def test_get_project_ok(monkeypatch):
 
 
 def test_get_project_404(monkeypatch):
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: None)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: None))
     assert client.get("/api/projects/999", headers=_auth()).status_code == 404
 
 
@@ -112,14 +156,13 @@ def test_get_project_404(monkeypatch):
 # GET /api/projects/{id}/rows
 # ---------------------------------------------------------------------------
 def test_get_rows_ok(monkeypatch):
-    monkeypatch.setattr(
-        bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X")
-    )
     rows = [
         TimetableRowDraft(artist_name="A", duration=20),
         TimetableRowDraft(artist_name="B", duration=30),
     ]
-    monkeypatch.setattr(bot_api, "_load_rows", lambda pid: rows)
+    monkeypatch.setattr(
+        bot_api, "_load_project_with_rows_async", _async(lambda pid: (ProjectView(id=pid, title="X"), rows))
+    )
     r = client.get("/api/projects/1/rows", headers=_auth())
     assert r.status_code == 200
     body = r.json()
@@ -130,7 +173,7 @@ def test_get_rows_ok(monkeypatch):
 
 
 def test_get_rows_404_when_project_missing(monkeypatch):
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: None)
+    monkeypatch.setattr(bot_api, "_load_project_with_rows_async", _async(lambda pid: (None, [])))
     assert client.get("/api/projects/999/rows", headers=_auth()).status_code == 404
 
 
@@ -141,7 +184,7 @@ def test_get_grid_ok(monkeypatch):
     view = ProjectView(
         id=1, title="X", grid_order_json='{"order":["a","b"],"row_counts_str":"5,6"}'
     )
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: view)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: view))
     r = client.get("/api/projects/1/grid", headers=_auth())
     assert r.status_code == 200
     assert r.json() == {"grid_order": {"order": ["a", "b"], "row_counts_str": "5,6"}}
@@ -149,7 +192,7 @@ def test_get_grid_ok(monkeypatch):
 
 def test_get_grid_null_when_absent(monkeypatch):
     view = ProjectView(id=1, title="X", grid_order_json=None)
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: view)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: view))
     r = client.get("/api/projects/1/grid", headers=_auth())
     assert r.status_code == 200
     assert r.json() == {"grid_order": None}
@@ -158,7 +201,7 @@ def test_get_grid_null_when_absent(monkeypatch):
 def test_get_grid_null_when_empty_string(monkeypatch):
     """grid_order_json が空文字のプロジェクトでも 500 にならず 200 + null。"""
     view = ProjectView(id=1, title="X", grid_order_json="")
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: view)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: view))
     r = client.get("/api/projects/1/grid", headers=_auth())
     assert r.status_code == 200
     assert r.json() == {"grid_order": None}
@@ -167,17 +210,62 @@ def test_get_grid_null_when_empty_string(monkeypatch):
 def test_get_grid_null_when_broken_json(monkeypatch):
     """壊れた grid_order_json でも 500 にならず 200 + null(json.loads 例外を握る)。"""
     view = ProjectView(id=1, title="X", grid_order_json="{not json")
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: view)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: view))
     r = client.get("/api/projects/1/grid", headers=_auth())
     assert r.status_code == 200
     assert r.json() == {"grid_order": None}
 
 
 def test_get_grid_404(monkeypatch):
-    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: None)
+    monkeypatch.setattr(bot_api, "_load_project_view_async", _async(lambda pid: None))
     assert client.get("/api/projects/1/grid", headers=_auth()).status_code == 404
 
 
+# ---------------------------------------------------------------------------
+# GET /api/projects/{id}/conflicts
+# ---------------------------------------------------------------------------
+def test_conflicts_ok(monkeypatch):
+    stages = [
+        StageTimetable("Main", "10:00", [TimetableRowDraft(artist_name="A", duration=30, adjustment=0)], 1),
+        StageTimetable("Sub", "10:15", [TimetableRowDraft(artist_name="A", duration=30, adjustment=0)], 2),
+    ]
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X"))
+    monkeypatch.setattr(bot_api, "_find_conflicts", lambda pid: (stages, find_conflicts(stages)))
+    r = client.get("/api/projects/1/conflicts", headers=_auth())
+    assert r.status_code == 200
+    body = r.json()
+    assert body["stages"] == [{"project_id": 1, "name": "Main"}, {"project_id": 2, "name": "Sub"}]
+    assert [c["kind"] for c in body["conflicts"]] == ["artist_double_booking"]
+    assert (body["conflicts"][0]["overlap_start"], body["conflicts"][0]["overlap_end"]) == ("10:15", "10:30")
+
+
+def test_sync_request_shares_one_session(monkeypatch):
+    import database
+
+    seen = []
+
+    def load_view(pid):
+        seen.append(database.SessionLocal())
+        return ProjectView(id=pid, title="X")
+
+    def load_conflicts(pid):
+        seen.append(database.SessionLocal())
+        return [], []
+
+    monkeypatch.setattr(bot_api, "_load_project_view", load_view)
+    monkeypatch.setattr(bot_api, "_find_conflicts", load_conflicts)
+    assert client.get("/api/projects/1/conflicts", headers=_auth()).status_code == 200
+    assert client.get("/api/projects/1/conflicts", headers=_auth()).status_code == 200
+    # 1 リクエスト内は同じセッション、リクエストごとには別
+    assert seen[0] is seen[1] and seen[2] is seen[3] and seen[0] is not seen[2]
+
+
+def test_conflicts_404(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: None)
+    monkeypatch.setattr(bot_api, "_find_conflicts", lambda pid: pytest.fail("loaded"))
+    assert client.get("/api/projects/999/conflicts", headers=_auth()).status_code == 404
+
+
 # ---------------------------------------------------------------------------
 # GET /api/artists
 # ---------------------------------------------------------------------------
@@ -193,7 +281,7 @@ def test_list_artists_ok(monkeypatch):
             crop_y=0,
         )
     ]
-    monkeypatch.setattr(bot_api, "_load_artists", lambda: artists)
+    monkeypatch.setattr(bot_api, "_load_artists_async", _async(lambda: artists))
     r = client.get("/api/artists", headers=_auth())
     assert r.status_code == 200
     body = r.json()
@@ -205,14 +293,14 @@ def test_list_artists_ok(monkeypatch):
 # GET /api/projects/{id}/summary-text(生成トリガー・§A1)
 # ---------------------------------------------------------------------------
 def test_summary_text_ok(monkeypatch):
-    monkeypatch.setattr(bot_api, "_build_summary_text", lambda pid: "【公演概要】\n...")
+    monkeypatch.setattr(bot_api, "_build_summary_text_async", _async(lambda pid: "【公演概要】\n..."))
     r = client.get("/api/projects/1/summary-text", headers=_auth())
     assert r.status_code == 200
     assert r.json() == {"text": "【公演概要】\n..."}
 
 
 def test_summary_text_404(monkeypatch):
-    monkeypatch.setattr(bot_api, "_build_summary_text", lambda pid: None)
+    monkeypatch.setattr(bot_api, "_build_summary_text_async", _async(lambda pid: None))
     assert client.get("/api/projects/999/summary-text", headers=_auth()).status_code == 404
 
 
@@ -252,3 +340,145 @@ def test_grid_image_404_when_no_artists(monkeypatch):
 
 def test_grid_image_401():
     assert client.get("/api/projects/1/grid-image").status_code == 401
+
+
+# ---------------------------------------------------------------------------
+# GET /api/projects/{id}/flyer-layout(計測のみ・描画なし)
+# ---------------------------------------------------------------------------
+def test_flyer_layout_ok(monkeypatch):
+    seen = {}
+
+    def _fake(pid, variant):
+        seen["args"] = (pid, variant)
+        return {
+            "variant": variant,
+            "canvas": {"width": 1080, "height": 1350},
+            "elements": {"date": {"base_x": 540, "base_y": 900, "bbox": [400, 880, 680, 960]}},
+        }
+
+    monkeypatch.setattr(bot_api, "_build_flyer_layout", _fake)
+    r = client.get("/api/projects/3/flyer-layout?variant=tt", headers=_auth())
+    assert r.status_code == 200
+    assert seen["args"] == (3, "tt")
+    assert r.json()["elements"]["date"]["bbox"] == [400, 880, 680, 960]
+
+
+def test_flyer_layout_default_variant_is_grid(monkeypatch):
+    monkeypatch.setattr(bot_api, "_build_flyer_layout", lambda pid, v: {"variant": v})
+    r = client.get("/api/projects/3/flyer-layout", headers=_auth())
+    assert r.json() == {"variant": "grid"}
+
+
+def test_flyer_layout_unknown_variant_422(monkeypatch):
+    monkeypatch.setattr(bot_api, "_build_flyer_layout", lambda pid, v: {"variant": v})
+    assert client.get("/api/projects/3/flyer-layout?variant=a4", headers=_auth()).status_code == 422
+
+
+def test_flyer_layout_404(monkeypatch):
+    monkeypatch.setattr(bot_api, "_build_flyer_layout", lambda pid, v: None)
+    assert client.get("/api/projects/999/flyer-layout", headers=_auth()).status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# GET /api/projects/{id}/flyer-image(完成フライヤー・入力ハッシュ ETag)
+# ---------------------------------------------------------------------------
+def test_flyer_image_ok_with_etag(monkeypatch):
+    seen = {}
+
+    def _fake(pid, variant):
+        seen["args"] = (pid, variant)
+        return b"\x89PNG\r\n\x1a\nFLYER", "abc123"
+
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X"))
+    monkeypatch.setattr(bot_api, "_render_flyer_png", _fake)
+    r = client.get("/api/projects/5/flyer-image?variant=tt", headers=_auth())
+    assert r.status_code == 200
+    assert seen["args"] == (5, "tt")
+    assert r.headers["content-type"] == "image/png"
+    assert r.headers["etag"] == '"abc123"'
+    assert r.content == b"\x89PNG\r\n\x1a\nFLYER"
+
+
+def test_flyer_image_304_when_etag_matches(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X"))
+    monkeypatch.setattr(bot_api, "_render_flyer_png", lambda pid, v: (b"PNG", "abc123"))
+    r = client.get("/api/projects/5/flyer-image", headers={**_auth(), "If-None-Match": '"old", "abc123"'})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == '"abc123"'
+
+
+def test_flyer_image_404(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X"))
+    monkeypatch.setattr(bot_api, "_render_flyer_png", lambda pid, v: None)
+    r = client.get("/api/projects/5/flyer-image", headers=_auth())
+    assert r.status_code == 404
+    assert r.json()["detail"] == "flyer source unavailable"
+
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: None)
+    assert client.get("/api/projects/999/flyer-image", headers=_auth()).status_code == 404
+
+
+def test_flyer_image_unknown_variant_422(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X"))
+    assert client.get("/api/projects/5/flyer-image?variant=a4", headers=_auth()).status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# GET /api/exports/timetables.pdf
+# ---------------------------------------------------------------------------
+def test_export_timetables_pdf_streams_temp_file(monkeypatch):
+    calls = []
+
+    def fake_export(date_from, date_to, out):
+        calls.append((date_from, date_to, out.name))
+        out.write(b"%PDF-1.4 fake")
+        return 2
+
+    monkeypatch.setattr(bot_api, "_export_timetables_pdf", fake_export)
+    r = client.get("/api/exports/timetables.pdf?date_from=2025-01-01&date_to=2025-03-31", headers=_auth())
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/pdf"
+    assert r.content == b"%PDF-1.4 fake"
+    assert calls[0][:2] == ("2025-01-01", "2025-03-31")
+    assert not os.path.exists(calls[0][2])  # 送信後に一時ファイルを消す
+
+
+def test_export_timetables_pdf_404_when_empty(monkeypatch):
+    paths = []
+
+    def fake_export(date_from, date_to, out):
+        paths.append(out.name)
+        return 0
+
+    monkeypatch.setattr(bot_api, "_export_timetables_pdf", fake_export)
+    r = client.get("/api/exports/timetables.pdf", headers=_auth())
+    assert r.status_code == 404
+    assert not os.path.exists(paths[0])
+
+
+def test_export_timetables_pdf_bad_date_422():
+    assert client.get("/api/exports/timetables.pdf?date_from=2025-13-01", headers=_auth()).status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# GET /api/projects/{id}/event-pack.pdf
+# ---------------------------------------------------------------------------
+def test_event_pack_ok(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: ProjectView(id=pid, title="X"))
+
+    def fake_pack(pid, out):
+        out.write(b"%PDF-1.4 pack " + str(pid).encode())
+        return True
+
+    monkeypatch.setattr(bot_api, "_build_event_pack_pdf", fake_pack)
+    r = client.get("/api/projects/7/event-pack.pdf", headers=_auth())
+    assert r.status_code == 200
+    assert r.content == b"%PDF-1.4 pack 7"
+    assert "event_pack_7.pdf" in r.headers["content-disposition"]
+
+
+def test_event_pack_404(monkeypatch):
+    monkeypatch.setattr(bot_api, "_load_project_view", lambda pid: None)
+    monkeypatch.setattr(bot_api, "_build_event_pack_pdf", lambda pid, out: pytest.fail("built"))
+    assert client.get("/api/projects/999/event-pack.pdf", headers=_auth()).status_code == 404
@@ -0,0 +1,91 @@
+"""services.catalog_cache とカタログ系 service の読み取りキャッシュのテスト。
+
+- 2 回目以降はヒット(DB を読まない)、invalidate で版数が上がり次の読みはミス
+- TTL を過ぎたら読み直す / 読み込み中に invalidate されたら古い結果を残さない
+- artist_service / template_service の書き込み経路がキャッシュを無効化する
+"""
+from __future__ import annotations
+
+import pytest
+
+from services import artist_service, catalog_cache, template_service
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    catalog_cache.clear()
+    yield
+    catalog_cache.clear()
+
+
+@pytest.fixture
+def factory(sqlite_db):
+    return sqlite_db(artist_service, template_service)
+
+
+def _selects(factory):
+    return [s for s in factory.statements if s.lstrip().startswith("SELECT")]
+
+
+def test_hit_miss_and_version_bump():
+    calls = []
+    load = lambda: calls.append(1) or ["x"]  # noqa: E731
+    assert catalog_cache.get_or_load("c", "k", load) == ["x"]
+    assert catalog_cache.get_or_load("c", "k", load) == ["x"]
+    assert len(calls) == 1
+    catalog_cache.invalidate("c")
+    catalog_cache.get_or_load("c", "k", load)
+    assert len(calls) == 2
+    assert catalog_cache.stats()["c"] == {"hits": 1, "misses": 2, "version": 1}
+
+
+def test_ttl_and_invalidate_during_load(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(catalog_cache, "_clock", lambda: now[0])
+    catalog_cache.get_or_load("c", "k", lambda: 1, ttl=10)
+    now[0] += 9
+    assert catalog_cache.get_or_load("c", "k", lambda: 2, ttl=10) == 1
+    now[0] += 2
+    assert catalog_cache.get_or_load("c", "k", lambda: 3, ttl=10) == 3
+
+    def racing_load():
+        catalog_cache.invalidate("c")  # 読み込み中に書き込みが入った
+        return "stale"
+
+    catalog_cache.invalidate("c")
+    assert catalog_cache.get_or_load("c", "k", racing_load) == "stale"
+    assert catalog_cache.get_or_load("c", "k", lambda: "fresh") == "fresh"
+
+
+def test_artist_writes_invalidate(factory):
+    assert artist_service.list_artists() == []
+    view, status = artist_service.create_artist("A")
+    assert status == "created"
+    del factory.statements[:]
+    assert [a.name for a in artist_service.list_artists()] == ["A"]
+    assert [a.id for a in artist_service.get_artists_by_names(["A", "Z", "A"])] == [view.id, view.id]
+    n = len(_selects(factory))
+    artist_service.list_artists()
+    artist_service.get_artists_by_names(["A"])
+    assert len(_selects(factory)) == n  # どちらもヒット
+
+    artist_service.update_artist(view.id, "B")
+    assert [a.name for a in artist_service.list_artists()] == ["B"]
+    assert artist_service.get_artists_by_names(["A"]) == []
+    assert artist_service.soft_delete_artist(view.id)
+    assert artist_service.list_artists() == []
+    assert len(artist_service.list_artists(include_deleted=True)) == 1
+
+
+def test_template_writes_invalidate(factory):
+    assert template_service.list_templates() == []
+    assert template_service.create_template("T", "{}")
+    templates = template_service.list_templates()
+    assert [t.name for t in templates] == ["T"]
+    del factory.statements[:]
+    template_service.list_templates()
+    assert _selects(factory) == []
+    assert template_service.rename_template(templates[0].id, "U")
+    assert [t.name for t in template_service.list_templates()] == ["U"]
+    assert template_service.delete_template(templates[0].id)
+    assert template_service.list_templates() == []
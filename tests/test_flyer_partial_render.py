@@ -0,0 +1,155 @@
+"""フライヤーのクリック移動・差分再合成(rerender_flyer)の等価性テスト。
+
+- 位置だけ変えた再描画 → 前回 FlyerRender を使い回し、フル描画と画素単位で一致
+- time の上下移動 → チケット・備考(フッター)が連動して動き、layout_meta も一致
+- 位置以外(フォントサイズ等)が変わったら → 使い回さずフル描画(前回無かったスタイルが足された場合も)
+- layout_meta に各要素の bbox が入る
+- layout_flyer(計測のみ)の layout_meta は、実際に描画したときと一致する
+- 描画倍率(scale): キャンバスだけ変わり layout_meta はデザイン単位、縮小プレビューでも差分経路が効く
+- フォーマット違い(render_flyer_formats): レイヤーを使い回しても直接描画と一致する
+
+utils の import が database(import 時に secrets/env 必須)を引くため、
+read-only secrets を注入する conftest 前提で .venv 実行を想定。DB/ネットワークには触れない。
+フォントは未配置でも load_default にフォールバックするので環境に依存しない。
+"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.flyer_generator import (
+    FLYER_FORMATS, MOVABLE_ELEMENTS, layout_flyer, render_flyer, render_flyer_formats, rerender_flyer, rescale_flyer,
+)
+
+
+def _styles(**overrides):
+    st = {}
+    for k in MOVABLE_ELEMENTS:
+        st[f"{k}_font"] = "missing.ttf"
+        st[f"{k}_size"] = 48
+        st[f"{k}_shadow_on"] = True
+        st[f"{k}_shadow_blur"] = 4
+    st.update(logo_shadow_on=True, logo_shadow_spread=3, logo_shadow_blur=6)
+    st.update(overrides)
+    return st
+
+
+@pytest.fixture
+def args():
+    return dict(
+        bg_source=None,
+        logo_source=Image.new("RGBA", (300, 100), (255, 0, 0, 255)),
+        main_source=Image.new("RGBA", (800, 600), (0, 200, 0, 255)),
+        date_text="2026.10.19 (MON)", venue_text="VENUE", subtitle_text="SUBTITLE",
+        open_time="18:00", start_time="18:30",
+        ticket_info_list=[{"name": "前売", "price": "3000"}, {"name": "当日", "price": "3500"}],
+        common_notes_list=["ドリンク代別", "再入場不可"],
+    )
+
+
+@pytest.mark.parametrize("moves", [
+    {"date_pos_x": 40, "date_pos_y": -20},
+    {"time_pos_y": 60},
+    {"time_pos_x": -30, "ticket_note_pos_y": 12},
+    {"subtitle_pos_y": 900},  # キャンバス外へはみ出す移動
+])
+def test_position_only_change_matches_full_render(args, moves):
+    prev = render_flyer(styles=_styles(), **args)
+    styles2 = _styles(**moves)
+    updated = rerender_flyer(prev, styles=styles2, **args)
+    full = render_flyer(styles=styles2, **args)
+
+    assert updated is prev  # 使い回された
+    assert np.array_equal(np.asarray(updated.canvas), np.asarray(full.canvas))
+    assert updated.layout_meta == full.layout_meta
+    assert all(r[2] - r[0] < 1080 or r[3] - r[1] < 1350 for r in updated.dirty_rects)
+
+
+def test_no_change_composites_nothing(args):
+    prev = render_flyer(styles=_styles(), **args)
+    rerender_flyer(prev, styles=_styles(), **args)
+    assert prev.dirty_rects == []
+
+
+def test_non_position_change_falls_back_to_full_render(args):
+    prev = render_flyer(styles=_styles(), **args)
+    assert rerender_flyer(prev, styles=_styles(date_size=30), **args) is not prev
+    assert rerender_flyer(prev, styles=_styles(), **{**args, "venue_text": "OTHER"}) is not prev
+
+
+def test_added_style_key_falls_back_to_full_render(args):
+    styles = _styles()
+    assert "subtitle_color" not in styles
+    prev = render_flyer(styles=styles, **args)
+    styles2 = _styles(subtitle_color="#FF0000")
+    updated = rerender_flyer(prev, styles=styles2, **args)
+    full = render_flyer(styles=styles2, **args)
+    assert updated is not prev
+    assert np.array_equal(np.asarray(updated.canvas), np.asarray(full.canvas))
+
+
+def test_layout_meta_has_bbox(args):
+    meta = render_flyer(styles=_styles(), **args).layout_meta
+    for key in ("main", "logo", "subtitle", "date", "venue", "time", "ticket_name", "ticket_note", "footer_area"):
+        x0, y0, x1, y1 = meta[key]["bbox"]
+        assert x0 < x1 and y0 < y1
+
+
+def test_layout_only_matches_render(args):
+    styles = _styles(time_alignment="triangle", time_line_gap=8)
+    render = render_flyer(styles=styles, **args)
+    layout = layout_flyer(
+        styles, args["date_text"], args["venue_text"], args["subtitle_text"],
+        args["open_time"], args["start_time"], args["ticket_info_list"], args["common_notes_list"],
+        logo_size=args["logo_source"].size, main_size=args["main_source"].size,
+    )
+    assert layout.layout_meta == render.layout_meta
+
+
+@pytest.mark.parametrize("scale", [0.5, 2.0])
+def test_scaled_render_keeps_design_units(args, scale):
+    render = render_flyer(styles=_styles(), scale=scale, **args)
+    assert render.canvas.size == (round(1080 * scale), round(1350 * scale))
+    # layout_meta はデザイン単位(1080x1350)のまま: クリック座標の換算が解像度に依らない
+    # (縦位置はフォントの実寸で決まり、load_default は拡縮しないので横方向だけ見る)
+    meta = render.layout_meta
+    assert meta["time"]["base_x"] == 540
+    for key in ("main", "logo", "date", "time", "ticket_note"):
+        x0, y0, x1, y1 = meta[key]["bbox"]
+        assert 0 <= x0 < x1 <= 1080 and y0 < y1
+
+
+def test_position_change_at_preview_scale_matches_full_render(args):
+    prev = render_flyer(styles=_styles(), scale=0.5, **args)
+    styles2 = _styles(time_pos_y=60, date_pos_x=40)
+    updated = rerender_flyer(prev, styles=styles2, scale=0.5, **args)
+    full = render_flyer(styles=styles2, scale=0.5, **args)
+
+    assert updated is prev
+    assert np.array_equal(np.asarray(updated.canvas), np.asarray(full.canvas))
+    assert updated.layout_meta == full.layout_meta
+    # 倍率が違えば使い回さない
+    assert rerender_flyer(prev, styles=styles2, scale=1.0, **args) is not prev
+
+
+def test_rescale_matches_direct_render(args):
+    preview = render_flyer(styles=_styles(date_pos_x=40), scale=0.5, **args)
+    export = rescale_flyer(preview, 1.0)
+    direct = render_flyer(styles=_styles(date_pos_x=40), **args)
+    assert np.array_equal(np.asarray(export.canvas), np.asarray(direct.canvas))
+
+
+def test_formats_reuse_layers_and_match_direct_render(args):
+    render = render_flyer(styles=_styles(time_pos_y=20), scale=0.5, **args)
+    variants = render_flyer_formats(render, ["feed", "story", "square"])
+
+    assert variants["feed"] is render
+    for name in ("story", "square"):
+        size = FLYER_FORMATS[name]["size"]
+        direct = render_flyer(styles=_styles(time_pos_y=20), scale=0.5, design_size=size, **args)
+        assert variants[name].canvas.size == direct.canvas.size == (size[0] // 2, size[1] // 2)
+        assert np.array_equal(np.asarray(variants[name].canvas), np.asarray(direct.canvas))
+        assert variants[name].layout_meta == direct.layout_meta
+        # 幅が同じなのでテキストレイヤーはラスタライズし直さず同じ画像を使い回す
+        assert variants[name].layers["date"][0][0] is render.layers["date"][0][0]
@@ -0,0 +1,84 @@
+"""utils/font_metrics(字幅テーブルによる見積もり・サイズ決定)のテスト。
+
+- テーブルは SHA-256 キーでディスクに保存され、2 回目は作り直さない
+- 見積もりは PIL 実測と数 % 以内(verify_table)
+- fit_font_size は従来の線形ループ(2px 刻みで実測)と同じサイズを返す
+- draw_centered_text(TT)の描画結果は線形ループ時と画素単位で一致する
+
+utils の import が database(import 時に secrets/env 必須)を引くため、
+read-only secrets を注入する conftest 前提で .venv 実行を想定。DB/ネットワークには触れない。
+フォントは Pillow 同梱の既定フォント(load_default の FreeType 版)をファイルに書き出して使う。
+"""
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+import logic_timetable
+from utils import font_metrics
+
+NAMES = ["A", "Short", "Mid name 12", "A Very Long Artist Name Here", "Two\nLines"]
+
+
+@pytest.fixture(autouse=True)
+def _isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(font_metrics, "FONT_DIR", str(tmp_path))
+    monkeypatch.setattr(font_metrics, "_tables", OrderedDict())
+    return tmp_path
+
+
+@pytest.fixture
+def font_path(tmp_path):
+    font = ImageFont.load_default(20)
+    if not hasattr(font, "font_bytes"):
+        pytest.skip("FreeType 版の既定フォントが無い Pillow")
+    path = os.path.join(tmp_path, "default.ttf")
+    with open(path, "wb") as f:
+        f.write(font.font_bytes)
+    return path
+
+
+def test_table_is_cached_on_disk(font_path, monkeypatch):
+    assert font_metrics.ensure_table(font_path)
+    assert len(os.listdir(font_metrics.cache_dir())) == 1
+
+    monkeypatch.setattr(font_metrics, "_tables", OrderedDict())
+    monkeypatch.setattr(font_metrics, "build_table", lambda *a, **k: pytest.fail("rebuilt"))
+    assert font_metrics.get_table(font_path) is not None
+
+
+def test_estimates_close_to_pil(font_path):
+    report = font_metrics.verify_table(font_path, [n for n in NAMES if "\n" not in n], sizes=(15, 32, 80))
+    assert report["samples"] == 12
+    assert report["max_width_error_ratio"] < 0.1
+
+
+def test_fit_matches_linear_loop(font_path):
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    table = font_metrics.get_table(font_path)
+    for name in NAMES:
+        for box_w in range(40, 700, 23):
+            def fits(size):
+                bbox = draw.multiline_textbbox((0, 0), name, font=ImageFont.truetype(font_path, size), spacing=4)
+                return (bbox[2] - bbox[0]) <= box_w and (bbox[3] - bbox[1]) <= 90
+
+            estimate = font_metrics.estimate_fit_size(table, name, box_w, 90)
+            assert font_metrics.fit_font_size(fits, 80, 15, 2, estimate) == font_metrics._linear_fit(fits, 80, 15, 2)
+
+
+def test_draw_centered_text_unchanged(font_path, monkeypatch):
+    def draw_all():
+        img = Image.new("RGBA", (900, 400), (0, 0, 0, 255))
+        draw = ImageDraw.Draw(img)
+        for i, name in enumerate(NAMES):
+            logic_timetable.draw_centered_text(draw, name, 0, i * 80, 120 + i * 150, 80, font_path, 70)
+        return np.asarray(img)
+
+    fast = draw_all()
+    monkeypatch.setattr(logic_timetable, "fit_font_size",
+                        lambda fits, start, stop, step, estimate=None: font_metrics._linear_fit(fits, start, stop, step))
+    assert np.array_equal(fast, draw_all())
@@ -0,0 +1,81 @@
+"""utils/font_specimen(フォント見本のキャッシュ)のテスト。
+
+- 2 回目の見本シートは描き直さない(行もシートもキャッシュから)
+- フォントを 1 つ追加しても新しく描くのはその 1 行だけ
+- フォントファイルの中身が変われば、その行だけ描き直す
+- キャッシュ経由のシートは従来どおりの寸法(ヘッダー + 行数 x 80 + 余白)
+
+utils の import が database(import 時に secrets/env 必須)を引くため、
+read-only secrets を注入する conftest 前提で .venv 実行を想定。DB/ネットワークには触れない。
+フォントは実体が無くてよい(見本は "Preview Not Available" で描かれる)。
+"""
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from utils import font_specimen
+
+
+@pytest.fixture(autouse=True)
+def _isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(font_specimen, "FONT_DIR", str(tmp_path))
+    monkeypatch.setattr(font_specimen, "_memory", OrderedDict())
+    monkeypatch.setattr(font_specimen, "_sheet_memo", OrderedDict())
+    return tmp_path
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    calls = []
+    original = font_specimen._render_row
+
+    def _counting(name, filename, label_font_path):
+        calls.append(filename)
+        return original(name, filename, label_font_path)
+
+    monkeypatch.setattr(font_specimen, "_render_row", _counting)
+    return calls
+
+
+def _write(tmp_path, name, data):
+    with open(os.path.join(tmp_path, name), "wb") as f:
+        f.write(data)
+
+
+def test_second_sheet_is_cached(_isolated, rendered):
+    entries = [("A", "a.ttf"), ("B", "b.ttf")]
+    first = font_specimen.specimen_sheet(entries, "label.ttf")
+    assert first.size == (800, 40 + 2 * 80 + 20)
+    assert rendered == ["a.ttf", "b.ttf"]
+
+    font_specimen.specimen_sheet(entries, "label.ttf")
+    assert rendered == ["a.ttf", "b.ttf"]
+
+
+def test_adding_font_renders_one_row(_isolated, rendered):
+    before = font_specimen.specimen_sheet([("A", "a.ttf"), ("B", "b.ttf")], "label.ttf")
+    after = font_specimen.specimen_sheet([("A", "a.ttf"), ("B", "b.ttf"), ("C", "c.ttf")], "label.ttf")
+    assert rendered == ["a.ttf", "b.ttf", "c.ttf"]
+    # 既存の行は同じ画素
+    assert np.array_equal(np.asarray(after)[: 40 + 160], np.asarray(before)[: 40 + 160])
+
+
+def test_disk_cache_survives_memory_loss(_isolated, rendered, monkeypatch):
+    font_specimen.specimen_sheet([("A", "a.ttf")], "label.ttf")
+    monkeypatch.setattr(font_specimen, "_memory", OrderedDict())
+    monkeypatch.setattr(font_specimen, "_sheet_memo", OrderedDict())
+    font_specimen.specimen_sheet([("A", "a.ttf")], "label.ttf")
+    assert rendered == ["a.ttf"]
+
+
+def test_changed_font_file_rerenders_row(_isolated, rendered):
+    _write(_isolated, "a.ttf", b"v1")
+    entries = [("A", "a.ttf"), ("B", "b.ttf")]
+    font_specimen.specimen_sheet(entries, "label.ttf")
+    _write(_isolated, "a.ttf", b"version2")
+    font_specimen.specimen_sheet(entries, "label.ttf")
+    assert rendered == ["a.ttf", "b.ttf", "a.ttf"]
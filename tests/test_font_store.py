@@ -0,0 +1,132 @@
+"""utils/font_store(フォント置き場のアトミック書き込み・整合チェック)と
+utils.flyer_helpers.provision_font_file(確保処理)のテスト。
+
+- 書き込みは一時ファイル → rename。期待サイズ不一致なら最終パスに何も残らない
+- manifest のサイズ / SHA-256 と食い違うファイルは無効扱い → 取り直す
+- 同じフォントを同時に要求しても取得は 1 回(ファイル名ごとのロック)
+- ローカルバックエンド以外では、Asset の URL がファイルパスでも開かない
+
+utils の import が database(import 時に secrets/env 必須)を引くため、
+read-only secrets を注入する conftest 前提で .venv 実行を想定。DB/ネットワークには触れない
+(DB セッションと requests.get はフェイクに差し替える)。
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import pytest
+
+from utils import flyer_helpers, font_store
+
+
+@pytest.fixture(autouse=True)
+def _font_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(font_store, "FONT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_write_is_atomic_and_recorded(_font_dir):
+    path = font_store.write_font("a.ttf", b"x" * 100)
+    assert os.path.getsize(path) == 100
+    assert font_store.load_manifest()["a.ttf"]["size"] == 100
+    assert font_store.is_valid("a.ttf", full=True)
+    # 一時ファイル(.part)は残らない
+    assert not [n for n in os.listdir(_font_dir) if n.endswith(".part")]
+
+
+def test_size_mismatch_leaves_nothing(_font_dir):
+    with pytest.raises(font_store.FontIntegrityError):
+        font_store.write_font("b.ttf", b"x" * 50, expected_size=100)
+    assert not os.path.exists(font_store.local_path("b.ttf"))
+
+
+def test_truncated_or_tampered_file_is_invalid():
+    font_store.write_font("c.ttf", b"x" * 100)
+    with open(font_store.local_path("c.ttf"), "wb") as f:
+        f.write(b"x" * 40)  # 途中で切れたファイル
+    assert not font_store.is_valid("c.ttf")
+
+    font_store.write_font("d.ttf", b"x" * 100)
+    with open(font_store.local_path("d.ttf"), "wb") as f:
+        f.write(b"y" * 100)  # 同サイズで中身違い → 高速チェックは通り、full で落ちる
+    assert font_store.is_valid("d.ttf")
+    assert not font_store.is_valid("d.ttf", full=True)
+
+
+class _FakeQuery:
+    def __init__(self, result):
+        self._result = result
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    def first(self):
+        return self._result
+
+
+class _FakeDB:
+    def __init__(self, asset):
+        self._asset = asset
+
+    def query(self, model):
+        return _FakeQuery(self._asset if model is flyer_helpers.Asset else None)
+
+
+class _Asset:
+    image_filename = "e.ttf"
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {"Content-Length": str(len(content))}
+
+
+def test_concurrent_requests_fetch_once(monkeypatch):
+    calls = []
+
+    def _slow_get(url, timeout=None):
+        calls.append(url)
+        time.sleep(0.05)
+        return _Response(b"F" * 200)
+
+    monkeypatch.setattr(flyer_helpers, "get_image_url", lambda name: f"https://storage/{name}")
+    monkeypatch.setattr(flyer_helpers.requests, "get", _slow_get)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flyer_helpers.provision_font_file(_FakeDB(_Asset()), "e.ttf")))
+        for _ in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(s for s, _ in results) == ["cached"] * 5 + ["downloaded_url"]
+    assert all(p == font_store.local_path("e.ttf") for _, p in results)
+
+
+def test_corrupt_local_file_is_refetched(monkeypatch):
+    font_store.write_font("e.ttf", b"F" * 200)
+    with open(font_store.local_path("e.ttf"), "wb") as f:
+        f.write(b"F" * 10)
+
+    monkeypatch.setattr(flyer_helpers, "get_image_url", lambda name: f"https://storage/{name}")
+    monkeypatch.setattr(flyer_helpers.requests, "get", lambda url, timeout=None: _Response(b"F" * 200))
+    status, path = flyer_helpers.provision_font_file(_FakeDB(_Asset()), "e.ttf")
+    assert status == "downloaded_url"
+    assert os.path.getsize(path) == 200
+
+
+def test_file_path_url_not_opened_outside_local_backend(tmp_path, monkeypatch):
+    local = tmp_path / "elsewhere.ttf"
+    local.write_bytes(b"F" * 200)
+    monkeypatch.setattr(flyer_helpers, "get_image_url", lambda name: str(local))
+    assert flyer_helpers.provision_font_file(_FakeDB(_Asset()), "e.ttf") == ("not_found", None)
+    assert not os.path.exists(font_store.local_path("e.ttf"))
@@ -73,6 +73,7 @@ def test_generation_service_is_streamlit_free(monkeypatch):
 
         assert callable(gs.build_summary_text_for_project)
         assert callable(gs.render_grid_png_for_project)
+        assert callable(gs.render_flyer_png_for_project)
         # (b) streamlit を引く連鎖を一切持たない
         assert "streamlit" not in sys.modules
         assert "services.session_manager" not in sys.modules
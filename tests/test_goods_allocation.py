@@ -0,0 +1,138 @@
+"""
+models.goods_allocation(物販ブースの占有集計と割り当て提案)のテスト。
+
+- booth_usage の最大同時数が総当たり(1 分刻みの数え上げ)と一致する
+- suggest_places は必要最小ブース数ちょうどで、同じ place の枠が重ならない
+- 最少ブース数を崩さない範囲で既存の place を残す / apply_places でドラフト行へ反映される
+- 80 組超の表でも一瞬で終わる
+
+DB / Streamlit 不要(python3 tests/test_goods_allocation.py でも回る)。
+"""
+from __future__ import annotations
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from constants import PLACE_OPTIONS  # noqa: E402
+from models.goods_allocation import (  # noqa: E402
+    ADD,
+    MAIN,
+    apply_places,
+    booth_usage,
+    changed_slots,
+    goods_slots,
+    required_booths,
+    suggest_places,
+)
+from models.timetable import TimetableRowDraft  # noqa: E402
+from models.timetable_flow import format_hhmm  # noqa: E402
+
+
+def _random_rows(rnd, n):
+    rows = []
+    for i in range(n):
+        start = rnd.randint(10 * 60, 20 * 60)
+        row = TimetableRowDraft(
+            artist_name=f"A{i}",
+            goods_start_time=format_hhmm(start),
+            goods_duration=rnd.choice([0, 30, 45, 60, 90]),
+            place=rnd.choice(["", "A", "B", "C"]),
+        )
+        if rnd.random() < 0.3:
+            row.add_goods_start_time = format_hhmm(start + 120)
+            row.add_goods_place = rnd.choice(["", "A", "D"])
+        rows.append(row)
+    return rows
+
+
+def _max_concurrent(slots):
+    if not slots:
+        return 0
+    return max(sum(1 for s in slots if s.start <= t < s.end)
+               for t in range(min(s.start for s in slots), max(s.end for s in slots)))
+
+
+def test_booth_usage_matches_brute_force():
+    rnd = random.Random(3)
+    for _ in range(30):
+        slots = goods_slots(_random_rows(rnd, rnd.randint(0, 30)))
+        for u in booth_usage(slots):
+            same = [s for s in slots if s.place == u.place]
+            assert u.slots == len(same)
+            assert u.peak == _max_concurrent(same)
+            assert sum(1 for s in same if s.start <= u.peak_start < s.end) == u.peak
+        assert required_booths(slots) == _max_concurrent(slots)
+
+
+def test_suggestion_uses_fewest_booths_without_overlap():
+    rnd = random.Random(5)
+    for _ in range(30):
+        rows = _random_rows(rnd, rnd.randint(1, 40))
+        slots = goods_slots(rows)
+        assignment = suggest_places(slots, PLACE_OPTIONS)
+        assert len(set(assignment.values())) == required_booths(slots)
+
+        applied = goods_slots(apply_places(rows, assignment))
+        assert all(u.peak <= 1 for u in booth_usage(applied))
+        assert changed_slots(applied, suggest_places(applied, PLACE_OPTIONS)) == []
+
+
+def test_valid_assignment_is_kept_and_post_goods_acts_skipped():
+    rows = [
+        TimetableRowDraft(artist_name="X", goods_start_time="11:00", goods_duration=60, place="C"),
+        TimetableRowDraft(artist_name="Y", goods_start_time="11:30", goods_duration=60, place="C",
+                          add_goods_start_time="13:00", add_goods_place="B"),
+        TimetableRowDraft(artist_name="Z", goods_start_time="11:30", goods_duration=60, place="C",
+                          is_post_goods=True),
+    ]
+    slots = goods_slots(rows)
+    assert [(s.row_index, s.which) for s in slots] == [(0, MAIN), (1, MAIN), (1, ADD)]
+    # C はそのまま。追加枠(13:00)は B を新設せず空いている A / C のうち先頭の A へ(最少ブース優先)
+    assignment = suggest_places(slots, PLACE_OPTIONS)
+    assert assignment == {(0, MAIN): "C", (1, MAIN): "A", (1, ADD): "A"}
+
+    new_rows = apply_places(rows, assignment)
+    assert new_rows[0] is rows[0] and new_rows[2] is rows[2]
+    assert (new_rows[1].place, new_rows[1].add_goods_place, rows[1].place) == ("A", "A", "C")
+
+
+def test_large_table_is_fast():
+    rows = _random_rows(random.Random(11), 200)
+    t0 = time.perf_counter()
+    slots = goods_slots(rows)
+    booth_usage(slots)
+    try:
+        suggest_places(slots, PLACE_OPTIONS)
+    except ValueError:
+        pass  # ブース候補(A-Z)を超える同時数になりうる
+    assert time.perf_counter() - t0 < 0.5
+
+
+_TESTS = [
+    test_booth_usage_matches_brute_force,
+    test_suggestion_uses_fewest_booths_without_overlap,
+    test_valid_assignment_is_kept_and_post_goods_acts_skipped,
+    test_large_table_is_fast,
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for t in _TESTS:
+        name = t.__name__
+        try:
+            t()
+            print(f"PASS  {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL  {name}: {e}")
+        except Exception as e:
+            failed += 1
+            print(f"ERROR {name}: {type(e).__name__}: {e}")
+    print()
+    print(f"=== {len(_TESTS) - failed} / {len(_TESTS)} passed ===")
+    sys.exit(0 if failed == 0 else 1)
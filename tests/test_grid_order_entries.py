@@ -0,0 +1,113 @@
+"""grid_order_entries(grid_order_json の order の索引)のテスト。
+
+- apply_draft / duplicate_project で entries が order と同じ並びに同期される
+- backfill は既存 JSON(dict / 裸 list)から埋め、壊れた JSON は飛ばし、2 回目は何もしない
+- reassign_grid_orders は索引で引いたプロジェクトだけを読み、結果は旧実装(全件走査)と同じ
+- query_project_list(featuring=...) / project_service.list_projects_featuring
+"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from database import GridOrderEntry, TimetableProject
+from repositories import project_repo
+from services import project_service
+
+_GRIDS = {
+    1: json.dumps({"order": ["A", "B", "C"], "alignment": "中央揃え"}, ensure_ascii=False),
+    2: json.dumps(["B", "D"]),
+    3: json.dumps({"order": ["C", "A"]}),
+    4: "{broken",
+    5: None,
+    6: json.dumps({"row_counts_str": "5,5"}),
+}
+
+
+@pytest.fixture
+def factory(sqlite_db):
+    factory = sqlite_db(project_service)
+    db = factory()
+    for pid, raw in _GRIDS.items():
+        db.add(TimetableProject(id=pid, title=f"P{pid}", event_date=f"2025-01-0{pid}", grid_order_json=raw))
+    db.commit()
+    db.close()
+    return factory
+
+
+def _entries(db):
+    out = {}
+    for e in db.query(GridOrderEntry).order_by(GridOrderEntry.project_id, GridOrderEntry.position):
+        out.setdefault(e.project_id, []).append(e.artist_name)
+    return out
+
+
+def _legacy_reassign(grids, old, new):
+    out = dict(grids)
+    for pid, raw in grids.items():
+        try:
+            updated = project_repo._reassign_grid_json(raw, old, new)
+        except json.JSONDecodeError:
+            continue
+        if updated is not None:
+            out[pid] = updated
+    return out
+
+
+def test_backfill_from_json_is_idempotent(factory):
+    db = factory()
+    assert project_repo.backfill_grid_order_entries(db) == 3
+    db.commit()
+    assert _entries(db) == {1: ["A", "B", "C"], 2: ["B", "D"], 3: ["C", "A"]}
+    assert project_repo.backfill_grid_order_entries(db) == 0
+    db.close()
+
+
+def test_apply_draft_and_duplicate_keep_entries_in_sync(factory):
+    db = factory()
+    project_repo.backfill_grid_order_entries(db)
+    db.commit()
+
+    proj = project_repo.get_project(db, 1)
+    draft = project_repo.to_draft(proj)
+    draft.grid_settings["order"] = ["C", "E", "A"]
+    project_repo.apply_draft(proj, draft)
+    db.commit()
+    assert _entries(db)[1] == ["C", "E", "A"]
+
+    copy = project_repo.duplicate_project(db, 1)
+    assert _entries(db)[copy.id] == ["C", "E", "A"]
+    assert project_repo.delete_project(db, copy.id)
+    assert copy.id not in _entries(db)
+    db.close()
+
+
+def test_reassign_uses_index_and_matches_legacy(factory):
+    db = factory()
+    project_repo.backfill_grid_order_entries(db)
+    db.commit()
+    expected = _legacy_reassign(_GRIDS, "A", "B")
+
+    del factory.statements[:]
+    assert project_repo.reassign_grid_orders(db, "A", "B") == 2
+    db.commit()
+    selects = [s for s in factory.statements if s.lstrip().startswith("SELECT")]
+    # 索引で引いた 2 件(1, 3)だけを読む(全件 SELECT をしない)
+    assert not any("grid_order_entries" not in s and "projects_v4.grid_order_json" in s for s in selects)
+
+    grids = {p.id: p.grid_order_json for p in db.query(TimetableProject)}
+    assert grids == expected
+    assert json.loads(grids[1]) == {"order": ["B", "C"], "alignment": "中央揃え"}
+    assert _entries(db) == {1: ["B", "C"], 2: ["B", "D"], 3: ["C", "B"]}
+    db.close()
+
+
+def test_projects_featuring_artist(factory):
+    db = factory()
+    project_repo.backfill_grid_order_entries(db)
+    db.commit()
+    db.close()
+    assert [v.id for v in project_service.list_projects_featuring("C")] == [3, 1]
+    assert [v.id for v in project_service.list_projects_featuring("B")] == [2, 1]
+    assert project_service.list_projects_featuring("Z") == []
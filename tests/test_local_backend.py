@@ -0,0 +1,107 @@
+"""ローカルバックエンド(EVENT_APP_BACKEND=local: SQLite + ファイル保存)のテスト。
+
+- Supabase の設定(SUPABASE_*)無しで database を import でき、Supabase クライアントを作らない
+- init_db で SQLite にテーブルができ、service(作成・一覧)がそのまま動く
+- upload_image_to_supabase は LOCAL_STORAGE_DIR に書き、get_image_url はファイルパス
+  (LOCAL_STORAGE_URL があればその URL)を返す。描画側のローダーがそのパスを読める
+- LOCAL_STORAGE_DIR の外を指すファイル名は保存しない / 外を指すパスは読まない
+- ローカルバックエンド以外では、画像 URL の代わりにファイルパスが来ても開かない
+- Bot は /storage で画像を配信する
+
+database は import 時に設定を確定させるので、env を変えた別プロセスで検証する。
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_SCRIPT = textwrap.dedent("""
+    import io, json, os
+    from PIL import Image
+
+    import database
+    from services import artist_service
+    import logic_grid
+
+    database.init_db()
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 20), (255, 0, 0)).save(buf, format="PNG")
+    with open("outside.png", "wb") as f:
+        f.write(buf.getvalue())
+    photo = io.BytesIO(buf.getvalue())
+    photo.name = "photo.png"
+    view, status = artist_service.create_artist("A", photo)
+    path = database.get_image_url(view.image_filename)
+    bad = io.BytesIO(b"x")
+    out = {
+        "supabase": database.supabase is None,
+        "db": database.engine.url.get_backend_name(),
+        "status": status,
+        "names": [a.name for a in artist_service.list_artists()],
+        "stored": os.listdir(os.environ["LOCAL_STORAGE_DIR"]),
+        "path": path,
+        "size": None if path.startswith("http") else list(logic_grid.load_image_from_url(path).size),
+        "missing": database.get_image_url("nope.png"),
+        "escape": database.upload_image_to_supabase(bad, "../escape.png"),
+        "outside": logic_grid.load_image_from_url(os.path.abspath("outside.png")),
+    }
+    if not path.startswith("http"):
+        os.environ["EVENT_API_KEY"] = "k"
+        from fastapi.testclient import TestClient
+        from bot import main
+        r = TestClient(main.app).get("/storage/" + view.image_filename)
+        out["http"] = [r.status_code, len(r.content) == len(buf.getvalue())]
+    print(json.dumps(out))
+""")
+
+
+def _run(tmp_path, **extra):
+    env = {k: v for k, v in os.environ.items() if not k.startswith("SUPABASE_") and k != "DB_URL"}
+    env.update({
+        "EVENT_APP_BACKEND": "local",
+        "LOCAL_DB_URL": f"sqlite:///{tmp_path / 'local.db'}",
+        "LOCAL_STORAGE_DIR": str(tmp_path / "storage"),
+        "PYTHONPATH": REPO_ROOT,
+    })
+    env.update(extra)
+    proc = subprocess.run(
+        [sys.executable, "-c", _SCRIPT], cwd=str(tmp_path), env=env,
+        capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_local_backend_without_supabase(tmp_path):
+    out = _run(tmp_path)
+    assert out["supabase"] is True and out["db"] == "sqlite"
+    assert out["status"] == "created" and out["names"] == ["A"]
+    assert len(out["stored"]) == 1 and out["stored"][0].endswith(".png")
+    assert out["path"] == str(tmp_path / "storage" / out["stored"][0])
+    assert out["size"] == [40, 20]
+    assert out["missing"] is None
+    assert out["escape"] is None and not (tmp_path / "escape.png").exists()
+    assert out["outside"] is None
+    assert out["http"] == [200, True]
+
+
+def test_local_storage_url(tmp_path):
+    out = _run(tmp_path, LOCAL_STORAGE_URL="http://127.0.0.1:8000/storage/")
+    assert out["path"] == f"http://127.0.0.1:8000/storage/{out['stored'][0]}"
+    assert out["missing"] == "http://127.0.0.1:8000/storage/nope.png"
+
+
+
+def test_file_paths_ignored_outside_local_backend(tmp_path):
+    from PIL import Image
+
+    import logic_grid
+
+    path = tmp_path / "a.png"
+    Image.new("RGB", (4, 4)).save(path)
+    assert logic_grid.load_image_from_url(str(path)) is None
@@ -0,0 +1,136 @@
+"""utils/pdf_export(業務用 PDF の組み立て・一括出力)のテスト。
+
+- 日本語フォントの登録はプロセスで 1 回だけ(2 回目以降は registerFont を呼ばない)
+- タイムテーブル表は LongTable でヘッダ行を各ページに繰り返す
+- write_timetables_pdf は複数プロジェクトを 1 つの PDF にしてファイルへ直接書く(0 件なら書かない)。
+  次のプロジェクトは前の 1 件を描き終えてから読む
+- 従来 API(create_business_pdf / create_event_summary_pdf)は BytesIO の PDF を返す
+- イベント資料は画像を表示サイズ × DPI の JPEG(DCTDecode)で埋め込み、同じ画像は 1 回だけ入る
+
+utils の import が database(import 時に secrets/env 必須)を引くため、
+read-only secrets を注入する conftest 前提で .venv 実行を想定。DB/ネットワークには触れない。
+"""
+from __future__ import annotations
+
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+from reportlab.platypus import LongTable
+
+import utils
+from utils import pdf_export
+
+
+_PROJECT = type("P", (), {
+    "id": 1, "title": "T", "event_date": "2025-01-01", "venue_name": "V", "venue_url": "",
+    "tickets_json": '[{"name": "前売", "price": "3000"}]', "free_text_json": None,
+})()
+
+
+def _calc_df(n):
+    return pd.DataFrame({
+        "TIME_DISPLAY": [f"{10 + i // 6:02d}:{(i % 6) * 10:02d}-" for i in range(n)],
+        "ARTIST": ["開演前物販"] + [f"アーティスト{i}" for i in range(1, n)],
+        "DURATION": [0] + [20] * (n - 1),
+        "ADJUSTMENT": [0] + [5] * (n - 1),
+        "GOODS_DISPLAY": ["10:00-11:00 / 12:00-13:00"] * n,
+        "PLACE": ["A / B"] * n,
+    })
+
+
+@pytest.fixture
+def fresh_font_cache():
+    pdf_export.pdf_font_name.cache_clear()
+    yield
+    pdf_export.pdf_font_name.cache_clear()
+
+
+def test_font_registered_once(monkeypatch, fresh_font_cache):
+    calls = []
+    register = pdf_export.pdfmetrics.registerFont
+
+    def counting_register(font):
+        calls.append(font)
+        register(font)
+
+    monkeypatch.setattr(pdf_export.pdfmetrics, "getRegisteredFontNames", lambda: [])
+    monkeypatch.setattr(pdf_export.pdfmetrics, "registerFont", counting_register)
+    for _ in range(3):
+        utils.create_business_pdf(_calc_df(3), "T", "2025-01-01", "V")
+        utils.create_event_summary_pdf(_PROJECT)
+    assert [f.fontName for f in calls if f.fontName == pdf_export.CID_FONT_NAME] == [pdf_export.CID_FONT_NAME]
+
+
+def test_long_table_repeats_header():
+    elements = pdf_export.timetable_flowables(_calc_df(5), "T", "2025-01-01", "V")
+    table = elements[-1]
+    assert isinstance(table, LongTable)
+    assert table.repeatRows == 1
+    assert pdf_export.timetable_rows(_calc_df(2))[1] == ["10:00-", "開演前物販", "-", "-", "10:00-11:00\n12:00-13:00", "A\nB"]
+
+
+def test_batch_export_writes_one_pdf(tmp_path):
+    path = tmp_path / "all.pdf"
+    sections = ((_calc_df(60), f"Event {i}", "2025-01-0%d" % i, "V") for i in range(1, 4))
+    assert pdf_export.write_timetables_pdf(sections, str(path)) == 3
+    data = path.read_bytes()
+    assert data.startswith(b"%PDF")
+    assert data.count(b"/Type /Page\n") >= 6  # 60 行は 2 ページ以上 × 3 件
+
+    empty = tmp_path / "empty.pdf"
+    assert pdf_export.write_timetables_pdf(iter(()), str(empty)) == 0
+    assert not empty.exists()
+
+
+def test_batch_export_reads_sections_one_at_a_time(tmp_path, monkeypatch):
+    events = []
+    draw = LongTable.drawOn
+    monkeypatch.setattr(LongTable, "drawOn", lambda self, *a, **k: events.append("draw") or draw(self, *a, **k))
+
+    def sections():
+        for i in range(3):
+            events.append(f"read {i}")
+            yield _calc_df(60), f"Event {i}", "2025-01-01", "V"
+
+    assert pdf_export.write_timetables_pdf(sections(), str(tmp_path / "all.pdf")) == 3
+    # 次の 1 件は前の 1 件の表を描き終えてから読む(全件を先に読み込まない)
+    reads = [i for i, e in enumerate(events) if e.startswith("read")]
+    assert all("draw" in events[a:b] for a, b in zip(reads, reads[1:]))
+
+
+def test_legacy_api_returns_pdf_buffer():
+    buf = utils.create_business_pdf(_calc_df(4), "T", "2025-01-01", "V")
+    assert buf.read(4) == b"%PDF"
+
+
+def test_event_pack_embeds_downsampled_jpeg_once(tmp_path):
+    rng = np.random.default_rng(0)
+    grid = Image.fromarray(rng.integers(0, 255, (3000, 2400, 4), dtype=np.uint8), "RGBA")
+    tt = Image.fromarray(rng.integers(0, 255, (2000, 1200, 3), dtype=np.uint8), "RGB")
+    path = tmp_path / "pack.pdf"
+    pdf_export.write_event_pack_pdf(str(path), _PROJECT, _calc_df(10), [
+        ("grid", grid), ("tt", tt), ("grid again", grid), ("missing", None),
+    ])
+    data = path.read_bytes()
+    assert data.count(b"/Type /Page\n") == 5  # 概要 + 表 + 画像 3 ページ
+    assert data.count(b"/DCTDecode") == 2     # 同じ grid 画像は 1 回だけ
+    widths = [int(m) for m in re.findall(rb"/DCTDecode \][^>]*?/Width (\d+)", data)]
+    # A4 の本文枠(約 451pt 幅)× 150dpi ≒ 940px 以下まで縮小されている
+    assert len(widths) == 2 and max(widths) < 1000
+    assert path.stat().st_size < 2_000_000
+
+
+def test_jpeg_pool_reuses_encoding(monkeypatch):
+    calls = []
+    encode = pdf_export._jpeg_bytes
+    monkeypatch.setattr(pdf_export, "_jpeg_bytes", lambda *a: calls.append(a[1]) or encode(*a))
+    img = Image.new("RGB", (1000, 500), (10, 20, 30))
+    with pdf_export.JpegImagePool(dpi=72) as pool:
+        a = pool.flowable(img, 400, 400)
+        b = pool.flowable(img, 400, 400)
+        assert a.filename == b.filename
+        assert (a.drawWidth, a.drawHeight) == (400, 200)
+    assert calls == [(400, 200)]
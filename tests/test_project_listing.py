@@ -0,0 +1,80 @@
+"""プロジェクト一覧(project_repo.query_project_list / project_service.list_project_summary_page)のテスト。
+
+- 並びは旧実装(全件取得 → Python で event_date 降順の安定ソート)と同じ
+- keyset ページングをどの limit で辿っても、全件一覧と同じ並び・重複/欠落なし
+- summary_only は JSON 列を読まない(to_summary_view も追加 SELECT を起こさない)
+- date_from / date_to で event_date を絞る
+"""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from database import TimetableProject
+from repositories import project_repo
+from services import project_service
+
+
+@pytest.fixture
+def session_factory(sqlite_db):
+    factory = sqlite_db(project_service)
+    rnd = random.Random(1)
+    db = factory()
+    dates = [None, "2025-01-01", "2025-01-01", "2025-02-10", "2024-12-31", "2025-03-03"]
+    for i in range(1, 41):
+        db.add(TimetableProject(
+            id=i, title=f"P{i}", event_date=rnd.choice(dates),
+            flyer_json="{}" * 100, settings_json="{}", grid_order_json="{}",
+        ))
+    db.commit()
+    db.close()
+    return factory
+
+
+def _legacy_order(db):
+    projects = db.query(TimetableProject).order_by(TimetableProject.id).all()
+    projects.sort(key=lambda x: x.event_date or "0000-00-00", reverse=True)
+    return [p.id for p in projects]
+
+
+def test_sql_order_matches_legacy_sort(session_factory):
+    db = session_factory()
+    assert [p.id for p in project_repo.list_projects(db)] == _legacy_order(db)
+    db.close()
+
+
+def test_keyset_pages_cover_full_list(session_factory):
+    db = session_factory()
+    expected = _legacy_order(db)
+    db.close()
+    for limit in (1, 3, 7, 40, 100):
+        ids, cursor, pages = [], None, 0
+        while True:
+            views, cursor = project_service.list_project_summary_page(limit=limit, cursor=cursor)
+            ids += [v.id for v in views]
+            pages += 1
+            if cursor is None:
+                break
+        assert ids == expected
+        assert pages == max(1, -(-len(expected) // limit))
+
+
+def test_summary_only_skips_json_columns(session_factory):
+    db = session_factory()
+    statements = session_factory.statements
+    del statements[:]
+    projects = project_repo.query_project_list(db, summary_only=True)
+    views = [project_repo.to_summary_view(p) for p in projects]
+    assert len(statements) == 1
+    assert "flyer_json" not in statements[0] and "data_json" not in statements[0]
+    assert views[0].flyer_json is None and views[0].title
+    db.close()
+
+
+def test_date_filter_and_bad_cursor(session_factory):
+    views, cursor = project_service.list_project_summary_page(date_from="2025-01-01", date_to="2025-02-28")
+    assert cursor is None
+    assert views and {v.event_date for v in views} <= {"2025-01-01", "2025-02-10"}
+    with pytest.raises(ValueError):
+        project_service.list_project_summary_page(limit=5, cursor="not-a-cursor")
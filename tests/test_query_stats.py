@@ -0,0 +1,107 @@
+"""utils.query_stats(SQL の文数・時間の計測と N+1 検出)のテスト。
+
+- track はスコープ内の文を数え、入れ子なら外側にも数える / 同じ SQL の繰り返しを N+1 の疑いとして出す
+- 遅い文は呼び出し元(リポジトリ内のフレーム)付きで warning になる
+- query_budget は宣言した文数を超えたら AssertionError(conftest の query_budget フィクスチャ)
+- タイムテーブル画像の生成は行数によらず Artist を 1 文で引く(行ごとの N+1 が無い)
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+
+import database
+import logic_timetable
+from database import Artist, TimetableProject
+from models import TimetableRowDraft
+from repositories import timetable_repo
+from utils import query_stats
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db(database)()
+    session.add(TimetableProject(id=1, title="P"))
+    session.add_all([Artist(name=f"A{i}") for i in range(12)] + [Artist(name="A3"), Artist(name="Gone", is_deleted=True)])
+    session.commit()
+    yield session
+    session.close()
+
+
+class _Log:
+    def __init__(self):
+        self.warnings = []
+
+    def warning(self, msg, *a, **k):
+        self.warnings.append(msg)
+
+    def debug(self, msg, *a, **k):
+        pass
+
+
+def test_track_counts_nested_and_flags_repeats(db, monkeypatch):
+    log = _Log()
+    monkeypatch.setattr(query_stats, "logger", log)
+    with query_stats.track("outer") as outer:
+        db.execute(text("SELECT 1"))
+        with query_stats.track("inner") as inner:
+            for i in range(query_stats.REPEATED_QUERIES):
+                db.execute(text("SELECT name FROM artists WHERE id = :i"), {"i": i})
+            assert query_stats.current() is inner
+    assert query_stats.current() is None
+    assert inner.count == query_stats.REPEATED_QUERIES
+    assert outer.count == inner.count + 1
+    assert outer.total_ms >= inner.total_ms
+
+    sql, n, site = inner.repeated()[0]
+    assert n == query_stats.REPEATED_QUERIES
+    assert site.startswith("tests/test_query_stats.py:")
+    # 内側・外側の両方が終わりに N+1 の疑いを出す
+    assert len([w for w in log.warnings if "N+1" in w]) == 2
+
+
+def test_slow_query_logged_with_call_site(db, monkeypatch):
+    log = _Log()
+    monkeypatch.setattr(query_stats, "logger", log)
+    monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0.0)
+    query_stats.install()
+    db.execute(text("SELECT 2"))  # track の外でも遅い文は出す
+    assert len(log.warnings) == 1
+    assert "test_slow_query_logged_with_call_site" in log.warnings[0]
+    assert "SELECT 2" in log.warnings[0]
+
+
+def test_query_budget_fails_when_exceeded(db):
+    with query_stats.query_budget(2) as stats:
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT 2"))
+    assert stats.count == 2
+    with pytest.raises(AssertionError, match=r"query budget exceeded: 3 > 2"):
+        with query_stats.query_budget(2):
+            for _ in range(3):
+                db.execute(text("SELECT 3"))
+
+
+def test_timetable_image_resolves_artists_in_one_query(db, query_budget):
+    rows = [["12:00", "OPEN / START", "", ""]]
+    rows += [[f"12:{i:02d}", f"A{i}", "", ""] for i in range(12)]
+    rows += [["13:00", "A3", "", ""], ["13:30", "Gone", "", ""]]
+    # 完全一致は IN 1 回、見つからない名前("Gone")だけ ilike で 1 回
+    with query_budget(2):
+        img = logic_timetable.generate_timetable_image(rows)
+    assert img.size[0] > 0
+
+
+def test_unchanged_rows_save_is_one_select(db, query_budget):
+    drafts = [TimetableRowDraft(artist_name=f"A{i}", duration=20) for i in range(20)]
+    timetable_repo.save_rows(db, 1, drafts)
+    db.commit()
+    with query_budget(1):
+        timetable_repo.save_rows(db, 1, drafts)
+
+
+def test_flush_statements_point_at_the_commit(db):
+    with query_stats.track("flush", report=False) as stats:
+        db.add(Artist(name="New"))
+        db.commit()
+    assert stats.records and all(r.site.startswith("tests/test_query_stats.py:") for r in stats.records)
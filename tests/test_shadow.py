@@ -0,0 +1,58 @@
+"""utils/shadow(影パイプライン)の不変条件テスト。
+
+- 太さ 0・ぼかし 0 → 形はそのまま、不透明度だけが掛かる
+- 太さ → 楕円カーネルで spread px だけ外へ広がる(上下左右は spread ちょうど)
+- ぼかし → 総量(アルファ合計)をほぼ保存し、縮小経路(大半径)でも寸法は不変
+- 着色 → RGB は影色一色(縁が黒ずまない)
+
+utils の import が database(import 時に secrets/env 必須)を引くため、
+read-only secrets を注入する conftest 前提で .venv 実行を想定。DB/ネットワークには触れない。
+"""
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from utils.shadow import LARGE_BLUR_SIGMA, blur_alpha, dilate_alpha, render_shadow
+
+
+def _square_mask(size=(120, 80), box=(40, 20, 79, 59)):
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rectangle(box, fill=255)
+    return mask
+
+
+def test_no_spread_no_blur_applies_opacity_only():
+    mask = _square_mask()
+    layer = render_shadow(mask, (10, 20, 30), opacity=128, spread=0, blur=0)
+    a = np.asarray(layer.getchannel("A"))
+    assert layer.size == mask.size
+    assert a[40, 60] == 128
+    assert a[0, 0] == 0
+
+
+def test_dilate_extends_by_spread():
+    alpha = np.zeros((50, 50), dtype=np.uint8)
+    alpha[25, 25] = 255
+    out = dilate_alpha(alpha, 4)
+    assert out[25, 21] == 255 and out[25, 29] == 255
+    assert out[21, 25] == 255 and out[29, 25] == 255
+    assert out[25, 20] == 0
+    # 楕円なので対角の角 (±4, ±4) は塗られない
+    assert out[21, 21] == 0
+
+
+def test_blur_preserves_mass_and_size():
+    alpha = np.asarray(_square_mask(size=(200, 160), box=(70, 50, 129, 109)))
+    for sigma in (2, LARGE_BLUR_SIGMA + 6):
+        out = blur_alpha(alpha, sigma)
+        assert out.shape == alpha.shape
+        # 矩形の縁が内外ともになだらかになっている = ぼけている
+        assert 0 < out[80, 68] < 255 and 0 < out[80, 71] < 255
+        assert abs(int(out.sum()) - int(alpha.sum())) / alpha.sum() < 0.02
+
+
+def test_shadow_rgb_is_uniform():
+    layer = render_shadow(_square_mask(), (200, 50, 0), opacity=255, spread=2, blur=4)
+    rgb = np.asarray(layer.convert("RGBA"))[..., :3].reshape(-1, 3)
+    assert (rgb == np.array([200, 50, 0])).all()
@@ -0,0 +1,115 @@
+"""
+models.stage_schedule(複数ステージの重複検出)のテスト。
+
+- IntervalTree の重なり検索が総当たりと一致する(半開区間・接する区間は重ならない)
+- 別ステージでの同一アーティストの出演重複を検出する(表記ゆれは NFKC で同一視)
+- 同じ物販ブース(place)の物販枠の重なりを、ステージをまたいでも同一ステージ内でも検出する
+
+DB / Streamlit 不要(python3 tests/test_stage_schedule.py でも回る)。
+"""
+from __future__ import annotations
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models.stage_schedule import (  # noqa: E402
+    ARTIST_DOUBLE_BOOKING,
+    GOODS_BOOTH_OVERLAP,
+    IntervalTree,
+    Slot,
+    StageTimetable,
+    find_conflicts,
+)
+from models.timetable import TimetableRowDraft  # noqa: E402
+
+
+def _act(name, duration, adjustment=0, **kw):
+    return TimetableRowDraft(artist_name=name, duration=duration, adjustment=adjustment, **kw)
+
+
+def test_interval_tree_matches_brute_force():
+    rnd = random.Random(7)
+    for _ in range(50):
+        slots = []
+        for i in range(rnd.randint(0, 60)):
+            s = rnd.randint(0, 300)
+            slots.append(Slot("S", "act", "K", str(i), s, s + rnd.randint(1, 60), i))
+        tree = IntervalTree(slots)
+        for _ in range(20):
+            qs = rnd.randint(-10, 320)
+            qe = qs + rnd.randint(1, 80)
+            expected = sorted((x for x in slots if x.start < qe and qs < x.end), key=lambda x: (x.start, x.end))
+            assert sorted(tree.overlapping(qs, qe), key=lambda x: (x.start, x.end)) == expected
+        pairs = {(a.row_index, b.row_index) for a, b in tree.overlapping_pairs()}
+        brute = {
+            (a.row_index, b.row_index)
+            for ia, a in enumerate(tree.slots) for b in tree.slots[ia + 1:]
+            if a.start < b.end and b.start < a.end
+        }
+        assert pairs == brute
+
+
+def test_artist_double_booked_across_stages():
+    main = StageTimetable("Main", "10:00", [_act("A", 30, 5), _act("B", 20)])
+    # Sub: C 10:00-10:20 → " Ｂ "(=B) 10:20-10:40 は Main の B(10:35-10:55)と重なる
+    sub = StageTimetable("Sub", "10:00", [_act("C", 20), _act(" Ｂ ", 20)])
+    conflicts = find_conflicts([main, sub])
+    assert [(c.kind, c.key) for c in conflicts] == [(ARTIST_DOUBLE_BOOKING, "B")]
+    assert conflicts[0].describe() == "Ｂ: Sub と Main で出演時間が重複 (10:35-10:40)"
+
+    # 入れ替わりちょうど(終了 == 開始)は重複ではない
+    sub_ok = StageTimetable("Sub", "10:00", [_act("C", 55), _act("B", 20)])
+    assert find_conflicts([main, sub_ok]) == []
+
+
+def test_goods_booth_overlap():
+    main = StageTimetable("Main", "10:00", [
+        _act("A", 30, goods_start_time="10:30", goods_duration=60, place="a"),
+        _act("B", 30, goods_start_time="11:00", goods_duration=60, place="B"),
+    ])
+    sub = StageTimetable("Sub", "10:00", [
+        _act("C", 30, goods_start_time="11:15", goods_duration=30, place="Ａ",
+             add_goods_start_time="13:00", add_goods_place="B"),
+    ])
+    conflicts = find_conflicts([main, sub])
+    assert [(c.kind, c.key, c.a.stage, c.b.stage) for c in conflicts] == [
+        (GOODS_BOOTH_OVERLAP, "A", "Main", "Sub"),
+    ]
+    assert conflicts[0].to_dict()["overlap_start"] == "11:15"
+
+    # 同一ステージ内の重なりも拾う / place 空・時間 0 は対象外
+    same = StageTimetable("Main", "10:00", [
+        _act("A", 30, goods_start_time="10:30", goods_duration=60, place="C"),
+        _act("B", 30, goods_start_time="11:00", goods_duration=60, place="C"),
+        _act("D", 30, goods_start_time="11:00", goods_duration=60, place=""),
+        _act("E", 30, goods_start_time="11:00", goods_duration=0, place="C"),
+    ])
+    assert [(c.key, c.a.label, c.b.row_index) for c in find_conflicts([same])] == [("C", "C", 1)]
+
+
+_TESTS = [
+    test_interval_tree_matches_brute_force,
+    test_artist_double_booked_across_stages,
+    test_goods_booth_overlap,
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for t in _TESTS:
+        name = t.__name__
+        try:
+            t()
+            print(f"PASS  {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL  {name}: {e}")
+        except Exception as e:
+            failed += 1
+            print(f"ERROR {name}: {type(e).__name__}: {e}")
+    print()
+    print(f"=== {len(_TESTS) - failed} / {len(_TESTS)} passed ===")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,137 @@
+"""タイムテーブル CSV 取り込み(models.timetable_csv / timetable_service.import_csv)のテスト。
+
+- 列単位の変換は旧 import_csv_callback の iterrows 版と同じ draft_rows / 開演時間を返す
+  (意図的な差分: 名前の strip・IS_POST_GOODS の空セル=False は除いた CSV で比較)
+- START / END と Adjustment が両方ある CSV でも、最終行の転換は Adjustment 列(旧実装どおり)
+- アーティストの照合は SELECT 1 文、未登録分の登録は INSERT 1 文(行数によらない)
+- report は matched / created / ambiguous を CSV の出現順で返し、2 回目の取り込みは何も登録しない
+"""
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+import pytest
+
+from database import Artist
+from models import POST_GOODS_ARTIST_NAME, PRE_GOODS_ARTIST_NAME, TimetableRowDraft
+from models.artist import ArtistImportReport
+from models.timetable_csv import parse_timetable_csv
+from services import artist_service, catalog_cache, timetable_service
+from utils import get_duration_minutes, safe_int, safe_str
+
+_CSV = """グループ名 ,START,END,持ち時間,物販開始,物販時間,物販場所,AddGoodsDuration
+A,12:00,12:20,20,12:30,60,B,
+B,12:25,12:45,20.5,,,,30
+,12:50,13:00,10,,,,
+開演前物販,13:00,13:10,10,,,,
+C,13:15,13:35,abc,13:40,45,A,
+A,13:30,13:50,20,,,C,
+"""
+
+
+def _legacy_parse(df_csv):
+    """旧 views/timetable.import_csv_callback の行組み立て(iterrows 版)の写し。"""
+    df_csv.columns = [c.strip() for c in df_csv.columns]
+    col_group = "グループ名" if "グループ名" in df_csv.columns else next(
+        (c for c in df_csv.columns if c.lower() == "artist"), df_csv.columns[0])
+    col_start = "START" if "START" in df_csv.columns else None
+    col_end = "END" if "END" in df_csv.columns else None
+    col_duration = "持ち時間" if "持ち時間" in df_csv.columns else "Duration"
+    col_adj = "Adjustment" if "Adjustment" in df_csv.columns else None
+    start = None
+    if not df_csv.empty and col_start:
+        first = str(df_csv.iloc[0].get(col_start, "")).strip()
+        if ":" in first:
+            h, m = map(int, first.split(":"))
+            start = f"{h:02d}:{m:02d}"
+    rows = []
+    for i, row in df_csv.iterrows():
+        name = str(row.get(col_group, ""))
+        if name == "nan" or not name or name in (PRE_GOODS_ARTIST_NAME, POST_GOODS_ARTIST_NAME):
+            continue
+        adjustment = 0
+        if col_start and col_end and i < len(df_csv) - 1:
+            current_end = str(row.get(col_end, "")).strip()
+            next_start = str(df_csv.iloc[i + 1].get(col_start, "")).strip()
+            if current_end and next_start:
+                adjustment = max(get_duration_minutes(current_end, next_start), 0)
+        elif col_adj:
+            adjustment = safe_int(row.get(col_adj), 0)
+        rows.append(TimetableRowDraft(
+            artist_name=name,
+            duration=safe_int(row.get(col_duration), 20),
+            adjustment=adjustment,
+            is_post_goods=bool(row.get("IS_POST_GOODS", False)),
+            goods_start_time=safe_str(row.get("物販開始") or row.get("GoodsStart")),
+            goods_duration=safe_int(row.get("物販時間") or row.get("GoodsDuration"), 60),
+            place=safe_str(row.get("物販場所") or row.get("Place") or "A"),
+            add_goods_start_time=safe_str(row.get("AddGoodsStart")),
+            add_goods_duration=safe_int(row.get("AddGoodsDuration"), None),
+            add_goods_place=safe_str(row.get("AddGoodsPlace")),
+        ))
+    return rows, start
+
+
+@pytest.mark.parametrize("csv", [
+    _CSV,
+    "artist,Duration,Adjustment,GoodsStart,GoodsDuration,Place,IS_POST_GOODS\n"
+    "X,30,5,18:00,,,False\nY,,-3,,90,D,True\n",
+    "name,Duration\nP,15\nQ,25\n",
+    "START,END,Artist\n9:05,9:25,Z\n",
+    "START,END,Artist,Adjustment\n10:00,10:20,X,7\n10:30,10:50,Y,9\n11:00,11:20,Z,4\n",
+    "START,END,Artist,Adjustment\n10:00,10:20,X,7\n10:30,10:50,Y,\n",
+])
+def test_parse_matches_legacy(csv):
+    parsed = parse_timetable_csv(pd.read_csv(io.StringIO(csv)))
+    rows, start = _legacy_parse(pd.read_csv(io.StringIO(csv)))
+    assert parsed.rows == rows
+    assert parsed.start_time == start
+    assert parsed.artist_names == list(dict.fromkeys(r.artist_name for r in rows))
+
+
+def test_last_row_adjustment_falls_back_to_column():
+    csv = "START,END,Artist,Adjustment\n10:00,10:20,X,7\n10:30,10:50,Y,9\n11:00,11:20,Z,4\n"
+    parsed = parse_timetable_csv(pd.read_csv(io.StringIO(csv)))
+    assert [r.adjustment for r in parsed.rows] == [10, 10, 4]
+
+
+def test_parse_strips_names_and_blank_post_goods_is_false():
+    csv = "artist,IS_POST_GOODS\n A ,True\nB,\n"
+    parsed = parse_timetable_csv(pd.read_csv(io.StringIO(csv)))
+    assert [(r.artist_name, r.is_post_goods) for r in parsed.rows] == [("A", True), ("B", False)]
+    assert parse_timetable_csv(pd.DataFrame()).rows == []
+
+
+@pytest.fixture
+def factory(sqlite_db):
+    factory = sqlite_db(artist_service)
+    db = factory()
+    db.add_all([Artist(name="A"), Artist(name="C"), Artist(name="C"), Artist(name="Old", is_deleted=True)])
+    db.commit()
+    db.close()
+    catalog_cache.clear()
+    yield factory
+    catalog_cache.clear()
+
+
+def _kinds(stats):
+    return [r.sql.split()[0] for r in stats.records]
+
+
+def test_import_resolves_and_registers_in_bulk(factory, query_budget):
+    csv = "グループ名,持ち時間\n" + "".join(f"N{i},20\n" for i in range(60)) + "A,20\nC,20\nOld,20\nN3,20\n"
+    # 照合 SELECT 1 文 + 複数行 INSERT 1 文(60 組でも往復は増えない)
+    with query_budget(2) as stats:
+        parsed, report = timetable_service.import_csv(io.BytesIO(csv.encode("cp932")))
+    assert _kinds(stats) == ["SELECT", "INSERT"]
+    assert len(parsed.rows) == 64
+    assert report == ArtistImportReport(
+        matched=("A", "Old"), created=tuple(f"N{i}" for i in range(60)), ambiguous=("C",),
+    )
+
+    with query_budget(1) as stats:
+        _, report = timetable_service.import_csv(io.BytesIO(csv.encode("utf-8")))
+    assert _kinds(stats) == ["SELECT"]
+    assert report.created == () and len(report.matched) == 62
+    assert [a.name for a in artist_service.list_artists()].count("N0") == 1
@@ -0,0 +1,314 @@
+"""
+models.timetable_flow(utils.calculate_timetable_flow の本体)の等価性テスト。
+
+旧実装(iterrows + strptime/strftime + safe_int/safe_str)を下に写経し、
+test_timetable_converters のフィクスチャ・dtype 揺れ・日付またぎ・読めない時刻・
+数千枠の表で、新実装の DataFrame が完全一致(列順・値・dtype)することを確かめる。
+差分計算(TimetableFlow.update)も、編集を重ねた結果が毎回一括計算と一致し、
+作り直す行が「時刻: 変更行以降」「物販のみ: その行だけ」に限られることを確かめる。
+
+DB / Streamlit 不要。pandas / numpy のみ(python3 tests/test_timetable_flow.py でも回る)。
+"""
+from __future__ import annotations
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# ファイル直接実行時、リポジトリ root と tests をパスに通す
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from models.timetable import draft_rows_to_df  # noqa: E402
+from models.timetable_flow import TimetableFlow, calculate_flow  # noqa: E402
+from test_timetable_converters import (  # noqa: E402
+    _EXPECTED_COLUMNS,
+    _make_normal_row,
+    _make_post_goods_row,
+    _make_pre_goods_row,
+)
+
+
+# ---------- 旧実装(utils/__init__.py の写経) ----------
+def _safe_int(val, default=0):
+    try:
+        if pd.isna(val) or str(val).strip() == "" or str(val).lower() in ["nan", "none"]:
+            return default
+        return int(float(val))
+    except Exception:
+        return default
+
+
+def _safe_str(val):
+    if pd.isna(val) or val is None or str(val).lower() == "nan":
+        return ""
+    return str(val)
+
+
+def _add_minutes(time_str, minutes):
+    try:
+        t = datetime.strptime(str(time_str), "%H:%M")
+        t += timedelta(minutes=int(minutes))
+        return t.strftime("%H:%M")
+    except Exception:
+        return str(time_str)
+
+
+def _legacy_flow(df, open_time, start_time):
+    calculated_rows = []
+    if open_time and start_time:
+        calculated_rows.append({
+            "TIME_DISPLAY": f"{open_time} - {start_time}", "ARTIST": "OPEN / START",
+            "DURATION": 0, "ADJUSTMENT": 0,
+            "GOODS_DISPLAY": "", "GOODS_START_MANUAL": "", "GOODS_DURATION": 0, "PLACE": "",
+            "ADD_GOODS_START": "", "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "",
+            "RAW_START": open_time, "RAW_END": start_time,
+        })
+    current_time = start_time
+    for _, row in df.iterrows():
+        artist_name = row["ARTIST"]
+        duration = _safe_int(row["DURATION"], 0)
+        adjustment = _safe_int(row["ADJUSTMENT"], 0)
+        if artist_name in ("開演前物販", "終演後物販"):
+            goods_start = _safe_str(row["GOODS_START_MANUAL"])
+            goods_dur = _safe_int(row["GOODS_DURATION"], 0 if artist_name == "開演前物販" else 60)
+            goods_end = ""
+            if goods_start and goods_dur > 0:
+                goods_end = _add_minutes(goods_start, goods_dur)
+            calculated_rows.append({
+                "TIME_DISPLAY": "", "ARTIST": artist_name, "DURATION": 0, "ADJUSTMENT": 0,
+                "GOODS_DISPLAY": f"{goods_start} - {goods_end}" if goods_start else "", "PLACE": "",
+                "GOODS_START_MANUAL": goods_start,
+                "GOODS_DURATION": goods_dur, "PLACE_RAW": "", "ADD_GOODS_START": "",
+                "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "", "RAW_START": "", "RAW_END": ""
+            })
+            continue
+
+        end_time = _add_minutes(current_time, duration)
+        next_start_time = _add_minutes(end_time, adjustment)
+        final_goods_display = ""
+        final_place_display = ""
+        if row.get("IS_POST_GOODS", False):
+            place = _safe_str(row["PLACE"])
+            final_goods_display = f"終演後物販 {place}" if place else "終演後物販"
+        else:
+            goods_start = _safe_str(row["GOODS_START_MANUAL"])
+            goods_end = ""
+            goods_dur = _safe_int(row["GOODS_DURATION"], 60)
+            if goods_start and goods_dur > 0:
+                goods_end = _add_minutes(goods_start, goods_dur)
+            main_goods_str = f"{goods_start} - {goods_end}" if goods_start else ""
+            main_place = _safe_str(row["PLACE"])
+            add_goods_start = _safe_str(row.get("ADD_GOODS_START", ""))
+            add_goods_dur = _safe_int(row.get("ADD_GOODS_DURATION"), 60)
+            add_goods_place = _safe_str(row.get("ADD_GOODS_PLACE", ""))
+            add_goods_str = ""
+            if add_goods_start:
+                add_goods_str = f"{add_goods_start} - {_add_minutes(add_goods_start, add_goods_dur)}"
+            if main_goods_str and add_goods_str:
+                final_goods_display = f"{main_goods_str} / {add_goods_str}"
+                p1 = main_place if main_place else "-"
+                p2 = add_goods_place if add_goods_place else "-"
+                final_place_display = f"{p1} / {p2}"
+            elif main_goods_str:
+                final_goods_display = main_goods_str
+                final_place_display = main_place
+            elif add_goods_str:
+                final_goods_display = add_goods_str
+                final_place_display = add_goods_place
+
+        calculated_rows.append({
+            "TIME_DISPLAY": f"{current_time} - {end_time}",
+            "ARTIST": row["ARTIST"], "DURATION": duration, "ADJUSTMENT": adjustment,
+            "GOODS_DISPLAY": final_goods_display, "PLACE": final_place_display,
+            "GOODS_START_MANUAL": _safe_str(row["GOODS_START_MANUAL"]),
+            "GOODS_DURATION": _safe_int(row["GOODS_DURATION"], 60),
+            "PLACE_RAW": _safe_str(row["PLACE"]),
+            "ADD_GOODS_START": _safe_str(row.get("ADD_GOODS_START", "")),
+            "ADD_GOODS_DURATION": _safe_int(row.get("ADD_GOODS_DURATION"), 60),
+            "ADD_GOODS_PLACE": _safe_str(row.get("ADD_GOODS_PLACE", "")),
+            "RAW_START": current_time, "RAW_END": end_time
+        })
+        current_time = next_start_time
+    return pd.DataFrame(calculated_rows)
+
+
+def _assert_same(df, open_time="17:30", start_time="18:00"):
+    expected = _legacy_flow(df, open_time, start_time)
+    actual = calculate_flow(df, open_time, start_time)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def _fixture_df():
+    rows = [_make_pre_goods_row()] + [_make_normal_row(f"A{i}") for i in range(4)] + [_make_post_goods_row()]
+    rows[2].is_post_goods = True
+    rows[3].add_goods_duration = None
+    rows[4].goods_start_time = ""
+    return draft_rows_to_df(rows)
+
+
+def test_fixture_rows_match_legacy():
+    df = _fixture_df()
+    _assert_same(df)
+    _assert_same(df, open_time="", start_time="18:00")
+    _assert_same(draft_rows_to_df([]))
+    _assert_same(draft_rows_to_df([_make_normal_row()]))
+
+
+def test_crossing_midnight_and_unparsable_times():
+    df = _fixture_df()
+    _assert_same(df, start_time="23:40")
+    _assert_same(df, start_time="9:5")  # strptime は 1 桁も受け付ける(先頭枠だけ整形されない)
+    _assert_same(df, start_time="25:00")  # 読めない → 以降も同じ文字列
+    _assert_same(df, open_time=None, start_time=None)
+    df.loc[1, "GOODS_START_MANUAL"] = "あとで"
+    df.loc[2, "ADJUSTMENT"] = -30
+    _assert_same(df)
+
+
+def test_dtype_drift_matches_legacy():
+    """data_editor 経由の dtype 揺れ(NaN / float 化した int / 文字列数値 / bool)。"""
+    df = pd.DataFrame(
+        [
+            {"IS_HIDDEN": np.bool_(False), "ARTIST": "X", "DURATION": 25.7, "IS_POST_GOODS": 0,
+             "ADJUSTMENT": np.int64(5), "GOODS_START_MANUAL": "10:30", "GOODS_DURATION": 60.0,
+             "PLACE": "A", "ADD_GOODS_START": "", "ADD_GOODS_DURATION": float("nan"), "ADD_GOODS_PLACE": ""},
+            {"IS_HIDDEN": 0, "ARTIST": "Y", "DURATION": float("nan"), "IS_POST_GOODS": float("nan"),
+             "ADJUSTMENT": " 10 ", "GOODS_START_MANUAL": float("nan"), "GOODS_DURATION": "abc",
+             "PLACE": float("nan"), "ADD_GOODS_START": "12:00", "ADD_GOODS_DURATION": None,
+             "ADD_GOODS_PLACE": float("nan")},
+            {"IS_HIDDEN": 0, "ARTIST": "開演前物販", "DURATION": -3.5, "IS_POST_GOODS": np.bool_(True),
+             "ADJUSTMENT": float("inf"), "GOODS_START_MANUAL": "nan", "GOODS_DURATION": None,
+             "PLACE": 3, "ADD_GOODS_START": float("nan"), "ADD_GOODS_DURATION": "None",
+             "ADD_GOODS_PLACE": ""},
+        ],
+        columns=_EXPECTED_COLUMNS,
+    )
+    _assert_same(df)
+    # 任意列(ADD_GOODS_* / IS_POST_GOODS)が無い DataFrame
+    _assert_same(df.drop(columns=["ADD_GOODS_START", "ADD_GOODS_DURATION", "ADD_GOODS_PLACE", "IS_POST_GOODS"]))
+
+
+def test_festival_size_table():
+    rng = random.Random(0)
+    rows = []
+    for i in range(3000):
+        row = _make_normal_row(f"Artist {i}")
+        row.duration = rng.choice([10, 15, 20, 25, 30, 40])
+        row.adjustment = rng.choice([0, 5, 10])
+        row.is_post_goods = rng.random() < 0.1
+        row.add_goods_duration = rng.choice([None, 30, 45])
+        rows.append(row)
+    rows.insert(0, _make_pre_goods_row())
+    rows.append(_make_post_goods_row())
+    _assert_same(draft_rows_to_df(rows), start_time="10:00")
+
+
+def _festival_df(n=200):
+    rows = [_make_normal_row(f"Artist {i}") for i in range(n)]
+    rows.insert(0, _make_pre_goods_row())
+    rows.append(_make_post_goods_row())
+    return draft_rows_to_df(rows)
+
+
+def test_edit_shifts_only_following_rows():
+    df = _festival_df()
+    flow = TimetableFlow()
+    first = flow.update(df, "17:30", "18:00")
+
+    edited = df.copy()
+    edited.loc[150, "DURATION"] = 45
+    out = flow.update(edited, "17:30", "18:00")
+    assert flow.last_rebuilt == list(range(150, 201))  # 151 行目〜最後の出演枠(物販専用行は時刻なし)
+    assert out is not first
+    pd.testing.assert_frame_equal(out, _legacy_flow(edited, "17:30", "18:00"))
+
+
+def test_goods_only_edit_keeps_schedule():
+    df = _festival_df()
+    flow = TimetableFlow()
+    flow.update(df, "17:30", "18:00")
+    offsets = flow.offsets
+
+    edited = df.copy()
+    edited.loc[10, "PLACE"] = "Z"
+    edited.loc[201, "GOODS_START_MANUAL"] = "21:15"  # 終演後物販行
+    out = flow.update(edited, "17:30", "18:00")
+    assert flow.last_rebuilt == [10, 201]
+    assert np.array_equal(flow.offsets, offsets)
+    pd.testing.assert_frame_equal(out, _legacy_flow(edited, "17:30", "18:00"))
+
+    # 変更なし → 前回の DataFrame をそのまま
+    assert flow.update(edited.copy(), "17:30", "18:00") is out
+
+
+def test_random_edit_sequence_matches_full_calculation():
+    rng = random.Random(1)
+    df = _festival_df(60)
+    flow = TimetableFlow()
+    start = "18:00"
+    for _ in range(80):
+        op = rng.random()
+        i = rng.randrange(len(df))
+        df = df.copy()
+        if op < 0.3:
+            df.loc[i, "DURATION"] = rng.choice([5, 20, 35])
+        elif op < 0.45:
+            df.loc[i, "ADJUSTMENT"] = rng.choice([0, 5, 15])
+        elif op < 0.6:
+            df.loc[i, "PLACE"] = rng.choice(["", "A", "B"])
+        elif op < 0.7:
+            df.loc[i, "IS_POST_GOODS"] = not df.loc[i, "IS_POST_GOODS"]
+        elif op < 0.8:
+            df = df.drop(index=i).reset_index(drop=True)
+        elif op < 0.9:
+            df = pd.concat([df.iloc[:i], df.iloc[[i]], df.iloc[i:]]).reset_index(drop=True)
+        else:
+            start = rng.choice(["18:00", "23:50", "x"])
+        pd.testing.assert_frame_equal(flow.update(df, "17:30", start), _legacy_flow(df, "17:30", start))
+
+
+def test_gen_list_skips_open_and_hidden():
+    df = _fixture_df()
+    flow = TimetableFlow()
+    calculated = flow.update(df, "17:30", "18:00")
+    hidden = [False, True, False, False, False, False]
+    expected = [
+        [r["TIME_DISPLAY"], r["ARTIST"], r["GOODS_DISPLAY"], r["PLACE"]]
+        for (_, r), h in zip(calculated.iloc[1:].iterrows(), hidden) if not h
+    ]
+    assert flow.gen_list(hidden) == expected
+
+
+_TESTS = [
+    test_fixture_rows_match_legacy,
+    test_crossing_midnight_and_unparsable_times,
+    test_dtype_drift_matches_legacy,
+    test_festival_size_table,
+    test_edit_shifts_only_following_rows,
+    test_goods_only_edit_keeps_schedule,
+    test_random_edit_sequence_matches_full_calculation,
+    test_gen_list_skips_open_and_hidden,
+]
+
+
+if __name__ == "__main__":
+    failed = 0
+    for t in _TESTS:
+        name = t.__name__
+        try:
+            t()
+            print(f"PASS  {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL  {name}: {e}")
+        except Exception as e:
+            failed += 1
+            print(f"ERROR {name}: {type(e).__name__}: {e}")
+    print()
+    print(f"=== {len(_TESTS) - failed} / {len(_TESTS)} passed ===")
+    sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,109 @@
+"""timetable_repo.save_rows(差分 upsert)のテスト。
+
+- 保存→読み込みで drafts と一致する(追加・削除・並べ替え・内容変更のどれでも)
+- 変更のない行の id は変わらない / 1 行だけの編集は UPDATE 1 文だけで済む
+- 何も変わらない保存は SELECT だけ(書き込み文を出さない)
+"""
+from __future__ import annotations
+
+import dataclasses
+import random
+
+import pytest
+
+from database import TimetableProject, TimetableRow
+from models import TimetableRowDraft
+from repositories import timetable_repo
+
+
+@pytest.fixture
+def db(sqlite_db):
+    factory = sqlite_db()
+    session = factory()
+    session.add(TimetableProject(id=1, title="P"))
+    session.commit()
+    session.statements = factory.statements
+    yield session
+    session.close()
+
+
+def _drafts(n, seed=0):
+    rnd = random.Random(seed)
+    return [
+        TimetableRowDraft(
+            artist_name=f"A{i}", duration=rnd.choice([20, 30]), adjustment=rnd.choice([0, 5]),
+            place=rnd.choice(["A", "B"]), is_hidden=rnd.random() < 0.2,
+            add_goods_duration=rnd.choice([None, 30]),
+        )
+        for i in range(n)
+    ]
+
+
+def _writes(db):
+    return [s.split()[0] for s in db.statements if not s.lstrip().startswith("SELECT")]
+
+
+def _ids(db):
+    return [r.id for r in db.query(TimetableRow).order_by(TimetableRow.sort_order)]
+
+
+def test_round_trip_through_edits(db):
+    rnd = random.Random(4)
+    drafts = _drafts(6)
+    for _ in range(20):
+        assert timetable_repo.save_rows(db, 1, drafts)
+        assert timetable_repo.load_rows(db, 1) == drafts
+        drafts = list(drafts)
+        op = rnd.choice(["add", "remove", "swap", "edit"])
+        if op == "add":
+            drafts.insert(rnd.randint(0, len(drafts)), _drafts(1, rnd.random())[0])
+        elif op == "remove" and drafts:
+            drafts.pop(rnd.randrange(len(drafts)))
+        elif op == "swap" and len(drafts) > 1:
+            i, j = rnd.sample(range(len(drafts)), 2)
+            drafts[i], drafts[j] = drafts[j], drafts[i]
+        elif drafts:
+            i = rnd.randrange(len(drafts))
+            drafts[i] = dataclasses.replace(drafts[i], duration=drafts[i].duration + 5)
+
+
+def test_single_edit_updates_one_row(db):
+    drafts = _drafts(30)
+    timetable_repo.save_rows(db, 1, drafts)
+    ids = _ids(db)
+
+    drafts[7] = dataclasses.replace(drafts[7], place="Z")
+    del db.statements[:]
+    timetable_repo.save_rows(db, 1, drafts)
+    assert _writes(db) == ["UPDATE"]
+    assert _ids(db) == ids
+
+    # 末尾の追加・削除は INSERT / DELETE 各 1 文、既存行の id はそのまま
+    del db.statements[:]
+    timetable_repo.save_rows(db, 1, drafts + _drafts(3, 9))
+    assert _writes(db) == ["INSERT"]
+    del db.statements[:]
+    timetable_repo.save_rows(db, 1, drafts[:24])
+    assert _writes(db) == ["DELETE"]
+    assert _ids(db) == ids[:24]
+
+
+def test_unchanged_save_writes_nothing(db):
+    drafts = _drafts(10)
+    timetable_repo.save_rows(db, 1, drafts)
+    del db.statements[:]
+    timetable_repo.save_rows(db, 1, drafts)
+    assert _writes(db) == []
+
+
+def test_diff_rows_pairs_by_position():
+    stored = [(10, 0, {"artist_name": "A"}), (11, 1, {"artist_name": "B"}), (12, 5, {"artist_name": "C"})]
+    updates, inserts, delete_ids = timetable_repo.diff_rows(stored, [{"artist_name": "A"}, {"artist_name": "X"}])
+    assert [(u["id"], u["sort_order"], u["artist_name"]) for u in updates] == [(11, 1, "X")]
+    assert inserts == [] and delete_ids == [12]
+
+    updates, inserts, delete_ids = timetable_repo.diff_rows(stored, [{"artist_name": n} for n in "ABCD"])
+    # sort_order のずれ(5 → 2)も直す
+    assert [(u["id"], u["sort_order"]) for u in updates] == [(12, 2)]
+    assert [(i["sort_order"], i["artist_name"]) for i in inserts] == [(3, "D")]
+    assert delete_ids == []
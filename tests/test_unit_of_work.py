@@ -0,0 +1,86 @@
+"""database.unit_of_work(リクエスト / rerun 単位のセッション共有)のテスト。
+
+- スコープ外の SessionLocal() は従来どおり毎回別セッション
+- スコープ内は同じセッションを返し、service 側の close() では閉じない(入れ子は外側に合流)。
+  ただし使用中の service がいなくなればトランザクションを終え、接続をプールに返す
+- スコープを抜けると閉じ、未 commit の書き込みは捨てる / 別スレッドとは共有しない
+"""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from database import FlyerTemplate, unit_of_work
+
+
+@pytest.fixture
+def factory(sqlite_db):
+    return sqlite_db()
+
+
+def test_sessions_are_shared_only_inside_scope(factory):
+    a, b = factory(), factory()
+    assert a is not b
+    a.close()
+    b.close()
+
+    with unit_of_work():
+        s1 = factory()
+        s1.close()  # service 側の close は無視される
+        with unit_of_work():
+            assert factory() is s1
+        s1.add(FlyerTemplate(name="T", data_json="{}"))
+        s1.commit()
+        assert factory() is s1
+
+        other = []
+        t = threading.Thread(target=lambda: other.append(factory()))
+        t.start()
+        t.join()
+        assert other[0] is not s1
+        other[0].close()
+    assert factory() is not s1
+
+    check = factory()
+    assert [t.name for t in check.query(FlyerTemplate)] == ["T"]
+    check.close()
+
+
+def test_uncommitted_work_is_discarded_at_scope_end(factory):
+    with unit_of_work():
+        factory().add(FlyerTemplate(name="U", data_json="{}"))
+        factory().flush()
+    check = factory()
+    assert check.query(FlyerTemplate).count() == 0
+    check.close()
+
+
+
+def test_connection_returns_to_pool_between_services(tmp_path):
+    from sqlalchemy import create_engine, text
+
+    import database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'uow.db'}")
+    database.Base.metadata.create_all(engine)
+    factory = database._SessionFactory(autocommit=False, autoflush=False, bind=engine)
+
+    def service():
+        db = factory()
+        try:
+            return db.execute(text("SELECT 1")).scalar()
+        finally:
+            db.close()
+
+    with unit_of_work():
+        outer = factory()
+        assert service() == 1
+        assert engine.pool.checkedout() == 1   # 外側の service がまだ使っている
+        outer.close()
+        assert engine.pool.checkedout() == 0
+        assert service() == 1
+        assert engine.pool.checkedout() == 0
+        assert factory() is outer
+    assert engine.pool.checkedout() == 0
+    engine.dispose()
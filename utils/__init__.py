@@ -1,22 +1,15 @@
 import pandas as pd
 import io
 import os
-import json
 import zipfile
 import requests
 from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.pdfbase.ttfonts import TTFont
 from PIL import Image, ImageDraw, ImageFont, ImageOps
 
 # 定数とDBモデルのインポート
 from constants import FONT_DIR, ASSETS_DIR
 from database import get_db, Asset, Artist, FavoriteFont, SystemFontConfig, get_image_url
+from models.timetable_flow import calculate_flow
 
 # =========================================================
 # ユーティリティ関数群
@@ -139,19 +132,15 @@ def get_sorted_font_list(db):
     return result
 
 def create_font_specimen_img(session, font_assets):
-    """フォント一覧見本画像を作成する関数"""
+    """フォント一覧見本画像を作成する関数
+
+    各行は utils.font_specimen でフォントの中身(SHA-256)をキーにキャッシュされ、
+    rerun のたびに全フォントを描き直さない(新しいフォントの行だけ描く)。
+    """
     if not font_assets:
         return Image.new("RGB", (800, 100), (255, 255, 255))
 
-    # --- キャンバス設定 ---
-    img_width = 800
-    row_height = 80  # 1行の高さ
-    margin = 20
-    header_height = 40
-    
-    total_height = header_height + (len(font_assets) * row_height) + margin
-    img = Image.new("RGB", (img_width, total_height), (255, 255, 255))
-    draw = ImageDraw.Draw(img)
+    from utils.font_specimen import specimen_sheet
 
     # --- ラベル描画用フォントの準備 ---
     system_font_config = session.query(SystemFontConfig).first()
@@ -162,20 +151,7 @@ def create_font_specimen_img(session, font_assets):
         if os.path.exists(check_path):
             label_font_path = check_path
 
-    try:
-        label_font_large = ImageFont.truetype(label_font_path, 20)
-        label_font_small = ImageFont.truetype(label_font_path, 14)
-    except OSError:
-        label_font_large = ImageFont.load_default()
-        label_font_small = ImageFont.load_default()
-
-    # --- ヘッダー描画 ---
-    draw.text((margin, 10), "Font List Specimen", fill=(50, 50, 50), font=label_font_large)
-    draw.line((margin, header_height - 5, img_width - margin, header_height - 5), fill=(200, 200, 200), width=1)
-
-    # --- 各フォントの描画 ---
-    current_y = header_height
-
+    entries = []
     for asset in font_assets:
         if isinstance(asset, dict):
             name = asset.get("name", "No Name")
@@ -183,40 +159,9 @@ def create_font_specimen_img(session, font_assets):
         else:
             name = asset.name if asset.name else "No Name"
             filename = asset.image_filename if asset.image_filename else ""
+        entries.append((name, filename))
 
-        # 1. 表示名 (黒)
-        draw.text((margin, current_y + 15), str(name), fill="black", font=label_font_large)
-
-        # 2. ファイル名 (グレー / 表示名の下)
-        draw.text((margin, current_y + 45), str(filename), fill="gray", font=label_font_small)
-
-        # 3. 見本テキスト (右側)
-        preview_text = "ABC 123 あいう イベント"
-        font_file_path = os.path.join(FONT_DIR, filename)
-        
-        preview_font_size = 32
-        preview_font = None
-        
-        if os.path.exists(font_file_path):
-            try:
-                preview_font = ImageFont.truetype(font_file_path, preview_font_size)
-            except Exception:
-                preview_font = None
-        
-        preview_x = 300
-        preview_y = current_y + 20
-        
-        if preview_font:
-            draw.text((preview_x, preview_y), preview_text, fill="black", font=preview_font)
-        else:
-            draw.text((preview_x, preview_y + 5), "Preview Not Available", fill="red", font=label_font_small)
-
-        # 区切り線
-        draw.line((margin, current_y + row_height - 1, img_width - margin, current_y + row_height - 1), fill=(230, 230, 230), width=1)
-        
-        current_y += row_height
-
-    return img
+    return specimen_sheet(entries, label_font_path)
 
 # --- ★新規追加: 画像ロードヘルパー ---
 def load_artist_image(image_filename):
@@ -309,218 +254,26 @@ def draw_artist_background(base_img, box, artist_name, db, opacity=128):
 # =========================================================
 
 def calculate_timetable_flow(df, open_time, start_time):
-    calculated_rows = []
-    
-    if open_time and start_time:
-        calculated_rows.append({
-            "TIME_DISPLAY": f"{open_time} - {start_time}",
-            "ARTIST": "OPEN / START",
-            "DURATION": 0, "ADJUSTMENT": 0,
-            "GOODS_DISPLAY": "", "GOODS_START_MANUAL": "", "GOODS_DURATION": 0, "PLACE": "",
-            "ADD_GOODS_START": "", "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "",
-            "RAW_START": open_time, "RAW_END": start_time,
-        })
-
-    current_time = start_time
-    
-    for _, row in df.iterrows():
-        artist_name = row["ARTIST"]
-        duration = safe_int(row["DURATION"], 0)
-        adjustment = safe_int(row["ADJUSTMENT"], 0)
-        
-        if artist_name == "開演前物販":
-            goods_start = safe_str(row["GOODS_START_MANUAL"])
-            goods_dur = safe_int(row["GOODS_DURATION"], 0)
-            goods_end = ""
-            if goods_start and goods_dur > 0:
-                goods_end = add_minutes(goods_start, goods_dur)
-            main_goods_str = f"{goods_start} - {goods_end}" if goods_start else ""
-            calculated_rows.append({
-                "TIME_DISPLAY": "", "ARTIST": artist_name, "DURATION": 0, "ADJUSTMENT": 0,
-                "GOODS_DISPLAY": main_goods_str, "PLACE": "", "GOODS_START_MANUAL": goods_start,
-                "GOODS_DURATION": goods_dur, "PLACE_RAW": "", "ADD_GOODS_START": "", 
-                "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "", "RAW_START": "", "RAW_END": ""        
-            })
-            continue
-
-        if artist_name == "終演後物販":
-            goods_start = safe_str(row["GOODS_START_MANUAL"])
-            goods_dur = safe_int(row["GOODS_DURATION"], 60)
-            goods_end = ""
-            if goods_start and goods_dur > 0:
-                goods_end = add_minutes(goods_start, goods_dur)
-            main_goods_str = f"{goods_start} - {goods_end}" if goods_start else ""
-            calculated_rows.append({
-                "TIME_DISPLAY": "", "ARTIST": artist_name, "DURATION": 0, "ADJUSTMENT": 0,
-                "GOODS_DISPLAY": main_goods_str, "PLACE": "", "GOODS_START_MANUAL": goods_start,
-                "GOODS_DURATION": goods_dur, "PLACE_RAW": "", "ADD_GOODS_START": "", 
-                "ADD_GOODS_DURATION": 0, "ADD_GOODS_PLACE": "", "RAW_START": "", "RAW_END": ""        
-            })
-            continue
-
-        end_time = add_minutes(current_time, duration)
-        next_start_time = add_minutes(end_time, adjustment)
-        
-        is_post_goods = row.get("IS_POST_GOODS", False)
-        
-        final_goods_display = ""
-        final_place_display = ""
-        
-        if is_post_goods:
-            place = safe_str(row["PLACE"])
-            final_goods_display = f"終演後物販 {place}" if place else "終演後物販"
-            final_place_display = "" 
-        else:
-            goods_start = safe_str(row["GOODS_START_MANUAL"])
-            goods_end = ""
-            goods_dur = safe_int(row["GOODS_DURATION"], 60)
-            if goods_start and goods_dur > 0:
-                goods_end = add_minutes(goods_start, goods_dur)
-            
-            main_goods_str = f"{goods_start} - {goods_end}" if goods_start else ""
-            main_place = safe_str(row["PLACE"])
+    """各枠の開始/終了・物販表示を計算した DataFrame を返す。
 
-            add_goods_start = safe_str(row.get("ADD_GOODS_START", ""))
-            add_goods_dur = safe_int(row.get("ADD_GOODS_DURATION"), 60)
-            add_goods_place = safe_str(row.get("ADD_GOODS_PLACE", ""))
-            
-            add_goods_str = ""
-            if add_goods_start:
-                add_goods_end = add_minutes(add_goods_start, add_goods_dur)
-                add_goods_str = f"{add_goods_start} - {add_goods_end}"
-
-            if main_goods_str and add_goods_str:
-                final_goods_display = f"{main_goods_str} / {add_goods_str}"
-                p1 = main_place if main_place else "-"
-                p2 = add_goods_place if add_goods_place else "-"
-                final_place_display = f"{p1} / {p2}"
-            elif main_goods_str:
-                final_goods_display = main_goods_str
-                final_place_display = main_place
-            elif add_goods_str:
-                final_goods_display = add_goods_str
-                final_place_display = add_goods_place
-
-        calculated_rows.append({
-            "TIME_DISPLAY": f"{current_time} - {end_time}", 
-            "ARTIST": row["ARTIST"], "DURATION": duration, "ADJUSTMENT": adjustment,
-            "GOODS_DISPLAY": final_goods_display, "PLACE": final_place_display,
-            "GOODS_START_MANUAL": safe_str(row["GOODS_START_MANUAL"]),
-            "GOODS_DURATION": safe_int(row["GOODS_DURATION"], 60),
-            "PLACE_RAW": safe_str(row["PLACE"]), 
-            "ADD_GOODS_START": safe_str(row.get("ADD_GOODS_START", "")),
-            "ADD_GOODS_DURATION": safe_int(row.get("ADD_GOODS_DURATION"), 60),
-            "ADD_GOODS_PLACE": safe_str(row.get("ADD_GOODS_PLACE", "")),
-            "RAW_START": current_time, "RAW_END": end_time        
-        })
-        current_time = next_start_time
-
-    return pd.DataFrame(calculated_rows)
+    本体は models.timetable_flow.calculate_flow(整数分 + NumPy 累積和、整形は出力時のみ)。
+    """
+    return calculate_flow(df, open_time, start_time)
 
 def create_business_pdf(df, title, event_date, venue):
+    """タイムテーブル表の PDF(BytesIO)。組み立ては utils.pdf_export(フォント登録は初回のみ)。"""
+    from utils.pdf_export import timetable_flowables, write_pdf
+
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, title="Timetable")
-    elements = []
-    font_name = 'HeiseiKakuGo-W5'
-    try: pdfmetrics.registerFont(UnicodeCIDFont(font_name))
-    except Exception: font_name = 'Helvetica'
-
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Title'], fontName=font_name, fontSize=18, spaceAfter=20)
-    normal_style = ParagraphStyle('Normal', parent=styles['Normal'], fontName=font_name, fontSize=10)
-
-    elements.append(Paragraph(f"イベント名: {title}", title_style))
-    elements.append(Paragraph(f"日付: {event_date} / 会場: {venue}", normal_style))
-    elements.append(Spacer(1, 20))
-
-    table_data = [["時間", "出演アーティスト", "時間", "転換", "物販情報", "場所"]]
-    for _, row in df.iterrows():
-        goods_str = safe_str(row["GOODS_DISPLAY"]).replace(" / ", "\n")
-        place_str = safe_str(row["PLACE"]).replace(" / ", "\n")
-        dur = safe_int(row["DURATION"])
-        adj = safe_int(row["ADJUSTMENT"])
-        
-        dur_str = str(dur) if dur > 0 else "-"
-        adj_str = f"+{adj}" if adj > 0 else "-"
-        if row["ARTIST"] in ["開演前物販", "終演後物販"]:
-            dur_str = "-"
-            adj_str = "-"
-
-        table_data.append([
-            row["TIME_DISPLAY"], row["ARTIST"], dur_str, adj_str, goods_str, place_str
-        ])
-
-    table = Table(table_data, colWidths=[90, 180, 40, 40, 90, 60])
-    table.setStyle(TableStyle([
-        ('FONT', (0, 0), (-1, -1), font_name),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('PADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(table)
-    doc.build(elements)
+    write_pdf(timetable_flowables(df, title, event_date, venue), buffer, "Timetable")
     buffer.seek(0)
     return buffer
 
 def create_event_summary_pdf(project):
     """プロジェクトのイベント概要PDFを作成する"""
+    from utils.pdf_export import summary_flowables, write_pdf
+
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, title="Event Summary")
-    elements = []
-    
-    # フォント設定
-    font_name = 'HeiseiKakuGo-W5'
-    try: pdfmetrics.registerFont(UnicodeCIDFont(font_name))
-    except Exception: font_name = 'Helvetica'
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Title'], fontName=font_name, fontSize=20, spaceAfter=20)
-    h2_style = ParagraphStyle('H2', parent=styles['Heading2'], fontName=font_name, fontSize=14, spaceAfter=10, spaceBefore=10)
-    normal_style = ParagraphStyle('Normal', parent=styles['Normal'], fontName=font_name, fontSize=10, leading=14)
-
-    # タイトル
-    elements.append(Paragraph(f"【イベント概要】{safe_str(project.title)}", title_style))
-    elements.append(Paragraph(f"日付: {safe_str(project.event_date)}", normal_style))
-    elements.append(Paragraph(f"会場: {safe_str(project.venue_name)}", normal_style))
-    if project.venue_url:
-        elements.append(Paragraph(f"URL: {safe_str(project.venue_url)}", normal_style))
-    elements.append(Spacer(1, 20))
-
-    # チケット情報
-    elements.append(Paragraph("■ チケット情報", h2_style))
-    if project.tickets_json:
-        tickets = json.loads(project.tickets_json)
-        t_data = [["チケット名", "価格", "備考"]]
-        for t in tickets:
-            t_data.append([t.get("name",""), t.get("price",""), t.get("note","")])
-        t_table = Table(t_data, colWidths=[150, 100, 200])
-        t_table.setStyle(TableStyle([
-            ('FONT', (0,0), (-1,-1), font_name),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('PADDING', (0,0), (-1,-1), 6),
-        ]))
-        elements.append(t_table)
-    else:
-        elements.append(Paragraph("なし", normal_style))
-    
-    elements.append(Spacer(1, 20))
-
-    # 自由記述
-    elements.append(Paragraph("■ その他情報", h2_style))
-    if project.free_text_json:
-        free_texts = json.loads(project.free_text_json)
-        for ft in free_texts:
-            elements.append(Paragraph(f"<b>{ft.get('title','')}</b>", normal_style))
-            elements.append(Paragraph(ft.get('content',''), normal_style))
-            elements.append(Spacer(1, 10))
-    else:
-        elements.append(Paragraph("なし", normal_style))
-
-    doc.build(elements)
+    write_pdf(summary_flowables(project), buffer, "Event Summary")
     buffer.seek(0)
     return buffer
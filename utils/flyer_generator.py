@@ -1,10 +1,16 @@
 import os
 import re
+import json
 import requests
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageColor, ImageChops
+from PIL import Image, ImageDraw, ImageFont, ImageColor, ImageChops
 
 from constants import FONT_DIR
+from utils.font_metrics import REF_SIZE, estimate_mixed_length, fit_font_size, get_table
+from utils.shadow import render_shadow
 
 # ==========================================
 # 1. ヘルパー関数 (画像読み込みなど)
@@ -78,19 +84,79 @@ def safe_val(val):
     except (ValueError, TypeError):
         return 0
 
-def draw_text_with_shadow(base_img, text, x, y, font_path, font_size_px, max_width, fill_color, 
+# 計測専用の描画コンテキスト(textbbox だけ使い、何も描かない)
+_MEASURE_DRAW = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+def measure_text_mixed(text, primary_font, fallback_font):
+    """draw_text_mixed と同じ (total_w, max_h) を、グリフを描かずに返す(レイアウト計測用)。"""
+    total_w = 0
+    max_h = 0
+    for char in text:
+        use_font = primary_font
+        if not is_glyph_available(primary_font, char):
+            if fallback_font:
+                use_font = fallback_font
+        bbox = _MEASURE_DRAW.textbbox((0, 0), char, font=use_font)
+        char_w = bbox[2] - bbox[0]
+        char_h = bbox[3] - bbox[1]
+        try: advance = use_font.getlength(char)
+        except Exception: advance = char_w
+        total_w += advance
+        if char_h > max_h: max_h = char_h
+    return total_w, max_h
+
+def _u(v, scale):
+    """デザイン単位(1080px 幅基準)の値を描画スケールの px に直す。scale==1 は値をそのまま返す。"""
+    return v if scale == 1 else v * scale
+
+def _shadow_rgb(shadow_color):
+    try: return ImageColor.getrgb(shadow_color)
+    except Exception: return (0, 0, 0)
+
+
+@dataclass
+class TextPlan:
+    """1行テキスト(影付き)の計測結果。rasterize_text_plan でレイヤー化する。
+
+    pos / size は最終レイヤーの貼り付け位置と寸法、height は縦送り量
+    (draw_text_with_shadow の戻り値)。ここまではグリフを一切描かない。
+    """
+    text: str
+    primary_font: object
+    fallback_font: object
+    fill_color: object
+    margin: int
+    canvas_size: Tuple[int, int]
+    size: Tuple[int, int]
+    pos: Tuple[int, int]
+    height: int
+    shadow_on: bool = False
+    shadow_color: str = "#000000"
+    shadow_blur: int = 0
+    shadow_off: Tuple[int, int] = (0, 0)
+    shadow_opacity: int = 255
+    shadow_spread: int = 0
+
+
+def plan_text_with_shadow(text, x, y, font_path, font_size_px, max_width, fill_color, 
                           anchor="ma", 
                           shadow_on=False, shadow_color="#000000", 
                           shadow_blur=0, shadow_off_x=5, shadow_off_y=5,
                           shadow_opacity=255, shadow_spread=0,
-                          fallback_font_path=None, measure_only=False):
-    if not text: return 0
+                          fallback_font_path=None, scale=1.0):
+    """draw_text_with_shadow の計測部分。text が空なら None。
+
+    scale は内部の固定余白(最小サイズ・影マージン等)に掛ける描画倍率。
+    フォントサイズや影などの引数は呼び出し側でスケール済みの px を渡す。
+    """
+    if not text: return None
     text_str = str(text)
     
     # 数値の安全確保
     current_size = safe_val(font_size_px)
-    if current_size <= 0: current_size = 20
-    min_size = 10
+    if current_size <= 0: current_size = int(_u(20, scale))
+    min_size = _u(10, scale)
+    size_step = max(1, int(round(_u(2, scale))))
     
     shadow_blur = safe_val(shadow_blur)
     shadow_off_x = safe_val(shadow_off_x)
@@ -110,66 +176,38 @@ def draw_text_with_shadow(base_img, text, x, y, font_path, font_size_px, max_wid
         return p_font, f_font
 
     primary_font, fallback_font = load_fonts(current_size)
-    dummy_draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
-    
-    can_resize = True
-    while can_resize and current_size > min_size:
-        w, h = draw_text_mixed(dummy_draw, (0, 0), text_str, primary_font, fallback_font, fill_color)
-        margin_est = max(shadow_blur * 3, abs(shadow_off_x), abs(shadow_off_y)) + 10 + shadow_spread
-        if w + (margin_est * 2) <= max_width: break
-        current_size -= 2
+    margin_est = max(shadow_blur * 3, abs(shadow_off_x), abs(shadow_off_y)) + _u(10, scale) + shadow_spread
+
+    def fits(size):
+        w, _ = measure_text_mixed(text_str, *load_fonts(size))
+        return w + (margin_est * 2) <= max_width
+
+    # 字幅テーブルの見積もりで入るサイズへ飛び、実測で確定(従来の size_step 刻みループと同じ結果)
+    estimate = None
+    primary_metrics = get_table(primary_font)
+    ref_w = estimate_mixed_length(
+        text_str, primary_metrics, get_table(fallback_font) if fallback_font is not primary_font else None, REF_SIZE,
+    )
+    if ref_w:
+        estimate = (max_width - margin_est * 2) * REF_SIZE / ref_w
+    fitted = fit_font_size(fits, current_size, min_size, size_step, estimate=estimate)
+    if fitted != current_size:
+        current_size = fitted
         primary_font, fallback_font = load_fonts(current_size)
 
-    text_w, text_h = draw_text_mixed(dummy_draw, (0, 0), text_str, primary_font, fallback_font, fill_color)
-    margin = int(max(shadow_blur * 3, abs(shadow_off_x), abs(shadow_off_y)) + 20 + shadow_spread)
-    
-    if measure_only:
-        return int(text_h + margin + current_size * 0.2) 
+    text_w, text_h = measure_text_mixed(text_str, primary_font, fallback_font)
+    margin = int(max(shadow_blur * 3, abs(shadow_off_x), abs(shadow_off_y)) + _u(20, scale) + shadow_spread)
 
     canvas_w = int(text_w + margin * 2)
     canvas_h = int(text_h + margin * 2 + current_size * 0.5) 
     
-    txt_img = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
-    txt_draw = ImageDraw.Draw(txt_img)
-    draw_x, draw_y = margin, margin
-    draw_text_mixed(txt_draw, (draw_x, draw_y), text_str, primary_font, fallback_font, fill_color)
-    
-    final_layer = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
-    
-    if shadow_on:
-        try: s_rgb = ImageColor.getrgb(shadow_color)
-        except Exception: s_rgb = (0, 0, 0)
-        s_color_with_alpha = s_rgb + (int(shadow_opacity),)
-        
-        shadow_layer = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
-        shadow_draw = ImageDraw.Draw(shadow_layer)
-        
-        draw_text_mixed(shadow_draw, (draw_x + shadow_off_x, draw_y + shadow_off_y), 
-                        text_str, primary_font, fallback_font, s_color_with_alpha)
-        
-        if shadow_spread > 0:
-            r, g, b, a = shadow_layer.split()
-            a_dilated = a.filter(ImageFilter.MaxFilter(1 + shadow_spread * 2))
-            shadow_expanded = Image.new("RGBA", shadow_layer.size, s_color_with_alpha)
-            shadow_expanded.putalpha(a_dilated)
-            shadow_layer = shadow_expanded
-
-        if shadow_blur > 0:
-            shadow_layer = shadow_layer.filter(ImageFilter.GaussianBlur(shadow_blur))
-            
-        final_layer.paste(shadow_layer, (0, 0), shadow_layer)
-        
-    final_layer.paste(txt_img, (0, 0), txt_img)
-    
     content_w, content_h = canvas_w, canvas_h
     effective_text_w = text_w + (max(abs(shadow_off_x), shadow_blur*2)) + shadow_spread*2
     
     if effective_text_w > max_width:
         ratio = max_width / effective_text_w
-        new_w = int(content_w * ratio)
-        new_h = int(content_h * ratio)
-        final_layer = final_layer.resize((new_w, new_h), Image.LANCZOS)
-        content_w, content_h = new_w, new_h
+        content_w = int(content_w * ratio)
+        content_h = int(content_h * ratio)
 
     paste_x = x - int(margin * (content_w / canvas_w))
     paste_y = y - margin
@@ -181,17 +219,110 @@ def draw_text_with_shadow(base_img, text, x, y, font_path, font_size_px, max_wid
     elif anchor == "la":
         paste_x = x - int(margin * (content_w / canvas_w))
 
+    return TextPlan(
+        text=text_str, primary_font=primary_font, fallback_font=fallback_font, fill_color=fill_color,
+        margin=margin, canvas_size=(canvas_w, canvas_h), size=(content_w, content_h),
+        pos=(int(paste_x), int(paste_y)), height=content_h - margin,
+        shadow_on=bool(shadow_on), shadow_color=shadow_color, shadow_blur=shadow_blur,
+        shadow_off=(shadow_off_x, shadow_off_y), shadow_opacity=shadow_opacity, shadow_spread=shadow_spread,
+    )
+
+
+def rasterize_text_plan(plan):
+    """TextPlan を RGBA レイヤーに描く。戻り値は (layer, pos)。"""
+    canvas_w, canvas_h = plan.canvas_size
+    draw_x, draw_y = plan.margin, plan.margin
+    
+    txt_img = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
+    txt_draw = ImageDraw.Draw(txt_img)
+    draw_text_mixed(txt_draw, (draw_x, draw_y), plan.text, plan.primary_font, plan.fallback_font, plan.fill_color)
+    
+    final_layer = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
+    
+    if plan.shadow_on:
+        s_rgb = _shadow_rgb(plan.shadow_color)
+        off_x, off_y = plan.shadow_off
+        
+        # 影はアルファ(L)だけで形を作り、太さ・ぼかし後に着色する (utils/shadow.py)
+        shadow_mask = Image.new("L", (canvas_w, canvas_h), 0)
+        shadow_draw = ImageDraw.Draw(shadow_mask)
+        
+        draw_text_mixed(shadow_draw, (draw_x + off_x, draw_y + off_y), 
+                        plan.text, plan.primary_font, plan.fallback_font, 255)
+        
+        shadow_layer = render_shadow(shadow_mask, s_rgb, plan.shadow_opacity, plan.shadow_spread, plan.shadow_blur)
+            
+        final_layer.paste(shadow_layer, (0, 0), shadow_layer)
+        
+    final_layer.paste(txt_img, (0, 0), txt_img)
+    
+    if plan.size != plan.canvas_size:
+        final_layer = final_layer.resize(plan.size, Image.LANCZOS)
+    return final_layer, plan.pos
+
+
+def draw_text_with_shadow(base_img, text, x, y, font_path, font_size_px, max_width, fill_color, 
+                          anchor="ma", 
+                          shadow_on=False, shadow_color="#000000", 
+                          shadow_blur=0, shadow_off_x=5, shadow_off_y=5,
+                          shadow_opacity=255, shadow_spread=0,
+                          fallback_font_path=None, measure_only=False, layer_sink=None):
+    # layer_sink: list を渡すと (layer, (x, y)) を積む(差分再合成用。base_img=None と併用)
+    # measure_only: 描かずに縦送り量だけ返す(描画時の戻り値と同じ値)
+    plan = plan_text_with_shadow(text, x, y, font_path, font_size_px, max_width, fill_color,
+                                 anchor, shadow_on, shadow_color, shadow_blur, shadow_off_x, shadow_off_y,
+                                 shadow_opacity, shadow_spread, fallback_font_path)
+    if plan is None: return 0
+    if measure_only: return plan.height
+
+    final_layer, pos = rasterize_text_plan(plan)
+    if layer_sink is not None:
+        layer_sink.append((final_layer, pos))
     if base_img:
-        base_img.paste(final_layer, (int(paste_x), int(paste_y)), final_layer)
+        base_img.paste(final_layer, pos, final_layer)
         
-    return content_h - margin
+    return plan.height
 
-def draw_time_row_aligned(base_img, label, time_str, x, y, font, font_size_px, max_width, fill_color,
+
+@dataclass
+class TimeRowPlan:
+    """OPEN/START 行(ラベル・三角・時刻)の計測結果。rasterize_time_row_plan でレイヤー化する。"""
+    label: str
+    time_str: str
+    primary_font: object
+    fallback_font: object
+    font_size_px: float
+    fill_color: object
+    w_label: float
+    tri_visible: bool
+    tri_color: object
+    tri_w: float
+    tri_h: float
+    tri_padding: float
+    alignment: str
+    fixed_label_w: float
+    margin: int
+    canvas_size: Tuple[int, int]
+    pos: Tuple[int, int]
+    height: int
+    shadow_on: bool = False
+    shadow_color: str = "#000000"
+    shadow_blur: int = 0
+    shadow_off: Tuple[int, int] = (0, 0)
+    shadow_opacity: int = 255
+    shadow_spread: int = 0
+
+    @property
+    def size(self):
+        return self.canvas_size
+
+
+def plan_time_row_aligned(label, time_str, x, y, font, font_size_px, max_width, fill_color,
                           shadow_on, shadow_color, shadow_blur, shadow_off_x, shadow_off_y, fallback_font_path,
                           shadow_opacity=255, shadow_spread=0, 
                           tri_visible=True, tri_scale=1.0, tri_color=None,
-                          alignment="center", fixed_label_w=0, measure_only=False):
-    
+                          alignment="center", fixed_label_w=0, scale=1.0):
+    """draw_time_row_aligned の計測部分。scale の扱いは plan_text_with_shadow と同じ。"""
     # 数値の安全確保
     shadow_blur = safe_val(shadow_blur)
     shadow_off_x = safe_val(shadow_off_x)
@@ -206,9 +337,8 @@ def draw_time_row_aligned(base_img, label, time_str, x, y, font, font_size_px, m
         try: fallback_font = ImageFont.truetype(fallback_font_path, int(font_size_px))
         except Exception: pass
 
-    dummy = ImageDraw.Draw(Image.new("RGBA", (1,1)))
-    w_label, h_label = draw_text_mixed(dummy, (0,0), label, primary_font, fallback_font, fill_color)
-    w_time, h_time = draw_text_mixed(dummy, (0,0), time_str, primary_font, fallback_font, fill_color)
+    w_label, h_label = measure_text_mixed(label, primary_font, fallback_font)
+    w_time, h_time = measure_text_mixed(time_str, primary_font, fallback_font)
     
     tri_h = font_size_px * 0.6 * tri_scale
     tri_w = tri_h * 0.8
@@ -219,18 +349,40 @@ def draw_time_row_aligned(base_img, label, time_str, x, y, font, font_size_px, m
     else:
         total_w_content = w_label + (tri_w + tri_padding * 2 if tri_visible else tri_padding) + w_time
         
-    margin = int(max(shadow_blur * 3, abs(shadow_off_x), abs(shadow_off_y)) + 20 + shadow_spread)
+    margin = int(max(shadow_blur * 3, abs(shadow_off_x), abs(shadow_off_y)) + _u(20, scale) + shadow_spread)
     canvas_h = int(max(h_label, h_time, tri_h) + margin * 2 + font_size_px * 0.5)
+    canvas_w = int(total_w_content + margin * 2)
     
-    if measure_only: return canvas_h - (margin * 2)
+    paste_x = x - (canvas_w // 2) + margin
+    paste_y = y - margin
+
+    return TimeRowPlan(
+        label=label, time_str=time_str, primary_font=primary_font, fallback_font=fallback_font,
+        font_size_px=font_size_px, fill_color=fill_color, w_label=w_label,
+        tri_visible=tri_visible, tri_color=tri_color, tri_w=tri_w, tri_h=tri_h, tri_padding=tri_padding,
+        alignment=alignment, fixed_label_w=fixed_label_w, margin=margin, canvas_size=(canvas_w, canvas_h),
+        pos=(int(paste_x), int(paste_y)), height=max(h_label, h_time),
+        shadow_on=bool(shadow_on), shadow_color=shadow_color, shadow_blur=shadow_blur,
+        shadow_off=(shadow_off_x, shadow_off_y), shadow_opacity=shadow_opacity, shadow_spread=shadow_spread,
+    )
+
+
+def rasterize_time_row_plan(plan):
+    """TimeRowPlan を RGBA レイヤーに描く。戻り値は (layer, pos)。"""
+    canvas_w, canvas_h = plan.canvas_size
+    margin = plan.margin
+    font_size_px = plan.font_size_px
+    label, time_str = plan.label, plan.time_str
+    primary_font, fallback_font = plan.primary_font, plan.fallback_font
+    fill_color, fixed_label_w, w_label = plan.fill_color, plan.fixed_label_w, plan.w_label
+    tri_w, tri_h, tri_padding = plan.tri_w, plan.tri_h, plan.tri_padding
 
-    canvas_w = int(total_w_content + margin * 2)
     txt_img = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
     draw = ImageDraw.Draw(txt_img)
     
     cur_x, draw_y = margin, margin
     
-    if alignment == "triangle":
+    if plan.alignment == "triangle":
         label_draw_x = cur_x + (fixed_label_w - w_label)
         draw_text_mixed(draw, (label_draw_x, draw_y), label, primary_font, fallback_font, fill_color)
         cur_x += fixed_label_w
@@ -238,10 +390,10 @@ def draw_time_row_aligned(base_img, label, time_str, x, y, font, font_size_px, m
         draw_text_mixed(draw, (cur_x, draw_y), label, primary_font, fallback_font, fill_color)
         cur_x += w_label
     
-    if tri_visible:
+    if plan.tri_visible:
         cur_x += tri_padding
         cy = draw_y + (font_size_px * 0.5)
-        draw.polygon([(cur_x, cy - tri_h/2), (cur_x, cy + tri_h/2), (cur_x + tri_w, cy)], fill=tri_color or fill_color)
+        draw.polygon([(cur_x, cy - tri_h/2), (cur_x, cy + tri_h/2), (cur_x + tri_w, cy)], fill=plan.tri_color or fill_color)
         cur_x += tri_w + tri_padding
     else:
         cur_x += tri_padding
@@ -250,326 +402,728 @@ def draw_time_row_aligned(base_img, label, time_str, x, y, font, font_size_px, m
     
     final_layer = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
     
-    if shadow_on:
-        try: s_rgb = ImageColor.getrgb(shadow_color)
-        except Exception: s_rgb = (0,0,0)
-        s_color_with_alpha = s_rgb + (int(shadow_opacity),)
+    if plan.shadow_on:
+        s_rgb = _shadow_rgb(plan.shadow_color)
+        s_mask_fill = 255
         
-        shadow_layer = Image.new("RGBA", (canvas_w, canvas_h), (0,0,0,0))
-        shadow_draw = ImageDraw.Draw(shadow_layer)
+        shadow_mask = Image.new("L", (canvas_w, canvas_h), 0)
+        shadow_draw = ImageDraw.Draw(shadow_mask)
         
         s_cur_x = margin 
-        if alignment == "triangle":
+        if plan.alignment == "triangle":
             s_cur_x += (fixed_label_w - w_label)
-            draw_text_mixed(shadow_draw, (s_cur_x, draw_y), label, primary_font, fallback_font, s_color_with_alpha)
+            draw_text_mixed(shadow_draw, (s_cur_x, draw_y), label, primary_font, fallback_font, s_mask_fill)
             s_cur_x = margin + fixed_label_w
         else:
-            draw_text_mixed(shadow_draw, (s_cur_x, draw_y), label, primary_font, fallback_font, s_color_with_alpha)
+            draw_text_mixed(shadow_draw, (s_cur_x, draw_y), label, primary_font, fallback_font, s_mask_fill)
             s_cur_x += w_label
             
         s_cur_x += tri_padding
-        if tri_visible:
+        if plan.tri_visible:
             cy = draw_y + (font_size_px * 0.5)
-            shadow_draw.polygon([(s_cur_x, cy - tri_h/2), (s_cur_x, cy + tri_h/2), (s_cur_x + tri_w, cy)], fill=s_color_with_alpha)
+            shadow_draw.polygon([(s_cur_x, cy - tri_h/2), (s_cur_x, cy + tri_h/2), (s_cur_x + tri_w, cy)], fill=s_mask_fill)
             s_cur_x += tri_w + tri_padding
         
-        draw_text_mixed(shadow_draw, (s_cur_x, draw_y), time_str, primary_font, fallback_font, s_color_with_alpha)
+        draw_text_mixed(shadow_draw, (s_cur_x, draw_y), time_str, primary_font, fallback_font, s_mask_fill)
         
-        if shadow_spread > 0:
-            r, g, b, a = shadow_layer.split()
-            a = a.filter(ImageFilter.MaxFilter(1 + shadow_spread * 2))
-            shadow_expanded = Image.new("RGBA", shadow_layer.size, s_color_with_alpha)
-            shadow_expanded.putalpha(a)
-            shadow_layer = shadow_expanded
-
-        if shadow_blur > 0:
-            shadow_layer = shadow_layer.filter(ImageFilter.GaussianBlur(shadow_blur))
+        shadow_layer = render_shadow(shadow_mask, s_rgb, plan.shadow_opacity, plan.shadow_spread, plan.shadow_blur)
             
-        final_layer.paste(shadow_layer, (shadow_off_x, shadow_off_y), shadow_layer)
+        final_layer.paste(shadow_layer, plan.shadow_off, shadow_layer)
 
     final_layer.paste(txt_img, (0, 0), txt_img)
-    
-    paste_x = x - (canvas_w // 2) + margin
-    paste_y = y - margin
-    
+    return final_layer, plan.pos
+
+
+def draw_time_row_aligned(base_img, label, time_str, x, y, font, font_size_px, max_width, fill_color,
+                          shadow_on, shadow_color, shadow_blur, shadow_off_x, shadow_off_y, fallback_font_path,
+                          shadow_opacity=255, shadow_spread=0, 
+                          tri_visible=True, tri_scale=1.0, tri_color=None,
+                          alignment="center", fixed_label_w=0, measure_only=False, layer_sink=None):
+    plan = plan_time_row_aligned(label, time_str, x, y, font, font_size_px, max_width, fill_color,
+                                 shadow_on, shadow_color, shadow_blur, shadow_off_x, shadow_off_y, fallback_font_path,
+                                 shadow_opacity, shadow_spread, tri_visible, tri_scale, tri_color,
+                                 alignment, fixed_label_w)
+    if measure_only: return plan.height
+
+    final_layer, pos = rasterize_time_row_plan(plan)
+    if layer_sink is not None:
+        layer_sink.append((final_layer, pos))
     if base_img:
-        base_img.paste(final_layer, (int(paste_x), int(paste_y)), final_layer)
+        base_img.paste(final_layer, pos, final_layer)
         
-    return max(h_label, h_time)
+    return plan.height
 
 # ==========================================
 # 3. フライヤー生成関数 (メインロジック)
 # ==========================================
-def create_flyer_image_shadow(bg_source, logo_source, main_source, styles,
-                              date_text, venue_text, subtitle_text,
-                              open_time, start_time,
-                              ticket_info_list, common_notes_list,
-                              system_fallback_filename="keifont.ttf"):
-    
+# レイアウトはデザイン単位(1080x1350 = SNS 4:5 の px)で持ち、描画時に scale を掛ける。
+# styles のサイズ・余白・影・位置、layout_meta の座標はすべてデザイン単位。
+CANVAS_W, CANVAS_H = 1080, 1350
+
+# 用途別の描画倍率: エディタのプレビューは 540px(画素数 1/4)、SNS は 1080px、印刷は 4 倍
+RENDER_SCALES = {"preview": 0.5, "social": 1.0, "print": 4.0}
+PREVIEW_SCALE = RENDER_SCALES["preview"]
+EXPORT_SCALE = RENDER_SCALES["social"]
+
+# 書き出しフォーマット(キャンバスのデザイン寸法)。幅はどれも 1080 なので、
+# テキスト・ロゴのレイヤーは使い回したまま縦方向だけ組み直せる(render_flyer_formats)。
+# scale を持つものはその倍率で描く(A4 は印刷用に 4 倍 = 4320x6108)。
+FLYER_FORMATS = {
+    "feed": {"label": "フィード 4:5", "size": (1080, 1350)},
+    "story": {"label": "ストーリー 9:16", "size": (1080, 1920)},
+    "square": {"label": "スクエア 1:1", "size": (1080, 1080)},
+    "a4": {"label": "A4 印刷", "size": (1080, 1527), "scale": RENDER_SCALES["print"]},
+}
+
+# クリック移動で動かせる要素(views/flyer.py の move_targets と同じ並び)
+MOVABLE_ELEMENTS = ("subtitle", "date", "venue", "time", "ticket_name", "ticket_note")
+
+# 合成順(z-order)。base(背景+メイン画像)の上にこの順で重ねる
+LAYER_ORDER = ("logo", "subtitle", "date", "venue", "time", "ticket_name", "ticket_note", "buzz_logo")
+
+# 並列ラスタライズの上限(テキスト要素は多くても十数個)
+_RASTER_WORKERS = 8
+
+
+def canvas_size(scale=1.0, design_size=None):
+    """scale で描画したときのキャンバス寸法 (w, h)。design_size はデザイン単位(既定 1080x1350)。"""
+    w, h = design_size or (CANVAS_W, CANVAS_H)
+    if scale == 1: return w, h
+    return int(round(w * scale)), int(round(h * scale))
+
+
+@dataclass
+class FlyerLayout:
+    """layout_flyer の結果(計測のみ・ピクセル無し)。
+
+    items は (要素キー, TextPlan/TimeRowPlan) を合成順に並べたもの(座標は描画 px)。
+    logo / main は配置(寸法・位置・影設定)で、画像サイズを渡さなかった場合は None。
+    layout_meta は base_x/base_y と bbox をデザイン単位で持ち、views/flyer.py の
+    クリック移動や API(/api/projects/{id}/flyer-layout)がそのまま使う。
+    """
+    layout_meta: dict
+    items: List[Tuple[str, object]]
+    logo: Optional[dict] = None
+    main: Optional[dict] = None
+    scale: float = 1.0
+    design_size: Tuple[int, int] = (CANVAS_W, CANVAS_H)
+
+
+@dataclass
+class FlyerRender:
+    """render_flyer の描画結果一式(クリック移動の差分再合成・解像度違いの再出力用)。
+
+    canvas は base(背景+メイン画像)に layers を LAYER_ORDER 順で paste したもの。
+    layers は要素キー → [(RGBA レイヤー, 貼り付け位置)] で、位置だけ変わる編集なら
+    計測だけやり直して(layout_flyer)レイヤーを新しい位置へ動かし、動いた矩形
+    (移動前∪移動後)だけを base から合成し直せばよい。
+    styles は描画で実際に読んだキーだけの控え(再描画に足りる最小集合)、
+    signature / inputs は「位置以外の入力」。一致しない限り差分経路は使わない。
+    images はデコード済みの (背景, ロゴ, メイン画像) で、別フォーマットへの
+    組み直し(render_flyer_formats)では取得・デコードをやり直さずに使う。
+    """
+    canvas: Image.Image
+    base: Image.Image
+    layers: Dict[str, List[Tuple[Image.Image, Tuple[int, int]]]]
+    layout_meta: dict
+    styles: dict
+    signature: dict
+    inputs: tuple
+    layout_args: dict
+    scale: float = 1.0
+    design_size: Tuple[int, int] = (CANVAS_W, CANVAS_H)
+    sources: tuple = ()
+    images: tuple = ()
+    dirty_rects: List[Tuple[int, int, int, int]] = field(default_factory=list)
+
+
+_MISSING = object()   # styles に無かったキー(None を値に持つキーと区別する)
+
+
+class _StyleRecorder:
+    """styles.get をそのまま委譲しつつ、読まれたキーを記録する。
+
+    描画は styles の値だけで決まるので、記録したキーの値が一致すれば
+    同じ経路を通り同じレイヤーができる(= 位置以外は再描画不要と判定できる)。
+    """
+    def __init__(self, styles):
+        self._styles = styles
+        self.keys = set()
+
+    def get(self, key, default=None):
+        self.keys.add(key)
+        return self._styles.get(key, default)
+
+    def snapshot(self):
+        return {k: self._styles.get(k) for k in self.keys if k in self._styles}
+
+    def signature(self, exclude=()):
+        # 読んだが無かったキーも _MISSING として残す(後から足されたら不一致になるように)
+        return {k: self._styles.get(k, _MISSING) for k in self.keys if k not in exclude}
+
+
+def _pos_keys():
+    return {f"{k}_pos_{axis}" for k in MOVABLE_ELEMENTS for axis in ("x", "y")}
+
+
+def _source_ident(src):
+    # URL/パスは文字列のまま、PIL 画像はオブジェクト同一性で比較する
+    # (FlyerRender.sources が参照を握るので id の再利用は起きない)
+    if src is None or isinstance(src, str): return src
+    return ("obj", id(src))
+
+
+def _render_inputs(bg_source, logo_source, main_source, date_text, venue_text, subtitle_text,
+                   open_time, start_time, ticket_info_list, common_notes_list, system_fallback_filename):
+    return (
+        _source_ident(bg_source), _source_ident(logo_source), _source_ident(main_source),
+        date_text, venue_text, subtitle_text, open_time, start_time,
+        json.dumps(ticket_info_list or [], ensure_ascii=False, sort_keys=True, default=str),
+        json.dumps(common_notes_list or [], ensure_ascii=False, sort_keys=True, default=str),
+        system_fallback_filename,
+    )
+
+
+def _layer_rect(img, pos):
+    return (pos[0], pos[1], pos[0] + img.width, pos[1] + img.height)
+
+
+def _union_rect(rects):
+    rects = [r for r in rects if r]
+    if not rects: return None
+    return [min(r[0] for r in rects), min(r[1] for r in rects), max(r[2] for r in rects), max(r[3] for r in rects)]
+
+
+def _composite_rect(render, rect):
+    """rect の範囲だけ base から合成し直して canvas に書き戻す(全体合成と画素単位で一致)。"""
+    cw, ch = render.canvas.size
+    x0, y0 = max(0, int(rect[0])), max(0, int(rect[1]))
+    x1, y1 = min(cw, int(rect[2])), min(ch, int(rect[3]))
+    if x1 <= x0 or y1 <= y0: return None
+    patch = render.base.crop((x0, y0, x1, y1))
+    for key in LAYER_ORDER:
+        for img, (lx, ly) in render.layers.get(key, []):
+            if lx >= x1 or ly >= y1 or lx + img.width <= x0 or ly + img.height <= y0: continue
+            patch.paste(img, (lx - x0, ly - y0), img)
+    render.canvas.paste(patch, (x0, y0))
+    return (x0, y0, x1, y1)
+
+
+def _get_font_path(fname):
+    candidates = [fname, os.path.join(FONT_DIR, fname), os.path.join("assets", "fonts", fname), "keifont.ttf"]
+    for c in candidates:
+        if c and os.path.exists(c): return c
+    return None
+
+
+def _load_time_font(font_path, font_size_px):
+    try: return ImageFont.truetype(font_path, int(font_size_px))
+    except Exception: return ImageFont.load_default()
+
+
+def layout_flyer(styles, date_text, venue_text, subtitle_text,
+                 open_time, start_time,
+                 ticket_info_list, common_notes_list,
+                 system_fallback_filename="keifont.ttf",
+                 logo_size=None, main_size=None, scale=1.0, design_size=None):
+    """フライヤーの全要素の位置を、グリフを描かずに計測だけで決める(1段目)。
+
+    フッターの縦送り(current_y)は各要素の計測高さだけで決まるので、
+    ラスタライズ(2段目・render_flyer)を待たずに全レイアウトが確定する。
+    logo_size / main_size(元画像の (w, h))を渡すとロゴ・メイン画像の配置も計算する。
+    scale は描画倍率: デザイン単位の styles を px に直して計測する(フォントも
+    スケール後のサイズで計測するので、縮小プレビューでも折り返し判定が正しい)。
+    design_size はキャンバスのデザイン寸法(FLYER_FORMATS 参照、既定 1080x1350)。
+    フッターは下端から、ロゴは上端から組むので、縦横比が変わっても同じ設定で収まる。
+    """
     layout_meta = {}
-    CANVAS_W, CANVAS_H = 1080, 1350
-    
-    # 背景
-    bg_img = load_image(bg_source)
-    if bg_img:
-        bg_ratio = bg_img.width / bg_img.height
-        canvas_ratio = CANVAS_W / CANVAS_H
-        if bg_ratio > canvas_ratio:
-            new_h = CANVAS_H
-            new_w = int(new_h * bg_ratio)
-        else:
-            new_w = CANVAS_W
-            new_h = int(new_w / bg_ratio)
-        bg_resized = bg_img.resize((new_w, new_h), Image.LANCZOS)
-        left = (new_w - CANVAS_W) // 2
-        top = (new_h - CANVAS_H) // 2
-        bg_final = bg_resized.crop((left, top, left + CANVAS_W, top + CANVAS_H))
-    else:
-        bg_final = Image.new("RGBA", (CANVAS_W, CANVAS_H), (30, 30, 30, 255))
-    canvas = bg_final.convert("RGBA")
-    
-    # フォント
-    def get_font_path(fname):
-        candidates = [fname, os.path.join(FONT_DIR, fname), os.path.join("assets", "fonts", fname), "keifont.ttf"]
-        for c in candidates:
-            if c and os.path.exists(c): return c
-        return None
-    fallback_path = get_font_path(system_fallback_filename)
+    items = []
+    fallback_path = _get_font_path(system_fallback_filename)
+    design_size = tuple(design_size or (CANVAS_W, CANVAS_H))
+    cw, ch = canvas_size(scale, design_size)
+
+    def u(v):
+        return _u(v, scale)
+
+    def d(v):
+        # 描画 px → デザイン単位(layout_meta 用)
+        return v if scale == 1 else int(round(v / scale))
+
+    def d_rect(r):
+        return [d(v) for v in r] if r else None
 
-    # メイン画像
-    main_img = load_image(main_source)
-    if main_img:
+    # メイン画像 (位置はクリック移動の対象外なので base に焼き込む)
+    main = None
+    if main_size:
+        src_w, src_h = main_size
         scale_w_pct = styles.get("content_scale_w", 100)
         scale_h_pct = styles.get("content_scale_h", 100)
-        pos_y_off = styles.get("content_pos_y", 0)
-        target_w = int(CANVAS_W * (scale_w_pct / 100))
-        target_h = int(main_img.height * (target_w / main_img.width) * (scale_h_pct/scale_w_pct))
-        main_resized = main_img.resize((target_w, target_h), Image.LANCZOS)
-        main_base_x = CANVAS_W // 2
-        main_base_y = CANVAS_H // 2
+        pos_y_off = u(styles.get("content_pos_y", 0))
+        target_w = int(cw * (scale_w_pct / 100))
+        target_h = int(src_h * (target_w / src_w) * (scale_h_pct/scale_w_pct))
+        main_base_x = cw // 2
+        main_base_y = ch // 2
         main_x = main_base_x - (target_w // 2)
-        main_y = (main_base_y - (target_h // 2)) - pos_y_off
-        canvas.paste(main_resized, (main_x, main_y), main_resized)
-        layout_meta["main"] = {"base_x": main_base_x, "base_y": main_base_y}
+        main_y = int((main_base_y - (target_h // 2)) - pos_y_off)
+        main = {"size": (target_w, target_h), "pos": (main_x, main_y)}
+        layout_meta["main"] = {"base_x": d(main_base_x), "base_y": d(main_base_y),
+                               "bbox": d_rect([main_x, main_y, main_x + target_w, main_y + target_h])}
 
     # --- 4. ロゴ (★影機能追加) ---
-    logo_img = load_image(logo_source)
-    if logo_img:
+    logo = None
+    if logo_size:
+        src_w, src_h = logo_size
         l_scale = styles.get("logo_scale", 1.0)
         l_off_x = styles.get("logo_pos_x", 0.0)
         l_off_y = styles.get("logo_pos_y", 0.0)
-        base_w = CANVAS_W * 0.4 * l_scale
-        l_ratio = logo_img.height / logo_img.width
+        base_w = cw * 0.4 * l_scale
+        l_ratio = src_h / src_w
         l_w = int(base_w)
         l_h = int(l_w * l_ratio)
-        logo_resized = logo_img.resize((l_w, l_h), Image.LANCZOS)
         
-        base_x = (CANVAS_W - l_w) // 2
-        base_y = 50
-        final_x = base_x + int(CANVAS_W * (l_off_x / 100))
-        final_y = base_y - int(CANVAS_H * (l_off_y / 100))
+        base_x = (cw - l_w) // 2
+        base_y = int(u(50))
+        final_x = base_x + int(cw * (l_off_x / 100))
+        final_y = base_y - int(ch * (l_off_y / 100))
+        logo = {"size": (l_w, l_h), "pos": (final_x, final_y), "shadow": None}
+        rects = [(final_x, final_y, final_x + l_w, final_y + l_h)]
         
-        # ロゴの影描画
+        # ロゴの影
         if styles.get("logo_shadow_on", False):
             try:
                 ls_rgb = ImageColor.getrgb(styles.get("logo_shadow_color", "#000000"))
-                ls_opacity = int(styles.get("logo_shadow_opacity", 128))
-                ls_spread = int(styles.get("logo_shadow_spread", 0))
-                ls_blur = int(styles.get("logo_shadow_blur", 5))
-                ls_off_x = int(styles.get("logo_shadow_off_x", 5))
-                ls_off_y = int(styles.get("logo_shadow_off_y", 5))
-                
-                l_alpha = logo_resized.getchannel("A")
-                shadow_base = Image.new("RGBA", logo_resized.size, ls_rgb + (ls_opacity,))
-                shadow_base.putalpha(l_alpha)
-                
-                if ls_spread > 0:
-                    mask = shadow_base.getchannel("A")
-                    mask = mask.filter(ImageFilter.MaxFilter(1 + ls_spread * 2))
-                    shadow_expanded = Image.new("RGBA", logo_resized.size, ls_rgb + (ls_opacity,))
-                    shadow_expanded.putalpha(mask)
-                    shadow_base = shadow_expanded
-                
-                if ls_blur > 0:
-                    shadow_base = shadow_base.filter(ImageFilter.GaussianBlur(ls_blur))
-                
-                canvas.paste(shadow_base, (final_x + ls_off_x, final_y + ls_off_y), shadow_base)
+                ls_spread = int(u(int(styles.get("logo_shadow_spread", 0))))
+                ls_blur = int(u(int(styles.get("logo_shadow_blur", 5))))
+                ls_off_x = int(u(int(styles.get("logo_shadow_off_x", 5))))
+                ls_off_y = int(u(int(styles.get("logo_shadow_off_y", 5))))
+                sx, sy = final_x + ls_off_x, final_y + ls_off_y
+                logo["shadow"] = {"rgb": ls_rgb, "spread": ls_spread, "blur": ls_blur, "pos": (sx, sy)}
+                rects.append((sx, sy, sx + l_w, sy + l_h))
             except Exception as e:
                 print(f"Logo shadow error: {e}")
 
-        canvas.paste(logo_resized, (final_x, final_y), logo_resized)
-        layout_meta["logo"] = {"base_x": CANVAS_W // 2, "base_y": 50, "mode": "percent"}
+        layout_meta["logo"] = {"base_x": design_size[0] // 2, "base_y": 50, "mode": "percent",
+                               "bbox": d_rect(_union_rect(rects))}
 
-    # テキスト描画
-    footer_base_y = CANVAS_H - 450 - styles.get("footer_pos_y", 0)
+    # テキスト配置
+    footer_base_y = ch - u(450) - u(styles.get("footer_pos_y", 0))
     current_y = footer_base_y
 
     def get_s(key_prefix):
         return {
-            "font_path": get_font_path(styles.get(f"{key_prefix}_font")),
-            "font_size_px": styles.get(f"{key_prefix}_size", 40),
+            "font_path": _get_font_path(styles.get(f"{key_prefix}_font")),
+            "font_size_px": u(styles.get(f"{key_prefix}_size", 40)),
             "fill_color": styles.get(f"{key_prefix}_color", "#FFFFFF"),
             "shadow_on": styles.get(f"{key_prefix}_shadow_on", False),
             "shadow_color": styles.get(f"{key_prefix}_shadow_color", "#000000"),
-            "shadow_blur": styles.get(f"{key_prefix}_shadow_blur", 0),
-            "shadow_off_x": styles.get(f"{key_prefix}_shadow_off_x", 5),
-            "shadow_off_y": styles.get(f"{key_prefix}_shadow_off_y", 5),
+            "shadow_blur": u(styles.get(f"{key_prefix}_shadow_blur", 0)),
+            "shadow_off_x": u(styles.get(f"{key_prefix}_shadow_off_x", 5)),
+            "shadow_off_y": u(styles.get(f"{key_prefix}_shadow_off_y", 5)),
             "shadow_opacity": styles.get(f"{key_prefix}_shadow_opacity", 255),
-            "shadow_spread": styles.get(f"{key_prefix}_shadow_spread", 0),
-            "pos_x": styles.get(f"{key_prefix}_pos_x", 0),
-            "pos_y": styles.get(f"{key_prefix}_pos_y", 0)
+            "shadow_spread": u(styles.get(f"{key_prefix}_shadow_spread", 0)),
+            "pos_x": u(styles.get(f"{key_prefix}_pos_x", 0)),
+            "pos_y": u(styles.get(f"{key_prefix}_pos_y", 0))
         }
 
-    # (0) Subtitle
-    if subtitle_text:
-        s = get_s("subtitle")
-        base_x = CANVAS_W // 2
-        base_y = current_y
-        layout_meta["subtitle"] = {"base_x": base_x, "base_y": base_y}
-        h = draw_text_with_shadow(
-            canvas, subtitle_text,
-            base_x + s["pos_x"], base_y - s["pos_y"],
-            s["font_path"], s["font_size_px"], CANVAS_W - 40, s["fill_color"],
+    def plan_line(key, text, x, y, s, max_width):
+        plan = plan_text_with_shadow(
+            text, x, y,
+            s["font_path"], s["font_size_px"], max_width, s["fill_color"],
             anchor="ma",
             shadow_on=s["shadow_on"], shadow_color=s["shadow_color"],
             shadow_blur=s["shadow_blur"], shadow_off_x=s["shadow_off_x"], shadow_off_y=s["shadow_off_y"],
             shadow_opacity=s["shadow_opacity"], shadow_spread=s["shadow_spread"],
-            fallback_font_path=fallback_path
+            fallback_font_path=fallback_path, scale=scale
         )
-        current_y += h + styles.get("subtitle_date_gap", 10)
+        if plan is None: return 0
+        items.append((key, plan))
+        return plan.height
 
-    # (1) Date
-    if date_text:
-        s = get_s("date")
-        base_x = CANVAS_W // 2
+    # (0)-(2) Subtitle / Date / Venue
+    for key, text, gap in (
+        ("subtitle", subtitle_text, lambda: u(styles.get("subtitle_date_gap", 10))),
+        ("date", date_text, lambda: u(styles.get("date_venue_gap", 10))),
+        ("venue", venue_text, lambda: u(30)),
+    ):
+        if not text: continue
+        s = get_s(key)
+        base_x = cw // 2
         base_y = current_y
-        layout_meta["date"] = {"base_x": base_x, "base_y": base_y}
-        h = draw_text_with_shadow(
-            canvas, date_text, 
-            base_x + s["pos_x"], base_y - s["pos_y"],
-            s["font_path"], s["font_size_px"], CANVAS_W - 40, s["fill_color"],
-            anchor="ma",
-            shadow_on=s["shadow_on"], shadow_color=s["shadow_color"],
-            shadow_blur=s["shadow_blur"], shadow_off_x=s["shadow_off_x"], shadow_off_y=s["shadow_off_y"],
-            shadow_opacity=s["shadow_opacity"], shadow_spread=s["shadow_spread"],
-            fallback_font_path=fallback_path
-        )
-        current_y += h + styles.get("date_venue_gap", 10)
-
-    # (2) Venue
-    if venue_text:
-        s = get_s("venue")
-        base_x = CANVAS_W // 2
-        base_y = current_y
-        layout_meta["venue"] = {"base_x": base_x, "base_y": base_y}
-        h = draw_text_with_shadow(
-            canvas, venue_text, 
-            base_x + s["pos_x"], base_y - s["pos_y"],
-            s["font_path"], s["font_size_px"], CANVAS_W - 40, s["fill_color"],
-            anchor="ma",
-            shadow_on=s["shadow_on"], shadow_color=s["shadow_color"],
-            shadow_blur=s["shadow_blur"], shadow_off_x=s["shadow_off_x"], shadow_off_y=s["shadow_off_y"],
-            shadow_opacity=s["shadow_opacity"], shadow_spread=s["shadow_spread"],
-            fallback_font_path=fallback_path
-        )
-        current_y += h + 30
+        layout_meta[key] = {"base_x": d(base_x), "base_y": d(base_y)}
+        h = plan_line(key, text, base_x + s["pos_x"], base_y - s["pos_y"], s, cw - u(40))
+        current_y += h + gap()
 
     # (3) Time
     s = get_s("time")
-    try: time_font = ImageFont.truetype(s["font_path"], int(s["font_size_px"]))
-    except Exception: time_font = ImageFont.load_default()
     tri_visible = styles.get("time_tri_visible", True)
     tri_scale = styles.get("time_tri_scale", 1.0)
-    line_gap = styles.get("time_line_gap", 0)
+    line_gap = u(styles.get("time_line_gap", 0))
     alignment = styles.get("time_alignment", "center")
     
-    center_x = CANVAS_W // 2 + s["pos_x"]
+    center_x = cw // 2 + s["pos_x"]
     start_y = current_y - s["pos_y"]
-    layout_meta["time"] = {"base_x": CANVAS_W // 2, "base_y": current_y}
+    layout_meta["time"] = {"base_x": d(cw // 2), "base_y": d(current_y)}
     
-    dummy = ImageDraw.Draw(Image.new("RGBA",(1,1)))
-    w_open, _ = draw_text_mixed(dummy, (0,0), "OPEN", time_font, None, None)
-    w_start, _ = draw_text_mixed(dummy, (0,0), "START", time_font, None, None)
+    measure_font = _load_time_font(s["font_path"], s["font_size_px"])
+    w_open, _ = measure_text_mixed("OPEN", measure_font, None)
+    w_start, _ = measure_text_mixed("START", measure_font, None)
     fixed_label_w = max(w_open, w_start)
 
-    h1 = draw_time_row_aligned(
-        canvas, "OPEN", open_time, center_x, start_y,
-        time_font, s["font_size_px"], CANVAS_W, s["fill_color"],
-        s["shadow_on"], s["shadow_color"], s["shadow_blur"], s["shadow_off_x"], s["shadow_off_y"], fallback_path,
-        s["shadow_opacity"], s["shadow_spread"],
-        tri_visible, tri_scale, s["fill_color"], alignment, fixed_label_w
-    )
-    
-    h2 = draw_time_row_aligned(
-        canvas, "START", start_time, center_x, start_y + h1 + line_gap,
-        time_font, s["font_size_px"], CANVAS_W, s["fill_color"],
-        s["shadow_on"], s["shadow_color"], s["shadow_blur"], s["shadow_off_x"], s["shadow_off_y"], fallback_path,
-        s["shadow_opacity"], s["shadow_spread"],
-        tri_visible, tri_scale, s["fill_color"], alignment, fixed_label_w
-    )
-    current_y = start_y + h1 + line_gap + h2 + styles.get("area_gap", 40)
+    row_y = start_y
+    for i, (label, time_str) in enumerate((("OPEN", open_time), ("START", start_time))):
+        # 2段目で行ごとに並列描画するので、FreeType フォントは行ごとに別インスタンスにする
+        plan = plan_time_row_aligned(
+            label, time_str, center_x, row_y,
+            _load_time_font(s["font_path"], s["font_size_px"]), s["font_size_px"], cw, s["fill_color"],
+            s["shadow_on"], s["shadow_color"], s["shadow_blur"], s["shadow_off_x"], s["shadow_off_y"], fallback_path,
+            s["shadow_opacity"], s["shadow_spread"],
+            tri_visible, tri_scale, s["fill_color"], alignment, fixed_label_w, scale=scale
+        )
+        items.append(("time", plan))
+        row_y += plan.height + (line_gap if i == 0 else 0)
+    # 注: フッター開始位置は time の pos_y に追従する
+    current_y = row_y + u(styles.get("area_gap", 40))
 
     # (4) Footer
-    layout_meta["footer_area"] = {"base_x": CANVAS_W // 2, "base_y": current_y}
-    layout_meta["ticket_name"] = {"base_x": CANVAS_W // 2, "base_y": current_y}
-    layout_meta["ticket_note"] = {"base_x": CANVAS_W // 2, "base_y": current_y}
+    layout_meta["footer_area"] = {"base_x": d(cw // 2), "base_y": d(current_y)}
+    layout_meta["ticket_name"] = {"base_x": d(cw // 2), "base_y": d(current_y)}
+    layout_meta["ticket_note"] = {"base_x": d(cw // 2), "base_y": d(current_y)}
     
     s_ticket = get_s("ticket_name")
-    t_gap = styles.get("ticket_gap", 20)
+    t_gap = u(styles.get("ticket_gap", 20))
     for t in ticket_info_list:
         if not t.get("name") and not t.get("price"): continue
         line_text = f"{t.get('name')} {t.get('price')}"
         if t.get("note"): line_text += f" ({t.get('note')})"
-        h = draw_text_with_shadow(
-            canvas, line_text, 
-            CANVAS_W // 2 + s_ticket["pos_x"], current_y - s_ticket["pos_y"],
-            s_ticket["font_path"], s_ticket["font_size_px"], CANVAS_W - 60, s_ticket["fill_color"],
-            anchor="ma",
-            shadow_on=s_ticket["shadow_on"], shadow_color=s_ticket["shadow_color"],
-            shadow_blur=s_ticket["shadow_blur"], shadow_off_x=s_ticket["shadow_off_x"], shadow_off_y=s_ticket["shadow_off_y"],
-            shadow_opacity=s_ticket["shadow_opacity"], shadow_spread=s_ticket["shadow_spread"],
-            fallback_font_path=fallback_path
-        )
+        h = plan_line("ticket_name", line_text,
+                      cw // 2 + s_ticket["pos_x"], current_y - s_ticket["pos_y"], s_ticket, cw - u(60))
         current_y += h + t_gap
 
     s_note = get_s("ticket_note")
-    n_gap = styles.get("note_gap", 15)
-    current_y += 10 
+    n_gap = u(styles.get("note_gap", 15))
+    current_y += u(10)
     for note in common_notes_list:
         if not note: continue
-        h = draw_text_with_shadow(
-            canvas, note, 
-            CANVAS_W // 2 + s_note["pos_x"], current_y - s_note["pos_y"],
-            s_note["font_path"], s_note["font_size_px"], CANVAS_W - 60, s_note["fill_color"],
-            anchor="ma",
-            shadow_on=s_note["shadow_on"], shadow_color=s_note["shadow_color"],
-            shadow_blur=s_note["shadow_blur"], shadow_off_x=s_note["shadow_off_x"], shadow_off_y=s_note["shadow_off_y"],
-            shadow_opacity=s_note["shadow_opacity"], shadow_spread=s_note["shadow_spread"],
-            fallback_font_path=fallback_path
-        )
+        h = plan_line("ticket_note", note,
+                      cw // 2 + s_note["pos_x"], current_y - s_note["pos_y"], s_note, cw - u(60))
         current_y += h + n_gap
 
+    # bbox(テキスト要素): 計測済みの貼り付け位置と寸法から
+    for key in MOVABLE_ELEMENTS:
+        if key in layout_meta:
+            layout_meta[key]["bbox"] = d_rect(_union_rect(
+                [(p.pos[0], p.pos[1], p.pos[0] + p.size[0], p.pos[1] + p.size[1]) for k, p in items if k == key]))
+    layout_meta["footer_area"]["bbox"] = _union_rect([
+        layout_meta["ticket_name"]["bbox"], layout_meta["ticket_note"]["bbox"]])
+
+    return FlyerLayout(layout_meta=layout_meta, items=items, logo=logo, main=main, scale=scale,
+                       design_size=design_size)
+
+
+def _rasterize_logo(logo_img, placement):
+    """ロゴ(と影)をレイヤー化する。戻り値は [(layer, pos)](影が先)。"""
+    logo_resized = logo_img.resize(placement["size"], Image.LANCZOS)
+    layers = []
+    shadow = placement.get("shadow")
+    if shadow:
+        try:
+            # 注: 従来ロゴ影は putalpha でアルファを上書きしていたため logo_shadow_opacity が効いていなかった。
+            # 見た目を変えないよう、ここでも不透明度は掛けない(255 固定)。
+            shadow_base = render_shadow(logo_resized.getchannel("A"), shadow["rgb"], 255,
+                                        shadow["spread"], shadow["blur"])
+            layers.append((shadow_base, shadow["pos"]))
+        except Exception as e:
+            print(f"Logo shadow error: {e}")
+    layers.append((logo_resized, placement["pos"]))
+    return layers
+
+
+def _reuse_logo(placement, prev_layers):
+    """寸法が同じならロゴ(と影)の既存レイヤーを新しい位置で使い回す。使えなければ None。"""
+    positions = ([placement["shadow"]["pos"]] if placement.get("shadow") else []) + [placement["pos"]]
+    if not prev_layers or len(prev_layers) != len(positions): return None
+    if any(img.size != placement["size"] for img, _ in prev_layers): return None
+    return [(img, pos) for (img, _), pos in zip(prev_layers, positions)]
+
+
+def _rasterize_item(item):
+    key, plan = item
+    if isinstance(plan, TimeRowPlan):
+        return key, rasterize_time_row_plan(plan)
+    return key, rasterize_text_plan(plan)
+
+
+def _fit_background(bg_img, cw, ch):
+    """背景を cover(短辺合わせ → 中央切り抜き)でキャンバスに合わせる。無ければ暗灰色。"""
+    if bg_img:
+        bg_ratio = bg_img.width / bg_img.height
+        canvas_ratio = cw / ch
+        if bg_ratio > canvas_ratio:
+            new_h = ch
+            new_w = int(new_h * bg_ratio)
+        else:
+            new_w = cw
+            new_h = int(new_w / bg_ratio)
+        bg_resized = bg_img.resize((new_w, new_h), Image.LANCZOS)
+        left = (new_w - cw) // 2
+        top = (new_h - ch) // 2
+        bg_final = bg_resized.crop((left, top, left + cw, top + ch))
+    else:
+        bg_final = Image.new("RGBA", (cw, ch), (30, 30, 30, 255))
+    return bg_final.convert("RGBA")
+
+
+def _buzz_logo_layers(styles, scale, cw, ch):
     # ==========================================
     # ★追加: BUZZチケロゴの描画 (一番手前に描画)
     # ==========================================
-    if styles.get("show_buzz_logo", False):
-        buzz_logo_path = os.path.join("assets", "buzz-logo-appicon.jpg")
-        if os.path.exists(buzz_logo_path):
-            try:
-                # ロゴの読み込みとリサイズ (120x120)
-                buzz_img = Image.open(buzz_logo_path).convert("RGBA")
-                b_size = 120
-                buzz_resized = buzz_img.resize((b_size, b_size), Image.LANCZOS)
-                
-                # 配置位置 (右下、余白30px)
-                margin_x = 30
-                margin_y = 30
-                paste_x = CANVAS_W - b_size - margin_x
-                paste_y = CANVAS_H - b_size - margin_y
-                
-                # キャンバスに貼り付け
-                canvas.paste(buzz_resized, (paste_x, paste_y), buzz_resized)
-            except Exception as e:
-                print(f"BUZZチケロゴの合成エラー: {e}")
+    if not styles.get("show_buzz_logo", False): return None
+    buzz_logo_path = os.path.join("assets", "buzz-logo-appicon.jpg")
+    if not os.path.exists(buzz_logo_path): return None
+    try:
+        # ロゴの読み込みとリサイズ (120x120)
+        buzz_img = Image.open(buzz_logo_path).convert("RGBA")
+        b_size = int(round(_u(120, scale)))
+        buzz_resized = buzz_img.resize((b_size, b_size), Image.LANCZOS)
+        
+        # 配置位置 (右下、余白30px)
+        margin_x = int(round(_u(30, scale)))
+        margin_y = int(round(_u(30, scale)))
+        paste_x = cw - b_size - margin_x
+        paste_y = ch - b_size - margin_y
+        
+        return [(buzz_resized, (paste_x, paste_y))]
+    except Exception as e:
+        print(f"BUZZチケロゴの合成エラー: {e}")
+        return None
+
+
+def _assemble_flyer(images, recorder, layout_args, scale, design_size, reuse=None):
+    """デコード済み画像から 1 枚分を組む(レイアウト → 並列ラスタライズ → 合成)。
+
+    reuse に既存の layers を渡すと、寸法が一致する要素はラスタライズせずに
+    位置だけ差し替えて使う(同じ幅のキャンバスへの組み直し用)。
+    戻り値は (canvas, base, layers, layout)。
+    """
+    bg_img, logo_img, main_img = images
+    layout = layout_flyer(recorder, scale=scale, design_size=design_size, **layout_args)
+    cw, ch = canvas_size(scale, layout.design_size)
+    base = _fit_background(bg_img, cw, ch)
+    reuse = reuse or {}
+
+    layers = {}
+    pending = []
+    reuse_index = {}
+    for key, plan in layout.items:
+        i = reuse_index[key] = reuse_index.get(key, -1) + 1
+        prev = reuse.get(key, [])
+        if i < len(prev) and prev[i][0].size == tuple(plan.size):
+            pending.append((key, (prev[i][0], plan.pos)))
+        else:
+            pending.append((key, None))
+    logo_layers = _reuse_logo(layout.logo, reuse.get("logo")) if layout.logo else None
+
+    # 2段目: ラスタライズ(要素ごとに独立なので並列)
+    with ThreadPoolExecutor(max_workers=_RASTER_WORKERS) as executor:
+        logo_future = (executor.submit(_rasterize_logo, logo_img, layout.logo)
+                       if layout.logo and logo_layers is None else None)
+        text_futures = [
+            executor.submit(_rasterize_item, item) if done is None else None
+            for item, (_, done) in zip(layout.items, pending)
+        ]
+        if layout.main:
+            main_resized = main_img.resize(layout.main["size"], Image.LANCZOS)
+            base.paste(main_resized, layout.main["pos"], main_resized)
+        if logo_future is not None:
+            logo_layers = logo_future.result()
+        text_results = [
+            future.result() if future is not None else (key, done)
+            for future, (key, done) in zip(text_futures, pending)
+        ]
+    if logo_layers:
+        layers["logo"] = logo_layers
+    for key, layer in text_results:
+        layers.setdefault(key, []).append(layer)
+
+    buzz = _buzz_logo_layers(recorder, scale, cw, ch)
+    if buzz:
+        layers["buzz_logo"] = buzz
+
+    # 合成: base に z-order 順で重ねる
+    canvas = base.copy()
+    for key in LAYER_ORDER:
+        for img, pos in layers.get(key, []):
+            canvas.paste(img, pos, img)
+    return canvas, base, layers, layout
+
+
+def render_flyer(bg_source, logo_source, main_source, styles,
+                 date_text, venue_text, subtitle_text,
+                 open_time, start_time,
+                 ticket_info_list, common_notes_list,
+                 system_fallback_filename="keifont.ttf", scale=1.0, design_size=None):
+    """フライヤーを要素ごとのレイヤーに分けて描画し、合成済み canvas ごと返す。
+
+    2段構成: layout_flyer で全要素の位置を計測だけで確定 → 各テキスト行・ロゴを
+    ThreadPoolExecutor で並列にラスタライズ → LAYER_ORDER(z-order)順に合成。
+    画像ソース 3 枚の取得も並列。scale=1 の出力は逐次描画していた頃と画素単位で同じ。
+    scale を変えると同じ設定のまま解像度だけ変わる(RENDER_SCALES 参照)。
+    design_size でキャンバスの縦横比を変えられる(FLYER_FORMATS 参照)。
+    layout_meta には各要素の base_x/base_y に加えて bbox([x0, y0, x1, y1])を
+    デザイン単位で記録する。
+    """
+    recorder = _StyleRecorder(styles)
+
+    # 画像ソースの取得(URL の場合は HTTP)を並列に
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        images = tuple(executor.map(load_image, (bg_source, logo_source, main_source)))
+    _, logo_img, main_img = images
+
+    # 1段目: レイアウト(計測のみ)の入力
+    layout_args = dict(
+        date_text=date_text, venue_text=venue_text, subtitle_text=subtitle_text,
+        open_time=open_time, start_time=start_time,
+        ticket_info_list=ticket_info_list, common_notes_list=common_notes_list,
+        system_fallback_filename=system_fallback_filename,
+        logo_size=logo_img.size if logo_img else None,
+        main_size=main_img.size if main_img else None,
+    )
+    canvas, base, layers, layout = _assemble_flyer(images, recorder, layout_args, scale, design_size)
+
+    pos_keys = _pos_keys()
+    recorded = recorder.snapshot()
+    return FlyerRender(
+        canvas=canvas, base=base, layers=layers, layout_meta=layout.layout_meta,
+        styles=recorded,
+        signature=recorder.signature(exclude=pos_keys),
+        inputs=_render_inputs(bg_source, logo_source, main_source, date_text, venue_text, subtitle_text,
+                              open_time, start_time, ticket_info_list, common_notes_list, system_fallback_filename),
+        layout_args=layout_args, scale=scale, design_size=layout.design_size,
+        sources=(bg_source, logo_source, main_source), images=images,
+        dirty_rects=[(0, 0) + canvas.size],
+    )
+
+
+def create_flyer_image_shadow(bg_source, logo_source, main_source, styles,
+                              date_text, venue_text, subtitle_text,
+                              open_time, start_time,
+                              ticket_info_list, common_notes_list,
+                              system_fallback_filename="keifont.ttf", scale=1.0):
+    render = render_flyer(bg_source, logo_source, main_source, styles,
+                          date_text, venue_text, subtitle_text,
+                          open_time, start_time,
+                          ticket_info_list, common_notes_list,
+                          system_fallback_filename, scale=scale)
+    return render.canvas, render.layout_meta
+
+
+def _signature_matches(render, styles):
+    return all(styles.get(k, _MISSING) == v for k, v in render.signature.items())
+
+
+def update_flyer_positions(render, styles):
+    """位置(*_pos_x / *_pos_y)だけが変わった前提で、動いた要素の矩形だけを合成し直す。
+
+    layout_flyer(計測のみ)をやり直して各レイヤーの新しい位置を得る。time の上下で
+    フッターが連動して動くのもレイアウト側がそのまま面倒を見る。
+    render.canvas / layout_meta をその場で更新し、合成し直した矩形のリストを返す
+    (render.dirty_rects にも格納)。要素の構成が変わっていたら None(要フル描画)。
+    位置以外が変わっているかどうかは判定しない(それは rerender_flyer の役目)。
+    """
+    recorder = _StyleRecorder(styles)
+    layout = layout_flyer(recorder, scale=render.scale, design_size=render.design_size, **render.layout_args)
+
+    new_positions = {}
+    for key, plan in layout.items:
+        new_positions.setdefault(key, []).append(plan.pos)
+    for key in MOVABLE_ELEMENTS:
+        if len(new_positions.get(key, [])) != len(render.layers.get(key, [])):
+            return None
+
+    dirty = []
+    for key in MOVABLE_ELEMENTS:
+        moved = []
+        for (img, pos), new_pos in zip(render.layers.get(key, []), new_positions.get(key, [])):
+            if new_pos != pos:
+                dirty.append(_union_rect([_layer_rect(img, pos), _layer_rect(img, new_pos)]))
+            moved.append((img, new_pos))
+        if key in render.layers:
+            render.layers[key] = moved
+
+    render.layout_meta.clear()
+    render.layout_meta.update(layout.layout_meta)
+    render.styles.update(recorder.snapshot())
+    render.dirty_rects = [r for r in (_composite_rect(render, rect) for rect in dirty) if r]
+    return render.dirty_rects
+
+
+def rerender_flyer(prev, bg_source, logo_source, main_source, styles,
+                   date_text, venue_text, subtitle_text,
+                   open_time, start_time,
+                   ticket_info_list, common_notes_list,
+                   system_fallback_filename="keifont.ttf", scale=1.0):
+    """前回の FlyerRender を使い回せるなら位置差分だけ合成し直し、無理なら全体を描き直す。
+
+    使い回せる条件: 描画倍率・入力(画像ソース・テキスト・チケット)と、前回描画で
+    読んだ styles キーのうち位置以外の値がすべて一致すること。
+    クリック移動(views/flyer.py)はこの経路で数十 ms に収まる。
+    """
+    inputs = _render_inputs(bg_source, logo_source, main_source, date_text, venue_text, subtitle_text,
+                            open_time, start_time, ticket_info_list, common_notes_list, system_fallback_filename)
+    if (
+        isinstance(prev, FlyerRender)
+        and prev.scale == scale
+        and prev.inputs == inputs
+        and _signature_matches(prev, styles)
+        and update_flyer_positions(prev, styles) is not None
+    ):
+        return prev
+    return render_flyer(bg_source, logo_source, main_source, styles,
+                        date_text, venue_text, subtitle_text,
+                        open_time, start_time,
+                        ticket_info_list, common_notes_list,
+                        system_fallback_filename, scale=scale)
+
+
+def _derive_render(render, scale, design_size, reuse=None):
+    """デコード済み画像・記録済み styles から、倍率 / キャンバス違いの FlyerRender を組む。"""
+    recorder = _StyleRecorder(dict(render.styles))
+    canvas, base, layers, layout = _assemble_flyer(
+        render.images, recorder, render.layout_args, scale, design_size, reuse=reuse)
+    return replace(
+        render, canvas=canvas, base=base, layers=layers, layout_meta=layout.layout_meta,
+        styles=recorder.snapshot(), scale=scale, design_size=layout.design_size,
+        dirty_rects=[(0, 0) + canvas.size],
+    )
+
+
+def rescale_flyer(render, scale):
+    """同じ入力・設定のまま、別の描画倍率で描き直す(プレビュー → SNS / 印刷用書き出し)。
+
+    画像ソースは再取得せず、FlyerRender.images(デコード済み)を使う。
+    """
+    return _derive_render(render, scale, render.design_size)
+
+
+def render_flyer_formats(render, formats=None, scale=None):
+    """1 回分の描画結果から、複数のキャンバス比率(FLYER_FORMATS)へまとめて組み直す。
+
+    背景・ロゴ・メイン画像はデコード済みのものを使い、倍率とキャンバス幅が同じ
+    フォーマットではテキスト・ロゴのレイヤーもラスタライズせずに位置だけ差し替える
+    (縦が変わるのはフッター位置と背景の切り抜きだけ)。フォーマットごとに並列実行。
+    scale を省略すると各フォーマットの scale(無ければ render と同じ倍率)で描く。
+    戻り値は {フォーマット名: FlyerRender}(formats の順)。
+    """
+    formats = list(formats or FLYER_FORMATS)
+
+    def build(name):
+        spec = FLYER_FORMATS[name]
+        f_scale = scale if scale is not None else spec.get("scale", render.scale)
+        size = tuple(spec["size"])
+        reuse = render.layers if f_scale == render.scale and size[0] == render.design_size[0] else None
+        if f_scale == render.scale and size == tuple(render.design_size):
+            return render
+        return _derive_render(render, f_scale, size, reuse=reuse)
 
-    return canvas, layout_meta
+    with ThreadPoolExecutor(max_workers=min(len(formats), 4) or 1) as executor:
+        return dict(zip(formats, executor.map(build, formats)))
@@ -3,8 +3,9 @@ import os
 import requests
 from datetime import datetime, date
 from PIL import Image
-from constants import FONT_DIR
-from database import Asset, get_image_url
+from constants import LOCAL_BACKEND
+from database import Asset, get_image_url, read_local_file
+from utils import font_store
 
 # ==========================================
 # 1. 画像・ファイルロード系ヘルパー
@@ -27,41 +28,60 @@ def load_image_from_source(source):
         print(f"Image Load Error: {e}")
         return None
 
+def provision_font_file(db, filename, verify=False):
+    """フォントを FONT_DIR に確保し (状態, パス) を返す。状態は
+    "cached" / "downloaded_url" / "downloaded_db" / "not_found" のいずれか(パスは not_found で None)。
+
+    取得順は従来どおり Asset(Storage URL)→ AssetFile(DB バイナリ)。
+    書き込みは utils.font_store 経由(一時ファイル → rename、サイズ/SHA-256 を manifest に記録)で、
+    ファイル名ごとのロック内で「既にあるか」を見直すので、同時に呼ばれても取得は 1 回。
+    verify=True ならローカルの既存ファイルも SHA-256(manifest に無ければ PIL で開けるか)まで照合し、
+    壊れていれば取り直す。
+    """
+    if not filename: return "not_found", None
+
+    with font_store.font_lock(filename):
+        local_path = font_store.local_path(filename)
+        if font_store.is_valid(filename, full=verify):
+            if verify and filename not in font_store.load_manifest():
+                font_store.adopt(filename)
+            return "cached", local_path
+        if os.path.exists(local_path):
+            print(f"Font integrity check failed, re-fetching: {filename}")
+            font_store.discard(filename)
+
+        try:
+            # DB (Assetテーブル) から検索
+            asset = db.query(Asset).filter(Asset.image_filename == filename).first()
+            if asset:
+                url = get_image_url(asset.image_filename)
+                if url and LOCAL_BACKEND and not url.startswith("http"):
+                    # ローカルバックエンド(get_image_url が LOCAL_STORAGE_DIR 配下のパスを返す)
+                    return "downloaded_url", font_store.write_font(filename, read_local_file(url))
+                if url:
+                    response = requests.get(url, timeout=10)
+                    if response.status_code == 200:
+                        # Content-Length があれば途中切れ(短いボディ)を検出できる
+                        expected = response.headers.get("Content-Length")
+                        if expected is not None and "Content-Encoding" in response.headers:
+                            expected = None  # 圧縮転送ではボディ長と一致しない
+                        return "downloaded_url", font_store.write_font(filename, response.content, expected_size=expected)
+        except Exception as e:
+            print(f"Font download error: {e}")
+
+        try:
+            # ★追加: AssetFileテーブル (バイナリ保存) からも検索 (互換性のため)
+            from database import AssetFile
+            asset_file = db.query(AssetFile).filter(AssetFile.filename == filename).first()
+            if asset_file and asset_file.file_data:
+                return "downloaded_db", font_store.write_font(filename, asset_file.file_data)
+        except Exception as e:
+            print(f"Font download error: {e}")
+    return "not_found", None
+
 def ensure_font_file_exists(db, filename):
     """ローカルにフォントがない場合、DBのAsset情報を参照してダウンロードする"""
-    if not filename: return None
-    
-    # ★修正: 絶対パス化して安全性を確保
-    abs_font_dir = os.path.abspath(FONT_DIR)
-    os.makedirs(abs_font_dir, exist_ok=True)
-    local_path = os.path.join(abs_font_dir, filename)
-    
-    if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
-        return local_path
-    
-    try:
-        # DB (Assetテーブル) から検索
-        asset = db.query(Asset).filter(Asset.image_filename == filename).first()
-        if asset:
-            url = get_image_url(asset.image_filename)
-            if url:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    with open(local_path, "wb") as f:
-                        f.write(response.content)
-                    return local_path
-        
-        # ★追加: AssetFileテーブル (バイナリ保存) からも検索 (互換性のため)
-        from database import AssetFile
-        asset_file = db.query(AssetFile).filter(AssetFile.filename == filename).first()
-        if asset_file and asset_file.file_data:
-            with open(local_path, "wb") as f:
-                f.write(asset_file.file_data)
-            return local_path
-
-    except Exception as e:
-        print(f"Font download error: {e}")
-    return None
+    return provision_font_file(db, filename)[1]
 
 def crop_center_to_a4(img):
     """画像をA4比率に合わせて中央でクロップする"""
@@ -0,0 +1,367 @@
+"""フォントごとの字幅テーブル(ラスタライズしない文字幅見積もり)。
+
+グリッドのアーティスト名・タイムテーブルの draw_centered_text・フライヤーの計測パスは、
+「入るまでフォントサイズを 2px ずつ下げる」ループで毎回 ImageFont.truetype を開き直し、
+textbbox / getlength で実測していた(長い名前ほど 20〜30 回)。
+
+本モジュールは基準サイズ(REF_SIZE)で主要グリフの送り幅と bbox を 1 回だけ測って表にし、
+サイズには線形に比例させて幅・高さを見積もる。
+
+- テーブルはフォントファイルの SHA-256 をキーに FONT_DIR/.metrics_cache/<sha>.json に保存
+  (アップロード時・font_service の一括確保時に作成。未作成なら初回の計測で作る)。
+- fit_font_size: 見積もりで「入りそうなサイズ」へ一気に飛び、実測は前後 1〜2 回で確定する。
+  幅がサイズに対して単調である限り、従来の線形ループと同じサイズを返す(描画結果は不変)。
+- 検証モード(環境変数 FONT_METRICS_VERIFY=1 / set_verify_mode):
+  fit_font_size が従来ループも回して食い違いをログに出す(結果は従来ループ側を採用)。
+  verify_table は見積もりと PIL 実測の誤差を集計する。
+
+カーニング・合字は見積もりに入らない(basic レイアウトでは PIL も使わない)。
+streamlit 非依存(API / Bot からも使う)。
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import statistics
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from PIL import ImageFont
+
+from constants import FONT_DIR
+from utils import font_store
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# テーブルの形式・対象文字を変えたら上げる(古いキャッシュを無効化する)
+METRICS_VERSION = 1
+REF_SIZE = 100
+
+# 表に載せる文字(ASCII / Latin-1 / 約物 / かな / 全角英数・半角カナ)
+_TABLE_RANGES = (
+    (0x20, 0x7F), (0xA0, 0x100), (0x2010, 0x2028), (0x2190, 0x2194), (0x2460, 0x2474),
+    (0x25A0, 0x25D0), (0x2600, 0x2620), (0x3000, 0x3040), (0x3040, 0x30A0), (0x30A0, 0x3100),
+    (0xFF01, 0xFF5F), (0xFF61, 0xFFA0),
+)
+# 漢字は個別に持たず、よく使う字 + 範囲の間引きサンプルの中央値を「CJK 既定値」にする
+_KANJI_SAMPLE = "一二三日本語東京大阪名古屋会場出演時間物販前売当日開演終了祭夢愛歌声音楽"
+_KANJI_STRIDE = 97
+
+GlyphBox = Tuple[float, float, float, float, float]  # advance, left, top, right, bottom (REF_SIZE 時)
+
+_MEMORY_MAX = 64
+_tables: "OrderedDict[str, FontMetrics]" = OrderedDict()
+_lock = threading.Lock()
+_verify = os.environ.get("FONT_METRICS_VERIFY") == "1"
+
+
+def set_verify_mode(enabled: bool) -> None:
+    global _verify
+    _verify = bool(enabled)
+
+
+def verify_mode() -> bool:
+    return _verify
+
+
+def _glyph_available(font, char) -> bool:
+    # utils.flyer_generator.is_glyph_available と同じ判定(フォールバックの切り替えを揃える)
+    if char.isspace() or ord(char) < 32:
+        return True
+    try:
+        mask = font.getmask(char)
+        return not (mask.size[0] == 0 or mask.size[1] == 0)
+    except Exception:
+        return True
+
+
+@dataclass
+class FontMetrics:
+    """1 フォントの字幅テーブル。値はすべて REF_SIZE 時の px。"""
+    digest: str
+    glyphs: Dict[str, GlyphBox]
+    default: GlyphBox
+    cjk_default: GlyphBox
+    line_bottom: float  # textbbox("A")[3]: 複数行の行送り(PIL の multiline と同じ基準)
+    missing: frozenset = field(default_factory=frozenset)
+
+    def glyph(self, char: str) -> GlyphBox:
+        box = self.glyphs.get(char)
+        if box is not None:
+            return box
+        return self.cjk_default if ord(char) >= 0x2E80 else self.default
+
+    def has_glyph(self, char: str) -> bool:
+        return char not in self.missing
+
+    # --- 見積もり(size はフォントサイズ px) ---
+
+    def text_length(self, text: str, size: float) -> float:
+        """font.getlength 相当(送り幅の合計)。"""
+        return sum(self.glyph(c)[0] for c in text) * size / REF_SIZE
+
+    def text_bbox(self, text: str, size: float) -> Tuple[float, float, float, float]:
+        """draw.textbbox((0, 0), text) 相当(1 行)。"""
+        if not text:
+            return (0.0, 0.0, 0.0, 0.0)
+        k = size / REF_SIZE
+        x = 0.0
+        x0 = y0 = math.inf
+        x1 = y1 = -math.inf
+        for c in text:
+            adv, left, top, right, bottom = self.glyph(c)
+            if right > left:
+                x0 = min(x0, x + left)
+                x1 = max(x1, x + right)
+                y0 = min(y0, top)
+                y1 = max(y1, bottom)
+            x += adv
+        if x0 is math.inf:  # 空白だけ
+            return (0.0, 0.0, x * k, 0.0)
+        return (x0 * k, y0 * k, x1 * k, y1 * k)
+
+    def multiline_bbox(self, text: str, size: float, spacing: float = 4) -> Tuple[float, float, float, float]:
+        """draw.multiline_textbbox((0, 0), text, spacing=...) 相当(align は幅に影響しない)。"""
+        lines = text.split("\n")
+        if len(lines) == 1:
+            return self.text_bbox(text, size)
+        k = size / REF_SIZE
+        line_spacing = self.line_bottom * k + spacing
+        max_len = max(self.text_length(line, size) for line in lines)
+        boxes = [self.text_bbox(line, size) for line in lines]
+        top = min(b[1] + i * line_spacing for i, b in enumerate(boxes))
+        bottom = max(b[3] + i * line_spacing for i, b in enumerate(boxes))
+        return (min(b[0] for b in boxes), top, max(max_len, max(b[2] for b in boxes)), bottom)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": METRICS_VERSION, "digest": self.digest, "ref_size": REF_SIZE,
+            "glyphs": {c: list(v) for c, v in self.glyphs.items()},
+            "default": list(self.default), "cjk_default": list(self.cjk_default),
+            "line_bottom": self.line_bottom, "missing": sorted(self.missing),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Optional["FontMetrics"]:
+        if data.get("version") != METRICS_VERSION or data.get("ref_size") != REF_SIZE:
+            return None
+        return cls(
+            digest=data["digest"],
+            glyphs={c: tuple(v) for c, v in data["glyphs"].items()},
+            default=tuple(data["default"]), cjk_default=tuple(data["cjk_default"]),
+            line_bottom=data["line_bottom"], missing=frozenset(data.get("missing", ())),
+        )
+
+
+def _median_box(boxes: Sequence[GlyphBox], fallback: GlyphBox) -> GlyphBox:
+    if not boxes:
+        return fallback
+    return tuple(statistics.median(b[i] for b in boxes) for i in range(5))
+
+
+def build_table(font_path: str, digest: Optional[str] = None) -> FontMetrics:
+    """font_path を REF_SIZE で開いて表を作る(数十 ms)。開けなければ OSError。"""
+    font = ImageFont.truetype(font_path, REF_SIZE)
+    glyphs: Dict[str, GlyphBox] = {}
+    missing = set()
+
+    def measure(char):
+        left, top, right, bottom = font.getbbox(char)
+        return (float(font.getlength(char)), float(left), float(top), float(right), float(bottom))
+
+    for lo, hi in _TABLE_RANGES:
+        for code in range(lo, hi):
+            char = chr(code)
+            if not _glyph_available(font, char):
+                missing.add(char)
+                continue
+            glyphs[char] = measure(char)
+
+    kanji = list(dict.fromkeys(_KANJI_SAMPLE + "".join(chr(c) for c in range(0x4E00, 0xA000, _KANJI_STRIDE))))
+    kanji_boxes = [measure(c) for c in kanji if _glyph_available(font, c)]
+    latin_boxes = [glyphs[c] for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" if c in glyphs]
+    default = _median_box(latin_boxes, (REF_SIZE * 0.5, 0.0, 0.0, REF_SIZE * 0.5, REF_SIZE * 0.8))
+    cjk_default = _median_box(kanji_boxes, glyphs.get("あ", (REF_SIZE, 0.0, 0.0, REF_SIZE, REF_SIZE)))
+
+    return FontMetrics(
+        digest=digest or font_store.sha256_file(font_path),
+        glyphs=glyphs, default=default, cjk_default=cjk_default,
+        line_bottom=float(font.getbbox("A")[3]), missing=frozenset(missing),
+    )
+
+
+def cache_dir() -> str:
+    path = os.path.join(os.path.abspath(FONT_DIR), ".metrics_cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _remember(digest: str, table: "FontMetrics") -> None:
+    with _lock:
+        _tables[digest] = table
+        _tables.move_to_end(digest)
+        while len(_tables) > _MEMORY_MAX:
+            _tables.popitem(last=False)
+
+
+def get_table(font_path) -> Optional[FontMetrics]:
+    """フォントファイル(パス or FreeTypeFont)の字幅テーブル。使えないフォントなら None。
+
+    メモリ → ディスク(.metrics_cache)→ その場で作成、の順。load_default 等の
+    パスを持たないフォントは対象外(None)。
+    """
+    if not isinstance(font_path, str):
+        font_path = getattr(font_path, "path", None)
+        if not isinstance(font_path, str):
+            return None
+    digest = font_store.file_digest(font_path)
+    if digest is None:
+        return None
+    with _lock:
+        table = _tables.get(digest)
+        if table is not None:
+            _tables.move_to_end(digest)
+            return table
+
+    path = os.path.join(cache_dir(), f"{digest}.json")
+    table = None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            table = FontMetrics.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        table = None
+    if table is None:
+        try:
+            table = build_table(font_path, digest)
+        except Exception as e:
+            logger.warning(f"font metrics build failed: {font_path}: {e}")
+            return None
+        try:
+            font_store.atomic_write(path, json.dumps(table.to_dict(), ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"font metrics cache write failed: {e}")
+    _remember(digest, table)
+    return table
+
+
+def ensure_table(font_path: str) -> bool:
+    """アップロード・一括確保の直後に呼び、テーブルを前もって作っておく。"""
+    return get_table(font_path) is not None
+
+
+# --- 見積もり → サイズ決定 ---
+
+def estimate_fit_size(table: Optional[FontMetrics], text: str, max_width: float,
+                      max_height: Optional[float] = None, spacing: float = 4) -> Optional[float]:
+    """幅 max_width(と高さ max_height)に収まると見積もれる最大のフォントサイズ。
+
+    幅・高さはサイズに比例(複数行の行間 spacing だけは定数)として解く。
+    table が無い / 文字が無い場合は None(呼び出し側は従来の線形探索になる)。
+    """
+    if table is None or not text:
+        return None
+    x0, y0, x1, y1 = table.multiline_bbox(text, REF_SIZE, spacing=0)
+    candidates = []
+    if x1 - x0 > 0:
+        candidates.append(max_width * REF_SIZE / (x1 - x0))
+    if max_height is not None and y1 - y0 > 0:
+        gaps = text.count("\n") * spacing
+        candidates.append((max_height - gaps) * REF_SIZE / (y1 - y0))
+    return min(candidates) if candidates else None
+
+
+def estimate_mixed_length(text: str, primary: Optional[FontMetrics], fallback: Optional[FontMetrics],
+                          size: float) -> Optional[float]:
+    """utils.flyer_generator.measure_text_mixed の幅(送り幅の合計)の見積もり。"""
+    if primary is None:
+        return None
+    total = 0.0
+    for c in text:
+        table = primary if primary.has_glyph(c) or fallback is None else fallback
+        total += table.glyph(c)[0]
+    return total * size / REF_SIZE
+
+
+def _linear_fit(fits: Callable[[float], bool], start, stop, step):
+    size = start
+    while size > stop:
+        if fits(size):
+            break
+        size -= step
+    return size
+
+
+def fit_font_size(fits: Callable[[float], bool], start, stop, step, estimate: Optional[float] = None):
+    """``size = start; while size > stop and not fits(size): size -= step`` と同じ結果を返す。
+
+    estimate(estimate_fit_size の値)があれば、その直下の候補サイズから実測を始め、
+    入れば上へ・入らなければ下へ 1 段ずつ確かめる。fits がサイズに対して単調なら
+    線形探索と一致し、実測回数は通常 1〜2 回。検証モードでは両方を回して比較する。
+    """
+    if estimate is None or step <= 0 or start <= stop:
+        return _linear_fit(fits, start, stop, step)
+
+    def at(k):
+        return start - k * step
+
+    last = max(0, math.ceil((start - stop) / step))  # at(last) が最初の「stop 以下」
+    k = min(last, max(0, math.ceil((start - estimate) / step)))
+    checked = {}
+
+    def ok(k):
+        if k not in checked:
+            checked[k] = fits(at(k))
+        return checked[k]
+
+    if k == last or ok(k):
+        while k > 0 and ok(k - 1):
+            k -= 1
+    else:
+        k += 1
+        while k < last and not ok(k):
+            k += 1
+    result = at(k)
+
+    if _verify:
+        expected = _linear_fit(fits, start, stop, step)
+        if expected != result:
+            logger.warning(
+                f"font metrics fit mismatch: estimate={estimate:.1f} fast={result} linear={expected} "
+                f"(start={start}, stop={stop}, step={step})"
+            )
+            return expected
+    return result
+
+
+def verify_table(font_path: str, texts: Iterable[str], sizes: Iterable[int] = (16, 32, 64)) -> dict:
+    """見積もりと PIL 実測(getbbox / getlength)の誤差を集計する(検証モード・テスト用)。
+
+    戻り値: {"samples", "max_width_error", "max_width_error_ratio", "max_height_error"}
+    (誤差は px、ratio は実測幅に対する比)。
+    """
+    table = get_table(font_path)
+    if table is None:
+        raise ValueError(f"font metrics unavailable: {font_path}")
+    report = {"samples": 0, "max_width_error": 0.0, "max_width_error_ratio": 0.0, "max_height_error": 0.0}
+    for size in sizes:
+        font = ImageFont.truetype(font_path, size)
+        for text in texts:
+            if not text:
+                continue
+            real = font.getbbox(text)
+            est = table.text_bbox(text, size)
+            real_w = real[2] - real[0]
+            w_err = abs((est[2] - est[0]) - real_w)
+            h_err = abs((est[3] - est[1]) - (real[3] - real[1]))
+            report["samples"] += 1
+            report["max_width_error"] = max(report["max_width_error"], w_err)
+            report["max_height_error"] = max(report["max_height_error"], h_err)
+            if real_w > 0:
+                report["max_width_error_ratio"] = max(report["max_width_error_ratio"], w_err / real_w)
+    if report["max_width_error_ratio"] > 0.1:
+        logger.warning(f"font metrics deviate from PIL: {font_path}: {report}")
+    return report
@@ -0,0 +1,199 @@
+"""フォント見本(一覧シートの各行・素材カードのサムネイル)のキャッシュ。
+
+create_font_specimen_img(grid / TT / フライヤー / 素材管理の「フォント一覧見本」)は、
+expander を開いている間は Streamlit の rerun ごとに全フォントを ImageFont.truetype で
+開き直してシート全体を描き直していた。素材カードのサムネイルも同様。
+
+本モジュールは 1 行 / 1 サムネイルを「フォントファイルの SHA-256 + 描画内容」をキーに
+1 回だけ描き、PNG としてディスク(FONT_DIR/.specimen_cache)とプロセス内 LRU に持つ。
+シートはキャッシュ済みの行を縦に貼り合わせるだけなので、フォントを 1 つ追加しても
+新しく描くのはその 1 行だけ。貼り合わせ結果も行キーの並びをキーにメモする。
+
+行の見た目は従来の create_font_specimen_img と同じ(800x80・表示名/ファイル名/見本テキスト)。
+FONT_DIR は一時領域なので、ディスクキャッシュもコンテナ再起動で消える(再生成されるだけ)。
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from constants import FONT_DIR
+from utils import font_store
+
+# 描画内容を変えたら上げる(古いキャッシュを無効化する)
+SPECIMEN_VERSION = 1
+
+SHEET_WIDTH = 800
+ROW_HEIGHT = 80
+MARGIN = 20
+HEADER_HEIGHT = 40
+PREVIEW_TEXT = "ABC 123 あいう イベント"
+PREVIEW_FONT_SIZE = 32
+
+_MEMORY_MAX = 256
+_memory: "OrderedDict[str, Image.Image]" = OrderedDict()
+_sheet_memo: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+_SHEET_MEMO_MAX = 8
+_lock = threading.Lock()
+
+
+def cache_dir() -> str:
+    path = os.path.join(os.path.abspath(FONT_DIR), ".specimen_cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _key(*parts) -> str:
+    raw = "\x1f".join(str(p) for p in (SPECIMEN_VERSION,) + parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(store: OrderedDict, key, img, limit: int) -> None:
+    store[key] = img
+    store.move_to_end(key)
+    while len(store) > limit:
+        store.popitem(last=False)
+
+
+def _cached(key: str, render) -> Optional[Image.Image]:
+    """メモリ → ディスク → render() の順で引き、描いたものは両方に入れる。"""
+    with _lock:
+        img = _memory.get(key)
+        if img is not None:
+            _memory.move_to_end(key)
+            return img
+
+    path = os.path.join(cache_dir(), f"{key}.png")
+    img = None
+    if os.path.exists(path):
+        try:
+            with Image.open(path) as f:
+                img = f.convert("RGB")
+        except Exception:
+            img = None
+    if img is None:
+        img = render()
+        if img is None:
+            return None
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        try:
+            font_store.atomic_write(path, buf.getvalue())
+        except OSError as e:
+            print(f"Specimen cache write error: {e}")
+
+    with _lock:
+        _remember(_memory, key, img, _MEMORY_MAX)
+    return img
+
+
+def _load_label_fonts(label_font_path: str):
+    try:
+        return ImageFont.truetype(label_font_path, 20), ImageFont.truetype(label_font_path, 14)
+    except OSError:
+        return ImageFont.load_default(), ImageFont.load_default()
+
+
+def _render_row(name: str, filename: str, label_font_path: str) -> Image.Image:
+    row = Image.new("RGB", (SHEET_WIDTH, ROW_HEIGHT), (255, 255, 255))
+    draw = ImageDraw.Draw(row)
+    label_font_large, label_font_small = _load_label_fonts(label_font_path)
+
+    # 1. 表示名 (黒)
+    draw.text((MARGIN, 15), str(name), fill="black", font=label_font_large)
+    # 2. ファイル名 (グレー / 表示名の下)
+    draw.text((MARGIN, 45), str(filename), fill="gray", font=label_font_small)
+
+    # 3. 見本テキスト (右側)
+    font_file_path = os.path.join(FONT_DIR, filename)
+    preview_font = None
+    if os.path.exists(font_file_path):
+        try:
+            preview_font = ImageFont.truetype(font_file_path, PREVIEW_FONT_SIZE)
+        except Exception:
+            preview_font = None
+
+    preview_x, preview_y = 300, 20
+    if preview_font:
+        draw.text((preview_x, preview_y), PREVIEW_TEXT, fill="black", font=preview_font)
+    else:
+        draw.text((preview_x, preview_y + 5), "Preview Not Available", fill="red", font=label_font_small)
+
+    # 区切り線
+    draw.line((MARGIN, ROW_HEIGHT - 1, SHEET_WIDTH - MARGIN, ROW_HEIGHT - 1), fill=(230, 230, 230), width=1)
+    return row
+
+
+def _render_header(label_font_path: str) -> Image.Image:
+    header = Image.new("RGB", (SHEET_WIDTH, HEADER_HEIGHT), (255, 255, 255))
+    draw = ImageDraw.Draw(header)
+    label_font_large, _ = _load_label_fonts(label_font_path)
+    draw.text((MARGIN, 10), "Font List Specimen", fill=(50, 50, 50), font=label_font_large)
+    draw.line((MARGIN, HEADER_HEIGHT - 5, SHEET_WIDTH - MARGIN, HEADER_HEIGHT - 5), fill=(200, 200, 200), width=1)
+    return header
+
+
+def row_key(name: str, filename: str, label_font_path: str) -> str:
+    """見本 1 行のキャッシュキー。フォント本体・ラベル用フォントの中身が変われば変わる。"""
+    font_digest = font_store.file_digest(os.path.join(FONT_DIR, filename)) if filename else None
+    return _key("row", name, filename, font_digest, font_store.file_digest(label_font_path))
+
+
+def specimen_row(name: str, filename: str, label_font_path: str) -> Image.Image:
+    return _cached(row_key(name, filename, label_font_path),
+                   lambda: _render_row(name, filename, label_font_path))
+
+
+def specimen_sheet(entries: Sequence[Tuple[str, str]], label_font_path: str) -> Image.Image:
+    """[(表示名, ファイル名)] の見本シート。行はキャッシュから貼り合わせる。"""
+    header_key = _key("header", font_store.file_digest(label_font_path))
+    keys: List[str] = [row_key(name, filename, label_font_path) for name, filename in entries]
+    memo_key = (header_key, tuple(keys))
+    with _lock:
+        sheet = _sheet_memo.get(memo_key)
+        if sheet is not None:
+            _sheet_memo.move_to_end(memo_key)
+            return sheet
+
+    total_height = HEADER_HEIGHT + (len(entries) * ROW_HEIGHT) + MARGIN
+    sheet = Image.new("RGB", (SHEET_WIDTH, total_height), (255, 255, 255))
+    sheet.paste(_cached(header_key, lambda: _render_header(label_font_path)), (0, 0))
+    for i, ((name, filename), key) in enumerate(zip(entries, keys)):
+        row = _cached(key, lambda n=name, f=filename: _render_row(n, f, label_font_path))
+        sheet.paste(row, (0, HEADER_HEIGHT + i * ROW_HEIGHT))
+
+    with _lock:
+        _remember(_sheet_memo, memo_key, sheet, _SHEET_MEMO_MAX)
+    return sheet
+
+
+def _render_thumbnail(font_path: str, text: str, width: int, height: int) -> Optional[Image.Image]:
+    img = Image.new("RGB", (width, height), (240, 242, 246))  # 薄いグレー背景
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype(font_path, int(height * 0.6))
+    except Exception:
+        return None
+    bbox = draw.textbbox((0, 0), text, font=font)
+    w = bbox[2] - bbox[0]
+    h = bbox[3] - bbox[1]
+    x = (width - w) // 2
+    y = (height - h) // 2 - bbox[1]
+    draw.text((x, y), text, font=font, fill=(50, 50, 50))
+    return img
+
+
+def font_thumbnail(font_path: str, text: str = "あいうABC", width: int = 300,
+                   height: int = 100) -> Optional[Image.Image]:
+    """素材カード用のフォントサムネイル。フォントを開けなければ None(キャッシュしない)。"""
+    digest = font_store.file_digest(font_path)
+    if digest is None:
+        return None
+    key = _key("thumb", digest, text, width, height)
+    return _cached(key, lambda: _render_thumbnail(font_path, text, width, height))
@@ -0,0 +1,199 @@
+"""FONT_DIR(フォントのローカル置き場)への安全な書き込みと検証。
+
+FONT_DIR はシステムの一時領域(constants.FONT_DIR)にあり、コンテナ再起動のたびに空になる。
+従来はダウンロード結果を最終パスへ直接 open("wb") していたため、途中で落ちると
+壊れたフォントが残り、しかも ``size > 0`` の存在チェックを素通りしていた。
+
+本モジュールは「置き場の入出力」だけを担う(DB / HTTP には触れない):
+
+1. 書き込み: 同じディレクトリの一時ファイル(``.part``)に書いて fsync → ``os.replace``。
+   rename はアトミックなので、最終パスには「完全なファイル」か「無い」しか存在しない。
+2. 検証: 書き込んだファイルのサイズと SHA-256 を FONT_DIR の manifest
+   (``.font_manifest.json``)に記録する。高速チェックはサイズ一致、
+   起動時の一括確保(font_service.provision_fonts)では SHA-256 まで照合する。
+   manifest に無い既存ファイル(旧実装が書いたもの)は PIL で開けるかで判定する。
+3. 排他: ファイル名ごとの threading.Lock。同じフォントを同時に要求した描画は
+   先行するダウンロードを待ってから結果を使う(二重ダウンロード・書きかけ読みをしない)。
+
+streamlit 非依存(API / Bot からも使う)。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from PIL import ImageFont
+
+from constants import FONT_DIR
+
+MANIFEST_NAME = ".font_manifest.json"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+_manifest_lock = threading.Lock()
+
+# file_digest のメモ: (abs path, size, mtime_ns) → SHA-256
+_digest_memo: Dict[tuple, str] = {}
+
+
+class FontIntegrityError(ValueError):
+    """取得したフォントのバイト列が期待サイズ / ハッシュと一致しない。"""
+
+
+def font_dir() -> str:
+    abs_font_dir = os.path.abspath(FONT_DIR)
+    os.makedirs(abs_font_dir, exist_ok=True)
+    return abs_font_dir
+
+
+def local_path(filename: str) -> str:
+    return os.path.join(font_dir(), filename)
+
+
+@contextmanager
+def font_lock(filename: str):
+    """ファイル名単位の排他(同じフォントの確保処理を直列化する)。"""
+    with _locks_guard:
+        lock = _locks.setdefault(filename, threading.Lock())
+    with lock:
+        yield
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """ファイルの SHA-256(見本画像・メトリクスのキャッシュキー用)。無ければ None。
+
+    (パス, サイズ, 更新時刻) が同じ間はメモを返すので、毎 rerun 呼んでもハッシュし直さない。
+    """
+    try:
+        stat = os.stat(path)
+    except (TypeError, OSError):
+        return None
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(key)
+    if digest is None:
+        digest = _digest_memo[key] = sha256_file(path)
+    return digest
+
+
+def _manifest_path() -> str:
+    return os.path.join(font_dir(), MANIFEST_NAME)
+
+
+def load_manifest() -> Dict[str, dict]:
+    """{filename: {"size", "sha256"}}。無い / 壊れている場合は {}。"""
+    try:
+        with open(_manifest_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_manifest(filename: str, entry: Optional[dict]) -> None:
+    with _manifest_lock:
+        manifest = load_manifest()
+        if entry is None:
+            manifest.pop(filename, None)
+        else:
+            manifest[filename] = entry
+        atomic_write(_manifest_path(), json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """path の隣の一時ファイルに書いて fsync → os.replace(書きかけを最終パスに出さない)。"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_font(filename: str, data: bytes, expected_size: Optional[int] = None,
+               expected_sha256: Optional[str] = None) -> str:
+    """フォントを一時ファイル経由でアトミックに配置し、manifest に版を記録してパスを返す。
+
+    expected_size(HTTP の Content-Length 等)/ expected_sha256 が与えられていて
+    一致しなければ FontIntegrityError(最終パスには何も書かない)。
+    """
+    if not data:
+        raise FontIntegrityError(f"empty font data: {filename}")
+    if expected_size is not None and len(data) != int(expected_size):
+        raise FontIntegrityError(f"size mismatch: {filename} ({len(data)} != {expected_size})")
+    digest = sha256_bytes(data)
+    if expected_sha256 and digest != expected_sha256:
+        raise FontIntegrityError(f"sha256 mismatch: {filename}")
+
+    path = local_path(filename)
+    atomic_write(path, data)
+    _update_manifest(filename, {"size": len(data), "sha256": digest})
+    return path
+
+
+def _opens_as_font(path: str) -> bool:
+    try:
+        ImageFont.truetype(path, 12)
+        return True
+    except Exception:
+        return False
+
+
+def is_valid(filename: str, full: bool = False) -> bool:
+    """ローカルのフォントが使える状態か。
+
+    - 無い / 0 バイト → False
+    - manifest にあればサイズ一致(full=True なら SHA-256 も)
+    - manifest に無ければ(旧実装が直接書いたファイル)full=True のときだけ PIL で開いて確認
+    """
+    path = local_path(filename)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    if size <= 0:
+        return False
+    entry = load_manifest().get(filename)
+    if entry:
+        if entry.get("size") != size:
+            return False
+        return not full or sha256_file(path) == entry.get("sha256")
+    return not full or _opens_as_font(path)
+
+
+def adopt(filename: str) -> None:
+    """manifest に無い既存ファイルを(検証済みとして)manifest に登録する。"""
+    path = local_path(filename)
+    _update_manifest(filename, {"size": os.path.getsize(path), "sha256": sha256_file(path)})
+
+
+def discard(filename: str) -> None:
+    """壊れたローカルファイルを消す(次の確保で取り直させる)。"""
+    try:
+        os.unlink(local_path(filename))
+    except OSError:
+        pass
+    _update_manifest(filename, None)
@@ -0,0 +1,307 @@
+"""
+業務用 PDF(タイムテーブル表・イベント概要)の組み立てと書き出し。
+
+- 日本語 CID フォント(HeiseiKakuGo-W5)の登録はプロセスで 1 回だけ(pdf_font_name)。
+  登録できない環境では従来どおり Helvetica に落とす。
+- タイムテーブル表は LongTable(repeatRows=1)。ページをまたぐ長い表でも
+  ヘッダ行が各ページに付き、列幅は固定なので全行を測り直さない。
+- 書き出し先はファイルパスでも file-like(HTTP レスポンス用の一時ファイル等)でもよい。
+  複数プロジェクトの一括出力(write_timetables_pdf)は 1 つの文書にページ区切りで連結する。
+  flowable(表)は 1 件を組み終えてから次の 1 件を読むので、手元に持つ df・表は常に 1 件分。
+  ただし組み終えたページは reportlab が save までメモリに持つため、出力 PDF の大きさぶんの
+  メモリは使う(件数に比例する)。
+
+utils.create_business_pdf / create_event_summary_pdf(BytesIO を返す従来 API)は
+ここへ委譲する。
+
+イベント資料(write_event_pack_pdf)は 概要 + 業務用タイムテーブル + 描画済み画像(grid / TT)を
+1 冊にする。画像はページ上の表示サイズ × EVENT_PACK_DPI まで縮小した JPEG(DCT)にして
+内容ハッシュ名の一時ファイル経由で埋め込む(reportlab はファイル名で XObject を使い回し、
+.jpg はデコードせずそのまま DCTDecode ストリームにする)ので、同じ画像は 1 回しか入らない。
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import math
+import os
+import tempfile
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PIL import Image as PILImage
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.platypus import ActionFlowable, Image, LongTable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from utils import safe_int, safe_str
+
+CID_FONT_NAME = "HeiseiKakuGo-W5"
+FALLBACK_FONT_NAME = "Helvetica"
+
+TIMETABLE_HEADER = ["時間", "出演アーティスト", "時間", "転換", "物販情報", "場所"]
+TIMETABLE_COL_WIDTHS = [90, 180, 40, 40, 90, 60]
+_SPECIAL_ROWS = ("開演前物販", "終演後物販")
+
+# (df, title, event_date, venue)
+TimetableSection = Tuple[object, object, object, object]
+
+# イベント資料の画像: 印刷に足りる解像度と JPEG 品質
+EVENT_PACK_DPI = 150
+EVENT_PACK_JPEG_QUALITY = 85
+_CAPTION_SPACE = 60  # 画像ページの見出しぶん(pt)
+
+
+@functools.lru_cache(maxsize=1)
+def pdf_font_name() -> str:
+    """日本語フォントを 1 回だけ登録して名前を返す(失敗時は Helvetica)。"""
+    if CID_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return CID_FONT_NAME
+    try:
+        pdfmetrics.registerFont(UnicodeCIDFont(CID_FONT_NAME))
+        return CID_FONT_NAME
+    except Exception:
+        return FALLBACK_FONT_NAME
+
+
+@functools.lru_cache(maxsize=4)
+def _styles(font_name: str) -> dict:
+    base = getSampleStyleSheet()
+    return {
+        "tt_title": ParagraphStyle('Title', parent=base['Title'], fontName=font_name, fontSize=18, spaceAfter=20),
+        "tt_normal": ParagraphStyle('Normal', parent=base['Normal'], fontName=font_name, fontSize=10),
+        "title": ParagraphStyle('Title', parent=base['Title'], fontName=font_name, fontSize=20, spaceAfter=20),
+        "h2": ParagraphStyle('H2', parent=base['Heading2'], fontName=font_name, fontSize=14, spaceAfter=10, spaceBefore=10),
+        "normal": ParagraphStyle('Normal', parent=base['Normal'], fontName=font_name, fontSize=10, leading=14),
+    }
+
+
+def timetable_rows(df) -> List[list]:
+    """計算済み DataFrame(calculate_timetable_flow の結果)→ 表の行(ヘッダ込み)。"""
+    data = [list(TIMETABLE_HEADER)]
+    cols = {c: df[c].tolist() for c in ("TIME_DISPLAY", "ARTIST", "DURATION", "ADJUSTMENT", "GOODS_DISPLAY", "PLACE")}
+    for time_display, artist, dur, adj, goods, place in zip(*cols.values()):
+        dur = safe_int(dur)
+        adj = safe_int(adj)
+        dur_str = str(dur) if dur > 0 else "-"
+        adj_str = f"+{adj}" if adj > 0 else "-"
+        if artist in _SPECIAL_ROWS:
+            dur_str = "-"
+            adj_str = "-"
+        data.append([
+            time_display, artist, dur_str, adj_str,
+            safe_str(goods).replace(" / ", "\n"), safe_str(place).replace(" / ", "\n"),
+        ])
+    return data
+
+
+def timetable_flowables(df, title, event_date, venue, font_name: str = None) -> list:
+    """タイムテーブル PDF 1 件分の flowable(見出し + ヘッダ繰り返しの LongTable)。"""
+    font_name = font_name or pdf_font_name()
+    styles = _styles(font_name)
+    table = LongTable(timetable_rows(df), colWidths=TIMETABLE_COL_WIDTHS, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), font_name),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('PADDING', (0, 0), (-1, -1), 6),
+    ]))
+    return [
+        Paragraph(f"イベント名: {title}", styles["tt_title"]),
+        Paragraph(f"日付: {event_date} / 会場: {venue}", styles["tt_normal"]),
+        Spacer(1, 20),
+        table,
+    ]
+
+
+def summary_flowables(project, font_name: str = None) -> list:
+    """イベント概要 PDF の flowable(project は TimetableProject / ProjectView 相当)。"""
+    font_name = font_name or pdf_font_name()
+    styles = _styles(font_name)
+    normal_style = styles["normal"]
+    h2_style = styles["h2"]
+    elements = [
+        Paragraph(f"【イベント概要】{safe_str(project.title)}", styles["title"]),
+        Paragraph(f"日付: {safe_str(project.event_date)}", normal_style),
+        Paragraph(f"会場: {safe_str(project.venue_name)}", normal_style),
+    ]
+    if project.venue_url:
+        elements.append(Paragraph(f"URL: {safe_str(project.venue_url)}", normal_style))
+    elements.append(Spacer(1, 20))
+
+    # チケット情報
+    elements.append(Paragraph("■ チケット情報", h2_style))
+    if project.tickets_json:
+        tickets = json.loads(project.tickets_json)
+        t_data = [["チケット名", "価格", "備考"]]
+        for t in tickets:
+            t_data.append([t.get("name", ""), t.get("price", ""), t.get("note", "")])
+        t_table = Table(t_data, colWidths=[150, 100, 200])
+        t_table.setStyle(TableStyle([
+            ('FONT', (0, 0), (-1, -1), font_name),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('PADDING', (0, 0), (-1, -1), 6),
+        ]))
+        elements.append(t_table)
+    else:
+        elements.append(Paragraph("なし", normal_style))
+
+    elements.append(Spacer(1, 20))
+
+    # 自由記述
+    elements.append(Paragraph("■ その他情報", h2_style))
+    if project.free_text_json:
+        free_texts = json.loads(project.free_text_json)
+        for ft in free_texts:
+            elements.append(Paragraph(f"<b>{ft.get('title', '')}</b>", normal_style))
+            elements.append(Paragraph(ft.get('content', ''), normal_style))
+            elements.append(Spacer(1, 10))
+    else:
+        elements.append(Paragraph("なし", normal_style))
+    return elements
+
+
+def write_pdf(flowables: list, out, title: str) -> None:
+    """flowable を A4 の PDF として out(パス or file-like)へ書き出す。"""
+    SimpleDocTemplate(out, pagesize=A4, title=title).build(flowables)
+
+
+class _NextSection(ActionFlowable):
+    """1 件分の flowable の末尾に置く印。組み終わったところで次の 1 件を読ませる。"""
+
+    def apply(self, doc):
+        doc.load_next_section()
+
+
+class _TimetablesDocTemplate(SimpleDocTemplate):
+    """sections を 1 件ずつ flowable にしながら組む文書(write_timetables_pdf 用)。"""
+
+    def __init__(self, out, sections: Iterable[TimetableSection], font_name: str, **kw):
+        super().__init__(out, **kw)
+        self.pending: list = []   # build に渡すリスト。reportlab が先頭から消費し、ここへ次の件を足す
+        self.count = 0
+        self._sections = iter(sections)
+        self._font_name = font_name
+
+    def load_next_section(self) -> bool:
+        section = next(self._sections, None)
+        if section is None:
+            return False
+        if self.count:
+            self.pending.append(PageBreak())
+        self.pending.extend(timetable_flowables(*section, font_name=self._font_name))
+        self.pending.append(_NextSection())
+        self.count += 1
+        return True
+
+
+def write_timetables_pdf(sections: Iterable[TimetableSection], out, title: str = "Timetables") -> int:
+    """複数プロジェクトのタイムテーブルを 1 つの PDF に連結して out へ書く。件数を返す。
+
+    sections は (計算済み df, title, event_date, venue) の iterable(generator 可)。次の 1 件は
+    前の 1 件を組み終えてから読む(全件の表を同時に持たない)。0 件のときは何も書かない。
+    """
+    doc = _TimetablesDocTemplate(out, sections, pdf_font_name(), pagesize=A4, title=title)
+    if not doc.load_next_section():
+        return 0
+    doc.build(doc.pending)
+    return doc.count
+
+
+class JpegImagePool:
+    """PIL 画像 → 表示サイズに合わせて縮小した JPEG の platypus Image(with 文で使う)。
+
+    JPEG は内容の SHA-256 名で一時ディレクトリに 1 回だけ書く。同じ PIL 画像・同じ表示サイズの
+    2 回目はエンコードもしない。一時ファイルは with を抜けると消えるので、doc.build は with 内で呼ぶ。
+    """
+
+    def __init__(self, dpi: int = EVENT_PACK_DPI, quality: int = EVENT_PACK_JPEG_QUALITY):
+        self.dpi = dpi
+        self.quality = quality
+        self._dir: Optional[tempfile.TemporaryDirectory] = None
+        self._encoded: Dict[Tuple[int, int, int], str] = {}
+
+    def __enter__(self) -> "JpegImagePool":
+        self._dir = tempfile.TemporaryDirectory(prefix="event_pack_")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._dir.cleanup()
+        self._dir = None
+        self._encoded.clear()
+
+    def flowable(self, img, max_width: float, max_height: float) -> Image:
+        """縦横比を保って max_width × max_height(pt)に収めた Image flowable。"""
+        scale = min(max_width / img.width, max_height / img.height)
+        width_pt, height_pt = img.width * scale, img.height * scale
+        px_w = min(img.width, max(1, math.ceil(width_pt / 72 * self.dpi)))
+        px_h = min(img.height, max(1, math.ceil(height_pt / 72 * self.dpi)))
+        key = (id(img), px_w, px_h)
+        path = self._encoded.get(key)
+        if path is None:
+            path = self._write(_jpeg_bytes(img, (px_w, px_h), self.quality))
+            self._encoded[key] = path
+        return Image(path, width=width_pt, height=height_pt)
+
+    def _write(self, data: bytes) -> str:
+        path = os.path.join(self._dir.name, hashlib.sha256(data).hexdigest() + ".jpg")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        return path
+
+
+def _jpeg_bytes(img, size: Tuple[int, int], quality: int) -> bytes:
+    # 透過は白背景に合成(JPEG はアルファを持てない)。縮小は LANCZOS(reducing_gap で大きな縮小を速く)
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        flat = PILImage.new("RGB", rgba.size, (255, 255, 255))
+        flat.paste(rgba, mask=rgba.getchannel("A"))
+        img = flat
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != size:
+        img = img.resize(size, PILImage.LANCZOS, reducing_gap=3.0)
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def write_event_pack_pdf(
+    out,
+    project,
+    timetable_df=None,
+    images: Sequence[Tuple[str, object]] = (),
+    dpi: int = EVENT_PACK_DPI,
+) -> None:
+    """イベント資料 PDF(概要 → 業務用タイムテーブル → 画像 1 枚 1 ページ)を out へ書く。
+
+    project は create_event_summary_pdf と同じ(TimetableProject / ProjectView 相当)。
+    images は [(見出し, PIL 画像 or None), ...](None は飛ばす)。
+    """
+    font_name = pdf_font_name()
+    doc = SimpleDocTemplate(out, pagesize=A4, title="Event Pack")
+    elements = summary_flowables(project, font_name)
+    if timetable_df is not None and len(timetable_df):
+        elements.append(PageBreak())
+        elements.extend(timetable_flowables(
+            timetable_df, project.title, project.event_date, project.venue_name, font_name))
+
+    with JpegImagePool(dpi) as pool:
+        for caption, img in images:
+            if img is None:
+                continue
+            elements.append(PageBreak())
+            elements.append(Paragraph(caption, _styles(font_name)["h2"]))
+            elements.append(pool.flowable(img, doc.width, doc.height - _CAPTION_SPACE))
+        doc.build(elements)
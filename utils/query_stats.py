@@ -0,0 +1,178 @@
+"""
+SQL 発行の計測(文数・時間)と、遅いクエリ / N+1 の検出。
+
+使い方:
+    from utils import query_stats
+
+    with query_stats.track("rerun:ワークスペース") as stats:
+        ...                      # この中で発行された SQL を数える
+    stats.count, stats.total_ms
+
+    # テスト: 宣言した文数を超えたら AssertionError(conftest の query_budget フィクスチャ経由でも可)
+    with query_stats.query_budget(3):
+        artist_service.get_artists_by_names(names)
+
+- install(): SQLAlchemy の before/after_cursor_execute を Engine クラス全体に 1 回だけ登録する
+  (database の engine も、テストの sqlite engine も、非同期エンジンの sync_engine も対象)。
+  track() / query_budget() が最初に呼ぶので、入口(app.py・Bot の middleware)で明示的に呼ぶ必要はない
+- track(label): スコープ内の文数・合計時間・文ごとの呼び出し元を集める(入れ子可。外側にも数える)。
+  終わりに 1 行の集計を debug で出し、文数が多すぎる・同じ SQL を何度も出している(N+1 の疑い)
+  ときは warning にする。Streamlit は rerun 1 回、Bot の /api は 1 リクエストを包む
+- 遅い文(EVENT_APP_SLOW_QUERY_MS 既定 200ms 以上)は track の外でも warning に呼び出し元付きで出す
+- 呼び出し元 = スタックを遡って最初に見つかるリポジトリ内のフレーム(SQLAlchemy と本モジュールは除く)。
+  非同期エンジンの文は greenlet の中で実行されるため呼び出し元を辿れず "?" になる(数と時間は取れる)
+
+計測の ContextVar は unit_of_work と同じくスレッドをまたがない(ThreadPoolExecutor の中は数えない)。
+streamlit 非依存。
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("EVENT_APP_SLOW_QUERY_MS", "200"))
+MANY_QUERIES = int(os.environ.get("EVENT_APP_MANY_QUERIES", "100"))   # 1 スコープでこれを超えたら warning
+REPEATED_QUERIES = 10   # 同じ SQL がこの回数以上出たら N+1 の疑いとして warning
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+_clock = time.perf_counter
+_START_KEY = "query_stats_started"
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    ms: float
+    site: str   # "views/timetable.py:120 in render_xxx"
+
+
+@dataclass
+class QueryStats:
+    """track() 1 回分の集計。"""
+    label: str
+    count: int = 0
+    total_ms: float = 0.0
+    records: List[QueryRecord] = field(default_factory=list)
+
+    def repeated(self, threshold: int = REPEATED_QUERIES) -> List[Tuple[str, int, str]]:
+        """同じ SQL 文が threshold 回以上出たもの [(sql, 回数, 最初の呼び出し元)](多い順)。"""
+        counts: Dict[str, List] = {}
+        for r in self.records:
+            entry = counts.setdefault(r.sql, [0, r.site])
+            entry[0] += 1
+        out = [(sql, n, site) for sql, (n, site) in counts.items() if n >= threshold]
+        return sorted(out, key=lambda x: -x[1])
+
+    def describe(self, limit: int = 20) -> str:
+        lines = [f"{self.label}: {self.count} queries, {self.total_ms:.1f} ms"]
+        for r in self.records[:limit]:
+            lines.append(f"  {r.ms:7.1f} ms  {r.site}  {_short(r.sql)}")
+        if len(self.records) > limit:
+            lines.append(f"  ... (+{len(self.records) - limit})")
+        return "\n".join(lines)
+
+
+_active: ContextVar[Tuple[QueryStats, ...]] = ContextVar("query_stats_active", default=())
+
+
+def _short(sql: str, width: int = 160) -> str:
+    flat = " ".join(sql.split())
+    return flat if len(flat) <= width else flat[: width - 3] + "..."
+
+
+def _call_site() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        name = frame.f_code.co_filename
+        path = os.path.abspath(name)
+        if (not name.startswith("<") and path.startswith(_REPO_ROOT) and path != _THIS_FILE
+                and "site-packages" not in path and os.sep + "sqlalchemy" + os.sep not in path):
+            rel = os.path.relpath(path, _REPO_ROOT)
+            return f"{rel}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info[_START_KEY] = _clock()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop(_START_KEY, None)   # 失敗した文は after が来ないので次の before で上書き
+    if started is None:
+        return
+    ms = (_clock() - started) * 1000
+    scopes = _active.get()
+    slow = ms >= SLOW_QUERY_MS
+    if not scopes and not slow:
+        return
+    site = _call_site()
+    for stats in scopes:
+        stats.count += 1
+        stats.total_ms += ms
+        stats.records.append(QueryRecord(statement, ms, site))
+    if slow:
+        logger.warning(f"slow query {ms:.0f} ms at {site}: {_short(statement)}")
+
+
+def install() -> None:
+    """計測フックを Engine クラスに登録する(何度呼んでも 1 回だけ)。"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def current() -> Optional[QueryStats]:
+    """いちばん内側の track() の集計(track の外なら None)。"""
+    scopes = _active.get()
+    return scopes[-1] if scopes else None
+
+
+@contextmanager
+def track(label: str, report: bool = True) -> Iterator[QueryStats]:
+    """スコープ内で発行された SQL を数える。report=True なら終わりに集計をログに出す。"""
+    install()
+    stats = QueryStats(label)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+        if report:
+            _report(stats)
+
+
+def _report(stats: QueryStats) -> None:
+    if stats.count == 0:
+        return
+    suspects = stats.repeated()
+    for sql, n, site in suspects:
+        logger.warning(f"{stats.label}: 同じ SQL が {n} 回 (N+1 の疑い) at {site}: {_short(sql)}")
+    if stats.count > MANY_QUERIES:
+        logger.warning(f"{stats.label}: {stats.count} queries, {stats.total_ms:.1f} ms")
+    else:
+        logger.debug(f"{stats.label}: {stats.count} queries, {stats.total_ms:.1f} ms")
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "query budget") -> Iterator[QueryStats]:
+    """スコープ内の SQL が max_queries 文を超えたら AssertionError(テスト用)。"""
+    with track(label, report=False) as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"query budget exceeded: {stats.count} > {max_queries}\n{stats.describe()}"
+        )
@@ -0,0 +1,120 @@
+"""フライヤー影(ドロップシャドウ)の高速パイプライン。
+
+従来の影処理は RGBA レイヤー全体に対して
+``ImageFilter.MaxFilter(1 + spread*2)``(太さ)→ ``ImageFilter.GaussianBlur(blur)``(ぼかし)
+を掛けていた。MaxFilter は窓サイズの2乗で遅くなり、GaussianBlur も4チャンネル分走るため、
+太さ・ぼかしを上げるとプレビュー再生成が目に見えて重くなっていた。
+
+本モジュールは影を「アルファ1チャンネルだけ」で作り、最後に単色で着色する:
+
+1. 太さ: ``cv2.dilate`` + 楕円カーネル(MORPH_ELLIPSE)。角が丸く CSS の spread に近い。
+2. ぼかし: 3パスの箱フィルタでガウスを近似(``cv2.blur`` は半径に依らず O(1)/画素)。
+   半径が大きいときは「縮小 → ぼかし → 拡大」で画素数自体を減らす。
+3. 着色: 不透明度を掛けたアルファに影色を乗せた RGBA を返す。
+
+影色は一様なので、従来の「透明画素 (0,0,0,0) まで RGB をぼかして縁が黒ずむ」
+副作用も起きない。従来出力とは画素単位では一致しない。scratch/bench_shadow.py の実測で
+従来とのアルファ差(0-255)は:
+
+- 太さ 0(ぼかしのみ・箱フィルタ近似の差): 平均 0.5 階調未満、最大 5 階調程度
+- 太さ 3 前後: 平均 3 階調程度、最大 25 階調程度
+- 太さ 10 以上: 平均 6 階調程度、最大 30 階調程度
+
+太さ>0 の差は主に楕円カーネルで角が丸くなるぶん(意図した見た目の変更)で、縁に集中する。
+速度は同ベンチで太さ・ぼかし 10 以上なら 50〜110 倍程度。
+
+端の扱いは PIL のぼかしと同じ「端画素の複製」(BORDER_REPLICATE)。
+ロゴ影のようにレイヤーがロゴと同寸の場合も、従来と同じ見た目になる。
+"""
+from __future__ import annotations
+
+import math
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# この sigma を超えたら縮小してからぼかす(UI のぼかし上限は 20)
+LARGE_BLUR_SIGMA = 6.0
+# 縮小後も sigma がこの値以上残るように縮小率を決める(粗くなりすぎない下限)
+_MIN_SIGMA_AFTER_DOWNSAMPLE = 3.0
+
+
+def _box_sizes_for_gauss(sigma: float, passes: int = 3) -> List[int]:
+    """sigma のガウスを passes 回の箱フィルタで近似するときの各箱の幅(奇数)を返す。"""
+    w_ideal = math.sqrt((12.0 * sigma * sigma / passes) + 1.0)
+    wl = int(math.floor(w_ideal))
+    if wl % 2 == 0:
+        wl -= 1
+    wl = max(wl, 1)
+    wu = wl + 2
+    m_ideal = (12.0 * sigma * sigma - passes * wl * wl - 4.0 * passes * wl - 3.0 * passes) / (-4.0 * wl - 4.0)
+    m = int(round(m_ideal))
+    return [wl if i < m else wu for i in range(passes)]
+
+
+def _box_blur3(alpha: np.ndarray, sigma: float) -> np.ndarray:
+    """float32 アルファに3パス箱フィルタを掛ける(ガウス近似)。"""
+    out = alpha
+    for w in _box_sizes_for_gauss(sigma):
+        if w > 1:
+            out = cv2.blur(out, (w, w), borderType=cv2.BORDER_REPLICATE)
+    return out
+
+
+def dilate_alpha(alpha: np.ndarray, spread: int) -> np.ndarray:
+    """アルファを spread px だけ太らせる(楕円カーネルの膨張)。spread<=0 はそのまま返す。"""
+    if spread <= 0:
+        return alpha
+    k = 1 + spread * 2
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
+    return cv2.dilate(alpha, kernel)
+
+
+def blur_alpha(alpha: np.ndarray, sigma: float) -> np.ndarray:
+    """アルファを sigma でぼかす(uint8 in / uint8 out)。
+
+    sigma が LARGE_BLUR_SIGMA を超えるときは縮小 → ぼかし → 拡大で近似する。
+    影は低周波なので、縮小率 f で sigma/f に落としても見た目の差はほぼ出ない。
+    """
+    if sigma <= 0:
+        return alpha
+    h, w = alpha.shape[:2]
+    src = alpha.astype(np.float32)
+
+    factor = 1
+    if sigma > LARGE_BLUR_SIGMA:
+        factor = max(1, int(sigma // _MIN_SIGMA_AFTER_DOWNSAMPLE))
+        # 縮小後に数 px しか残らない極小レイヤーでは縮小しない
+        if w // factor < 8 or h // factor < 8:
+            factor = 1
+
+    if factor > 1:
+        small = cv2.resize(src, (max(1, w // factor), max(1, h // factor)), interpolation=cv2.INTER_AREA)
+        small = _box_blur3(small, sigma / factor)
+        out = cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+    else:
+        out = _box_blur3(src, sigma)
+
+    return np.clip(out + 0.5, 0, 255).astype(np.uint8)
+
+
+def render_shadow(mask: Image.Image, rgb: Tuple[int, int, int], opacity: int = 255,
+                  spread: int = 0, blur: float = 0) -> Image.Image:
+    """影の形(L モードのマスク)から、太さ・ぼかし・着色済みの RGBA 影レイヤーを作る。
+
+    mask は「影を落としたい形」を 255 で描いた L 画像(テキストなら fill=255 で描画)。
+    戻り値は mask と同寸の RGBA。そのまま ``paste(layer, pos, layer)`` で合成できる。
+    """
+    alpha = np.asarray(mask.convert("L"), dtype=np.uint8)
+    alpha = dilate_alpha(alpha, int(spread))
+    alpha = blur_alpha(alpha, float(blur))
+
+    opacity = max(0, min(255, int(opacity)))
+    if opacity < 255:
+        alpha = ((alpha.astype(np.uint16) * opacity + 127) // 255).astype(np.uint8)
+
+    layer = Image.new("RGBA", mask.size, tuple(rgb)[:3] + (255,))
+    layer.putalpha(Image.fromarray(alpha))
+    return layer
@@ -5,7 +5,7 @@ import time
 import pandas as pd
 from PIL import Image
 from database import get_image_url
-from services import artist_service
+from services import artist_service, project_service
 
 # 画像処理ロジックの読み込み
 try:
@@ -218,6 +218,14 @@ def render_artists_page():
             default_index = 1 if len(artist_options) > 1 else 0
             loser_id = st.selectbox("🗑️ 統合・削除するアーティスト (誤)", options=list(artist_options.values()), format_func=lambda x: [k for k, v in artist_options.items() if v == x][0], index=default_index, key="merge_loser")
 
+        if winner_id != loser_id:
+            loser_name = next((a.name for a in all_artists if a.id == loser_id), None)
+            featuring = project_service.list_projects_featuring(loser_name) if loser_name else []
+            if featuring:
+                st.caption("グリッド並び順が書き換わるプロジェクト: " + " / ".join(
+                    f"{p.event_date or '----'} {p.title}" for p in featuring
+                ))
+
         if st.button("⚠️ 統合を実行する", type="primary", width='stretch'):
             if winner_id == loser_id:
                 st.error("同じアーティスト同士は統合できません。")
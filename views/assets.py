@@ -1,12 +1,13 @@
 import streamlit as st
 import uuid
 import os
-import requests
 import urllib.parse  # ★追加：日本語ファイル名のURLエンコード用
-from PIL import Image, ImageDraw, ImageFont
 from database import get_db, Asset, FavoriteFont, SystemFontConfig, upload_image_to_supabase, get_image_url, IMAGE_DIR
 from constants import FONT_DIR
 from utils import create_font_specimen_img, get_sorted_font_list
+from utils.font_metrics import ensure_table
+from utils.font_specimen import font_thumbnail
+from services import asset_service, font_service
 
 # ディレクトリの確実な作成
 os.makedirs(IMAGE_DIR, exist_ok=True)
@@ -17,38 +18,17 @@ def sync_fonts_from_storage(db):
     """
     DBにはあるがローカル(FONT_DIR)にないフォントを
     SupabaseのURLからダウンロードして復元する
+    (font_service.provision_fonts で並列取得・一時ファイル → rename で書き込み)
     """
     # 削除されていないフォントを全て取得
     fonts = db.query(Asset).filter(Asset.asset_type == "font", Asset.is_deleted == False).all()
-    
-    restored_count = 0
-    error_logs = []
+    statuses = font_service.provision_fonts([f.image_filename for f in fonts], verify=False)
 
-    for font in fonts:
-        local_path = os.path.join(FONT_DIR, font.image_filename)
-        
-        # ローカルにファイルがない場合のみダウンロードを試行
-        if not os.path.exists(local_path):
-            url = get_image_url(font.image_filename)
-            
-            if url:
-                try:
-                    # ★日本語ファイル名対策: URLに日本語が含まれる場合の安全策
-                    # get_image_urlがすでにエンコード済みなら良いですが、念のため
-                    # URL自体が無効でないかチェックしつつリクエストを送ります
-                    response = requests.get(url, timeout=10)
-                    
-                    if response.status_code == 200:
-                        with open(local_path, "wb") as f:
-                            f.write(response.content)
-                        restored_count += 1
-                    else:
-                        # 404などのエラー詳細を記録
-                        error_logs.append(f"❌ 取得失敗: {font.name} (Status: {response.status_code})")
-                except Exception as e:
-                    error_logs.append(f"❌ エラー: {font.name} ({str(e)})")
-            else:
-                 error_logs.append(f"❌ URL不明: {font.name}")
+    restored_count = sum(1 for s in statuses.values() if s.startswith("downloaded"))
+    error_logs = [
+        f"❌ 取得失敗: {font.name} ({font.image_filename})"
+        for font in fonts if statuses.get(font.image_filename) == "not_found"
+    ]
 
     # 結果の表示
     if restored_count > 0:
@@ -63,23 +43,9 @@ def sync_fonts_from_storage(db):
 
 # --- ヘルパー関数: フォントプレビュー画像の生成 (個別カード用) ---
 def create_font_thumbnail(font_path, text="あいうABC", width=300, height=100):
+    # フォントの中身(SHA-256)をキーにキャッシュ済み(utils.font_specimen)。rerun ごとに描き直さない
     try:
-        img = Image.new("RGB", (width, height), (240, 242, 246)) # 薄いグレー背景
-        draw = ImageDraw.Draw(img)
-        try:
-            font_size = int(height * 0.6)
-            font = ImageFont.truetype(font_path, font_size)
-        except Exception:
-            return None
-        
-        bbox = draw.textbbox((0, 0), text, font=font)
-        w = bbox[2] - bbox[0]
-        h = bbox[3] - bbox[1]
-        x = (width - w) // 2
-        y = (height - h) // 2 - bbox[1]
-        
-        draw.text((x, y), text, font=font, fill=(50, 50, 50))
-        return img
+        return font_thumbnail(font_path, text=text, width=width, height=height)
     except Exception:
         return None
 
@@ -115,6 +81,7 @@ def render_asset_card(asset, db, is_font=False):
                 if new_name:
                     asset.name = new_name
                     db.commit()
+                    asset_service.invalidate_cache()
                     st.success("更新しました")
                     st.rerun()
 
@@ -122,6 +89,7 @@ def render_asset_card(asset, db, is_font=False):
         if st.button("🗑️ 削除", key=f"del_{asset.id}", type="secondary", width='stretch'):
             asset.is_deleted = True
             db.commit()
+            asset_service.invalidate_cache()
             st.rerun()
 
 def render_assets_page():
@@ -185,6 +153,10 @@ def render_assets_page():
                             st.error(f"ローカル保存エラー: {e}")
                             st.stop()
 
+                        # フォントは字幅テーブル(utils.font_metrics)をアップロード時に作っておく
+                        if a_type == "font":
+                            ensure_table(local_path)
+
                         # 4. Supabaseへアップロード
                         try:
                             f.seek(0)
@@ -210,6 +182,7 @@ def render_assets_page():
                                 st.success(f"保存しました: {fname}")
                             
                             db.commit()
+                            asset_service.invalidate_cache()
                             st.rerun()
                         except Exception as e:
                             st.error(f"DB登録エラー: {e}")
@@ -315,6 +288,7 @@ def render_assets_page():
                     db.add(FavoriteFont(filename=f_name))
                 
                 db.commit()
+                asset_service.invalidate_cache()
                 st.success("フォント設定を更新しました！")
                 st.rerun()
 
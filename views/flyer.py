@@ -14,8 +14,13 @@ except ImportError:
 from database import get_image_url
 from utils.text_generator import build_event_summary_text
 from utils.flyer_helpers import format_event_date, format_time_str
-from utils.flyer_generator import create_flyer_image_shadow
+from utils.flyer_generator import (
+    EXPORT_SCALE, FLYER_FORMATS, PREVIEW_SCALE, RENDER_SCALES, render_flyer, render_flyer_formats, rerender_flyer, rescale_flyer,
+)
 from models.flyer_keys import FLYER_KEY_REGISTRY
+from models.timetable import draft_rows_to_df
+from models.timetable_flow import calculate_flow
+from utils.pdf_export import write_event_pack_pdf
 from services import project_service, session_manager, timetable_service, font_service, asset_service, template_service
 
 # ==========================================
@@ -182,7 +187,8 @@ def render_flyer_editor(project_id):
 
                 # Phase 2B-1c-①: 座標クリックによる即時 DB commit を廃止。
                 # 編集は session_state に留め、DB 反映は保存ボタン押下時のみ。
-                _generate_preview(proj)
+                # 位置だけの変更なので、前回レイヤーを平行移動して差分矩形だけ合成し直す。
+                _generate_preview(proj, incremental=True)
 
     if HAS_CLICK_COORD:
         process_click_if_exists("coord_grid")
@@ -452,7 +458,8 @@ def render_flyer_editor(project_id):
 
                 # Phase 2B-1c-①: 座標クリックによる即時 DB commit を廃止。
                 # 編集は session_state に留め、DB 反映は保存ボタン押下時のみ。
-                _generate_preview(proj)
+                # 位置だけの変更なので、前回レイヤーを平行移動して差分矩形だけ合成し直す。
+                _generate_preview(proj, incremental=True)
 
         if HAS_CLICK_COORD:
             pass
@@ -469,9 +476,7 @@ def render_flyer_editor(project_id):
                 else:
                     st.image(st.session_state.flyer_result_grid, width=st.session_state.flyer_preview_width)
                 
-                buf = io.BytesIO()
-                st.session_state.flyer_result_grid.save(buf, format="PNG")
-                st.download_button("DL (Grid)", buf.getvalue(), "flyer_grid.png", "image/png", key="dl_grid_single")
+                _export_download("flyer_render_grid", "Grid", "flyer_grid", key="dl_grid_single")
             else: st.info("プレビューを生成してください")
             
         with t2:
@@ -486,9 +491,7 @@ def render_flyer_editor(project_id):
                 else:
                     st.image(st.session_state.flyer_result_tt, width=st.session_state.flyer_preview_width)
 
-                buf = io.BytesIO()
-                st.session_state.flyer_result_tt.save(buf, format="PNG")
-                st.download_button("DL (TT)", buf.getvalue(), "flyer_tt.png", "image/png", key="dl_tt_single")
+                _export_download("flyer_render_tt", "TT", "flyer_tt", key="dl_tt_single")
             else: st.info("プレビューを生成してください")
             
         filtered_artists = []
@@ -522,19 +525,24 @@ def render_flyer_editor(project_id):
         with t4:
             st.markdown("### ファイル一括ダウンロード")
             include_assets = st.checkbox("素材データを含める")
+            extra_formats = st.multiselect(
+                "追加フォーマット", [k for k in FLYER_FORMATS if k != "feed"],
+                format_func=lambda k: FLYER_FORMATS[k]["label"], key="flyer_zip_formats"
+            )
             if st.button("📦 ZIPファイルを生成", type="primary"):
                 if not st.session_state.get("flyer_result_grid"): st.error("先にプレビューを生成してください。")
                 else:
                     try:
                         zip_buffer = io.BytesIO()
                         with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-                            buf = io.BytesIO()
-                            st.session_state.flyer_result_grid.save(buf, format="PNG")
-                            zip_file.writestr("Flyer_Grid.png", buf.getvalue())
-                            if st.session_state.get("flyer_result_tt"):
-                                buf = io.BytesIO()
-                                st.session_state.flyer_result_tt.save(buf, format="PNG")
-                                zip_file.writestr("Flyer_Timetable.png", buf.getvalue())
+                            for cache_key, stem in (("flyer_render_grid", "Flyer_Grid"), ("flyer_render_tt", "Flyer_Timetable")):
+                                render = _export_render(cache_key, EXPORT_SCALE)
+                                if render is None: continue
+                                zip_file.writestr(f"{stem}.png", _png_bytes(render.canvas))
+                                # 追加フォーマットは書き出し済みのレイヤーを使い回して並列に組み直す
+                                for name, variant in render_flyer_formats(render, extra_formats).items():
+                                    if variant is render: continue
+                                    zip_file.writestr(f"{stem}_{name}.png", _png_bytes(variant.canvas))
                             zip_file.writestr("Event_Outline.txt", summary_text)
                             if include_assets:
                                 if st.session_state.get("last_generated_grid_image"):
@@ -548,8 +556,30 @@ def render_flyer_editor(project_id):
                         st.download_button("⬇️ ZIPをダウンロード", zip_buffer.getvalue(), f"flyer_assets_{proj.id}.zip", "application/zip")
                     except Exception as e: st.error(f"ZIP生成エラー: {e}")
 
+            st.markdown("### イベント資料PDF")
+            st.caption("概要・業務用タイムテーブル・出演者一覧 / タイムテーブル画像を印刷用の 1 冊にまとめます(画像は生成済みのもの)")
+            if st.button("📘 イベント資料PDFを生成"):
+                try:
+                    tt_rows = timetable_service.get_rows_for_project(project_id)
+                    df_tt = calculate_flow(
+                        draft_rows_to_df(tt_rows), format_time_str(proj.open_time), format_time_str(proj.start_time)
+                    ) if tt_rows else None
+                    pack_buffer = io.BytesIO()
+                    write_event_pack_pdf(pack_buffer, proj, df_tt, [
+                        ("■ 出演者一覧", st.session_state.get("last_generated_grid_image")),
+                        ("■ タイムテーブル", st.session_state.get("last_generated_tt_image")),
+                    ])
+                    st.download_button("⬇️ イベント資料PDFをダウンロード", pack_buffer.getvalue(), f"event_pack_{proj.id}.pdf", "application/pdf")
+                except Exception as e: st.error(f"PDF生成エラー: {e}")
+
 # プレビュー生成ロジック
-def _generate_preview(proj):
+def _generate_preview(proj, incremental=False):
+    """grid 版 / TT 版のフライヤーを生成して session_state.flyer_result_* に格納する。
+
+    incremental=True(クリック移動)のときは前回の FlyerRender を rerender_flyer に渡し、
+    位置以外の入力が同じなら動いた要素の矩形だけを合成し直す(数十 ms)。
+    保存ボタンからは従来どおり毎回フル生成(背景・ロゴの再取得を含む)。
+    """
     bg_url = None
     if st.session_state.flyer_bg_id:
         asset = asset_service.get_asset_view(st.session_state.flyer_bg_id)
@@ -564,6 +594,10 @@ def _generate_preview(proj):
     
     # フォント読み込み (絶対パス化 & ダウンロード)
     targets = ["subtitle", "date", "venue", "time", "ticket_name", "ticket_note"]
+    # 未取得のフォントを先に並列で確保しておく(以降の ensure_font_path はローカル確認だけで済む)
+    font_service.provision_fonts(
+        [styles.get(f"{t}_font") for t in targets] + [st.session_state.get("flyer_fallback_font")], verify=False
+    )
     for t in targets:
         f_key = f"{t}_font"
         f_name = styles.get(f_key)
@@ -594,14 +628,15 @@ def _generate_preview(proj):
             s_grid["content_scale_h"] = st.session_state.flyer_grid_scale_h
             s_grid["content_pos_y"] = st.session_state.flyer_grid_pos_y 
             
-            img, meta = create_flyer_image_shadow(
+            render = _render_variant(
+                "flyer_render_grid", incremental,
                 bg_source=bg_url, logo_source=logo_url, main_source=grid_src,
                 styles=s_grid, date_text=d_text, venue_text=v_text, subtitle_text=subtitle_text,
                 open_time=format_time_str(proj.open_time), start_time=format_time_str(proj.start_time),
                 ticket_info_list=tickets, common_notes_list=notes, system_fallback_filename=fallback_filename 
             )
-            st.session_state.flyer_result_grid = img
-            st.session_state.flyer_layout_meta = meta
+            st.session_state.flyer_result_grid = render.canvas
+            st.session_state.flyer_layout_meta = render.layout_meta
 
         tt_src = st.session_state.get("last_generated_tt_image")
         if tt_src:
@@ -610,10 +645,70 @@ def _generate_preview(proj):
             s_tt["content_scale_h"] = st.session_state.flyer_tt_scale_h
             s_tt["content_pos_y"] = st.session_state.flyer_tt_pos_y 
             
-            img_tt, _ = create_flyer_image_shadow(
+            render_tt = _render_variant(
+                "flyer_render_tt", incremental,
                 bg_source=bg_url, logo_source=logo_url, main_source=tt_src,
                 styles=s_tt, date_text=d_text, venue_text=v_text, subtitle_text=subtitle_text,
                 open_time=format_time_str(proj.open_time), start_time=format_time_str(proj.start_time),
                 ticket_info_list=tickets, common_notes_list=notes, system_fallback_filename=fallback_filename 
             )
-            st.session_state.flyer_result_tt = img_tt
+            st.session_state.flyer_result_tt = render_tt.canvas
+
+
+def _preview_scale():
+    """プレビューの描画倍率。表示幅が 540px 以下なら半分の解像度(画素数 1/4)で描く。
+
+    layout_meta はデザイン単位(1080 幅)なので、クリック座標の換算は倍率に依らない。
+    """
+    if st.session_state.get("flyer_preview_width", 0) <= 1080 * PREVIEW_SCALE:
+        return PREVIEW_SCALE
+    return RENDER_SCALES["social"]
+
+
+def _render_variant(cache_key, incremental, **kwargs):
+    """FlyerRender を session_state[cache_key] にキャッシュしつつ 1 バリアント分を描画する。"""
+    scale = _preview_scale()
+    if incremental:
+        render = rerender_flyer(st.session_state.get(cache_key), scale=scale, **kwargs)
+    else:
+        render = render_flyer(scale=scale, **kwargs)
+    st.session_state[cache_key] = render
+    return render
+
+
+def _export_render(cache_key, scale):
+    """プレビューの FlyerRender を書き出し倍率で描き直す(同じ倍率ならそのまま返す)。"""
+    render = st.session_state.get(cache_key)
+    if render is None or render.scale == scale: return render
+    return rescale_flyer(render, scale)
+
+
+def _png_bytes(img):
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _export_png(cache_key, scale):
+    """書き出し倍率の PNG バイト列。プレビューが無ければ空。"""
+    render = _export_render(cache_key, scale)
+    return _png_bytes(render.canvas) if render is not None else b""
+
+
+def _export_download(cache_key, label, file_stem, key):
+    """解像度を選んで書き出す 2 段階(生成 → ダウンロード)の UI。
+
+    書き出しはフル解像度の再描画を伴うので、毎回の rerun では描かずボタン押下時だけ生成する。
+    """
+    c1, c2 = st.columns([2, 1])
+    size_label = c1.radio(
+        "書き出しサイズ", ["SNS (1080px)", "印刷 (4320px)"], horizontal=True, key=f"{key}_size"
+    )
+    scale = RENDER_SCALES["print"] if size_label.startswith("印刷") else EXPORT_SCALE
+    if c2.button(f"🖼 書き出し ({label})", key=f"{key}_export"):
+        with st.spinner("書き出し中..."):
+            try:
+                data = _export_png(cache_key, scale)
+                suffix = "" if scale == EXPORT_SCALE else "_print"
+                st.download_button(f"DL ({label})", data, f"{file_stem}{suffix}.png", "image/png", key=key)
+            except Exception as e: st.error(f"書き出しエラー: {e}")
@@ -1,17 +1,49 @@
+from datetime import date
+from io import BytesIO
+
 import streamlit as st
-from database import get_db, TimetableProject, Asset
+from database import get_db, Asset
 from utils import create_event_summary_pdf, create_business_pdf, calculate_timetable_flow
-from services import project_service
+from services import generation_service, project_service
 from repositories.timetable_repo import load_rows
+from repositories import project_repo
 from models.timetable import draft_rows_to_df
 
+def _render_batch_export():
+    """期間内の全プロジェクトのタイムテーブルを 1 つの PDF にまとめて出力する。"""
+    with st.expander("📚 タイムテーブルPDFを期間でまとめて出力"):
+        today = date.today()
+        c_from, c_to = st.columns(2)
+        with c_from:
+            date_from = st.date_input("開始日", value=today.replace(day=1), key="batch_pdf_from")
+        with c_to:
+            date_to = st.date_input("終了日", value=today, key="batch_pdf_to")
+        if st.button("まとめPDFを作成", key="batch_pdf_build", width='stretch'):
+            st.session_state.pop("batch_pdf", None)
+            buf = BytesIO()
+            with st.spinner("PDFを作成中..."):
+                count = generation_service.export_timetables_pdf(date_from.isoformat(), date_to.isoformat(), buf)
+            if count:
+                st.session_state.batch_pdf = buf.getvalue()
+                st.success(f"{count} 件のタイムテーブルをまとめました")
+            else:
+                st.info("期間内にタイムテーブルのあるプロジェクトがありません")
+        pdf = st.session_state.get("batch_pdf")
+        if pdf:
+            st.download_button(
+                "⏱️ まとめPDFをダウンロード", pdf, f"timetables_{date_from}_{date_to}.pdf",
+                "application/pdf", key="batch_pdf_dl", width='stretch',
+            )
+
+
 def render_projects_page():
     st.title("🗂️ プロジェクト管理")
     st.caption("作成済みプロジェクトのデータ出力や削除を行います。編集は「ワークスペース」で行ってください。")
     
+    _render_batch_export()
+
     db = next(get_db())
-    projects = db.query(TimetableProject).all()
-    projects.sort(key=lambda x: x.event_date or "0000-00-00", reverse=True)
+    projects = project_repo.list_projects(db)
 
     if not projects:
         st.info("プロジェクトがありません。")
@@ -64,13 +96,11 @@ def render_projects_page():
                 with st.expander("🗑️ プロジェクトを削除"):
                     st.warning("この操作は取り消せません！")
                     if st.button("本当に削除する", key=f"del_{proj.id}", type="primary"):
-                        db.delete(proj)
-                        db.commit()
-                        # Phase 3 cache-selector: services を経由しない孤立削除経路。
-                        # 本来は project_service.delete_project_by_id 経由に統一すべき
-                        # (将来タスク)。それまでの暫定として一覧キャッシュをここで無効化する。
-                        project_service.list_projects_for_selector.clear()
-                        st.success("削除しました")
-                        st.rerun()
+                        # ステージグループからの切り離し・一覧キャッシュの無効化は service 側
+                        if project_service.delete_project_by_id(proj.id):
+                            st.success("削除しました")
+                            st.rerun()
+                        else:
+                            st.error("削除に失敗しました")
 
     db.close()
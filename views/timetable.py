@@ -3,19 +3,19 @@ import pandas as pd
 import json
 import io
 import os
-import requests
 from datetime import datetime, date, timedelta
 
-from database import get_db, SessionLocal, Artist, TimetableProject, AssetFile, Asset, get_image_url
+from database import get_db, Artist, TimetableProject
 from constants import (
     TIME_OPTIONS, DURATION_OPTIONS, ADJUSTMENT_OPTIONS, 
     GOODS_DURATION_OPTIONS, PLACE_OPTIONS, FONT_DIR, get_default_row_settings
 )
-from utils import safe_int, safe_str, get_duration_minutes, calculate_timetable_flow, create_business_pdf, create_font_specimen_img, get_sorted_font_list
+from utils import get_duration_minutes, create_business_pdf, create_font_specimen_img, get_sorted_font_list
+from utils.flyer_helpers import provision_font_file
 
 # Phase 2B-1b: save_active_project 経由に切替
 # Phase 2B-2-b: session_manager + 純粋変換器を追加 (draft_rows 一本化)
-from services import project_service, session_manager
+from services import project_service, session_manager, stage_service, timetable_service
 from models.timetable import (
     PRE_GOODS_ARTIST_NAME,
     POST_GOODS_ARTIST_NAME,
@@ -23,6 +23,10 @@ from models.timetable import (
     draft_rows_to_df,
     df_to_draft_rows,
 )
+from models.timetable_flow import TimetableFlow, format_hhmm
+from models.goods_allocation import (
+    apply_places, booth_usage, changed_slots, goods_slots, required_booths, suggest_places,
+)
 
 try:
     from streamlit_sortables import sort_items
@@ -38,39 +42,13 @@ except Exception as e:
 
 # --- フォント確保関数 ---
 def ensure_font_exists(db, font_filename):
-    if not font_filename: return None
-    abs_font_dir = os.path.abspath(FONT_DIR)
-    os.makedirs(abs_font_dir, exist_ok=True)
-    file_path = os.path.join(abs_font_dir, font_filename)
-
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-        return file_path
-
-    try:
-        asset = db.query(Asset).filter(Asset.image_filename == font_filename).first()
-        if asset:
-            url = get_image_url(asset.image_filename)
-            if url:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    with open(file_path, "wb") as f:
-                        f.write(response.content)
-                    st.toast(f"フォント(URL)を準備しました: {font_filename}", icon="🔤")
-                    return file_path
-    except Exception as e:
-        print(f"URL Font Download Error: {e}")
-
-    try:
-        asset_file = db.query(AssetFile).filter(AssetFile.filename == font_filename).first()
-        if asset_file and asset_file.file_data:
-            with open(file_path, "wb") as f:
-                f.write(asset_file.file_data)
-            st.toast(f"フォント(DB)を準備しました: {font_filename}", icon="🔤")
-            return file_path
-    except Exception as e:
-        print(f"Binary Font Write Error: {e}")
-
-    return None
+    # 取得・アトミック書き込み・整合チェックは共用 helper(utils.flyer_helpers.provision_font_file)
+    status, file_path = provision_font_file(db, font_filename)
+    if status == "downloaded_url":
+        st.toast(f"フォント(URL)を準備しました: {font_filename}", icon="🔤")
+    elif status == "downloaded_db":
+        st.toast(f"フォント(DB)を準備しました: {font_filename}", icon="🔤")
+    return file_path
 
 
 # Phase 2B-2-b: editor key bump helper.
@@ -178,6 +156,100 @@ def _apply_editor_state_to_df(df, editor_state):
     return new_df
 
 
+def _render_stage_conflicts(project_id, draft_rows):
+    """同じイベントのステージ(プロジェクト)を束ね、出演の二重ブッキングと物販ブースの重なりを表示する。
+
+    他ステージの行は tt_stages にキャッシュし(保存・再読込時のみ DB から読み直す)、
+    自ステージは編集中の draft_rows / tt_start_time で毎 rerun 判定する。
+    """
+    if "tt_stages" not in st.session_state:
+        st.session_state.tt_stages = stage_service.load_stage_timetables(project_id)
+    stages = st.session_state.tt_stages
+
+    proj_map = dict(project_service.list_projects_for_selector())
+    member_ids = [s.project_id for s in stages if s.project_id in proj_map]
+    if project_id not in member_ids:
+        member_ids.insert(0, project_id)
+    selected = st.multiselect(
+        "同じイベントのステージ(プロジェクト)",
+        options=list(proj_map.keys()),
+        default=member_ids,
+        format_func=lambda pid: proj_map.get(pid, str(pid)),
+        key=f"tt_stage_members_{project_id}",
+    )
+    names = {s.project_id: s.name for s in stages}
+    stage_names = {}
+    for pid in selected:
+        stage_names[pid] = st.text_input(
+            f"ステージ名: {proj_map.get(pid, pid)}",
+            value=names.get(pid, ""),
+            key=f"tt_stage_name_{project_id}_{pid}",
+        )
+
+    c_save, c_reload = st.columns(2)
+    with c_save:
+        if st.button("ステージ構成を保存", key="btn_tt_stage_save", width='stretch'):
+            if project_id not in selected:
+                selected = [project_id] + list(selected)
+            if stage_service.save_stage_group([(pid, stage_names.get(pid, "")) for pid in selected]):
+                st.session_state.tt_stages = stage_service.load_stage_timetables(project_id)
+                st.toast("ステージ構成を保存しました", icon="🎪")
+                st.rerun()
+            else:
+                st.error("ステージ構成の保存に失敗しました")
+    with c_reload:
+        if st.button("他ステージを再読込", key="btn_tt_stage_reload", width='stretch'):
+            st.session_state.tt_stages = stage_service.load_stage_timetables(project_id)
+            st.rerun()
+
+    _, conflicts = stage_service.find_conflicts_for_project(
+        project_id, rows=draft_rows, start_time=st.session_state.get("tt_start_time"), stages=stages,
+    )
+    if conflicts:
+        st.warning(f"⚠️ 重複が {len(conflicts)} 件あります")
+        for c in conflicts:
+            st.markdown(f"- {c.describe()}")
+    else:
+        st.success(f"重複はありません({len(stages)} ステージ)")
+
+
+def _render_goods_allocation(draft_rows):
+    """物販ブースの同時使用数と、最少ブース数の割り当て提案を表示する。一括適用したら True。"""
+    slots = goods_slots(draft_rows)
+    if not slots:
+        st.info("物販時間が入っている枠がありません")
+        return False
+
+    usage = booth_usage(slots)
+    if usage:
+        st.dataframe(pd.DataFrame([{
+            "場所": u.place, "枠数": u.slots, "最大同時": u.peak,
+            "ピーク開始": format_hhmm(u.peak_start), "状態": "⚠️ 重複" if u.peak > 1 else "OK",
+        } for u in usage]), width='stretch', hide_index=True)
+
+    need = required_booths(slots)
+    in_use = len({s.place for s in slots if s.place})
+    st.caption(f"必要な最少ブース数: {need}(現在 {in_use} 箇所を使用)")
+    try:
+        assignment = suggest_places(slots, PLACE_OPTIONS)
+    except ValueError as e:
+        st.warning(str(e))
+        return False
+    changes = changed_slots(slots, assignment)
+    if not changes:
+        st.success("現在の割り当てが最少ブース数で重複もありません")
+        return False
+
+    st.dataframe(pd.DataFrame([{
+        "アーティスト": s.artist, "物販": "追加" if s.which == "add" else "メイン",
+        "時間": f"{format_hhmm(s.start)}-{format_hhmm(s.end)}", "現在": s.place or "-", "提案": place,
+    } for s, place in changes]), width='stretch', hide_index=True)
+    if st.button(f"提案を一括適用({len(changes)} 枠)", key="btn_tt_goods_allocate", width='stretch'):
+        session_manager.set_draft_rows(apply_places(draft_rows, assignment))
+        return True
+    return False
+
+
 def render_timetable_page():
     if "ws_active_project_id" not in st.session_state or st.session_state.ws_active_project_id is None:
         st.title("⏱️ タイムテーブル作成")
@@ -243,101 +315,19 @@ def render_timetable_page():
         uploaded = st.session_state.get("csv_upload_key")
         if not uploaded: return
         try:
-            uploaded.seek(0)
-            try:
-                df_csv = pd.read_csv(uploaded)
-            except UnicodeDecodeError:
-                uploaded.seek(0)
-                df_csv = pd.read_csv(uploaded, encoding="cp932")
-            
-            df_csv.columns = [c.strip() for c in df_csv.columns]
-            
-            temp_db = SessionLocal()
-            try:
-                artists_to_check = []
-                col_group = "グループ名" if "グループ名" in df_csv.columns else next((c for c in df_csv.columns if c.lower() == "artist"), df_csv.columns[0])
-                artists_to_check = [str(row.get(col_group, "")).strip() for _, row in df_csv.iterrows()]
-                artists_to_check = list(set([a for a in artists_to_check if a and a != "nan"]))
-
-                for artist_name in artists_to_check:
-                    existing = temp_db.query(Artist).filter(Artist.name == artist_name).first()
-                    if not existing:
-                        new_artist = Artist(name=artist_name, image_filename=None)
-                        temp_db.add(new_artist)
-                temp_db.commit()
-            except Exception as e:
-                print(f"Auto reg error: {e}")
-            finally:
-                temp_db.close()
-            
+            # CSV の変換は列単位・アーティストの照合/自動登録は IN 1 回 + INSERT 1 文
+            # (timetable_service.import_csv → models.timetable_csv / artist_service)。
             # Phase 2B-2-b ③ Edit B: CSV パース結果を draft_rows に直接書き戻す。
             # 既存 draft_rows の開演前物販行は保持、通常行は CSV で全置換、
             # 終演後物販は (CSV に IS_POST_GOODS=True があれば) 次 rerun の②集約 trigger で append。
             # 旧 6 状態 (tt_artists_order / tt_artist_settings / tt_row_settings) への
             # 書き戻しは撤去 (sentinel で _rebuild_from_legacy が skip されるため反映されない)。
-            new_rows = []
-
-            col_start = "START" if "START" in df_csv.columns else None
-            col_end = "END" if "END" in df_csv.columns else None
-            col_duration = "持ち時間" if "持ち時間" in df_csv.columns else "Duration"
-            col_adj = "Adjustment" if "Adjustment" in df_csv.columns else None
-
-            if not df_csv.empty and col_start:
-                first_start_time = str(df_csv.iloc[0].get(col_start, "")).strip()
-                if ":" in first_start_time:
-                    try:
-                        h, m = map(int, first_start_time.split(":"))
-                        formatted_start = f"{h:02d}:{m:02d}"
-                        st.session_state.tt_start_time = formatted_start
-                    except Exception:
-                        pass
-
-            for i, row in df_csv.iterrows():
-                name = str(row.get(col_group, ""))
-                if name == "nan" or not name:
-                    continue
-                # ★ ガード: CSV に「開演前物販」「終演後物販」名行が含まれた場合は skip。
-                # 特殊行は existing_pre 保持 + ②集約による終演後物販 append で管理する。
-                # ガードなしだと: 開演前物販の二重化、終演後物販の auto-pop で意図と乖離。
-                # (scratch/probe_csv_special_row_names.py で検証済み)
-                if name in (PRE_GOODS_ARTIST_NAME, POST_GOODS_ARTIST_NAME):
-                    continue
-
-                duration = safe_int(row.get(col_duration), 20)
-                adjustment = 0
-
-                if col_start and col_end and i < len(df_csv) - 1:
-                    current_end = str(row.get(col_end, "")).strip()
-                    next_start = str(df_csv.iloc[i+1].get(col_start, "")).strip()
-                    if current_end and next_start:
-                        adjustment = get_duration_minutes(current_end, next_start)
-                        if adjustment < 0: adjustment = 0
-                elif col_adj:
-                    adjustment = safe_int(row.get(col_adj), 0)
-
-                g_start = safe_str(row.get("物販開始") or row.get("GoodsStart"))
-                g_dur = safe_int(row.get("物販時間") or row.get("GoodsDuration"), 60)
-                g_place = safe_str(row.get("物販場所") or row.get("Place") or "A")
-                add_start = safe_str(row.get("AddGoodsStart"))
-                add_dur = safe_int(row.get("AddGoodsDuration"), None)
-                add_place = safe_str(row.get("AddGoodsPlace"))
-                is_post = bool(row.get("IS_POST_GOODS", False))
-
-                # 重複アーティスト名は旧と等価で append (除外なし)。
-                # place は g_place ("A" 既定) で旧 get_default_row_settings と等価。
-                new_rows.append(TimetableRowDraft(
-                    artist_name=name,
-                    duration=duration,
-                    adjustment=adjustment,
-                    is_post_goods=is_post,
-                    is_hidden=False,
-                    goods_start_time=g_start,
-                    goods_duration=g_dur,
-                    place=g_place,
-                    add_goods_start_time=add_start,
-                    add_goods_duration=add_dur,
-                    add_goods_place=add_place,
-                ))
+            # 「開演前物販」「終演後物販」名の行は skip (開演前物販の二重化・終演後物販の auto-pop 防止。
+            # scratch/probe_csv_special_row_names.py で検証済み)。重複アーティスト名は除外せず append。
+            parsed, report = timetable_service.import_csv(uploaded)
+            if parsed.start_time:
+                st.session_state.tt_start_time = parsed.start_time
+            new_rows = parsed.rows
 
             # 既存 draft_rows の開演前物販行を保持 + CSV 通常行で全置換。
             # 終演後物販は CSV 内 IS_POST_GOODS=True があれば、次 rerun の②集約で append される。
@@ -350,6 +340,10 @@ def render_timetable_page():
             st.session_state.tt_unsaved_changes = True
             # ★ on_click 内なので st.rerun() は呼ばない (Streamlit が自動 rerun)。
             st.success(f"CSVを読み込みました (開演時間を {st.session_state.tt_start_time} に設定)")
+            if report and report.created:
+                st.info(f"未登録のアーティスト {len(report.created)} 件を登録しました: {', '.join(report.created)}")
+            if report and report.ambiguous:
+                st.warning(f"同名のアーティストが複数登録されています: {', '.join(report.ambiguous)}")
         except Exception as e:
             st.error(f"読み込みエラー: {e}")
 
@@ -573,35 +567,32 @@ def render_timetable_page():
                 st.rerun()
 
             # --- データ表示 ---
-            calculated_df = calculate_timetable_flow(edited_df, st.session_state.tt_open_time, st.session_state.tt_start_time)
+            # 計算結果は TimetableFlow に持ち越し、rerun ごとには編集差分だけ計算し直す
+            # (時刻の変更は変更行以降だけ、物販だけの変更は時刻に触れない)。
+            # 画像生成用の gen_list も同じ行 dict から作る(DataFrame を回し直さない)。
+            if "tt_flow" not in st.session_state:
+                st.session_state.tt_flow = TimetableFlow()
+            tt_flow = st.session_state.tt_flow
+            calculated_df = tt_flow.update(edited_df, st.session_state.tt_open_time, st.session_state.tt_start_time)
             st.dataframe(calculated_df[["TIME_DISPLAY", "ARTIST", "GOODS_DISPLAY", "PLACE"]], width='stretch', hide_index=True)
             
             # 画像生成用リスト (IS_HIDDEN対応)
-            gen_list = []
-            hidden_flags = []
             if "IS_HIDDEN" in edited_df.columns:
                 hidden_flags = edited_df["IS_HIDDEN"].tolist()
             else:
                 hidden_flags = [False] * len(edited_df)
-            
-            edited_row_idx = 0
-            
-            for _, row in calculated_df.iterrows():
-                if row["ARTIST"] == "OPEN / START": 
-                    continue
-                
-                is_hidden = False
-                if edited_row_idx < len(hidden_flags):
-                    is_hidden = hidden_flags[edited_row_idx]
-                
-                edited_row_idx += 1
-                
-                if is_hidden:
-                    continue
-                
-                gen_list.append([row["TIME_DISPLAY"], row["ARTIST"], row["GOODS_DISPLAY"], row["PLACE"]])
+            gen_list = tt_flow.gen_list(hidden_flags)
 
             st.session_state.tt_gen_list = gen_list
+
+            with st.expander("🎪 複数ステージ・重複チェック"):
+                _render_stage_conflicts(selected_id, draft_rows)
+
+            with st.expander("🛍️ 物販ブース割り当て"):
+                if _render_goods_allocation(draft_rows):
+                    _bump_editor_seq()
+                    mark_dirty()
+                    st.rerun()
             
             st.divider()
 
@@ -683,6 +674,7 @@ def render_timetable_page():
 
                                 # 画像生成
                                 img = generate_timetable_image(gen_list, font_path=font_path, columns=st.session_state.tt_columns)
+                                st.toast("画像生成完了！", icon="✅")
                                 st.session_state.last_generated_tt_image = img
                                 st.session_state.tt_last_generated_params = current_tt_params
 